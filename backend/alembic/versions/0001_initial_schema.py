@@ -0,0 +1,93 @@
+"""Schéma initial (tables créées jusqu'ici par Base.metadata.create_all)
+
+Revision ID: 0001
+Revises:
+Create Date: 2026-10-19 09:00:00
+"""
+
+from alembic import context, op
+import sqlalchemy as sa
+
+# Identifiants de révision utilisés par Alembic
+revision = '0001'
+down_revision = None
+branch_labels = None
+depends_on = None
+
+
+def upgrade() -> None:
+    # Les bases existantes ont été créées par create_all : on ne recrée pas leurs tables
+    # (hors ligne, --sql, pas d'inspection possible : le script crée tout)
+    existing_tables = set()
+    if not context.is_offline_mode():
+        existing_tables = set(sa.inspect(op.get_bind()).get_table_names())
+
+    if 'users' not in existing_tables:
+        op.create_table(
+            'users',
+            sa.Column('id', sa.Integer(), primary_key=True),
+            sa.Column('email', sa.String(), nullable=False),
+            sa.Column('username', sa.String(), nullable=False),
+            sa.Column('full_name', sa.String(), nullable=False),
+            sa.Column('hashed_password', sa.String(), nullable=False),
+            sa.Column('role', sa.String(), nullable=True),
+            sa.Column('is_active', sa.Boolean(), nullable=True),
+            sa.Column('created_at', sa.DateTime(timezone=True), server_default=sa.func.now(), nullable=True),
+            sa.Column('updated_at', sa.DateTime(timezone=True), nullable=True),
+        )
+        op.create_index('ix_users_id', 'users', ['id'])
+        op.create_index('ix_users_email', 'users', ['email'], unique=True)
+        op.create_index('ix_users_username', 'users', ['username'], unique=True)
+
+    if 'exams' not in existing_tables:
+        op.create_table(
+            'exams',
+            sa.Column('id', sa.Integer(), primary_key=True),
+            sa.Column('title', sa.String(), nullable=False),
+            sa.Column('description', sa.Text(), nullable=True),
+            sa.Column('duration_minutes', sa.Integer(), nullable=False),
+            sa.Column('start_time', sa.DateTime(timezone=True), nullable=False),
+            sa.Column('end_time', sa.DateTime(timezone=True), nullable=False),
+            sa.Column('student_id', sa.Integer(), sa.ForeignKey('users.id'), nullable=True),
+            sa.Column('instructor_id', sa.Integer(), sa.ForeignKey('users.id'), nullable=True),
+            sa.Column('allowed_apps', sa.Text(), nullable=True),
+            sa.Column('allowed_domains', sa.Text(), nullable=True),
+            sa.Column('is_active', sa.Boolean(), nullable=True),
+            sa.Column('created_at', sa.DateTime(timezone=True), server_default=sa.func.now(), nullable=True),
+        )
+        op.create_index('ix_exams_id', 'exams', ['id'])
+
+    if 'exam_sessions' not in existing_tables:
+        op.create_table(
+            'exam_sessions',
+            sa.Column('id', sa.Integer(), primary_key=True),
+            sa.Column('exam_id', sa.Integer(), sa.ForeignKey('exams.id'), nullable=True),
+            sa.Column('student_id', sa.Integer(), sa.ForeignKey('users.id'), nullable=True),
+            sa.Column('start_time', sa.DateTime(timezone=True), server_default=sa.func.now(), nullable=True),
+            sa.Column('end_time', sa.DateTime(timezone=True), nullable=True),
+            sa.Column('status', sa.String(), nullable=True),
+            sa.Column('video_path', sa.String(), nullable=True),
+            sa.Column('audio_path', sa.String(), nullable=True),
+            sa.Column('screen_captures', sa.Text(), nullable=True),
+        )
+        op.create_index('ix_exam_sessions_id', 'exam_sessions', ['id'])
+
+    if 'security_alerts' not in existing_tables:
+        op.create_table(
+            'security_alerts',
+            sa.Column('id', sa.Integer(), primary_key=True),
+            sa.Column('session_id', sa.Integer(), sa.ForeignKey('exam_sessions.id'), nullable=True),
+            sa.Column('alert_type', sa.String(), nullable=False),
+            sa.Column('severity', sa.String(), nullable=True),
+            sa.Column('description', sa.Text(), nullable=True),
+            sa.Column('timestamp', sa.DateTime(timezone=True), server_default=sa.func.now(), nullable=True),
+            sa.Column('is_resolved', sa.Boolean(), nullable=True),
+        )
+        op.create_index('ix_security_alerts_id', 'security_alerts', ['id'])
+
+
+def downgrade() -> None:
+    op.drop_table('security_alerts')
+    op.drop_table('exam_sessions')
+    op.drop_table('exams')
+    op.drop_table('users')
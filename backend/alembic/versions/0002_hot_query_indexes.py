@@ -0,0 +1,46 @@
+"""Index composites pour les requêtes de surveillance
+
+Revision ID: 0002
+Revises: 0001
+Create Date: 2026-10-19 09:30:00
+"""
+
+from alembic import op
+
+# Identifiants de révision utilisés par Alembic
+revision = '0002'
+down_revision = '0001'
+branch_labels = None
+depends_on = None
+
+# (nom, table, colonnes) : alertes d'une session triées par date, tableaux de bord par étudiant / examen
+INDEXES = [
+    ('ix_security_alerts_session_id_timestamp', 'security_alerts', ['session_id', 'timestamp']),
+    ('ix_exam_sessions_student_id_status', 'exam_sessions', ['student_id', 'status']),
+    ('ix_exam_sessions_exam_id_status', 'exam_sessions', ['exam_id', 'status']),
+]
+
+
+def upgrade() -> None:
+    # CREATE INDEX CONCURRENTLY ne peut pas s'exécuter dans une transaction (PostgreSQL) :
+    # les tables restent accessibles en écriture pendant la construction
+    with op.get_context().autocommit_block():
+        for name, table, columns in INDEXES:
+            op.create_index(
+                name,
+                table,
+                columns,
+                postgresql_concurrently=True,
+                if_not_exists=True,
+            )
+
+
+def downgrade() -> None:
+    with op.get_context().autocommit_block():
+        for name, table, _ in reversed(INDEXES):
+            op.drop_index(
+                name,
+                table_name=table,
+                postgresql_concurrently=True,
+                if_exists=True,
+            )
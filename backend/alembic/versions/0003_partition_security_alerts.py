@@ -0,0 +1,119 @@
+"""Partitionnement temporel de security_alerts (PostgreSQL)
+
+La table est recréée en PARTITION BY RANGE (timestamp) avec une partition par
+ALERT_PARTITION_INTERVAL_DAYS (une semaine par défaut), sur la même grille que
+le job de rétention qui crée les suivantes : la rétention supprime des
+partitions entières au lieu d'un DELETE massif. Les données existantes sont recopiées ; sur une base volumineuse,
+appliquer cette migration pendant une fenêtre de maintenance.
+Sans effet sur SQLite (la rétention y supprime par lots).
+
+Revision ID: 0003
+Revises: 0002
+Create Date: 2026-10-19 10:00:00
+"""
+
+from datetime import datetime, timedelta, timezone
+
+from alembic import context, op
+import sqlalchemy as sa
+
+from app.core.config import settings
+from app.core.partitions import (
+    next_partition_bound,
+    partition_bound,
+    partition_interval_days,
+    partition_name,
+    partition_start
+)
+
+# Identifiants de révision utilisés par Alembic
+revision = '0003'
+down_revision = '0002'
+branch_labels = None
+depends_on = None
+
+COLUMNS = "id, session_id, alert_type, severity, description, timestamp, is_resolved"
+
+
+def upgrade() -> None:
+    bind = op.get_bind()
+    if bind.dialect.name != 'postgresql':
+        return
+
+    # Bornes : de la plus ancienne alerte jusqu'à ALERT_PARTITIONS_AHEAD partitions après aujourd'hui
+    # En mode hors ligne (--sql), pas de lecture possible : on part de la partition courante
+    days = partition_interval_days()
+    oldest = None
+    if not context.is_offline_mode():
+        oldest = bind.execute(sa.text("SELECT min(timestamp) FROM security_alerts")).scalar()
+    today = datetime.now(timezone.utc).date()
+    start = partition_start(oldest.date() if oldest else today, days)
+    end = partition_start(today, days) + timedelta(days=days * (settings.ALERT_PARTITIONS_AHEAD + 1))
+
+    op.execute("ALTER TABLE security_alerts RENAME TO security_alerts_legacy")
+    op.execute("ALTER TABLE security_alerts_legacy RENAME CONSTRAINT security_alerts_pkey TO security_alerts_legacy_pkey")
+    op.execute("ALTER SEQUENCE security_alerts_id_seq OWNED BY NONE")
+
+    # La clé de partitionnement doit faire partie de la clé primaire
+    op.execute("""
+        CREATE TABLE security_alerts (
+            id INTEGER NOT NULL DEFAULT nextval('security_alerts_id_seq'),
+            session_id INTEGER REFERENCES exam_sessions (id),
+            alert_type VARCHAR NOT NULL,
+            severity VARCHAR,
+            description TEXT,
+            timestamp TIMESTAMP WITH TIME ZONE NOT NULL DEFAULT now(),
+            is_resolved BOOLEAN,
+            PRIMARY KEY (id, timestamp)
+        ) PARTITION BY RANGE (timestamp)
+    """)
+    op.execute("ALTER SEQUENCE security_alerts_id_seq OWNED BY security_alerts.id")
+
+    # Filet de sécurité pour les horodatages hors des partitions créées
+    op.execute("CREATE TABLE security_alerts_default PARTITION OF security_alerts DEFAULT")
+
+    current = start
+    while current < end:
+        upper = next_partition_bound(current, days)
+        op.execute(
+            f"CREATE TABLE {partition_name(current)} PARTITION OF security_alerts "
+            f"FOR VALUES FROM ('{partition_bound(current)}') TO ('{partition_bound(upper)}')"
+        )
+        current = upper
+
+    op.execute(
+        f"INSERT INTO security_alerts ({COLUMNS}) "
+        f"SELECT id, session_id, alert_type, severity, description, coalesce(timestamp, now()), is_resolved "
+        f"FROM security_alerts_legacy"
+    )
+    op.execute("DROP TABLE security_alerts_legacy")
+
+    # Index déclarés sur la table parente, propagés à chaque partition
+    op.create_index('ix_security_alerts_id', 'security_alerts', ['id'])
+    op.create_index('ix_security_alerts_session_id_timestamp', 'security_alerts', ['session_id', 'timestamp'])
+
+
+def downgrade() -> None:
+    bind = op.get_bind()
+    if bind.dialect.name != 'postgresql':
+        return
+
+    op.execute("ALTER TABLE security_alerts RENAME TO security_alerts_partitioned")
+    op.execute("ALTER TABLE security_alerts_partitioned RENAME CONSTRAINT security_alerts_pkey TO security_alerts_partitioned_pkey")
+    op.execute("ALTER SEQUENCE security_alerts_id_seq OWNED BY NONE")
+    op.execute("""
+        CREATE TABLE security_alerts (
+            id INTEGER NOT NULL DEFAULT nextval('security_alerts_id_seq') PRIMARY KEY,
+            session_id INTEGER REFERENCES exam_sessions (id),
+            alert_type VARCHAR NOT NULL,
+            severity VARCHAR,
+            description TEXT,
+            timestamp TIMESTAMP WITH TIME ZONE DEFAULT now(),
+            is_resolved BOOLEAN
+        )
+    """)
+    op.execute("ALTER SEQUENCE security_alerts_id_seq OWNED BY security_alerts.id")
+    op.execute(f"INSERT INTO security_alerts ({COLUMNS}) SELECT {COLUMNS} FROM security_alerts_partitioned")
+    op.execute("DROP TABLE security_alerts_partitioned")
+    op.create_index('ix_security_alerts_id', 'security_alerts', ['id'])
+    op.create_index('ix_security_alerts_session_id_timestamp', 'security_alerts', ['session_id', 'timestamp'])
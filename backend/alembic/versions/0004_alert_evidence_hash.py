@@ -0,0 +1,29 @@
+"""Référence de preuve sur les alertes (SHA-256 de l'image)
+
+Revision ID: 0004
+Revises: 0003
+Create Date: 2026-10-19 11:00:00
+"""
+
+from alembic import context, op
+import sqlalchemy as sa
+
+# Identifiants de révision utilisés par Alembic
+revision = '0004'
+down_revision = '0003'
+branch_labels = None
+depends_on = None
+
+
+def upgrade() -> None:
+    # Colonne nullable sans défaut : ajout instantané, y compris sur la table partitionnée
+    columns = set()
+    if not context.is_offline_mode():
+        columns = {column['name'] for column in sa.inspect(op.get_bind()).get_columns('security_alerts')}
+    if 'evidence_hash' not in columns:
+        op.add_column('security_alerts', sa.Column('evidence_hash', sa.String(length=64), nullable=True))
+
+
+def downgrade() -> None:
+    with op.batch_alter_table('security_alerts') as batch_op:
+        batch_op.drop_column('evidence_hash')
@@ -5,12 +5,15 @@ Détection et vérification d'identité par IA
 
 import cv2
 import numpy as np
-import face_recognition
 from typing import List, Dict, Tuple, Optional
 import logging
 from PIL import Image
 import io
-import base64
+
+from app.ai.face_recognition import face_recognition_engine
+from app.ai.providers import LazyService
+from app.core.metrics import AI_STAGE_SECONDS, timed
+from app.core.uploads import decode_base64
 
 logger = logging.getLogger(__name__)
 
@@ -22,6 +25,10 @@ class FaceDetectionService:
     
     def __init__(self):
         """Initialisation du service de reconnaissance faciale"""
+        # dlib est lourd à importer : chargé avec le service, pas avec le module
+        import face_recognition
+        self.face_recognition = face_recognition
+        
         self.face_cascade = cv2.CascadeClassifier(
             cv2.data.haarcascades + 'haarcascade_frontalface_default.xml'
         )
@@ -34,6 +41,9 @@ class FaceDetectionService:
         self.recognition_threshold = 0.6
         self.min_face_size = (30, 30)
         
+        # Regard par maillage FaceMesh (désactivé si MediaPipe est absent)
+        self.mesh_gaze = True
+        
         logger.info("Service de reconnaissance faciale initialisé")
     
     def decode_base64_image(self, image_data: str) -> np.ndarray:
@@ -47,20 +57,19 @@ class FaceDetectionService:
             Array numpy de l'image
         """
         try:
-            # Supprimer le préfixe data:image/...;base64, si présent
-            if ',' in image_data:
-                image_data = image_data.split(',')[1]
-            
-            # Décoder l'image
-            image_bytes = base64.b64decode(image_data)
-            image = Image.open(io.BytesIO(image_bytes))
-            
-            # Convertir en RGB si nécessaire
-            if image.mode != 'RGB':
-                image = image.convert('RGB')
-            
-            # Convertir en array numpy
-            return np.array(image)
+            # Décoder l'image (préfixe data:image/...;base64, accepté)
+            with timed(AI_STAGE_SECONDS, 'face_detection', 'base64_decode', 'python'):
+                image_bytes = decode_base64(image_data)
+            
+            with timed(AI_STAGE_SECONDS, 'face_detection', 'image_decode', 'pil'):
+                image = Image.open(io.BytesIO(image_bytes))
+                
+                # Convertir en RGB si nécessaire
+                if image.mode != 'RGB':
+                    image = image.convert('RGB')
+                
+                # Convertir en array numpy
+                return np.array(image)
         
         except Exception as e:
             logger.error(f"Erreur lors du décodage de l'image: {e}")
@@ -81,12 +90,13 @@ class FaceDetectionService:
             gray = cv2.cvtColor(image, cv2.COLOR_RGB2GRAY)
             
             # Détecter les visages
-            faces = self.face_cascade.detectMultiScale(
-                gray,
-                scaleFactor=1.1,
-                minNeighbors=5,
-                minSize=self.min_face_size
-            )
+            with timed(AI_STAGE_SECONDS, 'face_detection', 'face_detect', 'opencv_haar'):
+                faces = self.face_cascade.detectMultiScale(
+                    gray,
+                    scaleFactor=1.1,
+                    minNeighbors=5,
+                    minSize=self.min_face_size
+                )
             
             results = []
             for (x, y, w, h) in faces:
@@ -116,7 +126,8 @@ class FaceDetectionService:
         """
         try:
             # Utiliser face_recognition pour les landmarks
-            face_landmarks_list = face_recognition.face_landmarks(face_image)
+            with timed(AI_STAGE_SECONDS, 'face_detection', 'landmarks', 'dlib'):
+                face_landmarks_list = self.face_recognition.face_landmarks(face_image)
             
             if face_landmarks_list:
                 landmarks = face_landmarks_list[0]
@@ -168,8 +179,9 @@ class FaceDetectionService:
                 }
             
             # Extraire les encodages faciaux
-            current_encodings = face_recognition.face_encodings(current_img)
-            reference_encodings = face_recognition.face_encodings(reference_img)
+            with timed(AI_STAGE_SECONDS, 'face_detection', 'face_encoding', 'dlib'):
+                current_encodings = self.face_recognition.face_encodings(current_img)
+                reference_encodings = self.face_recognition.face_encodings(reference_img)
             
             if not current_encodings:
                 return {
@@ -190,7 +202,7 @@ class FaceDetectionService:
             reference_encoding = reference_encodings[0]
             
             # Calculer la distance
-            distance = face_recognition.face_distance([reference_encoding], current_encoding)[0]
+            distance = self.face_recognition.face_distance([reference_encoding], current_encoding)[0]
             
             # Convertir en score de confiance (0-1)
             confidence = 1.0 - distance
@@ -323,58 +335,50 @@ class FaceDetectionService:
                 'warning': False
             }
     
-    def track_gaze(self, image: str, face_bbox: List[int]) -> Dict:
+    def track_gaze(self, image, face_bbox: List[int], session_id: Optional[int] = None) -> Dict:
         """
         Analyse la direction du regard
         
+        Un passage FaceMesh (points des iris) donne l'orientation de la tête et le
+        regard ; sans MediaPipe, repli sur la cascade de Haar des yeux.
+        
         Args:
-            image: Image en base64
+            image: Image en base64, ou déjà décodée (RGB)
             face_bbox: Coordonnées du visage [x, y, w, h]
+            session_id: Session d'examen vérifiée (maillage en mode suivi propre à la session)
             
         Returns:
             Analyse du regard
         """
         try:
-            img = self.decode_base64_image(image)
-            gray = cv2.cvtColor(img, cv2.COLOR_RGB2GRAY)
-            
-            # Extraire la région du visage
-            x, y, w, h = face_bbox
-            face_roi = gray[y:y+h, x:x+w]
-            
-            # Détecter les yeux
-            eyes = self.eye_cascade.detectMultiScale(face_roi)
-            
-            if len(eyes) < 2:
-                return {
-                    'gaze_detected': False,
-                    'looking_at_screen': False,
-                    'confidence': 0.0,
-                    'reason': 'Yeux non détectés'
-                }
-            
-            # Analyser la position des yeux
-            eye_positions = []
-            for (ex, ey, ew, eh) in eyes:
-                eye_center = (ex + ew//2, ey + eh//2)
-                eye_positions.append(eye_center)
-            
-            # Calculer la direction du regard (simplifié)
-            # En production, utiliser un modèle plus sophistiqué
-            avg_eye_x = sum(pos[0] for pos in eye_positions) / len(eye_positions)
-            face_center_x = w // 2
-            
-            # Déterminer si le regard est centré
-            gaze_offset = abs(avg_eye_x - face_center_x) / face_center_x
-            looking_at_screen = gaze_offset < 0.3
-            
-            return {
-                'gaze_detected': True,
-                'looking_at_screen': looking_at_screen,
-                'confidence': max(0.0, 1.0 - gaze_offset),
-                'eye_positions': eye_positions,
-                'gaze_offset': float(gaze_offset)
-            }
+            img = image if isinstance(image, np.ndarray) else self.decode_base64_image(image)
+            
+            if self.mesh_gaze:
+                try:
+                    estimate = face_recognition_engine.estimate_head_pose(img, rgb=True, session_id=session_id)
+                except ImportError as e:
+                    logger.warning(f"MediaPipe indisponible, regard estimé par la cascade des yeux: {e}")
+                    self.mesh_gaze = False
+                else:
+                    if estimate is None:
+                        return {
+                            'gaze_detected': False,
+                            'looking_at_screen': False,
+                            'confidence': 0.0,
+                            'reason': 'Maillage du visage non détecté'
+                        }
+                    return {
+                        'gaze_detected': True,
+                        'looking_at_screen': estimate['looking_at_screen'],
+                        'confidence': estimate['confidence'],
+                        'eye_positions': estimate['iris_positions'],
+                        'gaze_offset': estimate['gaze_offset'],
+                        'head_pose': estimate['head_pose'],
+                        'gaze': estimate['gaze'],
+                        'gaze_vector': estimate['gaze_vector']
+                    }
+            
+            return self._track_gaze_cascade(img, face_bbox)
             
         except Exception as e:
             logger.error(f"Erreur lors du suivi du regard: {e}")
@@ -384,6 +388,49 @@ class FaceDetectionService:
                 'confidence': 0.0,
                 'reason': 'Erreur d\'analyse'
             }
+    
+    def _track_gaze_cascade(self, img: np.ndarray, face_bbox: List[int]) -> Dict:
+        """Regard estimé par la position des yeux (cascade de Haar) dans le visage"""
+        gray = cv2.cvtColor(img, cv2.COLOR_RGB2GRAY)
+        
+        # Extraire la région du visage
+        x, y, w, h = face_bbox
+        face_roi = gray[y:y+h, x:x+w]
+        
+        # Détecter les yeux
+        with timed(AI_STAGE_SECONDS, 'face_detection', 'eye_detect', 'opencv_haar'):
+            eyes = self.eye_cascade.detectMultiScale(face_roi)
+        
+        if len(eyes) < 2:
+            return {
+                'gaze_detected': False,
+                'looking_at_screen': False,
+                'confidence': 0.0,
+                'reason': 'Yeux non détectés'
+            }
+        
+        # Analyser la position des yeux
+        eye_positions = []
+        for (ex, ey, ew, eh) in eyes:
+            eye_center = (ex + ew//2, ey + eh//2)
+            eye_positions.append(eye_center)
+        
+        # Calculer la direction du regard (simplifié)
+        # En production, utiliser un modèle plus sophistiqué
+        avg_eye_x = sum(pos[0] for pos in eye_positions) / len(eye_positions)
+        face_center_x = w // 2
+        
+        # Déterminer si le regard est centré
+        gaze_offset = abs(avg_eye_x - face_center_x) / face_center_x
+        looking_at_screen = gaze_offset < 0.3
+        
+        return {
+            'gaze_detected': True,
+            'looking_at_screen': looking_at_screen,
+            'confidence': max(0.0, 1.0 - gaze_offset),
+            'eye_positions': eye_positions,
+            'gaze_offset': float(gaze_offset)
+        }
 
-# Instance globale du service
-face_detection_service = FaceDetectionService()
+# Instance globale du service (construite au premier usage)
+face_detection_service = LazyService('face_detection', FaceDetectionService)
@@ -3,19 +3,30 @@ Module de reconnaissance faciale ProctoFlex AI
 Utilise OpenCV et MediaPipe pour la vérification d'identité
 """
 
+import threading
+
 import cv2
-import mediapipe as mp
 import numpy as np
-from typing import Tuple, Optional, List
-import face_recognition
+from typing import Hashable, Tuple, Optional, List
 from PIL import Image
 import io
 import base64
 
+from app.ai.head_pose import HeadPoseEstimator, landmarks_to_pixels
+from app.ai.providers import LazyService
+from app.ai.tracker_pool import TrackerPool
+from app.core.config import settings
+from app.core.metrics import AI_STAGE_SECONDS, timed
+
 class FaceRecognitionEngine:
     """Moteur de reconnaissance faciale pour la surveillance d'examen"""
     
     def __init__(self):
+        # MediaPipe et dlib sont importés à la construction du moteur, pas avec le module
+        import face_recognition
+        import mediapipe as mp
+        self.face_recognition = face_recognition
+        
         # Initialisation de MediaPipe
         self.mp_face_detection = mp.solutions.face_detection
         self.mp_face_mesh = mp.solutions.face_mesh
@@ -25,11 +36,29 @@ class FaceRecognitionEngine:
         self.face_detection = self.mp_face_detection.FaceDetection(
             model_selection=1, min_detection_confidence=0.5
         )
+        # Graphe partagé entre les requêtes (boucle) et les sondes de disponibilité (thread)
+        self._detection_lock = threading.Lock()
+        # Images isolées (sans session) : détection à chaque image ; refine_landmarks
+        # ajoute les points des iris
         self.face_mesh = self.mp_face_mesh.FaceMesh(
-            static_image_mode=False,
+            static_image_mode=True,
             max_num_faces=1,
-            min_detection_confidence=0.5,
-            min_tracking_confidence=0.5
+            refine_landmarks=True,
+            min_detection_confidence=0.5
+        )
+        self.head_pose = HeadPoseEstimator(tracking=False)
+        
+        # Flux vidéo : un maillage en mode suivi par session d'examen
+        self.trackers = TrackerPool(
+            factory=lambda: self.mp_face_mesh.FaceMesh(
+                static_image_mode=False,
+                max_num_faces=1,
+                refine_landmarks=True,
+                min_detection_confidence=0.5,
+                min_tracking_confidence=0.5
+            ),
+            max_size=settings.FACE_TRACKER_POOL_SIZE,
+            idle_timeout=settings.FACE_TRACKER_IDLE_SECONDS
         )
         
         # Seuils de confiance
@@ -50,7 +79,9 @@ class FaceRecognitionEngine:
         rgb_image = cv2.cvtColor(image, cv2.COLOR_BGR2RGB)
         
         # Détection des visages
-        results = self.face_detection.process(rgb_image)
+        with timed(AI_STAGE_SECONDS, 'face_recognition', 'face_detect', 'mediapipe'):
+            with self._detection_lock:
+                results = self.face_detection.process(rgb_image)
         
         faces = []
         if results.detections:
@@ -71,6 +102,43 @@ class FaceRecognitionEngine:
         
         return faces
     
+    def estimate_head_pose(self, image: np.ndarray, rgb: bool = False, session_id: Optional[Hashable] = None) -> Optional[dict]:
+        """
+        Orientation de la tête et direction du regard (un passage FaceMesh)
+        
+        Args:
+            image: Image numpy array (BGR, ou RGB si rgb=True)
+            rgb: L'image est déjà en RGB
+            session_id: Session d'examen ; ses images successives passent par son
+                propre suiveur (mode suivi), sinon l'image est traitée isolément
+            
+        Returns:
+            Angles de la tête, regard et décision « regarde l'écran », ou None sans visage
+        """
+        rgb_image = image if rgb else cv2.cvtColor(image, cv2.COLOR_BGR2RGB)
+        
+        if session_id is None:
+            return self._estimate_head_pose(self.face_mesh, self.head_pose, rgb_image)
+        with self.trackers.acquire(session_id) as tracker:
+            return self._estimate_head_pose(tracker.mesh, tracker.head_pose, rgb_image)
+    
+    def _estimate_head_pose(self, mesh, head_pose: HeadPoseEstimator, rgb_image: np.ndarray) -> Optional[dict]:
+        with timed(AI_STAGE_SECONDS, 'face_recognition', 'face_mesh', 'mediapipe'):
+            results = mesh.process(rgb_image)
+        
+        if not results.multi_face_landmarks:
+            head_pose.reset()
+            return None
+        
+        h, w = rgb_image.shape[:2]
+        landmarks = landmarks_to_pixels(results.multi_face_landmarks[0].landmark, w, h)
+        with timed(AI_STAGE_SECONDS, 'face_recognition', 'head_pose', 'opencv_pnp'):
+            return head_pose.estimate(landmarks, w, h)
+    
+    def release_session(self, session_id: Hashable) -> None:
+        """Libère le suiveur d'une session terminée"""
+        self.trackers.release(session_id)
+    
     def extract_face_encoding(self, image: np.ndarray, face_bbox: Tuple[int, int, int, int]) -> Optional[np.ndarray]:
         """
         Extrait l'encodage facial d'un visage détecté
@@ -93,7 +161,8 @@ class FaceRecognitionEngine:
             face_rgb = cv2.cvtColor(face_image, cv2.COLOR_BGR2RGB)
             
             # Extraction de l'encodage
-            encodings = face_recognition.face_encodings(face_rgb)
+            with timed(AI_STAGE_SECONDS, 'face_recognition', 'face_encoding', 'dlib'):
+                encodings = self.face_recognition.face_encodings(face_rgb)
             
             if encodings:
                 return encodings[0]
@@ -138,7 +207,7 @@ class FaceRecognitionEngine:
                 }
             
             # Calcul de la distance entre les encodages
-            distance = face_recognition.face_distance([ref_encoding], cur_encoding)[0]
+            distance = self.face_recognition.face_distance([ref_encoding], cur_encoding)[0]
             
             # Conversion en score de confiance (0-1)
             confidence = 1.0 - distance
@@ -160,12 +229,13 @@ class FaceRecognitionEngine:
                 'error': f'Erreur lors de la vérification: {str(e)}'
             }
     
-    def analyze_face_behavior(self, image: np.ndarray) -> dict:
+    def analyze_face_behavior(self, image: np.ndarray, session_id: Optional[Hashable] = None) -> dict:
         """
         Analyse le comportement du visage (présence, orientation, etc.)
         
         Args:
             image: Image de la webcam
+            session_id: Session d'examen (suivi du visage d'une image à l'autre)
             
         Returns:
             Analyse du comportement facial
@@ -194,7 +264,9 @@ class FaceRecognitionEngine:
                 'multiple_faces': multiple_faces,
                 'face_visible': face_visible,
                 'confidence': main_face['confidence'],
-                'face_count': len(faces)
+                'face_count': len(faces),
+                # Orientation de la tête et regard (yaw, pitch, vecteur de regard)
+                'head_pose': self.estimate_head_pose(image, session_id=session_id)
             }
             
         except Exception as e:
@@ -228,3 +300,13 @@ class FaceRecognitionEngine:
         """Libère les ressources"""
         self.face_detection.close()
         self.face_mesh.close()
+        self.trackers.close()
+
+# Instance globale du moteur (construite au premier usage) ; les graphes MediaPipe
+# ne survivent pas à un fork : seuls les modules sont préchargés par le maître
+face_recognition_engine = LazyService(
+    'face_recognition',
+    FaceRecognitionEngine,
+    fork_safe=False,
+    modules=('mediapipe', 'face_recognition')
+)
@@ -0,0 +1,175 @@
+"""
+Estimation de l'orientation de la tête et du regard ProctoFlex AI
+À partir des points du maillage MediaPipe FaceMesh (iris compris) : pose par
+cv2.solvePnP sur un modèle 3D canonique du visage, puis regard par la position
+des iris dans les yeux
+"""
+
+import math
+from typing import Dict, Optional, Sequence
+
+import cv2
+import numpy as np
+
+# Indices FaceMesh (refine_landmarks=True : 478 points, iris à partir de 468)
+NOSE_TIP = 1
+CHIN = 152
+# « gauche » / « droite » : côté de l'image (caméra non inversée)
+LEFT_EYE_OUTER, LEFT_EYE_INNER, LEFT_EYE_TOP, LEFT_EYE_BOTTOM, LEFT_IRIS = 33, 133, 159, 145, 468
+RIGHT_EYE_INNER, RIGHT_EYE_OUTER, RIGHT_EYE_TOP, RIGHT_EYE_BOTTOM, RIGHT_IRIS = 362, 263, 386, 374, 473
+MOUTH_LEFT, MOUTH_RIGHT = 61, 291
+IRIS_LANDMARKS = 478
+
+POSE_LANDMARKS = (NOSE_TIP, CHIN, LEFT_EYE_OUTER, RIGHT_EYE_OUTER, MOUTH_LEFT, MOUTH_RIGHT)
+
+# Modèle 3D canonique (mm, repère caméra d'un visage de face : x vers la droite de
+# l'image, y vers le bas, z vers l'arrière de la tête ; origine au bout du nez)
+MODEL_POINTS = np.array([
+    (0.0, 0.0, 0.0),          # bout du nez
+    (0.0, 330.0, 65.0),       # menton
+    (-225.0, -170.0, 135.0),  # coin externe de l'œil gauche (image)
+    (225.0, -170.0, 135.0),   # coin externe de l'œil droit (image)
+    (-150.0, 150.0, 125.0),   # commissure gauche
+    (150.0, 150.0, 125.0),    # commissure droite
+], dtype=np.float64)
+
+# Amplitude angulaire de l'œil dans l'orbite pour un iris en butée
+EYE_YAW_RANGE_DEG = 30.0
+EYE_PITCH_RANGE_DEG = 20.0
+
+
+def _direction_angles(vector: np.ndarray) -> Dict[str, float]:
+    """Lacet (> 0 : vers la droite de l'image) et tangage (> 0 : vers le bas) d'une direction"""
+    x, y, z = vector
+    return {
+        'yaw': math.degrees(math.atan2(x, -z)),
+        'pitch': math.degrees(math.atan2(y, math.hypot(x, z)))
+    }
+
+
+def _iris_offset(landmarks: np.ndarray, left: int, right: int, top: int, bottom: int, iris: int) -> np.ndarray:
+    """Position de l'iris dans l'œil, de -1 à 1 (x : gauche → droite, y : haut → bas)"""
+    eye_width = landmarks[right, 0] - landmarks[left, 0]
+    eye_height = landmarks[bottom, 1] - landmarks[top, 1]
+    if abs(eye_width) < 1e-6 or abs(eye_height) < 1e-6:
+        return np.zeros(2)
+    return np.clip(np.array([
+        2.0 * (landmarks[iris, 0] - landmarks[left, 0]) / eye_width - 1.0,
+        2.0 * (landmarks[iris, 1] - landmarks[top, 1]) / eye_height - 1.0
+    ]), -1.0, 1.0)
+
+
+class HeadPoseEstimator:
+    """
+    Pose de la tête et regard image par image
+
+    En mode suivi, la pose de l'image précédente initialise solvePnP : l'estimation
+    est plus stable et converge plus vite sur un flux vidéo continu. Une instance
+    correspond donc à un seul flux (reset() lorsqu'il change).
+    """
+
+    def __init__(self, yaw_limit: float = 25.0, pitch_limit: float = 20.0, tracking: bool = True):
+        """
+        Args:
+            yaw_limit: Lacet du regard (degrés) au-delà duquel il quitte l'écran
+            pitch_limit: Tangage du regard (degrés) au-delà duquel il quitte l'écran
+            tracking: Réutilise la pose précédente comme point de départ
+        """
+        self.yaw_limit = yaw_limit
+        self.pitch_limit = pitch_limit
+        self.tracking = tracking
+        self._rvec: Optional[np.ndarray] = None
+        self._tvec: Optional[np.ndarray] = None
+        self._size = None
+
+    def reset(self) -> None:
+        """Oublie la pose précédente (nouveau flux)"""
+        self._rvec = None
+        self._tvec = None
+
+    def estimate(self, landmarks: np.ndarray, width: int, height: int) -> Optional[Dict]:
+        """
+        Estime la pose de la tête et le regard
+
+        Args:
+            landmarks: Points FaceMesh en pixels, tableau (N, 2) ; iris requis pour le regard
+            width: Largeur de l'image
+            height: Hauteur de l'image
+
+        Returns:
+            Angles de la tête (yaw, pitch, roll), regard (vecteur et angles) et
+            décision « regarde l'écran », ou None si la pose n'a pas convergé
+        """
+        image_points = np.ascontiguousarray(landmarks[list(POSE_LANDMARKS), :2], dtype=np.float64)
+        # Caméra approchée : focale égale à la largeur, centre optique au centre de l'image
+        camera = np.array([[width, 0, width / 2.0], [0, width, height / 2.0], [0, 0, 1]], dtype=np.float64)
+
+        if (width, height) != self._size:
+            self.reset()
+            self._size = (width, height)
+        guess = self.tracking and self._rvec is not None
+        ok, rvec, tvec = cv2.solvePnP(
+            MODEL_POINTS,
+            image_points,
+            camera,
+            None,
+            rvec=self._rvec.copy() if guess else None,
+            tvec=self._tvec.copy() if guess else None,
+            useExtrinsicGuess=guess,
+            flags=cv2.SOLVEPNP_ITERATIVE
+        )
+        # Visage derrière la caméra : solution miroir, on repart de zéro à l'image suivante
+        if not ok or tvec[2, 0] <= 0:
+            self.reset()
+            return None
+        self._rvec, self._tvec = rvec, tvec
+
+        rotation, _ = cv2.Rodrigues(rvec)
+        head = _direction_angles(rotation @ np.array([0.0, 0.0, -1.0]))
+        roll = math.degrees(math.atan2(rotation[1, 0], rotation[0, 0]))
+
+        result = {
+            'head_pose': {
+                'yaw': round(head['yaw'], 2),
+                'pitch': round(head['pitch'], 2),
+                'roll': round(roll, 2)
+            },
+            'gaze_vector': None,
+            'gaze': None,
+            'iris_positions': []
+        }
+
+        # Sans iris (maillage sans refine_landmarks), le regard suit l'orientation de la tête
+        direction = head
+        if len(landmarks) >= IRIS_LANDMARKS:
+            offset = (
+                _iris_offset(landmarks, LEFT_EYE_OUTER, LEFT_EYE_INNER, LEFT_EYE_TOP, LEFT_EYE_BOTTOM, LEFT_IRIS)
+                + _iris_offset(landmarks, RIGHT_EYE_INNER, RIGHT_EYE_OUTER, RIGHT_EYE_TOP, RIGHT_EYE_BOTTOM, RIGHT_IRIS)
+            ) / 2.0
+            eye_yaw = math.radians(offset[0] * EYE_YAW_RANGE_DEG)
+            eye_pitch = math.radians(offset[1] * EYE_PITCH_RANGE_DEG)
+            # Direction de l'œil dans le repère de la tête, puis dans celui de la caméra
+            gaze_vector = rotation @ np.array([
+                math.sin(eye_yaw) * math.cos(eye_pitch),
+                math.sin(eye_pitch),
+                -math.cos(eye_yaw) * math.cos(eye_pitch)
+            ])
+            direction = _direction_angles(gaze_vector)
+            result['gaze_vector'] = [round(float(value), 4) for value in gaze_vector]
+            result['gaze'] = {'yaw': round(direction['yaw'], 2), 'pitch': round(direction['pitch'], 2)}
+            result['iris_positions'] = [
+                [int(landmarks[LEFT_IRIS, 0]), int(landmarks[LEFT_IRIS, 1])],
+                [int(landmarks[RIGHT_IRIS, 0]), int(landmarks[RIGHT_IRIS, 1])]
+            ]
+
+        # Écart normalisé à la limite la plus proche : 0 face à l'écran, 1 à la limite
+        deviation = max(abs(direction['yaw']) / self.yaw_limit, abs(direction['pitch']) / self.pitch_limit)
+        result['looking_at_screen'] = deviation <= 1.0
+        result['gaze_offset'] = round(deviation, 3)
+        result['confidence'] = round(max(0.0, 1.0 - 0.5 * deviation), 3)
+        return result
+
+
+def landmarks_to_pixels(face_landmarks: Sequence, width: int, height: int) -> np.ndarray:
+    """Points normalisés MediaPipe (x, y dans [0, 1]) convertis en pixels, tableau (N, 2)"""
+    return np.array([(point.x * width, point.y * height) for point in face_landmarks], dtype=np.float64)
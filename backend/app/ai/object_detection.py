@@ -9,10 +9,13 @@ from typing import List, Dict, Tuple, Optional
 import logging
 from PIL import Image
 import io
-import base64
 import json
 import os
 
+from app.ai.providers import LazyService
+from app.core.metrics import AI_STAGE_SECONDS, timed
+from app.core.uploads import decode_base64
+
 logger = logging.getLogger(__name__)
 
 class ObjectDetectionService:
@@ -74,20 +77,19 @@ class ObjectDetectionService:
             Array numpy de l'image
         """
         try:
-            # Supprimer le préfixe data:image/...;base64, si présent
-            if ',' in image_data:
-                image_data = image_data.split(',')[1]
-            
-            # Décoder l'image
-            image_bytes = base64.b64decode(image_data)
-            image = Image.open(io.BytesIO(image_bytes))
+            # Décoder l'image (préfixe data:image/...;base64, accepté)
+            with timed(AI_STAGE_SECONDS, 'object_detection', 'base64_decode', 'python'):
+                image_bytes = decode_base64(image_data)
             
-            # Convertir en RGB si nécessaire
-            if image.mode != 'RGB':
-                image = image.convert('RGB')
-            
-            # Convertir en array numpy
-            return np.array(image)
+            with timed(AI_STAGE_SECONDS, 'object_detection', 'image_decode', 'pil'):
+                image = Image.open(io.BytesIO(image_bytes))
+                
+                # Convertir en RGB si nécessaire
+                if image.mode != 'RGB':
+                    image = image.convert('RGB')
+                
+                # Convertir en array numpy
+                return np.array(image)
         
         except Exception as e:
             logger.error(f"Erreur lors du décodage de l'image: {e}")
@@ -108,7 +110,8 @@ class ObjectDetectionService:
         
         try:
             # Effectuer la détection
-            results = self.model(image)
+            with timed(AI_STAGE_SECONDS, 'object_detection', 'object_detect', 'yolov5'):
+                results = self.model(image)
             
             detections = []
             for *xyxy, conf, cls in results.xyxy[0]:
@@ -145,15 +148,16 @@ class ObjectDetectionService:
             Liste des objets détectés
         """
         try:
-            # Convertir en niveaux de gris
-            gray = cv2.cvtColor(image, cv2.COLOR_RGB2GRAY)
-            
-            # Détecter les contours
-            blurred = cv2.GaussianBlur(gray, (5, 5), 0)
-            edges = cv2.Canny(blurred, 50, 150)
-            
-            # Trouver les contours
-            contours, _ = cv2.findContours(edges, cv2.RETR_EXTERNAL, cv2.CHAIN_APPROX_SIMPLE)
+            with timed(AI_STAGE_SECONDS, 'object_detection', 'object_detect', 'opencv_contours'):
+                # Convertir en niveaux de gris
+                gray = cv2.cvtColor(image, cv2.COLOR_RGB2GRAY)
+                
+                # Détecter les contours
+                blurred = cv2.GaussianBlur(gray, (5, 5), 0)
+                edges = cv2.Canny(blurred, 50, 150)
+                
+                # Trouver les contours
+                contours, _ = cv2.findContours(edges, cv2.RETR_EXTERNAL, cv2.CHAIN_APPROX_SIMPLE)
             
             detections = []
             for contour in contours:
@@ -469,5 +473,5 @@ class ObjectDetectionService:
         
         return ". ".join(analysis_parts) + "."
 
-# Instance globale du service
-object_detection_service = ObjectDetectionService()
+# Instance globale du service (construite au premier usage)
+object_detection_service = LazyService('object_detection', ObjectDetectionService)
@@ -0,0 +1,126 @@
+"""
+Fournisseurs paresseux des services IA ProctoFlex AI
+Les modèles (dlib, MediaPipe, YOLO) sont chargés au premier usage ou par la
+tâche de démarrage, et non à l'import des modules
+"""
+
+import importlib
+import logging
+import os
+import threading
+import time
+from typing import Callable, Dict, Generic, List, Sequence, TypeVar
+
+logger = logging.getLogger(__name__)
+
+T = TypeVar("T")
+
+# Fournisseurs déclarés (préchargement avant fork, réinitialisation dans les workers)
+_providers: List["LazyService"] = []
+
+
+class LazyService(Generic[T]):
+    """
+    Service IA construit à la première utilisation
+
+    Se comporte comme l'instance qu'il enveloppe (accès aux attributs délégué) :
+    les appels existants `service.methode(...)` restent inchangés. La construction
+    est protégée par un verrou, un seul thread charge les modèles.
+
+    Un service `fork_safe` peut être construit dans le processus maître avant le
+    fork des workers (poids partagés en copie sur écriture). Les autres (graphes
+    MediaPipe, qui démarrent des threads) ne font qu'importer leurs `modules` dans
+    le maître et sont reconstruits dans chaque worker au premier usage.
+    """
+
+    def __init__(self, name: str, factory: Callable[[], T], fork_safe: bool = True, modules: Sequence[str] = ()):
+        """
+        Args:
+            name: Nom du service (journaux, disponibilité)
+            factory: Constructeur appelé une seule fois
+            fork_safe: L'instance peut être héritée d'un processus parent
+            modules: Modules lourds importés par le préchargement
+        """
+        self._name = name
+        self._factory = factory
+        self._fork_safe = fork_safe
+        self._modules = tuple(modules)
+        self._instance = None
+        self._lock = threading.Lock()
+        _providers.append(self)
+
+    @property
+    def name(self) -> str:
+        return self._name
+
+    @property
+    def loaded(self) -> bool:
+        """Service construit (sans déclencher la construction)"""
+        return self._instance is not None
+
+    def get(self) -> T:
+        """Instance du service, construite au premier appel"""
+        instance = self._instance
+        if instance is None:
+            with self._lock:
+                instance = self._instance
+                if instance is None:
+                    started = time.perf_counter()
+                    instance = self._factory()
+                    self._instance = instance
+                    logger.info(f"Service IA {self._name} chargé en {time.perf_counter() - started:.2f} s")
+        return instance
+
+    def preload(self) -> None:
+        """Importe les modules lourds et construit le service s'il peut être hérité"""
+        for module in self._modules:
+            importlib.import_module(module)
+        if self._fork_safe:
+            self.get()
+
+    def _after_fork_in_child(self) -> None:
+        # Le verrou a pu être copié acquis par un thread qui n'existe plus dans l'enfant
+        self._lock = threading.Lock()
+        if not self._fork_safe:
+            self._instance = None
+
+    def __getattr__(self, item):
+        # Appelé uniquement pour les attributs absents du fournisseur lui-même
+        return getattr(self.get(), item)
+
+    def __repr__(self) -> str:
+        return f"<LazyService {self._name} {'chargé' if self.loaded else 'non chargé'}>"
+
+
+def preload_services() -> Dict[str, float]:
+    """
+    Charge les services IA dans le processus courant (maître avant fork)
+
+    Returns:
+        Durée de chargement par service ; les échecs sont journalisés et le
+        service sera construit au premier usage dans chaque worker
+    """
+    durations = {}
+    for provider in _providers:
+        started = time.perf_counter()
+        try:
+            provider.preload()
+        except Exception as e:
+            logger.warning(f"Préchargement de {provider.name} impossible: {e}")
+            continue
+        durations[provider.name] = time.perf_counter() - started
+    return durations
+
+
+def loaded_services() -> List[str]:
+    """Services déjà construits dans le processus courant"""
+    return [provider.name for provider in _providers if provider.loaded]
+
+
+def _after_fork_in_child() -> None:
+    for provider in _providers:
+        provider._after_fork_in_child()
+
+
+if hasattr(os, "register_at_fork"):
+    os.register_at_fork(after_in_child=_after_fork_in_child)
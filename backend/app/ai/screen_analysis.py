@@ -0,0 +1,303 @@
+"""
+Service d'analyse des captures d'écran pour ProctoFlex AI
+Détection incrémentale des changements d'écran par comparaison de tuiles
+"""
+
+import cv2
+import numpy as np
+from typing import List, Dict, Optional, Tuple
+from collections import OrderedDict, deque
+import logging
+import hashlib
+import threading
+import time
+
+from app.core.metrics import AI_STAGE_SECONDS, timed
+from app.core.uploads import decode_base64
+
+logger = logging.getLogger(__name__)
+
+
+def decode_capture_grayscale(image_data: str) -> np.ndarray:
+    """
+    Décode une capture d'écran base64 en niveaux de gris réduits
+
+    Args:
+        image_data: Capture encodée en base64 (data URL accepté)
+
+    Returns:
+        Array numpy 2D (niveaux de gris, résolution divisée par 2)
+    """
+    with timed(AI_STAGE_SECONDS, 'screen_analysis', 'base64_decode', 'python'):
+        image_bytes = decode_base64(image_data)
+    buffer = np.frombuffer(image_bytes, np.uint8)
+
+    # Le décodage réduit évite de matérialiser l'image pleine résolution en couleur
+    with timed(AI_STAGE_SECONDS, 'screen_analysis', 'image_decode', 'opencv'):
+        image = cv2.imdecode(buffer, cv2.IMREAD_REDUCED_GRAYSCALE_2)
+    if image is None:
+        raise ValueError("Format de capture d'écran invalide")
+    return image
+
+
+def compute_tile_signature(gray: np.ndarray, grid: Tuple[int, int], tile_px: int) -> np.ndarray:
+    """
+    Calcule la signature perceptuelle d'une image découpée en tuiles
+
+    L'image est sous-échantillonnée (moyenne par zone) à grid * tile_px pixels,
+    ce qui la rend insensible au bruit de compression et au lissage des polices.
+
+    Args:
+        gray: Image en niveaux de gris
+        grid: Nombre de tuiles (colonnes, lignes)
+        tile_px: Taille en pixels d'une tuile dans l'image réduite
+
+    Returns:
+        Array (lignes, colonnes, tile_px, tile_px) en float32
+    """
+    cols, rows = grid
+    small = cv2.resize(gray, (cols * tile_px, rows * tile_px), interpolation=cv2.INTER_AREA)
+    tiles = small.reshape(rows, tile_px, cols, tile_px).swapaxes(1, 2)
+    return tiles.astype(np.float32)
+
+
+class _ScreenState:
+    """État de la dernière capture connue pour une session"""
+
+    __slots__ = ('digest', 'signature', 'shape', 'change_times', 'last_seen')
+
+    def __init__(self):
+        self.digest: Optional[bytes] = None
+        self.signature: Optional[np.ndarray] = None
+        self.shape: Optional[Tuple[int, int]] = None
+        self.change_times: deque = deque()
+        self.last_seen: float = 0.0
+
+
+class ScreenAnalysisService:
+    """
+    Service d'analyse incrémentale des captures d'écran
+    Ne compare que des tuiles réduites et n'analyse que les zones modifiées
+    """
+
+    def __init__(self):
+        """Initialisation du service d'analyse d'écran"""
+        # Découpage en tuiles (colonnes, lignes) et taille d'une tuile réduite
+        self.grid = (16, 9)
+        self.tile_px = 8
+
+        # Écart moyen de luminance (0-255) à partir duquel une tuile est modifiée
+        self.tile_change_threshold = 12.0
+
+        # Seuils de classification (proportion de tuiles modifiées)
+        self.window_switch_ratio = 0.5
+        self.full_screen_ratio = 0.9
+
+        # Changements rapides (copier/coller, défilement de contenu externe)
+        self.rapid_change_window = 10.0  # secondes
+        self.rapid_change_count = 5
+
+        # Nombre maximal de sessions suivies simultanément
+        self.max_sessions = 2048
+
+        self._states: "OrderedDict[str, _ScreenState]" = OrderedDict()
+        self._lock = threading.Lock()
+
+        logger.info("Service d'analyse d'écran initialisé")
+
+    def _get_state(self, session_id: str) -> _ScreenState:
+        """Récupère (ou crée) l'état d'une session en respectant la limite LRU"""
+        with self._lock:
+            state = self._states.get(session_id)
+            if state is None:
+                state = _ScreenState()
+                self._states[session_id] = state
+                while len(self._states) > self.max_sessions:
+                    self._states.popitem(last=False)
+            else:
+                self._states.move_to_end(session_id)
+            return state
+
+    def reset_session(self, session_id) -> None:
+        """Oublie la capture de référence d'une session"""
+        with self._lock:
+            self._states.pop(str(session_id), None)
+
+    def analyze_capture(self, session_id: str, image_data: str, now: Optional[float] = None) -> Dict:
+        """
+        Analyse une capture d'écran par rapport à la précédente de la session
+
+        Args:
+            session_id: Identifiant de la session d'examen
+            image_data: Capture d'écran en base64
+            now: Horodatage monotone (secondes), utile pour les tests
+
+        Returns:
+            Résultat de l'analyse (changement, zones modifiées, événements)
+        """
+        now = time.monotonic() if now is None else now
+        state = self._get_state(str(session_id))
+
+        try:
+            # Chemin rapide : capture identique octet par octet, aucun décodage
+            digest = hashlib.blake2b(image_data.encode('ascii', 'ignore'), digest_size=16).digest()
+            with self._lock:
+                if digest == state.digest:
+                    state.last_seen = now
+                    return self._unchanged_result()
+
+            gray = decode_capture_grayscale(image_data)
+            with timed(AI_STAGE_SECONDS, 'screen_analysis', 'tile_signature', 'numpy'):
+                signature = compute_tile_signature(gray, self.grid, self.tile_px)
+            # Dimensions d'origine (le décodage réduit divise par 2)
+            shape = (gray.shape[0] * 2, gray.shape[1] * 2)
+
+            # Comparaison et remplacement de la référence sous verrou : deux captures
+            # concurrentes d'une session sont comparées chacune à la précédente
+            with self._lock:
+                previous, previous_shape = state.signature, state.shape
+                state.digest = digest
+                state.signature = signature
+                state.shape = shape
+                state.last_seen = now
+
+                if previous is None or previous_shape != shape:
+                    return self._baseline_result(shape, previous is None)
+
+                # Écart moyen par tuile
+                tile_diff = np.abs(signature - previous).mean(axis=(2, 3))
+                changed_mask = tile_diff > self.tile_change_threshold
+                changed_tiles = int(changed_mask.sum())
+
+                if changed_tiles == 0:
+                    return self._unchanged_result()
+
+                state.change_times.append(now)
+                while state.change_times and now - state.change_times[0] > self.rapid_change_window:
+                    state.change_times.popleft()
+                recent_changes = len(state.change_times)
+
+            total_tiles = self.grid[0] * self.grid[1]
+            changed_ratio = changed_tiles / total_tiles
+            regions = self._extract_regions(changed_mask, shape)
+            events = self._classify_change(changed_ratio, recent_changes)
+
+            return {
+                'changed': True,
+                'change_ratio': float(changed_ratio),
+                'changed_tiles': changed_tiles,
+                'changed_regions': regions,
+                'events': events,
+                'recent_changes': recent_changes,
+                'baseline': False
+            }
+
+        except Exception as e:
+            logger.error(f"Erreur lors de l'analyse de la capture d'écran: {e}")
+            return {
+                'changed': False,
+                'change_ratio': 0.0,
+                'changed_tiles': 0,
+                'changed_regions': [],
+                'events': [],
+                'recent_changes': 0,
+                'baseline': False,
+                'error': str(e)
+            }
+
+    def _extract_regions(self, changed_mask: np.ndarray, shape: Tuple[int, int]) -> List[Dict]:
+        """
+        Regroupe les tuiles modifiées en zones rectangulaires
+
+        Args:
+            changed_mask: Masque booléen (lignes, colonnes) des tuiles modifiées
+            shape: Dimensions (hauteur, largeur) de la capture d'origine
+
+        Returns:
+            Liste des zones modifiées en coordonnées de la capture d'origine
+        """
+        cols, rows = self.grid
+        height, width = shape
+        tile_w = width / cols
+        tile_h = height / rows
+
+        count, _, stats, _ = cv2.connectedComponentsWithStats(changed_mask.astype(np.uint8), connectivity=8)
+
+        regions = []
+        for label in range(1, count):
+            x, y, w, h, area = stats[label]
+            regions.append({
+                'bbox': [int(x * tile_w), int(y * tile_h), int(w * tile_w), int(h * tile_h)],
+                'tiles': int(area)
+            })
+
+        regions.sort(key=lambda region: region['tiles'], reverse=True)
+        return regions
+
+    def _classify_change(self, changed_ratio: float, recent_changes: int) -> List[Dict]:
+        """
+        Classifie un changement d'écran en événements de surveillance
+
+        Args:
+            changed_ratio: Proportion de tuiles modifiées
+            recent_changes: Nombre de changements dans la fenêtre récente
+
+        Returns:
+            Liste des événements détectés
+        """
+        events = []
+
+        if changed_ratio >= self.full_screen_ratio:
+            events.append({
+                'type': 'full_screen_change',
+                'severity': 'high',
+                'description': 'Nouveau contenu plein écran'
+            })
+        elif changed_ratio >= self.window_switch_ratio:
+            events.append({
+                'type': 'window_switch',
+                'severity': 'medium',
+                'description': 'Changement de fenêtre détecté'
+            })
+
+        if recent_changes >= self.rapid_change_count:
+            events.append({
+                'type': 'rapid_content_change',
+                'severity': 'medium',
+                'description': f'Changements rapides du contenu ({recent_changes} en {int(self.rapid_change_window)}s)'
+            })
+
+        return events
+
+    def _unchanged_result(self) -> Dict:
+        """Résultat d'une capture identique à la précédente"""
+        return {
+            'changed': False,
+            'change_ratio': 0.0,
+            'changed_tiles': 0,
+            'changed_regions': [],
+            'events': [],
+            'recent_changes': 0,
+            'baseline': False
+        }
+
+    def _baseline_result(self, shape: Tuple[int, int], first_capture: bool) -> Dict:
+        """Résultat d'une capture servant de nouvelle référence"""
+        height, width = shape
+        total_tiles = self.grid[0] * self.grid[1]
+        return {
+            'changed': not first_capture,
+            'change_ratio': 0.0 if first_capture else 1.0,
+            'changed_tiles': 0 if first_capture else total_tiles,
+            'changed_regions': [] if first_capture else [{'bbox': [0, 0, width, height], 'tiles': total_tiles}],
+            'events': [] if first_capture else [{
+                'type': 'resolution_change',
+                'severity': 'medium',
+                'description': "Changement de résolution d'écran"
+            }],
+            'recent_changes': 0,
+            'baseline': True
+        }
+
+# Instance globale du service
+screen_analysis_service = ScreenAnalysisService()
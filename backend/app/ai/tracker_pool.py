@@ -0,0 +1,201 @@
+"""
+Pool de suiveurs MediaPipe par session ProctoFlex AI
+Chaque session d'examen dispose de son propre FaceMesh en mode suivi : les images
+de plusieurs étudiants ne sont plus entrelacées dans un même état de suivi
+"""
+
+import logging
+import threading
+import time
+from collections import OrderedDict
+from typing import Callable, Dict, Hashable, List
+
+from app.ai.head_pose import HeadPoseEstimator
+from app.core.metrics import counter, gauge
+
+logger = logging.getLogger(__name__)
+
+FACE_TRACKERS = gauge(
+    "proctoflex_face_trackers",
+    "Suiveurs FaceMesh actifs (un par session)"
+)
+FACE_TRACKER_EVICTIONS = counter(
+    "proctoflex_face_tracker_evictions_total",
+    "Suiveurs FaceMesh libérés",
+    ["reason"]
+)
+
+
+class _Tracker:
+    """Suiveur d'une session : maillage en mode suivi et pose de la tête précédente"""
+
+    __slots__ = ('mesh', 'head_pose', 'lock', 'last_used', 'pins', 'retired')
+
+    def __init__(self, mesh):
+        self.mesh = mesh
+        self.head_pose = HeadPoseEstimator()
+        # Une image à la fois par session : l'état de suivi suit l'ordre des images
+        self.lock = threading.Lock()
+        self.last_used = time.monotonic()
+        # Baux en cours (modifiés sous le verrou du pool) : un suiveur épinglé n'est
+        # jamais fermé, il l'est à la fin de son dernier bail s'il a quitté le pool
+        self.pins = 0
+        self.retired = False
+
+    def close(self) -> None:
+        # Attend la fin d'une éventuelle analyse en cours avant de libérer le graphe
+        with self.lock:
+            self.mesh.close()
+
+
+class _Lease:
+    """Contexte d'utilisation exclusive d'un suiveur (épinglé dès sa création)"""
+
+    __slots__ = ('_pool', '_tracker')
+
+    def __init__(self, pool: "TrackerPool", tracker: _Tracker):
+        self._pool = pool
+        self._tracker = tracker
+
+    def __enter__(self) -> _Tracker:
+        self._tracker.lock.acquire()
+        self._tracker.last_used = time.monotonic()
+        return self._tracker
+
+    def __exit__(self, *exc) -> bool:
+        self._tracker.last_used = time.monotonic()
+        self._tracker.lock.release()
+        self._pool._unpin(self._tracker)
+        return False
+
+
+class TrackerPool:
+    """
+    Suiveurs FaceMesh indexés par session, bornés en nombre (LRU) et en inactivité
+
+    Un suiveur inactif depuis plus de `idle_timeout` secondes est libéré lors d'un
+    accès suivant au pool ; au-delà de `max_size` sessions, la moins récemment
+    utilisée est libérée. Une session libérée repart en mode détection. Un suiveur
+    dont un bail est en cours n'est fermé qu'à la fin de ce bail.
+    """
+
+    def __init__(self, factory: Callable[[], object], max_size: int, idle_timeout: float):
+        """
+        Args:
+            factory: Construit un FaceMesh en mode suivi
+            max_size: Nombre maximal de suiveurs simultanés
+            idle_timeout: Inactivité (secondes) au-delà de laquelle un suiveur est libéré
+        """
+        self.factory = factory
+        self.max_size = max_size
+        self.idle_timeout = idle_timeout
+
+        self._trackers: "OrderedDict[Hashable, _Tracker]" = OrderedDict()
+        self._lock = threading.Lock()
+
+    def acquire(self, session_id: Hashable) -> _Lease:
+        """
+        Suiveur de la session (créé si besoin), à utiliser aussitôt dans un bloc `with`
+
+        Le suiveur est épinglé sous le verrou du pool : ni l'éviction ni la fin de
+        la session ne peuvent le fermer avant ou pendant l'utilisation du bail.
+
+        Args:
+            session_id: Session d'examen
+
+        Returns:
+            Contexte donnant l'accès exclusif au suiveur
+        """
+        with self._lock:
+            closable = self._retire(self._evict_idle(), 'idle')
+            tracker = self._trackers.get(session_id)
+            if tracker is not None:
+                self._trackers.move_to_end(session_id)
+                tracker.pins += 1
+        self._close(closable)
+
+        if tracker is None:
+            # Construction du graphe hors du verrou : les autres sessions ne l'attendent pas
+            created = _Tracker(self.factory())
+            closable = []
+            with self._lock:
+                tracker = self._trackers.get(session_id)
+                if tracker is None:
+                    tracker, created = created, None
+                    self._trackers[session_id] = tracker
+                tracker.pins += 1
+                # Après l'épinglage : le suiveur demandé n'est jamais la victime
+                closable = self._retire(self._evict_lru(), 'lru')
+                FACE_TRACKERS.set(len(self._trackers))
+            if created is not None:
+                # Créé en parallèle par une autre requête de la même session
+                created.mesh.close()
+            self._close(closable)
+
+        return _Lease(self, tracker)
+
+    def release(self, session_id: Hashable) -> None:
+        """Libère le suiveur d'une session terminée"""
+        with self._lock:
+            tracker = self._trackers.pop(session_id, None)
+            FACE_TRACKERS.set(len(self._trackers))
+            closable = self._retire([tracker], 'session_end') if tracker is not None else []
+        self._close(closable)
+
+    def close(self) -> None:
+        """Libère tous les suiveurs"""
+        with self._lock:
+            trackers = list(self._trackers.values())
+            self._trackers.clear()
+            FACE_TRACKERS.set(0)
+            closable = self._retire(trackers, 'shutdown')
+        self._close(closable)
+
+    def stats(self) -> Dict:
+        """Occupation du pool"""
+        with self._lock:
+            return {'trackers': len(self._trackers), 'max_size': self.max_size, 'idle_timeout': self.idle_timeout}
+
+    def _evict_idle(self) -> List[_Tracker]:
+        """Retire les suiveurs inactifs (appelé sous le verrou ; les plus anciens sont en tête)"""
+        deadline = time.monotonic() - self.idle_timeout
+        idle = []
+        for session_id, tracker in self._trackers.items():
+            if tracker.last_used > deadline:
+                break
+            if not tracker.pins:
+                idle.append(session_id)
+        evicted = [self._trackers.pop(session_id) for session_id in idle]
+        if evicted:
+            FACE_TRACKERS.set(len(self._trackers))
+        return evicted
+
+    def _evict_lru(self) -> List[_Tracker]:
+        """Retire les suiveurs non épinglés les moins récents au-delà de max_size (sous le verrou)"""
+        excess = len(self._trackers) - self.max_size
+        if excess <= 0:
+            return []
+        oldest = [session_id for session_id, tracker in self._trackers.items() if not tracker.pins][:excess]
+        return [self._trackers.pop(session_id) for session_id in oldest]
+
+    def _retire(self, trackers: List[_Tracker], reason: str) -> List[_Tracker]:
+        """Suiveurs sortis du pool (sous le verrou) ; renvoie ceux à fermer immédiatement"""
+        for tracker in trackers:
+            tracker.retired = True
+            FACE_TRACKER_EVICTIONS.labels(reason).inc()
+        return [tracker for tracker in trackers if not tracker.pins]
+
+    def _unpin(self, tracker: _Tracker) -> None:
+        """Fin d'un bail : un suiveur sorti du pool est fermé après son dernier bail"""
+        with self._lock:
+            tracker.pins -= 1
+            close = tracker.retired and not tracker.pins
+        if close:
+            self._close([tracker])
+
+    def _close(self, trackers: List[_Tracker]) -> None:
+        for tracker in trackers:
+            try:
+                tracker.close()
+            except Exception as e:
+                logger.warning(f"Fermeture d'un suiveur FaceMesh en échec: {e}")
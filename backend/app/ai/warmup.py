@@ -0,0 +1,151 @@
+"""
+Préchauffage des modèles IA ProctoFlex AI
+Premier passage de chaque analyseur sur des images synthétiques au démarrage du
+worker, avant qu'il ne se déclare prêt (allocations, caches et graphes initialisés)
+"""
+
+import base64
+import logging
+import time
+from typing import Callable, Dict, List, Tuple
+
+import cv2
+import numpy as np
+
+from app.ai.face_detection import face_detection_service
+from app.ai.face_recognition import face_recognition_engine
+from app.ai.object_detection import object_detection_service
+from app.core.metrics import gauge
+
+logger = logging.getLogger(__name__)
+
+AI_WARMUP_SECONDS = gauge(
+    "proctoflex_ai_warmup_seconds",
+    "Durée du préchauffage au démarrage du worker",
+    ["analyzer"]
+)
+
+
+def synthetic_face_frame(width: int, height: int) -> np.ndarray:
+    """Image BGR représentative : visage schématique (yeux, iris, bouche) sur fond de bureau"""
+    frame = np.full((height, width, 3), (170, 180, 185), np.uint8)
+    cx, cy = width // 2, height // 2
+    rx, ry = max(width // 7, 4), max(height // 4, 4)
+    cv2.ellipse(frame, (cx, cy), (rx, ry), 0, 0, 360, (150, 175, 215), -1)
+    for side in (-1, 1):
+        eye = (cx + side * rx // 2, cy - ry // 4)
+        cv2.ellipse(frame, eye, (max(rx // 5, 2), max(ry // 10, 1)), 0, 0, 360, (245, 245, 245), -1)
+        cv2.circle(frame, eye, max(rx // 10, 1), (50, 40, 30), -1)
+    cv2.ellipse(frame, (cx, cy + ry // 2), (max(rx // 3, 2), max(ry // 10, 1)), 0, 0, 360, (90, 90, 170), -1)
+    # Objet rectangulaire sombre (téléphone) pour la détection d'objets
+    cv2.rectangle(frame, (width // 20, height - height // 4), (width // 20 + width // 12, height - height // 20), (30, 30, 30), -1)
+    return frame
+
+
+def encode_jpeg_base64(frame: np.ndarray, quality: int = 85) -> str:
+    """Image encodée comme les envoie le client (data URL JPEG)"""
+    ok, encoded = cv2.imencode('.jpg', frame, [cv2.IMWRITE_JPEG_QUALITY, quality])
+    if not ok:
+        raise ValueError("Encodage JPEG impossible")
+    return 'data:image/jpeg;base64,' + base64.b64encode(encoded.tobytes()).decode('ascii')
+
+
+def _face_box(frame: np.ndarray) -> Tuple[int, int, int, int]:
+    """Zone du visage synthétique au format face_recognition (haut, droite, bas, gauche)"""
+    height, width = frame.shape[:2]
+    return height // 4, width // 2 + width // 7, height - height // 4, width // 2 - width // 7
+
+
+def _warm_face_detection(frame: np.ndarray, image: str) -> None:
+    image_rgb = face_detection_service.decode_base64_image(image)
+    face_detection_service.detect_faces(image_rgb)
+    # Le synthétique n'est pas détecté par les cascades : prédicteur et encodeur dlib
+    # sont appelés directement sur la zone du visage
+    box = _face_box(frame)
+    face_detection_service.face_recognition.face_landmarks(image_rgb, [box])
+    face_detection_service.face_recognition.face_encodings(image_rgb, known_face_locations=[box])
+    top, right, bottom, left = box
+    face_detection_service.track_gaze(image_rgb, [left, top, right - left, bottom - top])
+
+
+def _warm_face_recognition(frame: np.ndarray, image: str) -> None:
+    face_recognition_engine.detect_faces(frame)
+    top, right, bottom, left = _face_box(frame)
+    face_recognition_engine.extract_face_encoding(frame, (left, top, right - left, bottom - top))
+    face_recognition_engine.estimate_head_pose(frame)
+    # Maillage en mode suivi (chemin des sessions), libéré aussitôt
+    face_recognition_engine.estimate_head_pose(frame, session_id='__warmup__')
+    face_recognition_engine.release_session('__warmup__')
+
+
+def _warm_object_detection(frame: np.ndarray, image: str) -> None:
+    object_detection_service.detect_suspicious_objects(image)
+
+
+# Analyseurs préchauffables (noms de AI_WARMUP_ANALYZERS)
+WARMERS: Dict[str, Callable[[np.ndarray, str], None]] = {
+    'face_detection': _warm_face_detection,
+    'face_recognition': _warm_face_recognition,
+    'object_detection': _warm_object_detection,
+}
+
+
+def parse_resolution(value: str) -> Tuple[int, int]:
+    """Résolution au format LARGEURxHAUTEUR"""
+    width, _, height = value.lower().partition('x')
+    return int(width), int(height)
+
+
+def warm_up(analyzers: List[str], resolutions: List[str], iterations: int = 2) -> Dict:
+    """
+    Préchauffe les analyseurs (appel bloquant, à exécuter hors de la boucle d'événements)
+
+    Le premier appel construit le service (chargement des modèles) et initialise ses
+    caches ; les suivants mesurent la latence stabilisée. Un analyseur en échec est
+    signalé sans interrompre le préchauffage des autres.
+
+    Args:
+        analyzers: Analyseurs à préchauffer (clés de WARMERS)
+        resolutions: Résolutions des images synthétiques (ex. "640x480")
+        iterations: Appels par analyseur et par résolution
+
+    Returns:
+        Durée totale et, par analyseur, durée, premier appel et dernier appel par résolution
+    """
+    started = time.perf_counter()
+    inputs = []
+    for resolution in resolutions:
+        frame = synthetic_face_frame(*parse_resolution(resolution))
+        inputs.append((resolution, frame, encode_jpeg_base64(frame)))
+
+    results = {}
+    for name in analyzers:
+        warmer = WARMERS.get(name)
+        if warmer is None:
+            logger.warning(f"Préchauffage : analyseur inconnu {name}")
+            continue
+
+        analyzer_started = time.perf_counter()
+        result = {'resolutions': {}, 'error': None}
+        try:
+            for resolution, frame, image in inputs:
+                calls = []
+                for _ in range(max(iterations, 1)):
+                    call_started = time.perf_counter()
+                    warmer(frame, image)
+                    calls.append(time.perf_counter() - call_started)
+                result['resolutions'][resolution] = {
+                    'first_ms': round(calls[0] * 1000.0, 2),
+                    'last_ms': round(calls[-1] * 1000.0, 2)
+                }
+        except Exception as e:
+            result['error'] = str(e)
+            logger.warning(f"Préchauffage de {name} en échec: {e}")
+
+        result['seconds'] = round(time.perf_counter() - analyzer_started, 3)
+        AI_WARMUP_SECONDS.labels(name).set(result['seconds'])
+        results[name] = result
+
+    total = round(time.perf_counter() - started, 3)
+    logger.info(f"Préchauffage IA terminé en {total} s ({', '.join(results)})")
+    return {'seconds': total, 'analyzers': results}
@@ -6,20 +6,61 @@ Reconnaissance faciale, détection d'objets, analyse audio
 from fastapi import APIRouter, HTTPException, Depends, UploadFile, File
 from fastapi.security import HTTPBearer
 from typing import Dict, List, Optional
+import asyncio
 import logging
 from pydantic import BaseModel
+from sqlalchemy.ext.asyncio import AsyncSession
 import base64
 
 from app.ai.face_detection import face_detection_service
 from app.ai.object_detection import object_detection_service
+from app.ai.screen_analysis import screen_analysis_service
+from app.storage.capture_store import screen_capture_store
+from app.storage.evidence import evidence_store
+from app.services.alert_sink import alert_sink
+from app.services.readiness import readiness_service
+from app.services.session_cache import owned_session_id
+from app.core.config import settings
+from app.core.metrics import AI_PIPELINE_SECONDS, timed
 from app.core.security import get_current_user
-from app.models.user import User
+from app.core.uploads import decode_base64
+from app.core.database import User, get_async_db
 
 logger = logging.getLogger(__name__)
 
 router = APIRouter(prefix="/ai", tags=["Intelligence Artificielle"])
 security = HTTPBearer()
 
+# Analyseurs sondés en arrière-plan (état servi par /ai/health et /ready)
+readiness_service.register(
+    'face_detection',
+    probe=lambda image: face_detection_service.detect_faces(face_detection_service.decode_base64_image(image)),
+    loaded=lambda: {
+        'loaded': face_detection_service.loaded and not face_detection_service.face_cascade.empty(),
+        'backend': 'opencv_haar'
+    },
+    load=face_detection_service.get
+)
+def _object_detection_state() -> Dict:
+    if not object_detection_service.loaded:
+        return {'loaded': False}
+    # Sans YOLO, la détection par contours OpenCV prend le relais
+    return {'loaded': True, 'backend': 'yolov5' if object_detection_service.model is not None else 'opencv_contours'}
+
+readiness_service.register(
+    'object_detection',
+    probe=lambda image: object_detection_service.detect_suspicious_objects(image),
+    loaded=_object_detection_state,
+    load=object_detection_service.get
+)
+if settings.SCREEN_ANALYSIS_ENABLED:
+    def _probe_screen_analysis(image: str) -> None:
+        # Session dédiée réinitialisée : chaque sonde traite une capture de référence complète
+        screen_analysis_service.reset_session('__readiness__')
+        screen_analysis_service.analyze_capture('__readiness__', image)
+
+    readiness_service.register('screen_analysis', probe=_probe_screen_analysis, required=False)
+
 # Modèles Pydantic pour les requêtes
 class IdentityVerificationRequest(BaseModel):
     current_image: str  # base64
@@ -27,6 +68,7 @@ class IdentityVerificationRequest(BaseModel):
 
 class FaceAnalysisRequest(BaseModel):
     image: str  # base64
+    session_id: Optional[str] = None  # suivi du visage d'une image à l'autre
 
 class ObjectDetectionRequest(BaseModel):
     image: str  # base64
@@ -69,12 +111,22 @@ class AudioAnalysisResponse(BaseModel):
     suspicious_sounds: bool
     analysis: Dict
 
+class ScreenAnalysisResponse(BaseModel):
+    changed: bool
+    change_ratio: float
+    changed_tiles: int
+    changed_regions: List[Dict]
+    events: List[Dict]
+    recent_changes: int
+    baseline: bool
+
 class SurveillanceAnalysisResponse(BaseModel):
     session_id: str
     timestamp: str
     face_analysis: Optional[FaceAnalysisResponse] = None
     object_analysis: Optional[ObjectDetectionResponse] = None
     audio_analysis: Optional[AudioAnalysisResponse] = None
+    screen_analysis: Optional[ScreenAnalysisResponse] = None
     overall_risk: str
     alerts: List[Dict]
 
@@ -96,10 +148,11 @@ async def verify_identity(
     try:
         logger.info(f"Vérification d'identité pour l'utilisateur {current_user.id}")
         
-        result = face_detection_service.verify_identity(
-            request.current_image,
-            request.reference_image
-        )
+        with readiness_service.track('face_detection'):
+            result = face_detection_service.verify_identity(
+                request.current_image,
+                request.reference_image
+            )
         
         return IdentityVerificationResponse(**result)
         
@@ -110,7 +163,8 @@ async def verify_identity(
 @router.post("/analyze-face", response_model=FaceAnalysisResponse)
 async def analyze_face(
     request: FaceAnalysisRequest,
-    current_user: User = Depends(get_current_user)
+    current_user: User = Depends(get_current_user),
+    db: AsyncSession = Depends(get_async_db)
 ):
     """
     Analyse une image pour détecter et analyser les visages
@@ -118,6 +172,24 @@ async def analyze_face(
     Args:
         request: Image à analyser
         current_user: Utilisateur authentifié
+        db: Session de base de données (contrôle de la session d'examen)
+        
+    Returns:
+        Analyse des visages détectés
+    """
+    # Suivi du visage uniquement pour une session de l'utilisateur : un identifiant
+    # arbitraire ne peut ni partager le suiveur d'un autre examen ni saturer le pool
+    session_id = await owned_session_id(request.session_id, current_user, db)
+    return _analyze_face(request.image, current_user, session_id)
+
+def _analyze_face(image: str, current_user: User, session_id: Optional[int]) -> FaceAnalysisResponse:
+    """
+    Analyse faciale d'une image
+    
+    Args:
+        image: Image à analyser (base64)
+        current_user: Utilisateur authentifié
+        session_id: Session d'examen vérifiée (suivi du regard d'une image à l'autre), ou None
         
     Returns:
         Analyse des visages détectés
@@ -125,40 +197,23 @@ async def analyze_face(
     try:
         logger.info(f"Analyse faciale pour l'utilisateur {current_user.id}")
         
-        # Décoder l'image
-        import numpy as np
-        from PIL import Image
-        import io
-        
-        # Supprimer le préfixe data:image/...;base64, si présent
-        image_data = request.image
-        if ',' in image_data:
-            image_data = image_data.split(',')[1]
-        
-        # Décoder l'image
-        image_bytes = base64.b64decode(image_data)
-        image = Image.open(io.BytesIO(image_bytes))
-        
-        # Convertir en RGB si nécessaire
-        if image.mode != 'RGB':
-            image = image.convert('RGB')
-        
-        # Convertir en array numpy
-        img_array = np.array(image)
-        
-        # Détecter les visages
-        faces = face_detection_service.detect_faces(img_array)
-        
-        # Analyser la qualité
-        quality = face_detection_service.analyze_face_quality(request.image)
-        
-        # Détecter les visages multiples
-        multiple_faces = face_detection_service.detect_multiple_faces(request.image)
-        
-        # Analyser le regard si un visage est détecté
-        gaze_analysis = None
-        if faces:
-            gaze_analysis = face_detection_service.track_gaze(request.image, faces[0]['bbox'])
+        with readiness_service.track('face_detection'):
+            # Décoder l'image (mesuré par étape dans le service)
+            img_array = face_detection_service.decode_base64_image(image)
+            
+            # Détecter les visages
+            faces = face_detection_service.detect_faces(img_array)
+            
+            # Analyser la qualité
+            quality = face_detection_service.analyze_face_quality(image)
+            
+            # Détecter les visages multiples
+            multiple_faces = face_detection_service.detect_multiple_faces(image)
+            
+            # Analyser le regard si un visage est détecté
+            gaze_analysis = None
+            if faces:
+                gaze_analysis = face_detection_service.track_gaze(img_array, faces[0]['bbox'], session_id)
         
         return FaceAnalysisResponse(
             faces_detected=len(faces),
@@ -189,7 +244,8 @@ async def detect_objects(
     try:
         logger.info(f"Détection d'objets pour l'utilisateur {current_user.id}")
         
-        result = object_detection_service.detect_suspicious_objects(request.image)
+        with readiness_service.track('object_detection'):
+            result = object_detection_service.detect_suspicious_objects(request.image)
         
         # Analyser les patterns si des objets sont détectés
         patterns = None
@@ -233,12 +289,8 @@ async def analyze_audio(
         import random
         
         # Décoder les données audio (simulation)
-        audio_data = request.audio_data
-        if ',' in audio_data:
-            audio_data = audio_data.split(',')[1]
-        
         # Analyser la longueur des données pour estimer le volume
-        audio_bytes = base64.b64decode(audio_data)
+        audio_bytes = decode_base64(request.audio_data)
         data_length = len(audio_bytes)
         
         # Simulation de l'analyse
@@ -271,10 +323,47 @@ async def analyze_audio(
         logger.error(f"Erreur lors de l'analyse audio: {e}")
         raise HTTPException(status_code=500, detail="Erreur lors de l'analyse audio")
 
+# Alertes dont la preuve est la capture d'écran (les autres : l'image vidéo)
+SCREEN_ALERT_TYPES = {'window_switch', 'full_screen_change', 'rapid_content_change', 'resolution_change'}
+
+async def record_alerts(session_id: int, alerts: List[Dict], request: SurveillanceAnalysisRequest) -> None:
+    """
+    Enregistre les alertes d'une analyse avec l'image qui les a déclenchées
+    
+    Args:
+        session_id: Session d'examen
+        alerts: Alertes produites par l'analyse (complétées avec evidence_hash)
+        request: Données analysées (image vidéo, capture d'écran)
+    """
+    # Une même image sert de preuve à toutes les alertes qu'elle a déclenchées
+    evidence: Dict[str, Optional[str]] = {}
+    for alert in alerts:
+        source = 'screen_capture' if alert['type'] in SCREEN_ALERT_TYPES else 'video_frame'
+        if 'audio' in alert['type']:
+            source = None
+        
+        if settings.EVIDENCE_STORE_ENABLED and source and source not in evidence and getattr(request, source):
+            try:
+                stored = await asyncio.to_thread(evidence_store.store, getattr(request, source), session_id)
+                evidence[source] = stored['hash']
+            except ValueError as e:
+                logger.warning(f"Preuve non enregistrée: {e}")
+                evidence[source] = None
+        
+        alert['evidence_hash'] = evidence.get(source)
+        await alert_sink.submit(
+            session_id=session_id,
+            alert_type=alert['type'],
+            severity=alert['severity'],
+            description=alert.get('description'),
+            evidence_hash=alert['evidence_hash']
+        )
+
 @router.post("/surveillance-analysis", response_model=SurveillanceAnalysisResponse)
 async def analyze_surveillance_data(
     request: SurveillanceAnalysisRequest,
-    current_user: User = Depends(get_current_user)
+    current_user: User = Depends(get_current_user),
+    db: AsyncSession = Depends(get_async_db)
 ):
     """
     Analyse complète des données de surveillance (vidéo, audio, écran)
@@ -282,6 +371,7 @@ async def analyze_surveillance_data(
     Args:
         request: Données de surveillance à analyser
         current_user: Utilisateur authentifié
+        db: Session de base de données (contrôle de la session d'examen)
         
     Returns:
         Analyse complète avec évaluation des risques
@@ -292,11 +382,17 @@ async def analyze_surveillance_data(
         alerts = []
         risk_factors = []
         
+        # Seule une session de l'utilisateur est archivée (captures, alertes)
+        exam_session_id = await owned_session_id(request.session_id, current_user, db)
+        if exam_session_id is None:
+            logger.warning(f"Session {request.session_id!r} inconnue ou d'un autre utilisateur : données non archivées")
+        
         # Analyser la vidéo si disponible
         face_analysis = None
         if request.video_frame:
             try:
-                face_result = await analyze_face(FaceAnalysisRequest(image=request.video_frame), current_user)
+                with timed(AI_PIPELINE_SECONDS, 'face_analysis'):
+                    face_result = _analyze_face(request.video_frame, current_user, exam_session_id)
                 face_analysis = face_result
                 
                 # Vérifier les alertes faciales
@@ -331,7 +427,8 @@ async def analyze_surveillance_data(
         object_analysis = None
         if request.video_frame:
             try:
-                object_result = await detect_objects(ObjectDetectionRequest(image=request.video_frame), current_user)
+                with timed(AI_PIPELINE_SECONDS, 'object_detection'):
+                    object_result = await detect_objects(ObjectDetectionRequest(image=request.video_frame), current_user)
                 object_analysis = object_result
                 
                 # Vérifier les alertes d'objets
@@ -358,10 +455,11 @@ async def analyze_surveillance_data(
         audio_analysis = None
         if request.audio_chunk:
             try:
-                audio_result = await analyze_audio(AudioAnalysisRequest(
-                    audio_data=request.audio_chunk,
-                    duration=1.0  # Durée par défaut
-                ), current_user)
+                with timed(AI_PIPELINE_SECONDS, 'audio_analysis'):
+                    audio_result = await analyze_audio(AudioAnalysisRequest(
+                        audio_data=request.audio_chunk,
+                        duration=1.0  # Durée par défaut
+                    ), current_user)
                 audio_analysis = audio_result
                 
                 # Vérifier les alertes audio
@@ -376,6 +474,42 @@ async def analyze_surveillance_data(
             except Exception as e:
                 logger.warning(f"Erreur lors de l'analyse audio: {e}")
         
+        # Analyser la capture d'écran si disponible (seules les zones modifiées sont traitées).
+        # La capture de référence est celle de la session vérifiée : un identifiant
+        # arbitraire ne peut ni remplacer celle d'un autre examen ni saturer l'état LRU
+        screen_analysis = None
+        if request.screen_capture and settings.SCREEN_ANALYSIS_ENABLED and exam_session_id is not None:
+            try:
+                with timed(AI_PIPELINE_SECONDS, 'screen_analysis'), readiness_service.track('screen_analysis'):
+                    screen_result = screen_analysis_service.analyze_capture(
+                        exam_session_id,
+                        request.screen_capture
+                    )
+                screen_analysis = ScreenAnalysisResponse(**screen_result)
+                
+                # Archiver chaque capture : le stockage compare les tuiles au pixel près et
+                # n'écrit que celles qui ont changé (le seuil perceptuel de l'analyse
+                # ignorerait les petites modifications) ; une capture identique à la
+                # précédente n'est ni décodée ni comparée
+                if settings.SCREEN_CAPTURE_STORAGE_ENABLED and exam_session_id is not None:
+                    await asyncio.to_thread(screen_capture_store.append_encoded, exam_session_id, request.screen_capture)
+                
+                # Vérifier les alertes d'écran
+                for event in screen_result['events']:
+                    alerts.append(event)
+                    risk_factors.append(0.6 if event['severity'] == 'high' else 0.4)
+                    
+            except Exception as e:
+                logger.warning(f"Erreur lors de l'analyse d'écran: {e}")
+        
+        # Persister les alertes avec leur preuve (session existante de l'utilisateur uniquement)
+        if alerts and exam_session_id is not None:
+            try:
+                with timed(AI_PIPELINE_SECONDS, 'record_alerts'):
+                    await record_alerts(exam_session_id, alerts, request)
+            except Exception as e:
+                logger.warning(f"Erreur lors de l'enregistrement des alertes: {e}")
+        
         # Calculer le risque global
         overall_risk = 'low'
         if risk_factors:
@@ -393,6 +527,7 @@ async def analyze_surveillance_data(
             face_analysis=face_analysis,
             object_analysis=object_analysis,
             audio_analysis=audio_analysis,
+            screen_analysis=screen_analysis,
             overall_risk=overall_risk,
             alerts=alerts
         )
@@ -454,44 +589,13 @@ async def ai_health_check(current_user: User = Depends(get_current_user)):
     """
     Vérifie l'état des services IA
     
+    L'état provient des sondes périodiques du service de disponibilité : aucune
+    inférence n'est exécutée pendant la requête.
+    
     Args:
         current_user: Utilisateur authentifié
         
     Returns:
-        État des services IA
+        Disponibilité du worker, modèles chargés, latences récentes et charge par analyseur
     """
-    try:
-        # Vérifier les services IA
-        services_status = {
-            "face_detection": "healthy",
-            "object_detection": "healthy",
-            "audio_analysis": "healthy"
-        }
-        
-        # Test simple des services
-        try:
-            # Test du service de reconnaissance faciale
-            test_image = "data:image/png;base64,iVBORw0KGgoAAAANSUhEUgAAAAEAAAABCAYAAAAfFcSJAAAADUlEQVR42mNkYPhfDwAChwGA60e6kgAAAABJRU5ErkJggg=="
-            face_detection_service.detect_faces(face_detection_service.decode_base64_image(test_image))
-        except Exception as e:
-            services_status["face_detection"] = "error"
-            logger.warning(f"Service de reconnaissance faciale en erreur: {e}")
-        
-        try:
-            # Test du service de détection d'objets
-            object_detection_service.detect_suspicious_objects(test_image)
-        except Exception as e:
-            services_status["object_detection"] = "error"
-            logger.warning(f"Service de détection d'objets en erreur: {e}")
-        
-        overall_status = "healthy" if all(status == "healthy" for status in services_status.values()) else "degraded"
-        
-        return {
-            "status": overall_status,
-            "services": services_status,
-            "timestamp": "2025-01-15T10:00:00Z"
-        }
-        
-    except Exception as e:
-        logger.error(f"Erreur lors du health check IA: {e}")
-        raise HTTPException(status_code=500, detail="Erreur lors du health check IA")
+    return readiness_service.report()
@@ -3,7 +3,8 @@ Routeur principal de l'API ProctoFlex AI
 """
 
 from fastapi import APIRouter
-from app.api.v1.endpoints import auth, surveillance
+from app.api.v1.endpoints import admin, auth, surveillance, users
+from app.api.v1 import ai
 
 # Création du routeur principal
 api_router = APIRouter()
@@ -11,8 +12,10 @@ api_router = APIRouter()
 # Inclusion des sous-routeurs (seulement les modules existants)
 api_router.include_router(auth.router, prefix="/auth", tags=["authentification"])
 api_router.include_router(surveillance.router, prefix="/surveillance", tags=["surveillance"])
+api_router.include_router(users.router, prefix="/users", tags=["utilisateurs"])
+api_router.include_router(admin.router, prefix="/admin", tags=["administration"])
+api_router.include_router(ai.router)  # préfixe /ai défini dans le module
 
 # TODO: Ajouter les routeurs suivants quand les fichiers seront créés:
-# - users.router (prefix="/users", tags=["utilisateurs"])
 # - exams.router (prefix="/exams", tags=["examens"])
 # - sessions.router (prefix="/sessions", tags=["sessions"])
@@ -0,0 +1,81 @@
+"""
+Endpoints d'administration ProctoFlex AI
+Profilage à la demande du worker (CPU et mémoire), réservé aux administrateurs
+"""
+
+import time
+
+from fastapi import APIRouter, Depends, HTTPException, Query
+from fastapi.responses import Response
+
+from app.core.database import User
+from app.core.security import check_user_permission, get_current_user
+from app.services.profiler import profiler_service
+
+router = APIRouter()
+
+def require_admin(current_user: User = Depends(get_current_user)) -> User:
+    """Dépendance : refuse l'accès aux utilisateurs non administrateurs"""
+    if not check_user_permission(current_user, "admin"):
+        raise HTTPException(status_code=403, detail="Réservé aux administrateurs")
+    if not profiler_service.enabled:
+        raise HTTPException(status_code=404, detail="Profilage désactivé")
+    return current_user
+
+def _profile_error(error: Exception) -> HTTPException:
+    """Erreur HTTP correspondant à un refus du profileur"""
+    if isinstance(error, ValueError):
+        return HTTPException(status_code=422, detail=str(error))
+    return HTTPException(status_code=409, detail=str(error))
+
+@router.post("/profiler/cpu")
+async def profile_cpu(
+    seconds: float = Query(10.0, gt=0),
+    mode: str = Query("sampler", pattern="^(sampler|signal|cprofile)$"),
+    interval_ms: float = Query(None, ge=1, le=1000),
+    include_idle: bool = False,
+    current_user: User = Depends(require_admin)
+):
+    """
+    Profile le worker pendant `seconds` secondes
+    sampler / signal : piles repliées (flamegraph) ; cprofile : statistiques pstats (.prof)
+    """
+    try:
+        if mode == "cprofile":
+            result = await profiler_service.cprofile(seconds)
+            content, media_type, extension = result["stats"], "application/octet-stream", "prof"
+        else:
+            result = await profiler_service.sample_stacks(
+                seconds,
+                interval=interval_ms / 1000.0 if interval_ms else None,
+                include_idle=include_idle,
+                mode="signal" if mode == "signal" else "thread"
+            )
+            content, media_type, extension = result["collapsed"], "text/plain; charset=utf-8", "collapsed"
+    except (ValueError, RuntimeError) as e:
+        raise _profile_error(e)
+
+    filename = f"profile-{result['pid']}-{time.strftime('%Y%m%dT%H%M%S')}.{extension}"
+    headers = {
+        "Content-Disposition": f'attachment; filename="{filename}"',
+        "X-Profiler-Pid": str(result["pid"]),
+        "X-Profiler-Mode": result["mode"],
+    }
+    if "samples" in result:
+        headers["X-Profiler-Samples"] = str(result["samples"])
+    return Response(content=content, media_type=media_type, headers=headers)
+
+@router.post("/profiler/memory")
+async def profile_memory(
+    seconds: float = Query(30.0, gt=0),
+    limit: int = Query(25, ge=1, le=500),
+    group_by: str = Query("lineno", pattern="^(lineno|filename|traceback)$"),
+    current_user: User = Depends(require_admin)
+):
+    """
+    Croissance mémoire par site d'allocation (tracemalloc) pendant `seconds` secondes
+    """
+    try:
+        return await profiler_service.memory_growth(seconds, limit=limit, group_by=group_by)
+    except (ValueError, RuntimeError) as e:
+        raise _profile_error(e)
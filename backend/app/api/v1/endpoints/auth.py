@@ -5,9 +5,9 @@ Endpoints d'authentification ProctoFlex AI
 from datetime import timedelta
 from fastapi import APIRouter, Depends, HTTPException, status
 from fastapi.security import OAuth2PasswordRequestForm
-from sqlalchemy.orm import Session
+from sqlalchemy.ext.asyncio import AsyncSession
 
-from app.core.database import get_db
+from app.core.database import get_async_db
 from app.core.security import (
     authenticate_user, 
     authenticate_user_by_email_or_username,
@@ -24,14 +24,14 @@ router = APIRouter()
 @router.post("/login", response_model=Token)
 async def login(
     form_data: OAuth2PasswordRequestForm = Depends(),
-    db: Session = Depends(get_db)
+    db: AsyncSession = Depends(get_async_db)
 ):
     """
     Authentification utilisateur et génération de token JWT
     Accepte email ou username dans le champ 'username'
     """
     # Authentification de l'utilisateur (accepte email ou username)
-    user = authenticate_user_by_email_or_username(db, form_data.username, form_data.password)
+    user = await authenticate_user_by_email_or_username(db, form_data.username, form_data.password)
     if not user:
         raise HTTPException(
             status_code=status.HTTP_401_UNAUTHORIZED,
@@ -63,13 +63,13 @@ async def login(
 @router.post("/register", response_model=Token)
 async def register(
     user_data: UserCreate,
-    db: Session = Depends(get_db)
+    db: AsyncSession = Depends(get_async_db)
 ):
     """
     Création d'un nouveau compte utilisateur
     """
     # Vérification que l'email n'existe pas déjà
-    existing_user = get_user_by_email(db, user_data.email)
+    existing_user = await get_user_by_email(db, user_data.email)
     if existing_user:
         raise HTTPException(
             status_code=status.HTTP_400_BAD_REQUEST,
@@ -77,7 +77,7 @@ async def register(
         )
     
     # Création de l'utilisateur
-    user = create_user(db, user_data)
+    user = await create_user(db, user_data)
     
     # Génération du token d'accès
     access_token_expires = timedelta(minutes=settings.ACCESS_TOKEN_EXPIRE_MINUTES)
@@ -3,63 +3,118 @@ Endpoints de surveillance ProctoFlex AI
 Reconnaissance faciale et gestion des sessions
 """
 
-import base64
+import asyncio
 import cv2
 import numpy as np
-from fastapi import APIRouter, Depends, HTTPException, UploadFile, File
-from sqlalchemy.orm import Session
-from typing import List
+from fastapi import APIRouter, Depends, HTTPException, UploadFile, File, Query, Request
+from fastapi.encoders import jsonable_encoder
+from pydantic import ValidationError
+from fastapi.responses import FileResponse, Response, StreamingResponse
+from sqlalchemy import func, update
+from sqlalchemy.ext.asyncio import AsyncSession
+from typing import List, Optional
+from datetime import datetime
 import json
+import os
 
-from app.core.database import get_db, User, ExamSession, SecurityAlert
+from app.core.config import settings
+from app.core.database import get_async_db, AsyncSessionLocal, User, ExamSession
+from app.core.metrics import AI_STAGE_SECONDS, timed
 from app.core.security import get_current_user
-from app.ai.face_recognition import FaceRecognitionEngine
+from app.core.uploads import decode_base64, read_body, read_json_with_base64_fields
+from app.ai.face_recognition import face_recognition_engine as face_engine
+from app.ai.screen_analysis import screen_analysis_service
+from app.crud.alert import get_session_alerts_page, stream_session_alerts
+from app.services.alert_sink import alert_sink
+from app.services.readiness import readiness_service
+from app.services.session_cache import owned_session_id, session_cache
+from app.storage.capture_store import screen_capture_store
+from app.storage.evidence import CONTENT_TYPES, evidence_store
+from app.storage.recordings import STREAMS, recording_store
 from app.models.surveillance import (
     FaceVerificationRequest,
     FaceVerificationResponse,
     SessionStartRequest,
-    SessionStatusResponse
+    SessionStatusResponse,
+    SecurityAlertPage
 )
 
 router = APIRouter()
 
-# Initialisation du moteur de reconnaissance faciale
-face_engine = FaceRecognitionEngine()
+def _probe_face_recognition(image_data: str) -> None:
+    image = cv2.imdecode(np.frombuffer(decode_base64(image_data), np.uint8), cv2.IMREAD_COLOR)
+    face_engine.detect_faces(image)
 
-@router.post("/verify-identity", response_model=FaceVerificationResponse)
+
+readiness_service.register(
+    'face_recognition',
+    probe=_probe_face_recognition,
+    loaded=lambda: {'loaded': face_engine.loaded, 'backend': 'mediapipe'},
+    load=face_engine.get
+)
+
+@router.post(
+    "/verify-identity",
+    response_model=FaceVerificationResponse,
+    openapi_extra={"requestBody": {"required": True, "content": {"application/json": {"schema": FaceVerificationRequest.model_json_schema()}}}}
+)
 async def verify_identity(
-    request: FaceVerificationRequest,
+    http_request: Request,
     current_user: User = Depends(get_current_user),
-    db: Session = Depends(get_db)
+    db: AsyncSession = Depends(get_async_db)
 ):
     """
     Vérifie l'identité d'un étudiant par reconnaissance faciale
     """
+    # Les images base64 sont décodées au fil de la réception (mémoire bornée)
+    fields, images = await read_json_with_base64_fields(http_request, ("reference_image", "current_image"))
     try:
-        # Décodage des images base64
-        reference_image_data = base64.b64decode(request.reference_image.split(',')[1])
-        current_image_data = base64.b64decode(request.current_image.split(',')[1])
+        try:
+            request = FaceVerificationRequest(**{**fields, "reference_image": "", "current_image": ""})
+        except ValidationError as e:
+            raise HTTPException(status_code=422, detail=e.errors(include_url=False, include_input=False))
+        if set(images) != {"reference_image", "current_image"}:
+            raise HTTPException(status_code=422, detail="reference_image et current_image sont requis")
         
+        reference_image_data = images["reference_image"].read()
+        current_image_data = images["current_image"].read()
+    finally:
+        for image in images.values():
+            image.close()
+    
+    try:
         # Conversion en numpy arrays
         reference_np = np.frombuffer(reference_image_data, np.uint8)
         current_np = np.frombuffer(current_image_data, np.uint8)
         
-        reference_image = cv2.imdecode(reference_np, cv2.IMREAD_COLOR)
-        current_image = cv2.imdecode(current_np, cv2.IMREAD_COLOR)
+        with timed(AI_STAGE_SECONDS, 'face_recognition', 'image_decode', 'opencv'):
+            reference_image = cv2.imdecode(reference_np, cv2.IMREAD_COLOR)
+            current_image = cv2.imdecode(current_np, cv2.IMREAD_COLOR)
         
         # Vérification de l'identité
-        verification_result = face_engine.verify_identity(reference_image, current_image)
+        with readiness_service.track('face_recognition'):
+            verification_result = face_engine.verify_identity(reference_image, current_image)
         
-        # Enregistrement de l'alerte si échec
+        # Enregistrement de l'alerte si échec, avec l'image comme preuve,
+        # uniquement pour une session de l'étudiant authentifié
+        session_id = None
         if not verification_result['verified']:
-            alert = SecurityAlert(
-                session_id=request.session_id,
+            session_id = await owned_session_id(request.session_id, current_user, db)
+        if session_id is not None:
+            evidence_hash = None
+            if settings.EVIDENCE_STORE_ENABLED:
+                try:
+                    evidence = await asyncio.to_thread(evidence_store.store, current_image_data, session_id)
+                    evidence_hash = evidence['hash']
+                except ValueError:
+                    pass
+            await alert_sink.submit(
+                session_id=session_id,
                 alert_type="face_verification_failed",
                 severity="high",
-                description=f"Échec de vérification d'identité: {verification_result.get('error', 'Confiance insuffisante')}"
+                description=f"Échec de vérification d'identité: {verification_result.get('error', 'Confiance insuffisante')}",
+                evidence_hash=evidence_hash
             )
-            db.add(alert)
-            db.commit()
         
         return FaceVerificationResponse(
             verified=verification_result['verified'],
@@ -74,7 +129,7 @@ async def verify_identity(
 async def start_exam_session(
     request: SessionStartRequest,
     current_user: User = Depends(get_current_user),
-    db: Session = Depends(get_db)
+    db: AsyncSession = Depends(get_async_db)
 ):
     """
     Démarre une session d'examen avec vérification d'identité
@@ -95,8 +150,9 @@ async def start_exam_session(
             status="active"
         )
         db.add(session)
-        db.commit()
-        db.refresh(session)
+        await db.commit()
+        await db.refresh(session)
+        session_cache.prime(session)
         
         return SessionStatusResponse(
             session_id=session.id,
@@ -111,96 +167,280 @@ async def start_exam_session(
 async def get_session_status(
     session_id: int,
     current_user: User = Depends(get_current_user),
-    db: Session = Depends(get_db)
+    db: AsyncSession = Depends(get_async_db)
 ):
     """
     Récupère le statut d'une session d'examen
     """
-    session = db.query(ExamSession).filter(ExamSession.id == session_id).first()
+    session = await session_cache.get(db, session_id)
     if not session:
         raise HTTPException(status_code=404, detail="Session non trouvée")
     
     # Vérification des permissions
-    if current_user.role == "student" and session.student_id != current_user.id:
+    if current_user.role == "student" and session["student_id"] != current_user.id:
         raise HTTPException(status_code=403, detail="Accès non autorisé à cette session")
     
     return SessionStatusResponse(
-        session_id=session.id,
-        status=session.status,
-        message=f"Session {session.status}"
+        session_id=session["id"],
+        status=session["status"],
+        message=f"Session {session['status']}"
     )
 
 @router.post("/session/{session_id}/end")
 async def end_exam_session(
     session_id: int,
     current_user: User = Depends(get_current_user),
-    db: Session = Depends(get_db)
+    db: AsyncSession = Depends(get_async_db)
 ):
     """
     Termine une session d'examen
     """
-    session = db.query(ExamSession).filter(ExamSession.id == session_id).first()
+    session = await session_cache.get(db, session_id)
     if not session:
         raise HTTPException(status_code=404, detail="Session non trouvée")
     
     # Vérification des permissions
-    if current_user.role == "student" and session.student_id != current_user.id:
+    if current_user.role == "student" and session["student_id"] != current_user.id:
         raise HTTPException(status_code=403, detail="Accès non autorisé à cette session")
     
+    # Clôture du stockage des captures d'écran et des enregistrements
+    screen_capture_store.close_session(session_id)
+    screen_analysis_service.reset_session(session_id)
+    # Libération du suiveur de visage (sans construire le moteur s'il n'a pas servi)
+    if face_engine.loaded:
+        face_engine.release_session(session_id)
+    recordings = await recording_store.close_session(session_id)
+    
     # Mise à jour du statut
-    session.status = "completed"
-    db.commit()
+    await db.execute(
+        update(ExamSession)
+        .where(ExamSession.id == session_id)
+        .values(
+            status="completed",
+            end_time=func.now(),
+            screen_captures=json.dumps(screen_capture_store.describe(session_id)),
+            video_path=recordings.get("video"),
+            audio_path=recordings.get("audio")
+        )
+    )
+    await db.commit()
+    await session_cache.invalidate(session_id)
     
     return {"message": "Session terminée avec succès"}
 
-@router.get("/session/{session_id}/alerts")
+@router.get("/session/{session_id}/alerts", response_model=SecurityAlertPage)
 async def get_session_alerts(
     session_id: int,
+    limit: int = Query(100, ge=1, le=1000),
+    cursor: Optional[str] = None,
+    severity: Optional[List[str]] = Query(None),
+    alert_type: Optional[List[str]] = Query(None),
+    current_user: User = Depends(get_current_user),
+    db: AsyncSession = Depends(get_async_db)
+):
+    """
+    Récupère les alertes de sécurité d'une session (pagination par curseur)
+    """
+    session = await session_cache.get(db, session_id)
+    if not session:
+        raise HTTPException(status_code=404, detail="Session non trouvée")
+    
+    # Vérification des permissions
+    if current_user.role == "student" and session["student_id"] != current_user.id:
+        raise HTTPException(status_code=403, detail="Accès non autorisé à cette session")
+    
+    try:
+        items, next_cursor = await get_session_alerts_page(
+            db, session_id, limit=limit, cursor=cursor, severity=severity, alert_type=alert_type
+        )
+    except ValueError as e:
+        raise HTTPException(status_code=400, detail=str(e))
+    
+    return SecurityAlertPage(items=items, next_cursor=next_cursor)
+
+@router.get("/session/{session_id}/alerts/stream")
+async def stream_session_alerts_ndjson(
+    session_id: int,
+    severity: Optional[List[str]] = Query(None),
+    alert_type: Optional[List[str]] = Query(None),
+    current_user: User = Depends(get_current_user),
+    db: AsyncSession = Depends(get_async_db)
+):
+    """
+    Exporte toutes les alertes d'une session en NDJSON (mémoire constante)
+    """
+    session = await session_cache.get(db, session_id)
+    if not session:
+        raise HTTPException(status_code=404, detail="Session non trouvée")
+    
+    # Vérification des permissions
+    if current_user.role == "student" and session["student_id"] != current_user.id:
+        raise HTTPException(status_code=403, detail="Accès non autorisé à cette session")
+    
+    async def generate():
+        # Session dédiée : celle de la dépendance est fermée avant la fin du flux
+        async with AsyncSessionLocal() as stream_db:
+            lines = []
+            async for alert in stream_session_alerts(stream_db, session_id, severity, alert_type):
+                lines.append(json.dumps(jsonable_encoder(alert), ensure_ascii=False))
+                if len(lines) >= 500:
+                    yield "\n".join(lines) + "\n"
+                    lines = []
+            if lines:
+                yield "\n".join(lines) + "\n"
+    
+    return StreamingResponse(generate(), media_type="application/x-ndjson")
+
+@router.get("/session/{session_id}/screen")
+async def get_session_screen_capture(
+    session_id: int,
+    at: Optional[datetime] = None,
     current_user: User = Depends(get_current_user),
-    db: Session = Depends(get_db)
+    db: AsyncSession = Depends(get_async_db)
 ):
     """
-    Récupère les alertes de sécurité d'une session
+    Reconstruit la capture d'écran affichée à un instant donné (PNG)
     """
-    session = db.query(ExamSession).filter(ExamSession.id == session_id).first()
+    session = await session_cache.get(db, session_id)
     if not session:
         raise HTTPException(status_code=404, detail="Session non trouvée")
     
     # Vérification des permissions
-    if current_user.role == "student" and session.student_id != current_user.id:
+    if current_user.role == "student":
+        raise HTTPException(status_code=403, detail="Accès non autorisé aux captures d'écran")
+    
+    timestamp = at.timestamp() if at else float("inf")
+    capture = screen_capture_store.get_capture_at(session_id, timestamp)
+    if capture is None:
+        raise HTTPException(status_code=404, detail="Aucune capture d'écran à cet instant")
+    
+    ok, encoded = cv2.imencode(".png", capture)
+    if not ok:
+        raise HTTPException(status_code=500, detail="Erreur lors de l'encodage de la capture")
+    
+    return Response(content=encoded.tobytes(), media_type="image/png")
+
+@router.post("/session/{session_id}/recording/{stream}")
+async def append_session_recording(
+    session_id: int,
+    stream: str,
+    request: Request,
+    timestamp: Optional[float] = None,
+    current_user: User = Depends(get_current_user),
+    db: AsyncSession = Depends(get_async_db)
+):
+    """
+    Ajoute un morceau encodé (corps brut) à l'enregistrement audio ou vidéo d'une session
+    """
+    if not settings.RECORDING_ENABLED:
+        raise HTTPException(status_code=404, detail="Enregistrement désactivé")
+    if stream not in STREAMS:
+        raise HTTPException(status_code=404, detail="Flux inconnu")
+    
+    # Statut lu en base : une fin de session sur un autre worker doit être vue immédiatement
+    session = await session_cache.get(db, session_id, fresh=True)
+    if not session:
+        raise HTTPException(status_code=404, detail="Session non trouvée")
+    
+    # Seul l'étudiant de la session enregistre, tant qu'elle est active
+    if session["student_id"] != current_user.id:
         raise HTTPException(status_code=403, detail="Accès non autorisé à cette session")
+    if session["status"] != "active":
+        raise HTTPException(status_code=409, detail="La session n'est pas active")
     
-    alerts = db.query(SecurityAlert).filter(SecurityAlert.session_id == session_id).all()
+    data = await read_body(request, settings.RECORDING_MAX_CHUNK_BYTES)
+    if not data:
+        raise HTTPException(status_code=400, detail="Morceau vide")
     
-    return [
-        {
-            "id": alert.id,
-            "type": alert.alert_type,
-            "severity": alert.severity,
-            "description": alert.description,
-            "timestamp": alert.timestamp,
-            "resolved": alert.is_resolved
-        }
-        for alert in alerts
-    ]
+    return await recording_store.append(session_id, stream, data, timestamp)
+
+@router.get("/session/{session_id}/recording/{stream}")
+async def get_session_recording(
+    session_id: int,
+    stream: str,
+    start: Optional[datetime] = None,
+    end: Optional[datetime] = None,
+    current_user: User = Depends(get_current_user),
+    db: AsyncSession = Depends(get_async_db)
+):
+    """
+    Relit l'enregistrement d'une session entre deux instants (morceaux concaténés)
+    """
+    if stream not in STREAMS:
+        raise HTTPException(status_code=404, detail="Flux inconnu")
+    
+    session = await session_cache.get(db, session_id)
+    if not session:
+        raise HTTPException(status_code=404, detail="Session non trouvée")
+    
+    # Vérification des permissions
+    if current_user.role == "student":
+        raise HTTPException(status_code=403, detail="Accès non autorisé aux enregistrements")
+    
+    reader = recording_store.open_reader(session_id, stream)
+    if reader.index.size == 0:
+        reader.close()
+        raise HTTPException(status_code=404, detail="Aucun enregistrement pour ce flux")
+    
+    def generate():
+        # Lecture par mmap : seules les pages des morceaux demandés sont chargées
+        with reader:
+            for _, chunk in reader.iter_range(
+                start.timestamp() if start else None,
+                end.timestamp() if end else None
+            ):
+                yield chunk
+    
+    return StreamingResponse(generate(), media_type="application/octet-stream")
+
+@router.get("/evidence/{evidence_hash}")
+async def get_evidence(
+    evidence_hash: str,
+    thumbnail: bool = False,
+    current_user: User = Depends(get_current_user)
+):
+    """
+    Récupère l'image de preuve d'une alerte (ou sa miniature)
+    """
+    # Vérification des permissions
+    if current_user.role == "student":
+        raise HTTPException(status_code=403, detail="Accès non autorisé aux preuves")
+    
+    if thumbnail:
+        path = await asyncio.to_thread(evidence_store.thumbnail, evidence_hash)
+        media_type = "image/jpeg"
+    else:
+        path = await asyncio.to_thread(evidence_store.find, evidence_hash)
+        media_type = CONTENT_TYPES.get(os.path.splitext(path)[1]) if path else None
+    if path is None:
+        raise HTTPException(status_code=404, detail="Preuve non trouvée")
+    
+    # Contenu adressé par son hash : immuable
+    return FileResponse(path, media_type=media_type, headers={"Cache-Control": "private, max-age=31536000, immutable"})
 
 @router.post("/analyze-face")
 async def analyze_face_behavior(
     image_data: str,
-    current_user: User = Depends(get_current_user)
+    session_id: Optional[str] = None,
+    current_user: User = Depends(get_current_user),
+    db: AsyncSession = Depends(get_async_db)
 ):
     """
     Analyse le comportement du visage en temps réel
     """
+    # Suiveur de visage propre à une session vérifiée de l'utilisateur (sinon image isolée)
+    session_id = await owned_session_id(session_id, current_user, db)
     try:
         # Décodage de l'image
-        image_data_clean = image_data.split(',')[1] if ',' in image_data else image_data
-        image_bytes = base64.b64decode(image_data_clean)
+        with timed(AI_STAGE_SECONDS, 'face_recognition', 'base64_decode', 'python'):
+            image_bytes = decode_base64(image_data)
         image_np = np.frombuffer(image_bytes, np.uint8)
-        image = cv2.imdecode(image_np, cv2.IMREAD_COLOR)
+        with timed(AI_STAGE_SECONDS, 'face_recognition', 'image_decode', 'opencv'):
+            image = cv2.imdecode(image_np, cv2.IMREAD_COLOR)
         
         # Analyse du comportement
-        analysis = face_engine.analyze_face_behavior(image)
+        with readiness_service.track('face_recognition'):
+            analysis = face_engine.analyze_face_behavior(image, session_id)
         
         return analysis
         
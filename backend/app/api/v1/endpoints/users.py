@@ -0,0 +1,163 @@
+"""
+Endpoints de gestion des utilisateurs ProctoFlex AI
+Import en masse (CSV ou NDJSON, lu en flux) réservé aux administrateurs
+"""
+
+import asyncio
+import csv
+import io
+import json
+from typing import BinaryIO, Iterator, Optional, TextIO, Tuple
+
+from fastapi import APIRouter, Depends, File, HTTPException, Query, Request, UploadFile
+from pydantic import ValidationError
+from sqlalchemy.ext.asyncio import AsyncSession
+
+from app.core.config import settings
+from app.core.database import get_async_db, User
+from app.core.security import check_user_permission, get_current_user
+from app.core.uploads import spool_body
+from app.crud.user import bulk_create_users
+from app.models.auth import UserCreate, UserImportReport
+
+router = APIRouter()
+
+ROLES = {"student", "instructor", "admin"}
+
+def _detect_format(content_type: Optional[str], filename: Optional[str], format: Optional[str]) -> str:
+    """Détermine le format du fichier (paramètre, type MIME puis extension)"""
+    if format:
+        return format
+    content_type = (content_type or "").lower()
+    filename = (filename or "").lower()
+    if "ndjson" in content_type or "jsonl" in content_type or filename.endswith((".ndjson", ".jsonl")):
+        return "ndjson"
+    return "csv"
+
+def _iter_records(text: TextIO, file_format: str) -> Iterator[Tuple[int, object]]:
+    """Parcourt le fichier en couples (numéro de ligne, enregistrement brut), sans le charger"""
+    if file_format == "ndjson":
+        for line_number, line in enumerate(text, start=1):
+            if not line.strip():
+                continue
+            try:
+                yield line_number, json.loads(line)
+            except json.JSONDecodeError:
+                yield line_number, None
+        return
+
+    reader = csv.DictReader(text)
+    # Ligne 1 : en-tête
+    for row in reader:
+        yield reader.line_num, row
+
+def _count_records(source: BinaryIO, file_format: str) -> int:
+    """Premier passage : vérifie l'encodage et la syntaxe, compte les enregistrements"""
+    source.seek(0)
+    text = io.TextIOWrapper(source, encoding="utf-8-sig", newline="")
+    try:
+        return sum(1 for _ in _iter_records(text, file_format))
+    finally:
+        # Le fichier sous-jacent reste ouvert pour le second passage
+        text.detach()
+
+def _validation_message(error: ValidationError) -> str:
+    """Résume une erreur de validation Pydantic"""
+    return "; ".join(
+        f"{'.'.join(str(part) for part in item['loc'])}: {item['msg']}" for item in error.errors()
+    )
+
+def _validate_record(line: int, record: object) -> Tuple[Optional[UserCreate], Optional[dict]]:
+    """Valide un enregistrement : (utilisateur, None) ou (None, erreur de la ligne)"""
+    if not isinstance(record, dict):
+        return None, {"line": line, "error": "Ligne JSON invalide"}
+    record = {key.strip(): value for key, value in record.items() if key and value not in (None, "")}
+    try:
+        user = UserCreate(**record)
+    except ValidationError as e:
+        return None, {"line": line, "email": record.get("email"), "error": _validation_message(e)}
+    if user.role not in ROLES:
+        return None, {"line": line, "email": user.email, "error": f"Rôle inconnu: {user.role}"}
+    return user, None
+
+@router.post("/import", response_model=UserImportReport)
+async def import_users(
+    request: Request,
+    file: Optional[UploadFile] = File(None),
+    format: Optional[str] = Query(None, pattern="^(csv|ndjson)$"),
+    current_user: User = Depends(get_current_user),
+    db: AsyncSession = Depends(get_async_db)
+):
+    """
+    Importe une promotion d'utilisateurs depuis un fichier CSV ou NDJSON
+    Colonnes : email, username, full_name, password, role (optionnel, student par défaut)
+
+    Le fichier est envoyé en multipart (champ file) ou directement comme corps de
+    la requête (text/csv, application/x-ndjson). Dans les deux cas il est tamponné
+    sur disque au-delà de UPLOAD_SPOOL_MEMORY_BYTES puis lu ligne à ligne : les
+    utilisateurs sont créés par lots de USER_IMPORT_BATCH_SIZE.
+    """
+    if not check_user_permission(current_user, "admin"):
+        raise HTTPException(status_code=403, detail="Seuls les administrateurs peuvent importer des utilisateurs")
+
+    if file is not None:
+        # Starlette a déjà tamponné la partie (mémoire puis disque)
+        if file.size is not None and file.size > settings.MAX_FILE_SIZE:
+            raise HTTPException(status_code=413, detail="Fichier trop volumineux")
+        source = file.file
+        file_format = _detect_format(file.content_type, file.filename, format)
+    else:
+        source = await spool_body(request, settings.MAX_FILE_SIZE)
+        file_format = _detect_format(request.headers.get("content-type"), None, format)
+
+    try:
+        # Encodage, syntaxe et nombre de lignes vérifiés avant la première insertion
+        try:
+            total = await asyncio.to_thread(_count_records, source, file_format)
+        except UnicodeDecodeError:
+            raise HTTPException(status_code=400, detail="Le fichier doit être encodé en UTF-8")
+        except csv.Error as e:
+            raise HTTPException(status_code=400, detail=f"Fichier CSV invalide: {str(e)}")
+
+        if total > settings.USER_IMPORT_MAX_ROWS:
+            raise HTTPException(
+                status_code=413,
+                detail=f"Trop de lignes ({total}), maximum {settings.USER_IMPORT_MAX_ROWS}"
+            )
+
+        # Validation ligne par ligne ; les lignes invalides n'empêchent pas l'import des autres.
+        # Chaque lot est validé en base avant le suivant : les doublons entre lots sont détectés
+        created = 0
+        errors = []
+        batch = []
+        source.seek(0)
+        text = io.TextIOWrapper(source, encoding="utf-8-sig", newline="")
+        try:
+            for line, record in _iter_records(text, file_format):
+                user, error = _validate_record(line, record)
+                if error is not None:
+                    errors.append(error)
+                    continue
+                batch.append((line, user))
+                if len(batch) >= settings.USER_IMPORT_BATCH_SIZE:
+                    batch_created, batch_errors = await bulk_create_users(db, batch)
+                    created += batch_created
+                    errors.extend(batch_errors)
+                    batch = []
+            if batch:
+                batch_created, batch_errors = await bulk_create_users(db, batch)
+                created += batch_created
+                errors.extend(batch_errors)
+        finally:
+            text.detach()
+    finally:
+        if file is None:
+            source.close()
+
+    errors.sort(key=lambda error: error["line"])
+    return UserImportReport(
+        total=total,
+        created=created,
+        failed=len(errors),
+        errors=errors
+    )
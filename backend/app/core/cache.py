@@ -0,0 +1,174 @@
+"""
+Caches en mémoire ProctoFlex AI
+Cache TTL/LRU par processus et invalidation partagée entre workers (Redis pub/sub)
+"""
+
+import asyncio
+import json
+import logging
+import threading
+import time
+import uuid
+from collections import OrderedDict
+from typing import Any, Dict, Hashable, Optional
+
+from app.core.config import settings
+from app.core.metrics import CACHE_REQUESTS
+
+logger = logging.getLogger(__name__)
+
+try:
+    import redis.asyncio as redis_asyncio
+    REDIS_AVAILABLE = True
+except ImportError:
+    REDIS_AVAILABLE = False
+
+
+class TTLCache:
+    """
+    Cache borné : expiration par entrée et éviction LRU au-delà de maxsize
+
+    Les valeurs stockées doivent être traitées comme immuables par les appelants.
+    """
+
+    def __init__(self, name: str, maxsize: int, ttl: float):
+        self.name = name
+        self.maxsize = maxsize
+        self.ttl = ttl
+        self._entries: "OrderedDict[Hashable, tuple]" = OrderedDict()
+        self._lock = threading.Lock()
+        self._stats = {"hits": 0, "misses": 0, "evictions": 0, "invalidations": 0}
+
+    def get(self, key: Hashable, default: Any = None) -> Any:
+        """Renvoie la valeur en cache, ou default si absente ou expirée"""
+        with self._lock:
+            entry = self._entries.get(key)
+            if entry is not None and entry[0] > time.monotonic():
+                self._entries.move_to_end(key)
+                self._stats["hits"] += 1
+                CACHE_REQUESTS.labels(self.name, "hit").inc()
+                return entry[1]
+            if entry is not None:
+                del self._entries[key]
+            self._stats["misses"] += 1
+        CACHE_REQUESTS.labels(self.name, "miss").inc()
+        return default
+
+    def set(self, key: Hashable, value: Any, ttl: Optional[float] = None) -> None:
+        """Ajoute une valeur (ttl en secondes, self.ttl par défaut)"""
+        expires_at = time.monotonic() + (self.ttl if ttl is None else ttl)
+        with self._lock:
+            self._entries[key] = (expires_at, value)
+            self._entries.move_to_end(key)
+            while len(self._entries) > self.maxsize:
+                self._entries.popitem(last=False)
+                self._stats["evictions"] += 1
+
+    def invalidate(self, key: Hashable) -> None:
+        """Retire une entrée"""
+        with self._lock:
+            if self._entries.pop(key, None) is not None:
+                self._stats["invalidations"] += 1
+
+    def clear(self) -> None:
+        """Vide le cache"""
+        with self._lock:
+            self._entries.clear()
+
+    def stats(self) -> Dict:
+        """Statistiques du cache"""
+        with self._lock:
+            return {**self._stats, "size": len(self._entries), "maxsize": self.maxsize, "ttl": self.ttl}
+
+    def __len__(self) -> int:
+        return len(self._entries)
+
+
+class CacheInvalidationBus:
+    """
+    Diffusion des invalidations entre workers
+
+    Chaque worker garde ses propres caches ; une invalidation locale est publiée
+    sur CACHE_INVALIDATION_CHANNEL et appliquée par les autres workers abonnés.
+    Sans Redis (ou si CACHE_INVALIDATION_REDIS est désactivé), seul le TTL borne
+    la durée pendant laquelle les autres workers voient une valeur obsolète.
+    """
+
+    def __init__(self):
+        self.channel = settings.CACHE_INVALIDATION_CHANNEL
+        self.instance_id = uuid.uuid4().hex
+        self._caches: Dict[str, TTLCache] = {}
+        self._redis = None
+        self._task: Optional[asyncio.Task] = None
+
+    def register(self, cache: TTLCache) -> TTLCache:
+        """Inscrit un cache pour qu'il reçoive les invalidations distantes"""
+        self._caches[cache.name] = cache
+        return cache
+
+    async def start(self) -> None:
+        """Se connecte à Redis et écoute les invalidations (hook lifespan)"""
+        if not settings.CACHE_INVALIDATION_REDIS or self._task is not None:
+            return
+        if not REDIS_AVAILABLE:
+            logger.warning("redis non installé, invalidation des caches limitée au worker courant")
+            return
+        self._redis = redis_asyncio.from_url(settings.REDIS_URL)
+        self._task = asyncio.create_task(self._listen())
+
+    async def stop(self) -> None:
+        """Arrête l'écoute et ferme la connexion Redis"""
+        if self._task is not None:
+            self._task.cancel()
+            try:
+                await self._task
+            except asyncio.CancelledError:
+                pass
+            self._task = None
+        if self._redis is not None:
+            await self._redis.aclose()
+            self._redis = None
+
+    async def invalidate(self, cache: TTLCache, key: Hashable) -> None:
+        """Invalide une entrée localement puis chez les autres workers"""
+        cache.invalidate(key)
+        if self._redis is None:
+            return
+        message = json.dumps({"origin": self.instance_id, "cache": cache.name, "key": key})
+        try:
+            await self._redis.publish(self.channel, message)
+        except Exception as e:
+            logger.warning(f"Échec de publication de l'invalidation {cache.name}:{key}: {e}")
+
+    async def _listen(self) -> None:
+        """Applique les invalidations reçues ; se réabonne après une coupure"""
+        while True:
+            try:
+                pubsub = self._redis.pubsub()
+                await pubsub.subscribe(self.channel)
+                # Messages perdus pendant la coupure : on repart de caches vides
+                for cache in self._caches.values():
+                    cache.clear()
+                async for message in pubsub.listen():
+                    if message.get("type") == "message":
+                        self._apply(message["data"])
+            except asyncio.CancelledError:
+                raise
+            except Exception as e:
+                logger.warning(f"Abonnement aux invalidations interrompu: {e}")
+                await asyncio.sleep(1.0)
+
+    def _apply(self, raw: Any) -> None:
+        """Applique un message d'invalidation"""
+        try:
+            data = json.loads(raw)
+        except (TypeError, ValueError):
+            return
+        if data.get("origin") == self.instance_id:
+            return
+        cache = self._caches.get(data.get("cache"))
+        if cache is not None:
+            cache.invalidate(data.get("key"))
+
+# Instance globale du bus d'invalidation
+cache_bus = CacheInvalidationBus()
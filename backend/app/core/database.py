@@ -2,17 +2,146 @@
 Configuration de la base de données ProctoFlex AI
 """
 
-from sqlalchemy import create_engine, Column, Integer, String, DateTime, Boolean, Text, ForeignKey
+from sqlalchemy import create_engine, Column, Integer, String, DateTime, Boolean, Text, ForeignKey, Index
+from sqlalchemy import event, exc
+from sqlalchemy.ext.asyncio import create_async_engine, async_sessionmaker, AsyncSession
 from sqlalchemy.ext.declarative import declarative_base
 from sqlalchemy.orm import sessionmaker, relationship
+from sqlalchemy.pool import QueuePool, AsyncAdaptedQueuePool
 from sqlalchemy.sql import func
 from datetime import datetime
+import time
+import os
 from app.core.config import settings
+from app.core.metrics import (
+    DB_POOL_CHECKOUT_SECONDS,
+    DB_POOL_IN_USE,
+    DB_POOL_OVERFLOW,
+    DB_POOL_OVERFLOW_CHECKOUTS,
+    DB_POOL_TIMEOUTS
+)
+
+def get_async_database_url(url: str) -> str:
+    """Convertit une URL synchrone vers le pilote asynchrone correspondant"""
+    if url.startswith(("postgresql://", "postgresql+psycopg2://")):
+        return "postgresql+asyncpg://" + url.split("://", 1)[1]
+    if url.startswith("sqlite://"):
+        return "sqlite+aiosqlite://" + url.split("://", 1)[1]
+    return url
+
+class _PoolMetricsMixin:
+    """Mesure l'attente d'emprunt et les timeouts du pool (autour de `Pool.connect`)"""
+    metrics_label = "sync"
+    
+    def connect(self):
+        start = time.perf_counter()
+        try:
+            connection = super().connect()
+        except exc.TimeoutError:
+            DB_POOL_TIMEOUTS.labels(pool=self.metrics_label).inc()
+            raise
+        DB_POOL_CHECKOUT_SECONDS.labels(pool=self.metrics_label).observe(time.perf_counter() - start)
+        return connection
+
+class InstrumentedQueuePool(_PoolMetricsMixin, QueuePool):
+    """QueuePool instrumenté (engine synchrone)"""
+    metrics_label = "sync"
+
+class InstrumentedAsyncQueuePool(_PoolMetricsMixin, AsyncAdaptedQueuePool):
+    """QueuePool instrumenté (engine asynchrone)"""
+    metrics_label = "async"
+
+def get_engine_options(url: str, asynchronous: bool = False) -> dict:
+    """Options de pool et de timeout de requête selon le pilote"""
+    if url.startswith("sqlite"):
+        # SQLite (développement / tests) : pool par défaut du dialecte
+        return {}
+    
+    options = {
+        "poolclass": InstrumentedAsyncQueuePool if asynchronous else InstrumentedQueuePool,
+        "pool_size": settings.DB_POOL_SIZE,
+        "max_overflow": settings.DB_MAX_OVERFLOW,
+        "pool_timeout": settings.DB_POOL_TIMEOUT,
+        "pool_recycle": settings.DB_POOL_RECYCLE,
+        "pool_pre_ping": settings.DB_POOL_PRE_PING,
+    }
+    
+    if settings.DB_STATEMENT_TIMEOUT_MS and url.startswith("postgresql"):
+        timeout = str(settings.DB_STATEMENT_TIMEOUT_MS)
+        if asynchronous:
+            options["connect_args"] = {"server_settings": {"statement_timeout": timeout}}
+        else:
+            options["connect_args"] = {"options": f"-c statement_timeout={timeout}"}
+    
+    return options
+
+def register_pool_metrics(label: str, engine_ref) -> None:
+    """Met à jour l'occupation du pool à chaque emprunt / restitution (événements du pool)"""
+    pool = engine_ref.pool
+    if not isinstance(pool, QueuePool):
+        return
+    
+    in_use = DB_POOL_IN_USE.labels(pool=label)
+    overflow = DB_POOL_OVERFLOW.labels(pool=label)
+    overflow_checkouts = DB_POOL_OVERFLOW_CHECKOUTS.labels(pool=label)
+    
+    def _on_checkout(dbapi_connection, connection_record, connection_proxy):
+        # `engine.pool` et non `pool` : dispose() recrée le pool (les écouteurs suivent)
+        current = engine_ref.pool
+        checked_out = current.checkedout()
+        if checked_out > current.size():
+            overflow_checkouts.inc()
+        in_use.set(checked_out)
+        overflow.set(max(0, current.overflow()))
+    
+    def _on_checkin(dbapi_connection, connection_record):
+        # Émis avant la remise en file : la connexion compte encore parmi les empruntées,
+        # et elle sera fermée (débordement) si la file est déjà pleine
+        current = engine_ref.pool
+        in_use.set(max(0, current.checkedout() - 1))
+        closing = 1 if current.checkedin() >= current.size() else 0
+        overflow.set(max(0, current.overflow() - closing))
+    
+    event.listen(pool, "checkout", _on_checkout)
+    event.listen(pool, "checkin", _on_checkin)
+
+def get_pool_status() -> dict:
+    """État des pools de connexions (health check, diagnostic)"""
+    status = {}
+    for label, pool in (("sync", engine.pool), ("async", async_engine.pool)):
+        if isinstance(pool, QueuePool):
+            status[label] = {
+                "size": pool.size(),
+                "checked_out": pool.checkedout(),
+                "overflow": max(0, pool.overflow()),
+                # Pools instrumentés : configurés depuis les réglages (pool par défaut sinon)
+                "max_overflow": settings.DB_MAX_OVERFLOW if isinstance(pool, _PoolMetricsMixin) else None
+            }
+        else:
+            status[label] = {"pool": type(pool).__name__}
+    return status
+
+ASYNC_DATABASE_URL = settings.ASYNC_DATABASE_URL or get_async_database_url(settings.DATABASE_URL)
 
 # Création de l'engine de base de données
-engine = create_engine(settings.DATABASE_URL)
+engine = create_engine(settings.DATABASE_URL, **get_engine_options(settings.DATABASE_URL))
 SessionLocal = sessionmaker(autocommit=False, autoflush=False, bind=engine)
 
+# Engine asynchrone pour les handlers FastAPI (asyncpg / aiosqlite)
+async_engine = create_async_engine(
+    ASYNC_DATABASE_URL,
+    **get_engine_options(ASYNC_DATABASE_URL, asynchronous=True)
+)
+AsyncSessionLocal = async_sessionmaker(
+    bind=async_engine,
+    class_=AsyncSession,
+    autoflush=False,
+    expire_on_commit=False
+)
+
+register_pool_metrics("sync", engine)
+register_pool_metrics("async", async_engine)
+
 # Base pour les modèles
 Base = declarative_base()
 
@@ -32,7 +161,7 @@ class User(Base):
     updated_at = Column(DateTime(timezone=True), onupdate=func.now())
     
     # Relations
-    exams = relationship("Exam", back_populates="student")
+    exams = relationship("Exam", back_populates="student", foreign_keys="Exam.student_id")
     sessions = relationship("ExamSession", back_populates="student")
 
 class Exam(Base):
@@ -53,12 +182,17 @@ class Exam(Base):
     created_at = Column(DateTime(timezone=True), server_default=func.now())
     
     # Relations
-    student = relationship("User", back_populates="exams")
+    student = relationship("User", back_populates="exams", foreign_keys=[student_id])
     sessions = relationship("ExamSession", back_populates="exam")
 
 class ExamSession(Base):
     """Modèle de session d'examen"""
     __tablename__ = "exam_sessions"
+    __table_args__ = (
+        # Tableaux de bord : sessions d'un étudiant / d'un examen par statut
+        Index("ix_exam_sessions_student_id_status", "student_id", "status"),
+        Index("ix_exam_sessions_exam_id_status", "exam_id", "status"),
+    )
     
     id = Column(Integer, primary_key=True, index=True)
     exam_id = Column(Integer, ForeignKey("exams.id"))
@@ -78,6 +212,10 @@ class ExamSession(Base):
 class SecurityAlert(Base):
     """Modèle d'alerte de sécurité"""
     __tablename__ = "security_alerts"
+    __table_args__ = (
+        # Alertes d'une session triées par date
+        Index("ix_security_alerts_session_id_timestamp", "session_id", "timestamp"),
+    )
     
     id = Column(Integer, primary_key=True, index=True)
     session_id = Column(Integer, ForeignKey("exam_sessions.id"))
@@ -86,10 +224,24 @@ class SecurityAlert(Base):
     description = Column(Text)
     timestamp = Column(DateTime(timezone=True), server_default=func.now())
     is_resolved = Column(Boolean, default=False)
+    evidence_hash = Column(String(64))  # SHA-256 de l'image de preuve (stockage des preuves)
     
     # Relations
     session = relationship("ExamSession", back_populates="alerts")
 
+# Répertoire contenant alembic.ini
+BACKEND_DIR = os.path.dirname(os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+def upgrade_database(revision: str = "head") -> None:
+    """Applique les migrations Alembic (équivalent de `alembic upgrade head`)"""
+    from alembic import command
+    from alembic.config import Config
+    
+    config = Config(os.path.join(BACKEND_DIR, "alembic.ini"))
+    config.set_main_option("script_location", os.path.join(BACKEND_DIR, "alembic"))
+    config.attributes["configure_logger"] = False
+    command.upgrade(config, revision)
+
 # Fonction pour obtenir la session de base de données
 def get_db():
     db = SessionLocal()
@@ -97,3 +249,8 @@ def get_db():
         yield db
     finally:
         db.close()
+
+# Fonction pour obtenir une session asynchrone (handlers async def)
+async def get_async_db():
+    async with AsyncSessionLocal() as db:
+        yield db
@@ -0,0 +1,71 @@
+"""
+Hachage des mots de passe ProctoFlex AI
+Contexte bcrypt partagé et hachage en masse dans un pool de processus
+
+Ce module n'importe ni la configuration ni la base de données : les processus
+du pool (démarrés en mode spawn) n'ont que passlib à charger.
+"""
+
+import asyncio
+import math
+import multiprocessing
+from concurrent.futures import ProcessPoolExecutor
+from typing import List, Optional
+
+from passlib.context import CryptContext
+
+# Configuration du hachage des mots de passe
+pwd_context = CryptContext(schemes=["bcrypt"], deprecated="auto")
+
+_process_pool: Optional[ProcessPoolExecutor] = None
+
+
+def hash_password_chunk(passwords: List[str]) -> List[str]:
+    """Hache une liste de mots de passe (exécuté dans un processus du pool)"""
+    return [pwd_context.hash(password) for password in passwords]
+
+
+def _get_process_pool(processes: int) -> ProcessPoolExecutor:
+    """Crée le pool de processus à la première utilisation"""
+    global _process_pool
+    if _process_pool is None:
+        # spawn : pas de fork d'un worker qui a déjà des threads et des connexions ouvertes
+        _process_pool = ProcessPoolExecutor(
+            max_workers=processes,
+            mp_context=multiprocessing.get_context("spawn")
+        )
+    return _process_pool
+
+
+async def hash_passwords(passwords: List[str], processes: int) -> List[str]:
+    """
+    Hache un lot de mots de passe en parallèle
+
+    Args:
+        passwords: Mots de passe en clair
+        processes: Nombre de processus du pool
+
+    Returns:
+        Hashes, dans l'ordre des mots de passe
+    """
+    if not passwords:
+        return []
+
+    # Quelques morceaux par processus pour équilibrer la charge
+    chunk_size = max(1, math.ceil(len(passwords) / (processes * 4)))
+    chunks = [passwords[i:i + chunk_size] for i in range(0, len(passwords), chunk_size)]
+
+    pool = _get_process_pool(processes)
+    loop = asyncio.get_running_loop()
+    results = await asyncio.gather(*[
+        loop.run_in_executor(pool, hash_password_chunk, chunk) for chunk in chunks
+    ])
+    return [hashed for chunk in results for hashed in chunk]
+
+
+def shutdown_process_pool() -> None:
+    """Arrête le pool de processus (hook lifespan)"""
+    global _process_pool
+    if _process_pool is not None:
+        _process_pool.shutdown(cancel_futures=True)
+        _process_pool = None
@@ -0,0 +1,276 @@
+"""
+Métriques Prometheus ProctoFlex AI
+Les métriques sont des no-op si ENABLE_METRICS est désactivé ou si
+prometheus-client n'est pas installé
+"""
+
+import functools
+import logging
+import os
+import time
+from contextlib import nullcontext
+
+from app.core.config import settings
+
+logger = logging.getLogger(__name__)
+
+try:
+    from prometheus_client import CONTENT_TYPE_LATEST, REGISTRY, CollectorRegistry, Counter, Gauge, Histogram, generate_latest
+    PROMETHEUS_AVAILABLE = True
+except ImportError:
+    PROMETHEUS_AVAILABLE = False
+    logger.info("prometheus-client non installé, métriques désactivées")
+
+METRICS_ENABLED = settings.ENABLE_METRICS and PROMETHEUS_AVAILABLE
+
+
+class _NoopMetric:
+    """Métrique inactive : toutes les opérations sont ignorées"""
+
+    def labels(self, *args, **kwargs):
+        return self
+
+    def inc(self, amount: float = 1) -> None:
+        pass
+
+    def dec(self, amount: float = 1) -> None:
+        pass
+
+    def set(self, value: float) -> None:
+        pass
+
+    def set_function(self, function) -> None:
+        pass
+
+    def observe(self, value: float) -> None:
+        pass
+
+
+_NOOP = _NoopMetric()
+
+
+def counter(name: str, documentation: str, labelnames=()):
+    """Crée un compteur (ou une métrique inactive)"""
+    return Counter(name, documentation, labelnames) if METRICS_ENABLED else _NOOP
+
+
+def gauge(name: str, documentation: str, labelnames=(), multiprocess_mode: str = "liveall"):
+    """
+    Crée une jauge (ou une métrique inactive)
+
+    Les jauges de l'application décrivent l'état d'un worker (son pool de connexions,
+    ses analyses en cours, sa boucle d'événements...) : avec PROMETHEUS_MULTIPROC_DIR,
+    le mode "liveall" les exporte par worker (label pid), et celles d'un worker arrêté
+    disparaissent quand le lanceur le déclare mort (serve.py).
+    """
+    return Gauge(name, documentation, labelnames, multiprocess_mode=multiprocess_mode) if METRICS_ENABLED else _NOOP
+
+
+def histogram(name: str, documentation: str, labelnames=(), buckets=None):
+    """Crée un histogramme (ou une métrique inactive)"""
+    if not METRICS_ENABLED:
+        return _NOOP
+    return Histogram(name, documentation, labelnames, buckets=buckets or Histogram.DEFAULT_BUCKETS)
+
+
+class _Timer:
+    """Mesure la durée d'un bloc et l'enregistre dans un histogramme"""
+
+    __slots__ = ("_metric", "_start")
+
+    def __init__(self, metric):
+        self._metric = metric
+
+    def __enter__(self):
+        self._start = time.perf_counter()
+        return self
+
+    def __exit__(self, *exc) -> bool:
+        self._metric.observe(time.perf_counter() - self._start)
+        return False
+
+
+# Contexte inactif partagé : aucune allocation ni horloge lorsque les métriques sont désactivées
+_NOOP_TIMER = nullcontext()
+
+
+def timed(metric, *labelvalues):
+    """
+    Contexte mesurant la durée d'un bloc
+
+    Args:
+        metric: Histogramme cible
+        labelvalues: Valeurs des labels, dans l'ordre de déclaration
+
+    Returns:
+        Contexte de mesure (inactif si les métriques sont désactivées)
+    """
+    if not METRICS_ENABLED:
+        return _NOOP_TIMER
+    return _Timer(metric.labels(*labelvalues) if labelvalues else metric)
+
+
+def timed_function(metric, *labelvalues):
+    """
+    Décorateur mesurant la durée de chaque appel de la fonction
+
+    Les labels sont résolus une seule fois ; si les métriques sont désactivées
+    la fonction est renvoyée telle quelle (aucun surcoût par appel).
+    """
+    def decorator(function):
+        if not METRICS_ENABLED:
+            return function
+        child = metric.labels(*labelvalues) if labelvalues else metric
+
+        @functools.wraps(function)
+        def wrapper(*args, **kwargs):
+            start = time.perf_counter()
+            try:
+                return function(*args, **kwargs)
+            finally:
+                child.observe(time.perf_counter() - start)
+        return wrapper
+    return decorator
+
+
+def render_latest():
+    """
+    Exposition texte des métriques
+
+    Avec PROMETHEUS_MULTIPROC_DIR (plusieurs workers), les valeurs de tous les
+    processus sont agrégées ; sinon le registre du processus courant est exporté.
+
+    Returns:
+        (contenu, type de contenu)
+    """
+    if os.environ.get("PROMETHEUS_MULTIPROC_DIR"):
+        from prometheus_client import multiprocess
+        registry = CollectorRegistry()
+        multiprocess.MultiProcessCollector(registry)
+    else:
+        registry = REGISTRY
+    return generate_latest(registry), CONTENT_TYPE_LATEST
+
+
+def _route_template(scope) -> str:
+    """Gabarit de la route : chemin dont les paramètres sont remplacés par leur nom"""
+    if scope.get("route") is None:
+        return "unmatched"
+    path = scope["path"]
+    path_params = scope.get("path_params")
+    if not path_params:
+        return path
+    names = {str(value): "{%s}" % name for name, value in path_params.items()}
+    return "/".join(names.get(segment, segment) for segment in path.split("/"))
+
+
+class HttpMetricsMiddleware:
+    """
+    Middleware ASGI : durée des requêtes HTTP par méthode, route et statut
+
+    La route est le gabarit FastAPI (/api/v1/surveillance/session/{session_id}),
+    jamais le chemin brut, pour borner la cardinalité des labels.
+    """
+
+    def __init__(self, app):
+        self.app = app
+
+    async def __call__(self, scope, receive, send):
+        if not METRICS_ENABLED or scope["type"] != "http":
+            await self.app(scope, receive, send)
+            return
+
+        status = 500
+
+        async def tracking_send(message):
+            nonlocal status
+            if message["type"] == "http.response.start":
+                status = message["status"]
+            await send(message)
+
+        start = time.perf_counter()
+        try:
+            await self.app(scope, receive, tracking_send)
+        finally:
+            HTTP_REQUEST_SECONDS.labels(
+                scope["method"],
+                _route_template(scope),
+                str(status)
+            ).observe(time.perf_counter() - start)
+
+
+# Pool de connexions à la base de données
+DB_POOL_CHECKOUT_SECONDS = histogram(
+    "proctoflex_db_pool_checkout_seconds",
+    "Temps d'attente pour obtenir une connexion du pool",
+    ["pool"],
+    buckets=(0.0005, 0.001, 0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1.0, 2.5, 5.0, 10.0, 30.0)
+)
+DB_POOL_IN_USE = gauge(
+    "proctoflex_db_pool_connections_in_use",
+    "Connexions actuellement empruntées au pool",
+    ["pool"]
+)
+DB_POOL_OVERFLOW = gauge(
+    "proctoflex_db_pool_overflow",
+    "Connexions ouvertes au-delà de la taille du pool",
+    ["pool"]
+)
+DB_POOL_OVERFLOW_CHECKOUTS = counter(
+    "proctoflex_db_pool_overflow_checkouts_total",
+    "Emprunts de connexion servis par le débordement du pool",
+    ["pool"]
+)
+DB_POOL_TIMEOUTS = counter(
+    "proctoflex_db_pool_timeouts_total",
+    "Emprunts de connexion abandonnés après DB_POOL_TIMEOUT",
+    ["pool"]
+)
+
+# Caches en mémoire
+CACHE_REQUESTS = counter(
+    "proctoflex_cache_requests_total",
+    "Lectures des caches en mémoire (hit / miss)",
+    ["cache", "result"]
+)
+
+# Hachage des mots de passe (bcrypt)
+PASSWORD_HASH_QUEUE_SECONDS = histogram(
+    "proctoflex_password_hash_queue_seconds",
+    "Attente avant l'exécution d'un hachage ou d'une vérification de mot de passe",
+    buckets=(0.001, 0.01, 0.05, 0.1, 0.25, 0.5, 1.0, 2.5, 5.0, 10.0, 30.0)
+)
+PASSWORD_HASH_SECONDS = histogram(
+    "proctoflex_password_hash_seconds",
+    "Durée d'un hachage ou d'une vérification de mot de passe",
+    ["operation"],
+    buckets=(0.05, 0.1, 0.2, 0.3, 0.5, 1.0, 2.0)
+)
+PASSWORD_HASH_REJECTED = counter(
+    "proctoflex_password_hash_rejected_total",
+    "Requêtes refusées car la file de hachage est pleine"
+)
+
+# Requêtes HTTP
+HTTP_REQUEST_SECONDS = histogram(
+    "proctoflex_http_request_seconds",
+    "Durée de traitement des requêtes HTTP",
+    ["method", "route", "status"],
+    buckets=(0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1.0, 2.5, 5.0, 10.0, 30.0)
+)
+
+# Étapes des traitements IA (décodage, détection, encodage...) par moteur
+AI_STAGE_SECONDS = histogram(
+    "proctoflex_ai_stage_seconds",
+    "Durée des étapes des traitements IA",
+    ["service", "stage", "backend"],
+    buckets=(0.0005, 0.001, 0.0025, 0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1.0, 2.5, 5.0, 10.0)
+)
+
+# Étapes de l'analyse de surveillance combinée (/ai/surveillance-analysis)
+AI_PIPELINE_SECONDS = histogram(
+    "proctoflex_ai_pipeline_seconds",
+    "Durée des étapes de l'analyse de surveillance combinée",
+    ["step"],
+    buckets=(0.001, 0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1.0, 2.5, 5.0, 10.0, 30.0)
+)
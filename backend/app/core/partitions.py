@@ -0,0 +1,42 @@
+"""
+Partitions temporelles de security_alerts ProctoFlex AI
+Grille commune à la migration 0003 et au job de rétention
+
+Ce module n'importe que la configuration : la migration l'utilise sans charger
+le reste de l'application.
+"""
+
+from datetime import date, datetime, timedelta, timezone
+
+from app.core.config import settings
+
+# Origine de la grille (un lundi) : partitions hebdomadaires alignées sur la semaine
+PARTITION_EPOCH = date(2024, 1, 1)
+
+
+def partition_interval_days() -> int:
+    """Durée d'une partition (ALERT_PARTITION_INTERVAL_DAYS), validée"""
+    days = settings.ALERT_PARTITION_INTERVAL_DAYS
+    if days < 1:
+        raise ValueError(f"ALERT_PARTITION_INTERVAL_DAYS doit être >= 1 (reçu : {days})")
+    return days
+
+
+def partition_start(day: date, days: int) -> date:
+    """Début de la partition de la grille contenant le jour donné"""
+    return day - timedelta(days=(day - PARTITION_EPOCH).days % days)
+
+
+def next_partition_bound(day: date, days: int) -> date:
+    """Première borne de la grille strictement après le jour donné"""
+    return partition_start(day, days) + timedelta(days=days)
+
+
+def partition_name(start: date) -> str:
+    """Nom de la partition commençant au jour donné"""
+    return f"security_alerts_p{start:%Y%m%d}"
+
+
+def partition_bound(day: date) -> str:
+    """Borne de partition : minuit UTC du jour donné (indépendante du fuseau de la session)"""
+    return datetime(day.year, day.month, day.day, tzinfo=timezone.utc).isoformat()
@@ -3,23 +3,41 @@ Module de sécurité ProctoFlex AI
 Gestion de l'authentification et des autorisations
 """
 
+import asyncio
+import hashlib
+import time
+from concurrent.futures import ThreadPoolExecutor
 from datetime import datetime, timedelta
 from typing import Optional, Union
 from jose import JWTError, jwt
-from passlib.context import CryptContext
 from fastapi import Depends, HTTPException, status
 from fastapi.security import HTTPBearer, HTTPAuthorizationCredentials
-from sqlalchemy.orm import Session
+from sqlalchemy import case, or_, select
+from sqlalchemy.ext.asyncio import AsyncSession
 
+from app.core.cache import TTLCache, cache_bus
 from app.core.config import settings
-from app.core.database import get_db, User
-
-# Configuration du hachage des mots de passe
-pwd_context = CryptContext(schemes=["bcrypt"], deprecated="auto")
+from app.core.database import get_async_db, User
+from app.core.hashing import pwd_context
+from app.core.metrics import PASSWORD_HASH_QUEUE_SECONDS, PASSWORD_HASH_REJECTED, PASSWORD_HASH_SECONDS
 
 # Configuration du token bearer
 security = HTTPBearer()
 
+# Utilisateurs authentifiés (objets détachés, clé : sujet du token)
+user_principal_cache = cache_bus.register(TTLCache(
+    "user_principals",
+    maxsize=settings.USER_CACHE_MAX_ENTRIES,
+    ttl=settings.USER_CACHE_TTL_SECONDS
+))
+
+# Revendications des tokens déjà vérifiés (clé : empreinte du token, jusqu'à `exp`)
+token_claims_cache = TTLCache(
+    "token_claims",
+    maxsize=settings.TOKEN_CACHE_MAX_ENTRIES,
+    ttl=settings.ACCESS_TOKEN_EXPIRE_MINUTES * 60
+)
+
 def verify_password(plain_password: str, hashed_password: str) -> bool:
     """Vérifie si le mot de passe en clair correspond au hash"""
     return pwd_context.verify(plain_password, hashed_password)
@@ -28,6 +46,48 @@ def get_password_hash(password: str) -> str:
     """Génère un hash du mot de passe"""
     return pwd_context.hash(password)
 
+# bcrypt libère le GIL : un pool de threads dédié suffit à paralléliser les hachages
+_hashing_executor = ThreadPoolExecutor(
+    max_workers=settings.PASSWORD_HASH_WORKERS,
+    thread_name_prefix="password-hash"
+)
+_hashing_slots = asyncio.Semaphore(settings.PASSWORD_HASH_WORKERS)
+_hashing_waiting = 0
+
+async def _run_hashing(operation: str, function, *args):
+    """Exécute une opération bcrypt dans le pool dédié (concurrence bornée)"""
+    global _hashing_waiting
+    if _hashing_waiting >= settings.PASSWORD_HASH_MAX_QUEUE:
+        PASSWORD_HASH_REJECTED.inc()
+        raise HTTPException(
+            status_code=status.HTTP_503_SERVICE_UNAVAILABLE,
+            detail="Serveur d'authentification surchargé, veuillez réessayer",
+            headers={"Retry-After": "1"},
+        )
+    
+    queued = time.perf_counter()
+    _hashing_waiting += 1
+    try:
+        await _hashing_slots.acquire()
+    finally:
+        _hashing_waiting -= 1
+    try:
+        started = time.perf_counter()
+        PASSWORD_HASH_QUEUE_SECONDS.observe(started - queued)
+        result = await asyncio.get_running_loop().run_in_executor(_hashing_executor, function, *args)
+        PASSWORD_HASH_SECONDS.labels(operation).observe(time.perf_counter() - started)
+        return result
+    finally:
+        _hashing_slots.release()
+
+async def verify_password_async(plain_password: str, hashed_password: str) -> bool:
+    """Vérifie un mot de passe sans bloquer la boucle d'événements"""
+    return await _run_hashing("verify", verify_password, plain_password, hashed_password)
+
+async def get_password_hash_async(password: str) -> str:
+    """Hache un mot de passe sans bloquer la boucle d'événements"""
+    return await _run_hashing("hash", get_password_hash, password)
+
 def create_access_token(data: dict, expires_delta: Optional[timedelta] = None) -> str:
     """Crée un token d'accès JWT"""
     to_encode = data.copy()
@@ -48,9 +108,31 @@ def verify_token(token: str) -> Optional[dict]:
     except JWTError:
         return None
 
+def verify_token_cached(token: str) -> Optional[dict]:
+    """Vérifie un token JWT en réutilisant le résultat jusqu'à son expiration"""
+    key = hashlib.sha256(token.encode()).digest()
+    payload = token_claims_cache.get(key)
+    if payload is not None:
+        # Le TTL est calé sur `exp` mais l'horloge du cache est monotone : on revérifie
+        if payload.get("exp") is None or payload["exp"] > time.time():
+            return payload
+        token_claims_cache.invalidate(key)
+
+    payload = verify_token(token)
+    if payload is not None:
+        exp = payload.get("exp")
+        ttl = None if exp is None else exp - time.time()
+        if ttl is None or ttl > 0:
+            token_claims_cache.set(key, payload, ttl=ttl)
+    return payload
+
+async def invalidate_user_principal(username: str) -> None:
+    """Retire un utilisateur du cache (tous les workers)"""
+    await cache_bus.invalidate(user_principal_cache, username)
+
 async def get_current_user(
     credentials: HTTPAuthorizationCredentials = Depends(security),
-    db: Session = Depends(get_db)
+    db: AsyncSession = Depends(get_async_db)
 ) -> User:
     """Récupère l'utilisateur actuel à partir du token JWT"""
     credentials_exception = HTTPException(
@@ -61,7 +143,7 @@ async def get_current_user(
     
     try:
         token = credentials.credentials
-        payload = verify_token(token)
+        payload = verify_token_cached(token)
         if payload is None:
             raise credentials_exception
         
@@ -72,10 +154,18 @@ async def get_current_user(
     except JWTError:
         raise credentials_exception
     
-    user = db.query(User).filter(User.username == username).first()
+    user = user_principal_cache.get(username)
+    if user is not None:
+        return user
+    
+    result = await db.execute(select(User).where(User.username == username))
+    user = result.scalars().first()
     if user is None:
         raise credentials_exception
     
+    # Détaché de la session de la requête : partagé en lecture seule entre requêtes
+    db.expunge(user)
+    user_principal_cache.set(username, user)
     return user
 
 async def get_current_active_user(current_user: User = Depends(get_current_user)) -> User:
@@ -84,35 +174,40 @@ async def get_current_active_user(current_user: User = Depends(get_current_user)
         raise HTTPException(status_code=400, detail="Utilisateur inactif")
     return current_user
 
-def authenticate_user(db: Session, username: str, password: str) -> Optional[User]:
+async def authenticate_user(db: AsyncSession, username: str, password: str) -> Optional[User]:
     """Authentifie un utilisateur avec nom d'utilisateur et mot de passe"""
-    user = db.query(User).filter(User.username == username).first()
+    result = await db.execute(select(User).where(User.username == username))
+    user = result.scalars().first()
     if not user:
         return None
-    if not verify_password(password, user.hashed_password):
+    if not await verify_password_async(password, user.hashed_password):
         return None
     return user
 
-def authenticate_user_by_email(db: Session, email: str, password: str) -> Optional[User]:
+async def authenticate_user_by_email(db: AsyncSession, email: str, password: str) -> Optional[User]:
     """Authentifie un utilisateur avec email et mot de passe"""
-    user = db.query(User).filter(User.email == email).first()
+    result = await db.execute(select(User).where(User.email == email))
+    user = result.scalars().first()
     if not user:
         return None
-    if not verify_password(password, user.hashed_password):
+    if not await verify_password_async(password, user.hashed_password):
         return None
     return user
 
-def authenticate_user_by_email_or_username(db: Session, identifier: str, password: str) -> Optional[User]:
+async def authenticate_user_by_email_or_username(db: AsyncSession, identifier: str, password: str) -> Optional[User]:
     """Authentifie un utilisateur avec email ou nom d'utilisateur et mot de passe"""
-    # Essayer d'abord par email
-    user = db.query(User).filter(User.email == identifier).first()
-    if not user:
-        # Si pas trouvé par email, essayer par username
-        user = db.query(User).filter(User.username == identifier).first()
+    # Une seule requête ; l'email est prioritaire si les deux correspondent
+    result = await db.execute(
+        select(User)
+        .where(or_(User.email == identifier, User.username == identifier))
+        .order_by(case((User.email == identifier, 0), else_=1))
+        .limit(1)
+    )
+    user = result.scalars().first()
     
     if not user:
         return None
-    if not verify_password(password, user.hashed_password):
+    if not await verify_password_async(password, user.hashed_password):
         return None
     return user
 
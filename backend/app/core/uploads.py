@@ -0,0 +1,360 @@
+"""
+Lecture en flux des corps de requête ProctoFlex AI
+Limites de taille appliquées au fil de l'eau, mise en tampon sur disque et
+décodage base64 incrémental (clients JSON historiques)
+"""
+
+import binascii
+import json
+import logging
+import tempfile
+from typing import Dict, Iterable, Optional, Tuple
+
+from fastapi import HTTPException, Request
+
+from app.core.config import settings
+
+logger = logging.getLogger(__name__)
+
+# Caractères ignorés dans le base64 (retours à la ligne MIME)
+BASE64_WHITESPACE = b" \t\r\n"
+
+# Préfixe data URL maximal accepté avant la virgule ("data:image/jpeg;base64,")
+DATA_URL_MAX_PREFIX = 256
+
+
+def _too_large(limit: int) -> HTTPException:
+    return HTTPException(status_code=413, detail=f"Corps de requête trop volumineux (maximum {limit} octets)")
+
+
+def _check_content_length(request: Request, limit: int) -> None:
+    """Refuse immédiatement une requête dont Content-Length dépasse la limite"""
+    content_length = request.headers.get("content-length")
+    if content_length and content_length.isdigit() and int(content_length) > limit:
+        raise _too_large(limit)
+
+
+async def read_body(request: Request, max_bytes: int) -> bytes:
+    """
+    Lit le corps d'une requête en refusant tout dépassement dès qu'il survient
+
+    Args:
+        request: Requête entrante
+        max_bytes: Taille maximale acceptée
+
+    Returns:
+        Corps de la requête
+    """
+    _check_content_length(request, max_bytes)
+    body = bytearray()
+    async for chunk in request.stream():
+        if len(body) + len(chunk) > max_bytes:
+            raise _too_large(max_bytes)
+        body += chunk
+    return bytes(body)
+
+
+async def spool_body(request: Request, max_bytes: int) -> tempfile.SpooledTemporaryFile:
+    """
+    Copie le corps d'une requête dans un fichier temporaire (mémoire puis disque)
+
+    Au-delà de UPLOAD_SPOOL_MEMORY_BYTES les données sont écrites sur disque :
+    la mémoire consommée par requête reste bornée quelle que soit la taille.
+
+    Returns:
+        Fichier positionné au début (à fermer par l'appelant)
+    """
+    _check_content_length(request, max_bytes)
+    spool = tempfile.SpooledTemporaryFile(max_size=settings.UPLOAD_SPOOL_MEMORY_BYTES)
+    received = 0
+    try:
+        async for chunk in request.stream():
+            received += len(chunk)
+            if received > max_bytes:
+                raise _too_large(max_bytes)
+            spool.write(chunk)
+    except BaseException:
+        spool.close()
+        raise
+    spool.seek(0)
+    return spool
+
+
+class Base64StreamDecoder:
+    """
+    Décodeur base64 incrémental
+
+    Accepte un préfixe data URL et des retours à la ligne ; les octets d'un
+    groupe de 4 incomplet sont conservés jusqu'au morceau suivant.
+    """
+
+    def __init__(self):
+        self._pending = b""
+        self._prefix_checked = False
+
+    def feed(self, data: bytes) -> bytes:
+        """Décode un morceau ; renvoie les octets décodés disponibles"""
+        data = self._pending + data.translate(None, BASE64_WHITESPACE)
+
+        if not self._prefix_checked:
+            if data.startswith(b"data:") or (len(data) < 5 and b"data:".startswith(data)):
+                comma = data.find(b",")
+                if comma < 0:
+                    if len(data) > DATA_URL_MAX_PREFIX:
+                        raise ValueError("Préfixe data URL invalide")
+                    self._pending = data
+                    return b""
+                data = data[comma + 1:]
+            self._prefix_checked = True
+
+        usable = len(data) - len(data) % 4
+        self._pending = data[usable:]
+        try:
+            # Mode strict : un caractère invalide ignoré décalerait les groupes suivants
+            return binascii.a2b_base64(data[:usable], strict_mode=True)
+        except binascii.Error as e:
+            raise ValueError(f"Base64 invalide: {e}") from e
+
+    def finish(self) -> bytes:
+        """Termine le décodage (erreur si des données incomplètes subsistent)"""
+        if self._pending:
+            raise ValueError("Base64 tronqué")
+        return b""
+
+
+def decode_base64(data: str, chunk_size: int = 1024 * 1024) -> bytearray:
+    """
+    Décode une chaîne base64 (data URL acceptée) par morceaux, sans copie intégrale de la chaîne
+
+    Le tampon de décodage est renvoyé tel quel (np.frombuffer, PIL et l'écriture
+    de fichiers l'acceptent) : pas de seconde copie de l'image décodée.
+    """
+    decoder = Base64StreamDecoder()
+    decoded = bytearray()
+    for start in range(0, len(data), chunk_size):
+        decoded += decoder.feed(data[start:start + chunk_size].encode("ascii"))
+    decoder.finish()
+    return decoded
+
+
+class _JsonBase64Extractor:
+    """
+    Analyse incrémentale d'un objet JSON dont certains champs de premier niveau
+    sont des chaînes base64 volumineuses
+
+    Ces champs sont décodés au fil de l'eau vers des fichiers temporaires et
+    remplacés par null dans le document restant, qui reste petit.
+    """
+
+    def __init__(self, fields: Iterable[str], metadata_limit: int):
+        self.fields = set(fields)
+        self.metadata_limit = metadata_limit
+        self.blobs: Dict[str, tempfile.SpooledTemporaryFile] = {}
+
+        self._out = bytearray()
+        self._depth = 0
+        self._in_string = False
+        self._escape = False
+        self._string = bytearray()
+        self._last_string: Optional[bytes] = None
+        self._key: Optional[str] = None
+
+        # Champ binaire en cours de décodage
+        self._decoder: Optional[Base64StreamDecoder] = None
+        self._blob: Optional[tempfile.SpooledTemporaryFile] = None
+        self._carry = b""
+
+    def feed(self, chunk: bytes) -> None:
+        """Traite un morceau du corps de la requête"""
+        position = 0
+        while position < len(chunk):
+            if self._decoder is not None:
+                position = self._feed_binary(chunk, position)
+            else:
+                position = self._feed_json(chunk, position)
+
+        if len(self._out) > self.metadata_limit:
+            raise _too_large(self.metadata_limit)
+
+    def _feed_binary(self, chunk: bytes, position: int) -> int:
+        """Décode la valeur base64 jusqu'au guillemet fermant"""
+        end = chunk.find(b'"', position)
+        segment = self._carry + chunk[position:end if end >= 0 else len(chunk)]
+        self._carry = b""
+
+        # Un échappement coupé entre deux morceaux est complété au morceau suivant
+        if end < 0 and segment.endswith(b"\\") and not segment.endswith(b"\\\\"):
+            segment, self._carry = segment[:-1], b"\\"
+
+        if b"\\" in segment:
+            # JSON peut échapper "/" ; \n et \r proviennent du base64 MIME
+            segment = segment.replace(b"\\/", b"/").replace(b"\\n", b"").replace(b"\\r", b"")
+            if b"\\" in segment:
+                raise ValueError("Échappement inattendu dans une valeur base64")
+
+        self._blob.write(self._decoder.feed(segment))
+        if end < 0:
+            return len(chunk)
+
+        self._decoder.finish()
+        self._blob.seek(0)
+        self._decoder = None
+        self._blob = None
+        return end + 1
+
+    def _feed_json(self, chunk: bytes, position: int) -> int:
+        """Recopie le JSON hors champs binaires en suivant la structure"""
+        while position < len(chunk):
+            byte = chunk[position]
+            position += 1
+
+            if self._in_string:
+                if self._escape:
+                    self._escape = False
+                elif byte == 0x5C:  # \
+                    self._escape = True
+                elif byte == 0x22:  # "
+                    self._in_string = False
+                    self._last_string = bytes(self._string)
+                    self._out.append(byte)
+                    continue
+                if self._depth == 1 and len(self._string) < 256:
+                    self._string.append(byte)
+                self._out.append(byte)
+                continue
+
+            if byte == 0x22:
+                if self._key in self.fields and self._depth == 1:
+                    # Début d'un champ binaire : décodage direct vers un fichier temporaire
+                    self._out += b"null"
+                    self._decoder = Base64StreamDecoder()
+                    self._blob = tempfile.SpooledTemporaryFile(max_size=settings.UPLOAD_SPOOL_MEMORY_BYTES)
+                    self.blobs[self._key] = self._blob
+                    self._key = None
+                    return position
+                self._in_string = True
+                self._string.clear()
+            elif byte in b"{[":
+                self._depth += 1
+            elif byte in b"}]":
+                self._depth -= 1
+            elif byte == 0x3A and self._depth == 1:  # :
+                self._key = json.loads(b'"' + (self._last_string or b"") + b'"')
+            elif byte not in BASE64_WHITESPACE:
+                self._key = None
+            self._out.append(byte)
+        return position
+
+    def result(self) -> dict:
+        """Document JSON restant (champs binaires à null)"""
+        if self._decoder is not None or self._in_string or self._depth != 0:
+            raise ValueError("JSON incomplet")
+        document = json.loads(bytes(self._out))
+        if not isinstance(document, dict):
+            raise ValueError("Un objet JSON est attendu")
+        return document
+
+    def close(self) -> None:
+        """Ferme les fichiers temporaires"""
+        for blob in self.blobs.values():
+            blob.close()
+
+
+async def read_json_with_base64_fields(
+    request: Request,
+    fields: Iterable[str],
+    max_bytes: Optional[int] = None
+) -> Tuple[dict, Dict[str, tempfile.SpooledTemporaryFile]]:
+    """
+    Lit un corps JSON en décodant à la volée les champs base64 indiqués
+
+    Args:
+        request: Requête entrante
+        fields: Champs de premier niveau contenant du base64 (data URL acceptée)
+        max_bytes: Taille maximale du corps (MAX_JSON_BODY_SIZE par défaut)
+
+    Returns:
+        (autres champs, fichiers temporaires des champs décodés)
+    """
+    max_bytes = max_bytes or settings.MAX_JSON_BODY_SIZE
+    _check_content_length(request, max_bytes)
+
+    extractor = _JsonBase64Extractor(fields, metadata_limit=settings.UPLOAD_SPOOL_MEMORY_BYTES)
+    received = 0
+    try:
+        async for chunk in request.stream():
+            received += len(chunk)
+            if received > max_bytes:
+                raise _too_large(max_bytes)
+            extractor.feed(chunk)
+        document = extractor.result()
+    except ValueError as e:
+        extractor.close()
+        raise HTTPException(status_code=400, detail=f"Corps de requête invalide: {e}")
+    except BaseException:
+        extractor.close()
+        raise
+    return document, extractor.blobs
+
+
+class RequestSizeLimitMiddleware:
+    """
+    Middleware ASGI : limite la taille des corps de requête au fil de la réception
+
+    Les corps JSON sont limités à MAX_JSON_BODY_SIZE, les autres à MAX_FILE_SIZE ;
+    un client ne peut pas faire grossir la mémoire d'un worker au-delà.
+    """
+
+    def __init__(self, app, max_body_size: Optional[int] = None, max_json_body_size: Optional[int] = None):
+        self.app = app
+        self.max_body_size = max_body_size or settings.MAX_FILE_SIZE
+        self.max_json_body_size = max_json_body_size or settings.MAX_JSON_BODY_SIZE
+
+    async def __call__(self, scope, receive, send):
+        if scope["type"] != "http":
+            await self.app(scope, receive, send)
+            return
+
+        headers = dict(scope["headers"])
+        content_type = headers.get(b"content-type", b"").split(b";")[0].strip().lower()
+        limit = self.max_json_body_size if content_type == b"application/json" else self.max_body_size
+
+        content_length = headers.get(b"content-length", b"")
+        if content_length.isdigit() and int(content_length) > limit:
+            await self._reject(send, limit)
+            return
+
+        received = 0
+        response_started = False
+
+        async def limited_receive():
+            nonlocal received
+            message = await receive()
+            if message["type"] == "http.request":
+                received += len(message.get("body", b""))
+                if received > limit:
+                    # HTTPException : relayée telle quelle par le décodage du corps de FastAPI
+                    raise _too_large(limit)
+            return message
+
+        async def tracking_send(message):
+            nonlocal response_started
+            if message["type"] == "http.response.start":
+                response_started = True
+            await send(message)
+
+        try:
+            await self.app(scope, limited_receive, tracking_send)
+        except HTTPException as e:
+            if e.status_code != 413 or response_started:
+                raise
+            await self._reject(send, limit)
+
+    async def _reject(self, send, limit: int) -> None:
+        body = json.dumps({"detail": f"Corps de requête trop volumineux (maximum {limit} octets)"}).encode()
+        await send({
+            "type": "http.response.start",
+            "status": 413,
+            "headers": [(b"content-type", b"application/json"), (b"content-length", str(len(body)).encode())],
+        })
+        await send({"type": "http.response.body", "body": body})
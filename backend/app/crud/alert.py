@@ -0,0 +1,108 @@
+"""
+Opérations CRUD pour les alertes de sécurité ProctoFlex AI
+Pagination par curseur (timestamp, id) et lecture en flux
+"""
+
+import base64
+from datetime import datetime
+from typing import AsyncIterator, List, Optional, Tuple
+
+from sqlalchemy import select, tuple_
+from sqlalchemy.ext.asyncio import AsyncSession
+
+from app.core.database import SecurityAlert
+
+# Colonnes renvoyées par l'API (évite de matérialiser des objets ORM)
+ALERT_COLUMNS = (
+    SecurityAlert.id,
+    SecurityAlert.alert_type,
+    SecurityAlert.severity,
+    SecurityAlert.description,
+    SecurityAlert.timestamp,
+    SecurityAlert.is_resolved,
+    SecurityAlert.evidence_hash,
+)
+
+def encode_cursor(timestamp: datetime, alert_id: int) -> str:
+    """Encode la position (timestamp, id) d'une alerte en curseur opaque"""
+    raw = f"{timestamp.isoformat()}|{alert_id}".encode()
+    return base64.urlsafe_b64encode(raw).decode().rstrip("=")
+
+def decode_cursor(cursor: str) -> Tuple[datetime, int]:
+    """Décode un curseur ; lève ValueError s'il est invalide"""
+    try:
+        padded = cursor + "=" * (-len(cursor) % 4)
+        timestamp, alert_id = base64.urlsafe_b64decode(padded).decode().rsplit("|", 1)
+        return datetime.fromisoformat(timestamp), int(alert_id)
+    except Exception as e:
+        raise ValueError("Curseur invalide") from e
+
+def alert_to_dict(row) -> dict:
+    """Convertit une ligne (colonnes ALERT_COLUMNS) au format de l'API"""
+    return {
+        "id": row.id,
+        "type": row.alert_type,
+        "severity": row.severity,
+        "description": row.description,
+        "timestamp": row.timestamp,
+        "resolved": row.is_resolved,
+        "evidence_hash": row.evidence_hash
+    }
+
+def _session_alerts_query(
+    session_id: int,
+    severity: Optional[List[str]] = None,
+    alert_type: Optional[List[str]] = None
+):
+    """Requête des alertes d'une session, ordonnée par (timestamp, id)"""
+    query = select(*ALERT_COLUMNS).where(SecurityAlert.session_id == session_id)
+    if severity:
+        query = query.where(SecurityAlert.severity.in_(severity))
+    if alert_type:
+        query = query.where(SecurityAlert.alert_type.in_(alert_type))
+    # Ordre servi par l'index (session_id, timestamp)
+    return query.order_by(SecurityAlert.timestamp, SecurityAlert.id)
+
+async def get_session_alerts_page(
+    db: AsyncSession,
+    session_id: int,
+    limit: int = 100,
+    cursor: Optional[str] = None,
+    severity: Optional[List[str]] = None,
+    alert_type: Optional[List[str]] = None
+) -> Tuple[List[dict], Optional[str]]:
+    """
+    Récupère une page d'alertes après le curseur donné
+
+    Returns:
+        (alertes, curseur de la page suivante ou None)
+    """
+    query = _session_alerts_query(session_id, severity, alert_type)
+    if cursor:
+        timestamp, alert_id = decode_cursor(cursor)
+        query = query.where(tuple_(SecurityAlert.timestamp, SecurityAlert.id) > tuple_(timestamp, alert_id))
+
+    # Une ligne de plus pour savoir s'il existe une page suivante
+    result = await db.execute(query.limit(limit + 1))
+    rows = result.all()
+
+    next_cursor = None
+    if len(rows) > limit:
+        rows = rows[:limit]
+        last = rows[-1]
+        next_cursor = encode_cursor(last.timestamp, last.id)
+
+    return [alert_to_dict(row) for row in rows], next_cursor
+
+async def stream_session_alerts(
+    db: AsyncSession,
+    session_id: int,
+    severity: Optional[List[str]] = None,
+    alert_type: Optional[List[str]] = None,
+    batch_size: int = 500
+) -> AsyncIterator[dict]:
+    """Parcourt toutes les alertes d'une session via un curseur côté serveur"""
+    query = _session_alerts_query(session_id, severity, alert_type).execution_options(yield_per=batch_size)
+    result = await db.stream(query)
+    async for row in result:
+        yield alert_to_dict(row)
@@ -2,26 +2,33 @@
 Opérations CRUD pour les utilisateurs ProctoFlex AI
 """
 
-from sqlalchemy.orm import Session
-from app.core.security import get_password_hash
+from typing import Dict, List, Tuple
+from sqlalchemy import insert, or_, select
+from sqlalchemy.exc import IntegrityError
+from sqlalchemy.ext.asyncio import AsyncSession
+from app.core.config import settings
+from app.core.hashing import hash_passwords
+from app.core.security import get_password_hash_async, invalidate_user_principal
 from app.core.database import User
 from app.models.auth import UserCreate
 
-def get_user_by_email(db: Session, email: str):
+async def get_user_by_email(db: AsyncSession, email: str):
     """Récupère un utilisateur par son email"""
-    return db.query(User).filter(User.email == email).first()
+    result = await db.execute(select(User).where(User.email == email))
+    return result.scalars().first()
 
-def get_user_by_username(db: Session, username: str):
+async def get_user_by_username(db: AsyncSession, username: str):
     """Récupère un utilisateur par son nom d'utilisateur"""
-    return db.query(User).filter(User.username == username).first()
+    result = await db.execute(select(User).where(User.username == username))
+    return result.scalars().first()
 
-def get_user_by_id(db: Session, user_id: int):
+async def get_user_by_id(db: AsyncSession, user_id: int):
     """Récupère un utilisateur par son ID"""
-    return db.query(User).filter(User.id == user_id).first()
+    return await db.get(User, user_id)
 
-def create_user(db: Session, user_data: UserCreate):
+async def create_user(db: AsyncSession, user_data: UserCreate):
     """Crée un nouvel utilisateur"""
-    hashed_password = get_password_hash(user_data.password)
+    hashed_password = await get_password_hash_async(user_data.password)
     db_user = User(
         email=user_data.email,
         username=user_data.username,
@@ -30,34 +37,116 @@ def create_user(db: Session, user_data: UserCreate):
         role=user_data.role
     )
     db.add(db_user)
-    db.commit()
-    db.refresh(db_user)
+    await db.commit()
+    await db.refresh(db_user)
     return db_user
 
-def update_user(db: Session, user_id: int, user_data: dict):
+async def update_user(db: AsyncSession, user_id: int, user_data: dict):
     """Met à jour un utilisateur"""
-    db_user = get_user_by_id(db, user_id)
+    db_user = await get_user_by_id(db, user_id)
     if db_user:
+        previous_username = db_user.username
         for field, value in user_data.items():
             if hasattr(db_user, field):
                 setattr(db_user, field, value)
-        db.commit()
-        db.refresh(db_user)
+        await db.commit()
+        await db.refresh(db_user)
+        await invalidate_user_principal(previous_username)
+        if db_user.username != previous_username:
+            await invalidate_user_principal(db_user.username)
     return db_user
 
-def delete_user(db: Session, user_id: int):
+async def delete_user(db: AsyncSession, user_id: int):
     """Supprime un utilisateur"""
-    db_user = get_user_by_id(db, user_id)
+    db_user = await get_user_by_id(db, user_id)
     if db_user:
-        db.delete(db_user)
-        db.commit()
+        await db.delete(db_user)
+        await db.commit()
+        await invalidate_user_principal(db_user.username)
         return True
     return False
 
-def get_users(db: Session, skip: int = 0, limit: int = 100):
+async def get_users(db: AsyncSession, skip: int = 0, limit: int = 100):
     """Récupère une liste d'utilisateurs avec pagination"""
-    return db.query(User).offset(skip).limit(limit).all()
+    result = await db.execute(select(User).offset(skip).limit(limit))
+    return result.scalars().all()
 
-def get_users_by_role(db: Session, role: str):
+async def get_users_by_role(db: AsyncSession, role: str):
     """Récupère tous les utilisateurs d'un rôle spécifique"""
-    return db.query(User).filter(User.role == role).all()
+    result = await db.execute(select(User).where(User.role == role))
+    return result.scalars().all()
+
+async def bulk_create_users(
+    db: AsyncSession,
+    rows: List[Tuple[int, UserCreate]],
+    batch_size: int = None
+) -> Tuple[int, List[Dict]]:
+    """
+    Crée des utilisateurs en masse (import de promotion)
+
+    Args:
+        db: Session de base de données
+        rows: Couples (numéro de ligne, utilisateur validé)
+        batch_size: Lignes insérées par transaction (USER_IMPORT_BATCH_SIZE par défaut)
+
+    Returns:
+        (nombre d'utilisateurs créés, erreurs par ligne)
+    """
+    batch_size = batch_size or settings.USER_IMPORT_BATCH_SIZE
+    errors = []
+    if not rows:
+        return 0, errors
+
+    # Une seule requête pour les emails / noms d'utilisateur déjà pris
+    emails = {user.email for _, user in rows}
+    usernames = {user.username for _, user in rows}
+    result = await db.execute(
+        select(User.email, User.username)
+        .where(or_(User.email.in_(emails), User.username.in_(usernames)))
+    )
+    taken_emails, taken_usernames = set(), set()
+    for email, username in result:
+        taken_emails.add(email)
+        taken_usernames.add(username)
+
+    # Les doublons internes au fichier sont détectés par les mêmes ensembles
+    accepted = []
+    for line, user in rows:
+        if user.email in taken_emails:
+            errors.append({"line": line, "email": user.email, "error": "Email déjà utilisé"})
+        elif user.username in taken_usernames:
+            errors.append({"line": line, "email": user.email, "error": "Nom d'utilisateur déjà utilisé"})
+        else:
+            taken_emails.add(user.email)
+            taken_usernames.add(user.username)
+            accepted.append((line, user))
+
+    hashes = await hash_passwords([user.password for _, user in accepted], settings.USER_IMPORT_HASH_PROCESSES)
+
+    created = 0
+    for start in range(0, len(accepted), batch_size):
+        batch = accepted[start:start + batch_size]
+        values = [
+            {
+                "email": user.email,
+                "username": user.username,
+                "full_name": user.full_name,
+                "hashed_password": hashed_password,
+                "role": user.role,
+                "is_active": True
+            }
+            for (_, user), hashed_password in zip(batch, hashes[start:start + batch_size])
+        ]
+        try:
+            await db.execute(insert(User), values)
+            await db.commit()
+            created += len(batch)
+        except IntegrityError:
+            # Conflit avec une inscription concurrente : le lot entier est rejeté
+            await db.rollback()
+            errors.extend(
+                {"line": line, "email": user.email, "error": "Conflit d'unicité lors de l'insertion du lot"}
+                for line, user in batch
+            )
+
+    return created, sorted(errors, key=lambda error: error["line"])
@@ -3,7 +3,7 @@ Modèles Pydantic pour l'authentification ProctoFlex AI
 """
 
 from pydantic import BaseModel, EmailStr
-from typing import Optional
+from typing import List, Optional
 from datetime import datetime
 
 class Token(BaseModel):
@@ -50,3 +50,16 @@ class User(UserBase):
 class UserInDB(User):
     """Modèle d'utilisateur avec mot de passe hashé (pour la base de données)"""
     hashed_password: str
+
+class UserImportError(BaseModel):
+    """Erreur d'import pour une ligne du fichier"""
+    line: int
+    email: Optional[str] = None
+    error: str
+
+class UserImportReport(BaseModel):
+    """Rapport d'import en masse des utilisateurs"""
+    total: int
+    created: int
+    failed: int
+    errors: List[UserImportError]
@@ -3,7 +3,7 @@ Modèles Pydantic pour la surveillance ProctoFlex AI
 """
 
 from pydantic import BaseModel
-from typing import Optional
+from typing import List, Optional
 from datetime import datetime
 
 class FaceVerificationRequest(BaseModel):
@@ -33,10 +33,16 @@ class SecurityAlertResponse(BaseModel):
     """Alerte de sécurité"""
     id: int
     type: str
-    severity: str
-    description: str
+    severity: Optional[str] = None
+    description: Optional[str] = None
     timestamp: datetime
-    resolved: bool
+    resolved: Optional[bool] = None
+    evidence_hash: Optional[str] = None
+
+class SecurityAlertPage(BaseModel):
+    """Page d'alertes de sécurité (pagination par curseur)"""
+    items: List[SecurityAlertResponse]
+    next_cursor: Optional[str] = None
 
 class ProcessInfo(BaseModel):
     """Informations sur un processus système"""
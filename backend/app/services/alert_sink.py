@@ -0,0 +1,227 @@
+"""
+Écriture différée des alertes de sécurité ProctoFlex AI
+Les alertes sont mises en tampon puis insérées par lots
+"""
+
+import asyncio
+import csv
+import io
+import logging
+from datetime import datetime, timezone
+from typing import Dict, List, Optional, Tuple
+
+from sqlalchemy import insert
+
+from app.core.config import settings
+from app.core.database import SessionLocal, SecurityAlert, engine
+from app.core.metrics import counter
+
+logger = logging.getLogger(__name__)
+
+# Colonnes écrites par le tampon (dans l'ordre du COPY)
+ALERT_COLUMNS = ("session_id", "alert_type", "severity", "description", "timestamp", "is_resolved", "evidence_hash")
+
+ALERTS_DROPPED = counter(
+    "proctoflex_alert_sink_dropped_total",
+    "Alertes abandonnées après un échec d'écriture (tampon plein)"
+)
+
+
+class AlertSink:
+    """
+    Tampon d'écriture des alertes de sécurité
+
+    Les alertes sont accumulées en mémoire et insérées en une seule requête
+    toutes les ALERT_SINK_FLUSH_INTERVAL_MS ou dès ALERT_SINK_BATCH_SIZE lignes.
+    En mode durable, l'appelant attend la validation du lot qui contient son alerte.
+    """
+
+    def __init__(self):
+        self.flush_interval = settings.ALERT_SINK_FLUSH_INTERVAL_MS / 1000.0
+        self.batch_size = settings.ALERT_SINK_BATCH_SIZE
+        self.max_pending = settings.ALERT_SINK_MAX_PENDING
+        self.method = settings.ALERT_SINK_METHOD
+        self.durable = settings.ALERT_SINK_DURABLE
+
+        self._pending: List[Tuple[Dict, Optional[asyncio.Future]]] = []
+        self._wakeup: Optional[asyncio.Event] = None
+        self._flush_lock: Optional[asyncio.Lock] = None
+        self._task: Optional[asyncio.Task] = None
+        self._running = False
+
+        self._stats = {"submitted": 0, "written": 0, "failed": 0, "dropped": 0, "batches": 0}
+
+    @property
+    def running(self) -> bool:
+        """Indique si la tâche d'écriture est active"""
+        return self._running
+
+    async def start(self) -> None:
+        """Démarre la tâche de vidage périodique (hook lifespan)"""
+        if self._running:
+            return
+        self._wakeup = asyncio.Event()
+        self._flush_lock = asyncio.Lock()
+        self._running = True
+        self._task = asyncio.create_task(self._run())
+        logger.info("Tampon d'alertes démarré (méthode: %s)", self.method)
+
+    async def stop(self) -> None:
+        """Arrête la tâche et vide le tampon (arrêt gracieux)"""
+        if not self._running:
+            return
+        self._running = False
+        self._wakeup.set()
+        await self._task
+        await self.flush()
+        logger.info("Tampon d'alertes arrêté (%s alertes écrites)", self._stats["written"])
+
+    async def submit(
+        self,
+        alert_type: str,
+        severity: str = "medium",
+        description: Optional[str] = None,
+        session_id: Optional[int] = None,
+        durable: Optional[bool] = None,
+        evidence_hash: Optional[str] = None
+    ) -> None:
+        """
+        Ajoute une alerte au tampon
+
+        Args:
+            alert_type: Type d'alerte (face_detection, audio, screen, gaze...)
+            severity: Sévérité (low, medium, high, critical)
+            description: Description de l'alerte
+            session_id: Session d'examen concernée
+            durable: Attendre la validation en base (ALERT_SINK_DURABLE par défaut)
+            evidence_hash: Référence de l'image de preuve (stockage des preuves)
+        """
+        row = {
+            "session_id": session_id,
+            "alert_type": alert_type,
+            "severity": severity,
+            "description": description,
+            # Horodatage de l'événement, pas de l'insertion différée
+            "timestamp": datetime.now(timezone.utc),
+            "is_resolved": False,
+            "evidence_hash": evidence_hash,
+        }
+        self._stats["submitted"] += 1
+
+        # Hors cycle de vie de l'application (scripts, tests) : écriture directe
+        if not self._running:
+            await asyncio.get_running_loop().run_in_executor(None, self._write_batch, [row])
+            return
+
+        durable = self.durable if durable is None else durable
+        future = asyncio.get_running_loop().create_future() if durable else None
+        self._pending.append((row, future))
+
+        if len(self._pending) >= self.max_pending:
+            # Contre-pression : l'appelant participe au vidage
+            await self.flush()
+        elif len(self._pending) >= self.batch_size:
+            self._wakeup.set()
+
+        if future is not None:
+            await future
+
+    async def flush(self) -> None:
+        """Écrit toutes les alertes en attente, par lots"""
+        if self._flush_lock is None:
+            return
+
+        async with self._flush_lock:
+            loop = asyncio.get_running_loop()
+            while self._pending:
+                batch = self._pending[:self.batch_size]
+                del self._pending[:self.batch_size]
+                rows = [row for row, _ in batch]
+
+                try:
+                    await loop.run_in_executor(None, self._write_batch, rows)
+                except Exception as e:
+                    self._stats["failed"] += len(rows)
+                    logger.error(f"Erreur lors de l'écriture de {len(rows)} alerte(s): {e}")
+                    for _, future in batch:
+                        if future is not None and not future.done():
+                            future.set_exception(e)
+                    # Les alertes non durables sont reprises au prochain cycle
+                    retry = [(row, None) for row, future in batch if future is None]
+                    kept = retry[:max(0, self.max_pending - len(self._pending))]
+                    self._pending[:0] = kept
+                    dropped = len(retry) - len(kept)
+                    if dropped:
+                        self._stats["dropped"] += dropped
+                        ALERTS_DROPPED.inc(dropped)
+                        logger.warning(f"{dropped} alerte(s) abandonnée(s) : tampon plein ({self.max_pending} en attente)")
+                    break
+
+                self._stats["written"] += len(rows)
+                self._stats["batches"] += 1
+                for _, future in batch:
+                    if future is not None and not future.done():
+                        future.set_result(None)
+
+    def stats(self) -> Dict:
+        """Statistiques du tampon"""
+        return {**self._stats, "pending": len(self._pending), "method": self.method}
+
+    async def _run(self) -> None:
+        """Boucle de vidage périodique"""
+        while self._running:
+            try:
+                await asyncio.wait_for(self._wakeup.wait(), timeout=self.flush_interval)
+            except asyncio.TimeoutError:
+                pass
+            self._wakeup.clear()
+            try:
+                await self.flush()
+            except Exception as e:
+                logger.error(f"Erreur inattendue du tampon d'alertes: {e}")
+
+    def _write_batch(self, rows: List[Dict]) -> None:
+        """Insère un lot d'alertes (exécuté dans un thread)"""
+        if self.method == "copy" and engine.dialect.name == "postgresql":
+            self._copy_batch(rows)
+            return
+
+        db = SessionLocal()
+        try:
+            # executemany côté DBAPI, une seule transaction pour le lot
+            db.execute(insert(SecurityAlert), rows)
+            db.commit()
+        except Exception:
+            db.rollback()
+            raise
+        finally:
+            db.close()
+
+    def _copy_batch(self, rows: List[Dict]) -> None:
+        """Insère un lot d'alertes via COPY (PostgreSQL / psycopg2)"""
+        buffer = io.StringIO()
+        writer = csv.writer(buffer)
+        for row in rows:
+            writer.writerow([
+                row["timestamp"].isoformat() if column == "timestamp"
+                else ("" if row[column] is None else row[column])
+                for column in ALERT_COLUMNS
+            ])
+        buffer.seek(0)
+
+        raw_connection = engine.raw_connection()
+        try:
+            cursor = raw_connection.cursor()
+            cursor.copy_expert(
+                f"COPY {SecurityAlert.__tablename__} ({', '.join(ALERT_COLUMNS)}) FROM STDIN WITH (FORMAT csv)",
+                buffer
+            )
+            raw_connection.commit()
+        except Exception:
+            raw_connection.rollback()
+            raise
+        finally:
+            raw_connection.close()
+
+# Instance globale du tampon d'alertes
+alert_sink = AlertSink()
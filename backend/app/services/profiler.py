@@ -0,0 +1,293 @@
+"""
+Profilage à la demande ProctoFlex AI
+Échantillonnage des piles (flamegraph), cProfile et croissance mémoire (tracemalloc)
+sur le worker en cours d'exécution, pour une durée bornée
+"""
+
+import asyncio
+import cProfile
+import logging
+import marshal
+import os
+import signal
+import sys
+import threading
+import tracemalloc
+from collections import Counter
+from typing import Dict, Optional
+
+from app.core.config import settings
+
+logger = logging.getLogger(__name__)
+
+BACKEND_DIR = os.path.dirname(os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+# Feuilles de pile d'un thread en attente (boucle d'événements au repos, pool de threads
+# vide, Event.wait...) : ces échantillons ne correspondent à aucun travail
+IDLE_LEAVES = {
+    ("selectors.py", "select"),
+    ("selectors.py", "EpollSelector.select"),
+    ("threading.py", "wait"),
+    ("threading.py", "Condition.wait"),
+    ("threading.py", "Event.wait"),
+    ("threading.py", "_wait_for_tstate_lock"),
+    ("threading.py", "Thread._wait_for_tstate_lock"),
+    ("queue.py", "get"),
+    ("queue.py", "Queue.get"),
+    ("thread.py", "_worker"),
+    # Thread de connexion aiosqlite en attente de la requête suivante
+    ("core.py", "_connection_worker_thread"),
+    ("core.py", "Connection._connection_worker_thread"),
+}
+
+# Fichiers exclus des différences mémoire (allocations du profilage lui-même)
+TRACEMALLOC_IGNORED = (tracemalloc.__file__, "<frozen importlib._bootstrap>", "<frozen importlib._bootstrap_external>", "<unknown>")
+
+
+def _short_path(filename: str) -> str:
+    """Chemin lisible d'un fichier source (relatif au backend ou à site-packages)"""
+    marker = "site-packages" + os.sep
+    if marker in filename:
+        return filename.split(marker, 1)[1]
+    if filename.startswith(BACKEND_DIR + os.sep):
+        return os.path.relpath(filename, BACKEND_DIR)
+    return os.path.basename(filename)
+
+
+class StackSampler:
+    """
+    Échantillonneur statistique des piles de tous les threads
+
+    Mode "thread" : un thread relève les piles toutes les `interval` secondes (temps
+    réel), y compris celles des threads exécutant du code natif sans le GIL.
+    Mode "signal" (Linux / macOS, thread principal) : SIGPROF (ITIMER_PROF) déclenche
+    un échantillon toutes les `interval` secondes de CPU consommé. Python n'exécutant
+    les gestionnaires que dans le thread principal, ce mode mesure surtout le CPU de
+    la boucle d'événements : un signal reçu pendant que la boucle attend est différé.
+    """
+
+    def __init__(self, interval: float, include_idle: bool = False, mode: str = "thread"):
+        self.interval = interval
+        self.include_idle = include_idle
+        self.mode = mode
+        self.stacks: Counter = Counter()
+        self.samples = 0
+
+        self._labels: Dict[object, str] = {}
+        self._previous_handler = None
+        self._thread: Optional[threading.Thread] = None
+        self._stop = threading.Event()
+
+    def _label(self, code) -> str:
+        """Libellé d'une fonction dans la pile (mis en cache par objet code)"""
+        label = self._labels.get(code)
+        if label is None:
+            name = getattr(code, "co_qualname", code.co_name)
+            label = f"{name} ({_short_path(code.co_filename)})".replace(";", ",")
+            self._labels[code] = label
+        return label
+
+    def _sample(self, interrupted_frame=None) -> None:
+        """Enregistre la pile courante de chaque thread"""
+        names = {thread.ident: thread.name for thread in threading.enumerate()}
+        sampler_ident = self._thread.ident if self._thread is not None else None
+        main_ident = threading.main_thread().ident
+
+        for ident, frame in sys._current_frames().items():
+            if ident == sampler_ident:
+                continue
+            if ident == main_ident and interrupted_frame is not None:
+                # Pile interrompue par le signal (sans le gestionnaire lui-même)
+                frame = interrupted_frame
+
+            if not self.include_idle:
+                leaf = frame.f_code
+                if (os.path.basename(leaf.co_filename), getattr(leaf, "co_qualname", leaf.co_name)) in IDLE_LEAVES:
+                    continue
+
+            stack = []
+            while frame is not None:
+                stack.append(self._label(frame.f_code))
+                frame = frame.f_back
+            stack.append(names.get(ident, f"thread-{ident}"))
+            self.stacks[";".join(reversed(stack))] += 1
+        self.samples += 1
+
+    def _on_signal(self, signum, frame) -> None:
+        self._sample(frame)
+
+    def _run(self) -> None:
+        while not self._stop.wait(self.interval):
+            self._sample()
+
+    def start(self) -> None:
+        """Démarre l'échantillonnage"""
+        if self.mode == "signal":
+            if not hasattr(signal, "setitimer"):
+                raise RuntimeError("SIGPROF n'est pas disponible sur cette plateforme")
+            if threading.current_thread() is not threading.main_thread():
+                raise RuntimeError("Le mode signal exige que la boucle d'événements tourne dans le thread principal")
+            self._previous_handler = signal.signal(signal.SIGPROF, self._on_signal)
+            signal.setitimer(signal.ITIMER_PROF, self.interval, self.interval)
+            return
+        self._stop.clear()
+        self._thread = threading.Thread(target=self._run, name="profiler-sampler", daemon=True)
+        self._thread.start()
+
+    def stop(self) -> None:
+        """Arrête l'échantillonnage"""
+        if self.mode == "signal":
+            signal.setitimer(signal.ITIMER_PROF, 0, 0)
+            signal.signal(signal.SIGPROF, self._previous_handler or signal.SIG_DFL)
+        elif self.mode == "thread":
+            self._stop.set()
+            self._thread.join()
+
+    def collapsed(self) -> str:
+        """Piles au format replié (flamegraph.pl, speedscope, inferno)"""
+        return "".join(f"{stack} {count}\n" for stack, count in sorted(self.stacks.items()))
+
+
+class ProfilerService:
+    """
+    Profilage à la demande du worker courant
+
+    Un seul profil à la fois par worker ; la durée est bornée par PROFILER_MAX_SECONDS.
+    Avec plusieurs workers, seul celui qui traite la requête est profilé (son PID
+    figure dans le résultat).
+    """
+
+    def __init__(self):
+        """Initialisation du service de profilage"""
+        self.enabled = settings.PROFILER_ENABLED
+        self.max_seconds = settings.PROFILER_MAX_SECONDS
+        self.sample_interval = settings.PROFILER_SAMPLE_INTERVAL_MS / 1000.0
+        self.tracemalloc_frames = settings.PROFILER_TRACEMALLOC_FRAMES
+        self._busy = False
+
+    def _acquire(self, seconds: float) -> None:
+        """Réserve le profileur (un profil à la fois)"""
+        if not 0 < seconds <= self.max_seconds:
+            raise ValueError(f"Durée de profilage comprise entre 0 et {self.max_seconds} secondes")
+        if self._busy:
+            raise RuntimeError("Un profilage est déjà en cours sur ce worker")
+        self._busy = True
+
+    async def sample_stacks(
+        self,
+        seconds: float,
+        interval: Optional[float] = None,
+        include_idle: bool = False,
+        mode: str = "thread"
+    ) -> Dict:
+        """
+        Échantillonne les piles pendant une durée donnée
+
+        Args:
+            seconds: Durée de l'échantillonnage
+            interval: Intervalle entre deux échantillons (PROFILER_SAMPLE_INTERVAL_MS par défaut)
+            include_idle: Conserve les threads en attente (boucle au repos, pool vide)
+            mode: thread (temps réel, tous les threads) ou signal (SIGPROF, temps CPU)
+
+        Returns:
+            Piles repliées, nombre d'échantillons et mode utilisé
+        """
+        self._acquire(seconds)
+        try:
+            sampler = StackSampler(interval or self.sample_interval, include_idle, mode)
+            sampler.start()
+            try:
+                await asyncio.sleep(seconds)
+            finally:
+                sampler.stop()
+            logger.info(f"Profil échantillonné ({sampler.mode}) : {sampler.samples} échantillons en {seconds} s")
+            return {
+                "pid": os.getpid(),
+                "mode": sampler.mode,
+                "samples": sampler.samples,
+                "collapsed": sampler.collapsed()
+            }
+        finally:
+            self._busy = False
+
+    async def cprofile(self, seconds: float) -> Dict:
+        """
+        Profil déterministe (cProfile) de la boucle d'événements pendant une durée donnée
+
+        Seul le thread de la boucle est profilé (code des handlers async) ; le surcoût
+        est important, la durée doit rester courte.
+
+        Returns:
+            Statistiques au format pstats (fichier .prof : snakeviz, pstats)
+        """
+        self._acquire(seconds)
+        try:
+            profile = cProfile.Profile()
+            try:
+                profile.enable()
+            except ValueError as e:
+                raise RuntimeError(f"Profileur déjà actif: {e}")
+            try:
+                await asyncio.sleep(seconds)
+            finally:
+                profile.disable()
+            profile.create_stats()
+            return {"pid": os.getpid(), "mode": "cprofile", "stats": marshal.dumps(profile.stats)}
+        finally:
+            self._busy = False
+
+    async def memory_growth(self, seconds: float, limit: int = 25, group_by: str = "lineno") -> Dict:
+        """
+        Croissance mémoire par site d'allocation pendant une durée donnée
+
+        tracemalloc est démarré pour la fenêtre (et arrêté ensuite s'il ne l'était pas) :
+        seules les allocations faites pendant la fenêtre et encore présentes à la fin
+        sont comptées.
+
+        Args:
+            seconds: Durée de la fenêtre d'observation
+            limit: Nombre de sites renvoyés
+            group_by: Regroupement tracemalloc (lineno, filename, traceback)
+
+        Returns:
+            Sites d'allocation triés par croissance décroissante
+        """
+        self._acquire(seconds)
+        started_here = not tracemalloc.is_tracing()
+        try:
+            if started_here:
+                tracemalloc.start(self.tracemalloc_frames)
+            before = await asyncio.to_thread(tracemalloc.take_snapshot)
+            await asyncio.sleep(seconds)
+            after = await asyncio.to_thread(tracemalloc.take_snapshot)
+            current, peak = tracemalloc.get_traced_memory()
+        finally:
+            if started_here:
+                tracemalloc.stop()
+            self._busy = False
+
+        filters = [tracemalloc.Filter(False, pattern) for pattern in TRACEMALLOC_IGNORED]
+        differences = after.filter_traces(filters).compare_to(before.filter_traces(filters), group_by)
+        differences.sort(key=lambda stat: stat.size_diff, reverse=True)
+
+        return {
+            "pid": os.getpid(),
+            "seconds": seconds,
+            "group_by": group_by,
+            "traced_current_bytes": current,
+            "traced_peak_bytes": peak,
+            "total_growth_bytes": sum(stat.size_diff for stat in differences),
+            "sites": [
+                {
+                    "size_diff_bytes": stat.size_diff,
+                    "size_bytes": stat.size,
+                    "count_diff": stat.count_diff,
+                    "count": stat.count,
+                    "traceback": [f"{_short_path(frame.filename)}:{frame.lineno}" for frame in stat.traceback]
+                }
+                for stat in differences[:limit]
+            ]
+        }
+
+# Instance globale du service
+profiler_service = ProfilerService()
@@ -0,0 +1,318 @@
+"""
+Disponibilité des services IA ProctoFlex AI
+Sondes périodiques en arrière-plan, latences récentes et charge par analyseur
+"""
+
+import asyncio
+import logging
+import time
+from collections import deque
+from datetime import datetime, timezone
+from typing import Callable, Deque, Dict, Optional
+
+import numpy as np
+
+from app.ai.warmup import encode_jpeg_base64, synthetic_face_frame
+from app.core.config import settings
+from app.core.metrics import gauge
+
+logger = logging.getLogger(__name__)
+
+AI_ANALYZER_READY = gauge(
+    "proctoflex_ai_analyzer_ready",
+    "Analyseur IA chargé et sondé avec succès (1) ou non (0)",
+    ["analyzer"]
+)
+AI_ANALYZER_IN_FLIGHT = gauge(
+    "proctoflex_ai_analyzer_in_flight",
+    "Analyses en cours par analyseur",
+    ["analyzer"]
+)
+EVENT_LOOP_LAG_SECONDS = gauge(
+    "proctoflex_event_loop_lag_seconds",
+    "Retard de la boucle d'événements mesuré par la tâche de disponibilité"
+)
+
+
+def synthetic_probe_image(width: int = 160, height: int = 120) -> str:
+    """Image de sonde (visage synthétique de petite taille), encodée une seule fois en base64"""
+    return encode_jpeg_base64(synthetic_face_frame(width, height))
+
+
+class _Analyzer:
+    """État d'un analyseur : sonde, latences récentes et analyses en cours"""
+
+    def __init__(
+        self,
+        name: str,
+        probe: Callable[[str], object],
+        loaded: Callable[[], Dict],
+        load: Optional[Callable[[], object]],
+        required: bool,
+        window: int
+    ):
+        self.name = name
+        self.probe = probe
+        self.loaded = loaded
+        self.load = load
+        self.required = required
+        self.in_flight = 0
+        self.probe_latencies: Deque[float] = deque(maxlen=window)
+        self.live_latencies: Deque[float] = deque(maxlen=window)
+        self.last_probe_at: Optional[float] = None
+        self.last_success_at: Optional[float] = None
+        self.last_error: Optional[str] = None
+
+
+class _Tracker:
+    """Contexte comptant une analyse en cours et mesurant sa durée"""
+
+    __slots__ = ("_analyzer", "_start")
+
+    def __init__(self, analyzer: _Analyzer):
+        self._analyzer = analyzer
+
+    def __enter__(self):
+        self._analyzer.in_flight += 1
+        AI_ANALYZER_IN_FLIGHT.labels(self._analyzer.name).inc()
+        self._start = time.perf_counter()
+        return self
+
+    def __exit__(self, *exc) -> bool:
+        self._analyzer.live_latencies.append(time.perf_counter() - self._start)
+        self._analyzer.in_flight -= 1
+        AI_ANALYZER_IN_FLIGHT.labels(self._analyzer.name).dec()
+        return False
+
+
+def _percentile_ms(values, percentile: float) -> Optional[float]:
+    if not values:
+        return None
+    return round(float(np.percentile(np.fromiter(values, float), percentile)) * 1000.0, 2)
+
+
+class ReadinessService:
+    """
+    Disponibilité du worker pour les analyses IA
+
+    Chaque analyseur est sondé périodiquement avec une image synthétique mise en
+    cache ; les endpoints de santé ne font que lire l'état obtenu (aucune inférence
+    au moment de la requête). Un worker est prêt lorsque tous les analyseurs requis
+    ont répondu à leur dernière sonde, que cette sonde est récente et que la boucle
+    d'événements n'est pas saturée.
+    """
+
+    def __init__(self):
+        """Initialisation du suivi de disponibilité"""
+        self.enabled = settings.READINESS_PROBE_ENABLED
+        self.interval = settings.READINESS_PROBE_INTERVAL_SECONDS
+        self.window = settings.READINESS_LATENCY_WINDOW
+        self.max_loop_lag = settings.READINESS_MAX_LOOP_LAG_MS / 1000.0
+        self.max_in_flight = settings.READINESS_MAX_IN_FLIGHT
+
+        self._analyzers: Dict[str, _Analyzer] = {}
+        self._probe_image: Optional[str] = None
+        self._task: Optional[asyncio.Task] = None
+        self._loop_lag = 0.0
+        self._started_at = time.time()
+        self._warmup: Optional[Dict] = None
+
+    def register(
+        self,
+        name: str,
+        probe: Callable[[str], object],
+        loaded: Optional[Callable[[], Dict]] = None,
+        required: bool = True,
+        load: Optional[Callable[[], object]] = None
+    ) -> None:
+        """
+        Déclare un analyseur
+
+        Args:
+            name: Nom de l'analyseur (face_detection, object_detection...)
+            probe: Fonction appelée avec l'image de sonde (base64)
+            loaded: État des modèles (dictionnaire, clé "loaded" obligatoire)
+            required: Un échec rend le worker non prêt (sinon : dégradé)
+            load: Construction des modèles, exécutée hors de la boucle avant la première sonde
+        """
+        self._analyzers[name] = _Analyzer(name, probe, loaded or (lambda: {"loaded": True}), load, required, self.window)
+        AI_ANALYZER_READY.labels(name).set(0)
+
+    def record_warmup(self, result: Dict) -> None:
+        """Conserve le résultat du préchauffage de démarrage (servi par report())"""
+        self._warmup = result
+
+    def track(self, name: str):
+        """Contexte à placer autour d'une analyse réelle (latence et analyses en cours)"""
+        analyzer = self._analyzers.get(name)
+        return _Tracker(analyzer) if analyzer is not None else _NOOP_TRACKER
+
+    # ------------------------------------------------------------------
+    # Cycle de vie
+    # ------------------------------------------------------------------
+
+    async def start(self) -> None:
+        """Démarre les sondes périodiques (hook lifespan)"""
+        if self.enabled and self._task is None:
+            self._task = asyncio.create_task(self._run())
+
+    async def stop(self) -> None:
+        """Arrête les sondes"""
+        if self._task is not None:
+            self._task.cancel()
+            try:
+                await self._task
+            except asyncio.CancelledError:
+                pass
+            self._task = None
+
+    async def _run(self) -> None:
+        """Boucle des sondes et de mesure du retard de la boucle d'événements"""
+        while True:
+            await self.probe_all()
+            expected = time.monotonic() + self.interval
+            await asyncio.sleep(self.interval)
+            # Le réveil tardif mesure le temps pendant lequel la boucle était occupée
+            self._loop_lag = max(0.0, time.monotonic() - expected)
+            EVENT_LOOP_LAG_SECONDS.set(self._loop_lag)
+
+    async def probe_all(self) -> None:
+        """Sonde tous les analyseurs, un par un, dans un thread (la boucle continue de servir)"""
+        if self._probe_image is None:
+            self._probe_image = synthetic_probe_image()
+        for analyzer in list(self._analyzers.values()):
+            if analyzer.load is not None and not analyzer.loaded().get("loaded"):
+                # Chargement des modèles dans un thread : la boucle continue de servir
+                try:
+                    await asyncio.to_thread(analyzer.load)
+                except Exception as e:
+                    analyzer.last_error = str(e)
+                    logger.warning(f"Chargement de {analyzer.name} en échec: {e}")
+                    continue
+            await self._probe(analyzer)
+
+    async def _probe(self, analyzer: _Analyzer) -> None:
+        started = time.perf_counter()
+        analyzer.last_probe_at = time.time()
+        try:
+            state = analyzer.loaded()
+            if not state.get("loaded"):
+                raise RuntimeError("modèle non chargé")
+            # Inférence hors de la boucle : une sonde lente ne retarde aucune requête
+            await asyncio.to_thread(analyzer.probe, self._probe_image)
+        except Exception as e:
+            analyzer.last_error = str(e)
+            AI_ANALYZER_READY.labels(analyzer.name).set(0)
+            logger.warning(f"Sonde {analyzer.name} en échec: {e}")
+            return
+        analyzer.probe_latencies.append(time.perf_counter() - started)
+        analyzer.last_success_at = analyzer.last_probe_at
+        analyzer.last_error = None
+        AI_ANALYZER_READY.labels(analyzer.name).set(1)
+
+    # ------------------------------------------------------------------
+    # État
+    # ------------------------------------------------------------------
+
+    def _analyzer_status(self, analyzer: _Analyzer, now: float) -> str:
+        if analyzer.last_success_at is None:
+            return "error" if analyzer.last_error else "cold"
+        if analyzer.last_error:
+            return "error"
+        if now - analyzer.last_success_at > 3 * self.interval:
+            return "stale"
+        if analyzer.in_flight >= self.max_in_flight:
+            return "saturated"
+        return "warm"
+
+    def report(self) -> Dict:
+        """
+        État de disponibilité du worker (lecture seule, sans inférence)
+
+        Returns:
+            Statut global, prêt ou non, et détail par analyseur
+        """
+        now = time.time()
+        analyzers = {}
+        # Sondes activées mais pas encore démarrées : worker en cours de démarrage
+        ready = not self.enabled or self._task is not None
+        degraded = False
+
+        for name, analyzer in self._analyzers.items():
+            try:
+                models = analyzer.loaded()
+            except Exception as e:
+                models = {"loaded": False, "error": str(e)}
+            if self.enabled:
+                status = self._analyzer_status(analyzer, now)
+            else:
+                # Sans sondes, les modèles sont chargés par la première requête qui les utilise
+                status = "warm" if models.get("loaded") else "lazy"
+            if status not in ("warm", "lazy"):
+                if analyzer.required:
+                    ready = False
+                else:
+                    degraded = True
+
+            analyzers[name] = {
+                "status": status,
+                "required": analyzer.required,
+                "models": models,
+                "in_flight": analyzer.in_flight,
+                "probe_latency_ms": {
+                    "last": round(analyzer.probe_latencies[-1] * 1000.0, 2) if analyzer.probe_latencies else None,
+                    "p50": _percentile_ms(analyzer.probe_latencies, 50),
+                    "p95": _percentile_ms(analyzer.probe_latencies, 95)
+                },
+                "live_latency_ms": {
+                    "p50": _percentile_ms(analyzer.live_latencies, 50),
+                    "p95": _percentile_ms(analyzer.live_latencies, 95),
+                    "samples": len(analyzer.live_latencies)
+                },
+                "last_probe_at": _isoformat(analyzer.last_probe_at),
+                "last_error": analyzer.last_error
+            }
+
+        loop_saturated = self._loop_lag > self.max_loop_lag
+        if loop_saturated:
+            ready = False
+
+        if not ready:
+            status = "unavailable"
+        elif degraded:
+            status = "degraded"
+        else:
+            status = "healthy"
+
+        return {
+            "status": status,
+            "ready": ready,
+            "event_loop_lag_ms": round(self._loop_lag * 1000.0, 2),
+            "event_loop_saturated": loop_saturated,
+            "in_flight": sum(analyzer.in_flight for analyzer in self._analyzers.values()),
+            "probe_interval_seconds": self.interval,
+            "uptime_seconds": round(now - self._started_at, 1),
+            "analyzers": analyzers,
+            "warmup": self._warmup,
+            "timestamp": _isoformat(now)
+        }
+
+
+def _isoformat(timestamp: Optional[float]) -> Optional[str]:
+    if timestamp is None:
+        return None
+    return datetime.fromtimestamp(timestamp, timezone.utc).isoformat()
+
+
+class _NoopTracker:
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *exc) -> bool:
+        return False
+
+
+_NOOP_TRACKER = _NoopTracker()
+
+# Instance globale du service
+readiness_service = ReadinessService()
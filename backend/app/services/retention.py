@@ -0,0 +1,295 @@
+"""
+Rétention des données ProctoFlex AI (RGPD)
+Suppression des alertes plus anciennes que RETENTION_DAYS et des médias des
+sessions terminées depuis plus de RETENTION_DAYS
+"""
+
+import asyncio
+import logging
+import re
+import time
+from datetime import datetime, timedelta, timezone
+from typing import Dict, List, Optional, Tuple
+
+from sqlalchemy import delete, func, select, text
+
+from app.core.config import settings
+from app.core.database import AsyncSessionLocal, ExamSession, SecurityAlert, async_engine
+from app.core.partitions import (
+    next_partition_bound,
+    partition_bound,
+    partition_interval_days,
+    partition_name,
+    partition_start
+)
+from app.storage.capture_store import screen_capture_store
+from app.storage.evidence import evidence_store
+from app.storage.recordings import recording_store
+
+logger = logging.getLogger(__name__)
+
+# Clé du verrou consultatif PostgreSQL : un seul worker exécute la rétention
+RETENTION_LOCK_KEY = 4_815_162_342
+
+PARTITION_BOUND = re.compile(r"FROM \('([^']+)'\) TO \('([^']+)'\)")
+
+
+def _parse_bound(value: str) -> datetime:
+    """Convertit une borne de partition PostgreSQL en datetime UTC"""
+    # PostgreSQL renvoie '2026-10-19 00:00:00+00' : on complète le fuseau au format ISO
+    if re.search(r"[+-]\d{2}$", value):
+        value += ":00"
+    parsed = datetime.fromisoformat(value)
+    return parsed if parsed.tzinfo else parsed.replace(tzinfo=timezone.utc)
+
+
+class RetentionService:
+    """
+    Tâche périodique de rétention
+
+    Sur PostgreSQL partitionné, les partitions entièrement expirées sont supprimées
+    (DROP TABLE, instantané) et les partitions futures créées à l'avance. Les lignes
+    restantes (partition à cheval sur la limite, SQLite) sont supprimées par lots
+    courts pour ne pas bloquer les examens en cours. Les médias sont supprimés
+    session par session, d'après la date de fin en base, par l'API de chaque
+    stockage : une session en cours n'est jamais touchée.
+    """
+
+    def __init__(self):
+        self.retention_days = settings.RETENTION_DAYS
+        self.interval = settings.RETENTION_INTERVAL_HOURS * 3600
+        self.chunk_size = settings.RETENTION_DELETE_CHUNK
+        self.partition_days = partition_interval_days()
+        self.partitions_ahead = settings.ALERT_PARTITIONS_AHEAD
+
+        # Pause entre deux lots de suppression (laisse passer les requêtes en cours)
+        self.chunk_pause = 0.05
+
+        self._task: Optional[asyncio.Task] = None
+        self.last_report: Optional[Dict] = None
+
+    async def start(self) -> None:
+        """Démarre la tâche périodique (hook lifespan)"""
+        if self._task is None and settings.RETENTION_ENABLED:
+            self._task = asyncio.create_task(self._run())
+
+    async def stop(self) -> None:
+        """Arrête la tâche périodique"""
+        if self._task is not None:
+            self._task.cancel()
+            try:
+                await self._task
+            except asyncio.CancelledError:
+                pass
+            self._task = None
+
+    async def _run(self) -> None:
+        """Boucle : une exécution au démarrage puis toutes les RETENTION_INTERVAL_HOURS"""
+        while True:
+            try:
+                await self.run_once()
+            except Exception as e:
+                logger.error(f"Erreur lors de la rétention des données: {e}")
+            await asyncio.sleep(self.interval)
+
+    async def run_once(self, now: Optional[datetime] = None) -> Dict:
+        """
+        Exécute une passe de rétention
+
+        Args:
+            now: Instant de référence (UTC), maintenant par défaut
+
+        Returns:
+            Rapport (partitions créées / supprimées, alertes et fichiers supprimés)
+        """
+        started = time.perf_counter()
+        now = now or datetime.now(timezone.utc)
+        cutoff = now - timedelta(days=self.retention_days)
+
+        report = {
+            "cutoff": cutoff.isoformat(),
+            "partitions_created": [],
+            "partitions_dropped": [],
+            "alerts_deleted": 0,
+            "sessions_purged": 0,
+            "files_deleted": 0,
+            "bytes_freed": 0,
+        }
+
+        if async_engine.dialect.name == "postgresql":
+            locked = await self._purge_postgresql(now, cutoff, report)
+            if not locked:
+                report["skipped"] = "rétention déjà en cours sur un autre worker"
+                return report
+        else:
+            report["alerts_deleted"] = await self._delete_alerts_in_chunks(cutoff)
+
+        await self._purge_media(cutoff, report)
+        report["duration_seconds"] = round(time.perf_counter() - started, 3)
+
+        self.last_report = report
+        logger.info(
+            "Rétention: %s partition(s) supprimée(s), %s alerte(s), %s session(s), %s fichier(s) en %ss",
+            len(report["partitions_dropped"]), report["alerts_deleted"], report["sessions_purged"],
+            report["files_deleted"], report["duration_seconds"]
+        )
+        return report
+
+    # ------------------------------------------------------------------
+    # Alertes
+    # ------------------------------------------------------------------
+
+    async def _purge_postgresql(self, now: datetime, cutoff: datetime, report: Dict) -> bool:
+        """Rétention PostgreSQL sous verrou consultatif ; False si le verrou est pris"""
+        async with async_engine.connect() as connection:
+            conn = await connection.execution_options(isolation_level="AUTOCOMMIT")
+            locked = await conn.scalar(text("SELECT pg_try_advisory_lock(:key)"), {"key": RETENTION_LOCK_KEY})
+            if not locked:
+                return False
+
+            try:
+                partitioned = await conn.scalar(text(
+                    "SELECT relkind = 'p' FROM pg_class WHERE oid = to_regclass('security_alerts')"
+                ))
+                if partitioned:
+                    partitions = await self._list_partitions(conn)
+                    report["partitions_created"] = await self._ensure_partitions(conn, partitions, now)
+                    report["partitions_dropped"] = await self._drop_expired_partitions(conn, partitions, cutoff)
+            finally:
+                await conn.execute(text("SELECT pg_advisory_unlock(:key)"), {"key": RETENTION_LOCK_KEY})
+
+        # Reste : partition à cheval sur la limite, partition par défaut, table non partitionnée
+        report["alerts_deleted"] = await self._delete_alerts_in_chunks(cutoff)
+        return True
+
+    async def _list_partitions(self, conn) -> List[Tuple[str, datetime, datetime]]:
+        """Liste les partitions bornées de security_alerts (nom, début, fin)"""
+        result = await conn.execute(text(
+            "SELECT c.relname, pg_get_expr(c.relpartbound, c.oid) "
+            "FROM pg_inherits i JOIN pg_class c ON c.oid = i.inhrelid "
+            "WHERE i.inhparent = 'security_alerts'::regclass"
+        ))
+
+        partitions = []
+        for name, bound in result.all():
+            match = PARTITION_BOUND.search(bound or "")
+            if match:
+                partitions.append((name, _parse_bound(match.group(1)), _parse_bound(match.group(2))))
+        return sorted(partitions, key=lambda partition: partition[1])
+
+    async def _ensure_partitions(self, conn, partitions: List[Tuple[str, datetime, datetime]], now: datetime) -> List[str]:
+        """Crée les partitions futures à la suite de la dernière existante"""
+        horizon = now + timedelta(days=self.partition_days * self.partitions_ahead)
+
+        if partitions:
+            start = partitions[-1][2].astimezone(timezone.utc)
+            if start.time() != datetime.min.time():
+                # Borne posée à la main hors minuit UTC : on ne devine pas la suite
+                logger.error(f"Borne de partition inattendue ({partitions[-1][0]}: {start.isoformat()})")
+                return []
+            day = start.date()
+        else:
+            # Même grille que la migration 0003
+            day = partition_start(now.date(), self.partition_days)
+
+        created = []
+        while datetime.fromisoformat(partition_bound(day)) < horizon:
+            # Grille recalée si l'intervalle a changé depuis la dernière partition
+            end = next_partition_bound(day, self.partition_days)
+            name = partition_name(day)
+            try:
+                await conn.execute(text(
+                    f"CREATE TABLE IF NOT EXISTS {name} PARTITION OF security_alerts "
+                    f"FOR VALUES FROM ('{partition_bound(day)}') TO ('{partition_bound(end)}')"
+                ))
+                created.append(name)
+            except Exception as e:
+                # Typiquement : lignes de la partition par défaut dans cet intervalle
+                logger.error(f"Impossible de créer la partition {name}: {e}")
+                break
+            day = end
+        return created
+
+    async def _drop_expired_partitions(self, conn, partitions: List[Tuple[str, datetime, datetime]], cutoff: datetime) -> List[str]:
+        """Supprime les partitions dont toutes les lignes sont expirées"""
+        dropped = []
+        for name, _, end in partitions:
+            if end <= cutoff:
+                await conn.execute(text(f"DROP TABLE IF EXISTS {name}"))
+                dropped.append(name)
+        return dropped
+
+    async def _delete_alerts_in_chunks(self, cutoff: datetime) -> int:
+        """Supprime les alertes expirées par lots de RETENTION_DELETE_CHUNK lignes"""
+        deleted = 0
+        while True:
+            async with AsyncSessionLocal() as db:
+                expired_ids = (
+                    select(SecurityAlert.id)
+                    .where(SecurityAlert.timestamp < cutoff)
+                    .limit(self.chunk_size)
+                    .scalar_subquery()
+                )
+                result = await db.execute(
+                    delete(SecurityAlert)
+                    .where(SecurityAlert.id.in_(expired_ids))
+                    .execution_options(synchronize_session=False)
+                )
+                await db.commit()
+
+            deleted += max(result.rowcount, 0)
+            if result.rowcount < self.chunk_size:
+                return deleted
+            await asyncio.sleep(self.chunk_pause)
+
+    # ------------------------------------------------------------------
+    # Médias
+    # ------------------------------------------------------------------
+
+    async def _expired_sessions(self, session_ids: List[int], cutoff: datetime) -> List[int]:
+        """Sessions terminées avant la limite parmi celles qui ont des médias"""
+        expired = []
+        for start in range(0, len(session_ids), self.chunk_size):
+            async with AsyncSessionLocal() as db:
+                result = await db.execute(
+                    select(ExamSession.id)
+                    .where(ExamSession.id.in_(session_ids[start:start + self.chunk_size]))
+                    .where(ExamSession.status != "active")
+                    # Sessions terminées avant l'enregistrement de end_time : date de début
+                    .where(func.coalesce(ExamSession.end_time, ExamSession.start_time) < cutoff)
+                )
+                expired.extend(result.scalars().all())
+        return sorted(expired)
+
+    async def _purge_media(self, cutoff: datetime, report: Dict) -> None:
+        """Supprime les captures, enregistrements et preuves expirés (rapport complété)"""
+        stored = await asyncio.to_thread(
+            lambda: sorted(set(screen_capture_store.session_ids()) | set(recording_store.session_ids()))
+        )
+        for session_id in await self._expired_sessions(stored, cutoff):
+            for files, freed in (
+                await asyncio.to_thread(screen_capture_store.delete_session, session_id),
+                await recording_store.delete_session(session_id),
+            ):
+                report["files_deleted"] += files
+                report["bytes_freed"] += freed
+            report["sessions_purged"] += 1
+
+        # Preuves partagées entre sessions (dédupliquées) : supprimées lorsqu'aucune
+        # alerte conservée ne les référence plus
+        candidates = await asyncio.to_thread(lambda: list(evidence_store.iter_unused_since(cutoff.timestamp())))
+        for start in range(0, len(candidates), self.chunk_size):
+            chunk = candidates[start:start + self.chunk_size]
+            async with AsyncSessionLocal() as db:
+                result = await db.execute(
+                    select(SecurityAlert.evidence_hash).where(SecurityAlert.evidence_hash.in_(chunk)).distinct()
+                )
+                referenced = set(result.scalars().all())
+            for digest in chunk:
+                if digest not in referenced:
+                    files, freed = await asyncio.to_thread(evidence_store.delete, digest)
+                    report["files_deleted"] += files
+                    report["bytes_freed"] += freed
+
+# Instance globale du service de rétention
+retention_service = RetentionService()
@@ -0,0 +1,111 @@
+"""
+Cache de l'état des sessions d'examen ProctoFlex AI
+Évite une lecture de ExamSession par clé primaire à chaque requête de suivi
+"""
+
+import logging
+from typing import Dict, Optional, Union
+
+from sqlalchemy import select
+from sqlalchemy.ext.asyncio import AsyncSession
+
+from app.core.cache import TTLCache, cache_bus
+from app.core.config import settings
+from app.core.database import ExamSession, User
+
+logger = logging.getLogger(__name__)
+
+
+class SessionCache:
+    """
+    État minimal des sessions (id, exam_id, student_id, status)
+
+    Suffisant pour les contrôles d'accès et le statut ; les endpoints qui
+    modifient une session appellent invalidate() après validation. Sans Redis,
+    l'invalidation ne touche que le worker courant : les écritures conditionnées
+    au statut lisent la base (fresh=True) plutôt qu'un état vieux d'un TTL.
+    """
+
+    def __init__(self):
+        self._cache = cache_bus.register(TTLCache(
+            "exam_sessions",
+            maxsize=settings.SESSION_CACHE_MAX_ENTRIES,
+            ttl=settings.SESSION_CACHE_TTL_SECONDS
+        ))
+
+    async def get(self, db: AsyncSession, session_id: int, fresh: bool = False) -> Optional[Dict]:
+        """
+        Récupère l'état d'une session (cache puis base de données)
+
+        Args:
+            db: Session de base de données utilisée en cas d'absence du cache
+            session_id: Identifiant de la session d'examen
+            fresh: Lire la base même si la session est en cache (le cache est rafraîchi)
+
+        Returns:
+            État de la session, ou None si elle n'existe pas
+        """
+        if not fresh:
+            state = self._cache.get(session_id)
+            if state is not None:
+                return state
+
+        result = await db.execute(
+            select(ExamSession.id, ExamSession.exam_id, ExamSession.student_id, ExamSession.status)
+            .where(ExamSession.id == session_id)
+        )
+        row = result.first()
+        if row is None:
+            self._cache.invalidate(session_id)
+            return None
+
+        state = dict(row._mapping)
+        self._cache.set(session_id, state)
+        return state
+
+    def prime(self, session: ExamSession) -> None:
+        """Met en cache une session qui vient d'être créée"""
+        self._cache.set(session.id, {
+            "id": session.id,
+            "exam_id": session.exam_id,
+            "student_id": session.student_id,
+            "status": session.status
+        })
+
+    async def invalidate(self, session_id: int) -> None:
+        """Invalide une session dans ce worker et dans les autres"""
+        await cache_bus.invalidate(self._cache, session_id)
+
+    def stats(self) -> Dict:
+        """Statistiques du cache"""
+        return self._cache.stats()
+
+# Instance globale du cache des sessions
+session_cache = SessionCache()
+
+
+async def owned_session_id(session_id: Union[int, str, None], current_user: User, db: AsyncSession) -> Optional[int]:
+    """
+    Session d'examen de l'utilisateur authentifié désignée par une requête
+
+    Les identifiants de session transmis dans les corps de requête ne sont
+    jamais utilisés tels quels pour écrire (alertes, preuves, captures).
+
+    Args:
+        session_id: Identifiant transmis par le client
+        current_user: Utilisateur authentifié
+        db: Session de base de données (en cas d'absence du cache des sessions)
+
+    Returns:
+        Identifiant numérique de la session, ou None si l'identifiant est invalide,
+        la session inexistante ou celle d'un autre utilisateur
+    """
+    try:
+        session_id = int(session_id)
+    except (TypeError, ValueError):
+        return None
+
+    session = await session_cache.get(db, session_id)
+    if session is None or session["student_id"] != current_user.id:
+        return None
+    return session_id
@@ -0,0 +1,509 @@
+"""
+Stockage différentiel des captures d'écran ProctoFlex AI
+Images clés périodiques + tuiles modifiées compressées, par session
+"""
+
+import cv2
+import numpy as np
+from typing import Callable, Dict, List, Optional, Tuple
+from collections import OrderedDict
+import hashlib
+import logging
+import threading
+import struct
+import zlib
+import time
+import os
+
+from app.core.config import settings
+from app.core.uploads import decode_base64
+from app.storage.files import remove_tree
+from app.storage.locking import exclusive_lock
+
+logger = logging.getLogger(__name__)
+
+# Types d'enregistrement (REPEAT : capture identique à la précédente, entrée d'index seule)
+KEYFRAME = 1
+DELTA = 2
+REPEAT = 3
+
+# En-tête d'un enregistrement dans un segment : type, horodatage, largeur, hauteur, taille des données
+RECORD_HEADER = struct.Struct('<BdHHI')
+
+# Entrée d'index : horodatage, type, numéro de segment, position, taille totale de l'enregistrement
+INDEX_ENTRY = struct.Struct('<dBIQI')
+INDEX_DTYPE = np.dtype([
+    ('timestamp', '<f8'),
+    ('kind', 'u1'),
+    ('segment', '<u4'),
+    ('offset', '<u8'),
+    ('length', '<u4')
+])
+
+INDEX_FILENAME = 'index.bin'
+SEGMENT_PATTERN = 'segment_{:06d}.bin'
+
+
+def _session_key(session_id) -> str:
+    """Clé d'une session : identifiant entier, jamais un chemin fourni par le client"""
+    return str(int(session_id))
+
+
+def _pad_to_tiles(image: np.ndarray, tile: int) -> np.ndarray:
+    """Complète l'image par des zéros jusqu'à un multiple de la taille de tuile"""
+    height, width = image.shape[:2]
+    pad_h = (-height) % tile
+    pad_w = (-width) % tile
+    if pad_h == 0 and pad_w == 0:
+        return np.ascontiguousarray(image)
+    return np.pad(image, ((0, pad_h), (0, pad_w), (0, 0)))
+
+
+def _tile_view(image: np.ndarray, tile: int) -> np.ndarray:
+    """Vue (lignes, colonnes, tuile, tuile, canaux) d'une image complétée"""
+    height, width, channels = image.shape
+    return image.reshape(height // tile, tile, width // tile, tile, channels).swapaxes(1, 2)
+
+
+class _CaptureWriter:
+    """
+    État d'écriture d'une session (dernière image, segment courant)
+
+    Plusieurs workers peuvent écrire dans la même session : l'image de référence
+    n'est valide que si l'index n'a pas changé depuis la dernière écriture de ce
+    processus (index_size), sinon elle est relue sur disque.
+    """
+
+    def __init__(self, directory: str, segment: int):
+        self.directory = directory
+        self.segment = segment
+        self.segment_file = open(os.path.join(directory, SEGMENT_PATTERN.format(segment)), 'ab')
+        self.index_file = open(os.path.join(directory, INDEX_FILENAME), 'ab')
+        self.previous: Optional[np.ndarray] = None
+        # Empreinte de la dernière capture encodée (chemin rapide des captures identiques)
+        self.digest: Optional[bytes] = None
+        self.size: Tuple[int, int] = (0, 0)
+        self.since_keyframe = 0
+        self.index_size = 0
+        self.lock = threading.Lock()
+
+    def rotate(self) -> None:
+        """Passe au segment suivant"""
+        self.segment_file.close()
+        self.segment += 1
+        self.segment_file = open(os.path.join(self.directory, SEGMENT_PATTERN.format(self.segment)), 'ab')
+
+    def follow_rotation(self) -> None:
+        """Rejoint le dernier segment si un autre processus en a ouvert un nouveau"""
+        while os.path.exists(os.path.join(self.directory, SEGMENT_PATTERN.format(self.segment + 1))):
+            self.rotate()
+
+    def close(self) -> None:
+        """Ferme les fichiers ouverts"""
+        self.segment_file.close()
+        self.index_file.close()
+
+
+class ScreenCaptureStore:
+    """
+    Stockage append-only des captures d'écran d'une session
+
+    Chaque session possède des segments (images clés PNG et deltas de tuiles
+    compressés) et un index à entrées fixes permettant de retrouver la capture
+    affichée à n'importe quel instant.
+    """
+
+    def __init__(self, root_dir: Optional[str] = None):
+        """Initialisation du stockage des captures"""
+        self.root_dir = root_dir or os.path.join(settings.UPLOAD_DIR, 'captures')
+        self.tile_size = settings.SCREEN_CAPTURE_TILE_SIZE
+        self.keyframe_interval = settings.SCREEN_CAPTURE_KEYFRAME_INTERVAL
+        self.segment_max_bytes = settings.SCREEN_CAPTURE_SEGMENT_MAX_BYTES
+
+        # Au-delà de cette proportion de tuiles modifiées, une image clé est plus compacte
+        self.keyframe_change_ratio = 0.6
+        self.max_open_writers = 256
+
+        self._writers: "OrderedDict[str, _CaptureWriter]" = OrderedDict()
+        self._writers_lock = threading.Lock()
+
+        # Dernière reconstruction par session (position, image complétée, largeur, hauteur)
+        self._last_frames: "OrderedDict[str, Tuple[int, np.ndarray, int, int]]" = OrderedDict()
+        self._max_cached_frames = 32
+
+        os.makedirs(self.root_dir, exist_ok=True)
+        logger.info("Stockage des captures d'écran initialisé")
+
+    def session_dir(self, session_id) -> str:
+        """Répertoire de stockage d'une session (identifiant numérique uniquement)"""
+        return os.path.join(self.root_dir, _session_key(session_id))
+
+    # ------------------------------------------------------------------
+    # Écriture
+    # ------------------------------------------------------------------
+
+    def _get_writer(self, session_id: str) -> _CaptureWriter:
+        """Récupère (ou ouvre) l'écrivain d'une session"""
+        with self._writers_lock:
+            writer = self._writers.get(session_id)
+            if writer is not None:
+                self._writers.move_to_end(session_id)
+                return writer
+
+            directory = self.session_dir(session_id)
+            os.makedirs(directory, exist_ok=True)
+
+            # Reprise après redémarrage : on continue le dernier segment
+            segments = sorted(
+                name for name in os.listdir(directory)
+                if name.startswith('segment_') and name.endswith('.bin')
+            )
+            segment = int(segments[-1][8:14]) if segments else 0
+
+            writer = _CaptureWriter(directory, segment)
+            self._writers[session_id] = writer
+
+            while len(self._writers) > self.max_open_writers:
+                _, evicted = self._writers.popitem(last=False)
+                with evicted.lock:
+                    evicted.close()
+
+            return writer
+
+    def append_encoded(self, session_id, image_data: str, timestamp: Optional[float] = None) -> Dict:
+        """
+        Ajoute une capture encodée en base64 (data URL accepté)
+
+        Args:
+            session_id: Identifiant de la session
+            image_data: Capture d'écran en base64
+            timestamp: Horodatage (secondes epoch), maintenant par défaut
+
+        Returns:
+            Description de l'enregistrement écrit
+        """
+        session_id = _session_key(session_id)
+        timestamp = time.time() if timestamp is None else float(timestamp)
+
+        # Chemin rapide : capture identique octet par octet à la précédente, ni décodage
+        # ni comparaison des tuiles, seulement une entrée d'index horodatée
+        digest = hashlib.blake2b(image_data.encode('ascii', 'ignore'), digest_size=16).digest()
+        repeated = self._locked(session_id, lambda writer: self._write_repeat(writer, digest, timestamp))
+        if repeated is not None:
+            return repeated
+
+        buffer = np.frombuffer(decode_base64(image_data), np.uint8)
+        image = cv2.imdecode(buffer, cv2.IMREAD_COLOR)
+        if image is None:
+            raise ValueError("Format de capture d'écran invalide")
+        return self._locked(session_id, lambda writer: self._write(writer, image, timestamp, digest))
+
+    def append(self, session_id, image: np.ndarray, timestamp: Optional[float] = None) -> Dict:
+        """
+        Ajoute une capture (BGR) au stockage de la session
+
+        Args:
+            session_id: Identifiant de la session
+            image: Capture d'écran (numpy array BGR)
+            timestamp: Horodatage (secondes epoch), maintenant par défaut
+
+        Returns:
+            Description de l'enregistrement écrit (type, taille, tuiles modifiées)
+        """
+        session_id = _session_key(session_id)
+        timestamp = time.time() if timestamp is None else float(timestamp)
+        return self._locked(session_id, lambda writer: self._write(writer, image, timestamp))
+
+    def _locked(self, session_id: str, operation: Callable[[_CaptureWriter], Dict]):
+        """Exécute une écriture sous le verrou de l'écrivain et le verrou de fichier de la session"""
+        while True:
+            writer = self._get_writer(session_id)
+            with writer.lock:
+                # Écrivain évincé entre-temps : on en rouvre un
+                if writer.segment_file.closed:
+                    continue
+                # Verrou entre processus : segment, position et image de référence partagés
+                with exclusive_lock(writer.index_file):
+                    return operation(writer)
+
+    def _sync_writer(self, writer: _CaptureWriter) -> None:
+        """Aligne l'écrivain sur le disque (verrous acquis) : segment courant, image de référence"""
+        writer.follow_rotation()
+
+        index_size = os.fstat(writer.index_file.fileno()).st_size
+        # Entrée partiellement écrite (arrêt brutal) : supprimée avant d'ajouter la suivante
+        if index_size % INDEX_DTYPE.itemsize:
+            index_size -= index_size % INDEX_DTYPE.itemsize
+            os.ftruncate(writer.index_file.fileno(), index_size)
+
+        if writer.previous is not None and index_size == writer.index_size:
+            return
+
+        index = np.fromfile(
+            os.path.join(writer.directory, INDEX_FILENAME),
+            dtype=INDEX_DTYPE,
+            count=index_size // INDEX_DTYPE.itemsize
+        )
+        # Autre écrivain n'ayant ajouté que des répétitions : la référence reste valable
+        added = index[writer.index_size // INDEX_DTYPE.itemsize:]
+        if writer.previous is not None and index_size > writer.index_size and (added['kind'] == REPEAT).all():
+            writer.index_size = index_size
+            return
+
+        # Autre écrivain (autre worker, redémarrage) : référence reconstruite depuis la dernière image clé
+        writer.previous = None
+        writer.digest = None
+        writer.index_size = index_size
+        keyframes = np.flatnonzero(index['kind'] == KEYFRAME)
+        if keyframes.size == 0:
+            return
+        start = int(keyframes[-1])
+        frame, width, height = self._replay(writer.directory, index[start:])
+        writer.previous = frame
+        writer.size = (width, height)
+        writer.since_keyframe = int((index['kind'][start + 1:] == DELTA).sum())
+
+    def _write_repeat(self, writer: _CaptureWriter, digest: bytes, timestamp: float) -> Optional[Dict]:
+        """Enregistre une capture identique à la précédente (verrous acquis), None sinon"""
+        self._sync_writer(writer)
+        if writer.previous is None or writer.digest != digest:
+            return None
+
+        writer.index_file.write(INDEX_ENTRY.pack(timestamp, REPEAT, writer.segment, 0, 0))
+        writer.index_file.flush()
+        writer.index_size += INDEX_ENTRY.size
+        return {'kind': 'repeat', 'bytes': 0, 'changed_tiles': 0}
+
+    def _write(self, writer: _CaptureWriter, image: np.ndarray, timestamp: float,
+               digest: Optional[bytes] = None) -> Dict:
+        """Écrit une capture (verrou de l'écrivain et verrou de fichier déjà acquis)"""
+        self._sync_writer(writer)
+
+        height, width = image.shape[:2]
+        padded = _pad_to_tiles(image, self.tile_size)
+
+        keyframe = (
+            writer.previous is None
+            or writer.size != (width, height)
+            or writer.since_keyframe >= self.keyframe_interval
+        )
+
+        changed_tiles = 0
+        if not keyframe:
+            changed = (_tile_view(padded, self.tile_size) != _tile_view(writer.previous, self.tile_size)).any(axis=(2, 3, 4))
+            indices = np.flatnonzero(changed)
+            changed_tiles = int(indices.size)
+
+            if changed_tiles == 0:
+                writer.digest = digest
+                return {'kind': 'skipped', 'bytes': 0, 'changed_tiles': 0}
+
+            if changed_tiles > self.keyframe_change_ratio * changed.size:
+                keyframe = True
+
+        # Rotation vérifiée à chaque écriture (une longue suite de deltas remplit aussi
+        # le segment) ; un segment commence toujours par une image clé
+        if writer.segment_file.seek(0, os.SEEK_END) >= self.segment_max_bytes:
+            writer.rotate()
+            keyframe = True
+
+        if keyframe:
+            ok, encoded = cv2.imencode('.png', image, [cv2.IMWRITE_PNG_COMPRESSION, 3])
+            if not ok:
+                raise ValueError("Impossible d'encoder l'image clé")
+            payload = encoded.tobytes()
+            kind = KEYFRAME
+            writer.since_keyframe = 0
+        else:
+            tiles = _tile_view(padded, self.tile_size)[np.unravel_index(indices, changed.shape)]
+            payload = zlib.compress(
+                struct.pack('<I', changed_tiles)
+                + indices.astype('<u2').tobytes()
+                + np.ascontiguousarray(tiles).tobytes(),
+                6
+            )
+            kind = DELTA
+            writer.since_keyframe += 1
+
+        # Position lue sous le verrou : la fin du segment peut venir d'un autre processus
+        offset = writer.segment_file.seek(0, os.SEEK_END)
+        record = RECORD_HEADER.pack(kind, timestamp, width, height, len(payload)) + payload
+        writer.segment_file.write(record)
+        writer.segment_file.flush()
+
+        writer.index_file.write(INDEX_ENTRY.pack(timestamp, kind, writer.segment, offset, len(record)))
+        writer.index_file.flush()
+        writer.index_size += INDEX_ENTRY.size
+
+        writer.previous = padded if padded is not image else padded.copy()
+        writer.digest = digest
+        writer.size = (width, height)
+
+        return {
+            'kind': 'keyframe' if kind == KEYFRAME else 'delta',
+            'bytes': len(record),
+            'changed_tiles': changed_tiles
+        }
+
+    def close_session(self, session_id) -> None:
+        """Ferme l'écrivain d'une session (fin d'examen)"""
+        session_id = _session_key(session_id)
+        with self._writers_lock:
+            writer = self._writers.pop(session_id, None)
+            self._last_frames.pop(session_id, None)
+        if writer is not None:
+            with writer.lock:
+                writer.close()
+
+    def session_ids(self) -> List[int]:
+        """Sessions dont des captures sont stockées"""
+        if not os.path.isdir(self.root_dir):
+            return []
+        return sorted(int(name) for name in os.listdir(self.root_dir) if name.isdigit())
+
+    def delete_session(self, session_id) -> Tuple[int, int]:
+        """
+        Supprime les captures d'une session (rétention)
+
+        Args:
+            session_id: Identifiant de la session
+
+        Returns:
+            Nombre de fichiers supprimés et octets libérés
+        """
+        self.close_session(session_id)
+        return remove_tree(self.session_dir(session_id))
+
+    # ------------------------------------------------------------------
+    # Lecture
+    # ------------------------------------------------------------------
+
+    def load_index(self, session_id) -> np.ndarray:
+        """Charge l'index d'une session (tableau structuré numpy)"""
+        path = os.path.join(self.session_dir(session_id), INDEX_FILENAME)
+        if not os.path.exists(path):
+            return np.zeros(0, dtype=INDEX_DTYPE)
+        # Une entrée partiellement écrite (arrêt brutal) est ignorée
+        count = os.path.getsize(path) // INDEX_DTYPE.itemsize
+        return np.fromfile(path, dtype=INDEX_DTYPE, count=count)
+
+    def _read_record(self, directory: str, entry, handles: Dict) -> Tuple[int, int, int, bytes]:
+        """Lit un enregistrement (type, largeur, hauteur, données)"""
+        segment = int(entry['segment'])
+        handle = handles.get(segment)
+        if handle is None:
+            handle = open(os.path.join(directory, SEGMENT_PATTERN.format(segment)), 'rb')
+            handles[segment] = handle
+
+        handle.seek(int(entry['offset']))
+        record = handle.read(int(entry['length']))
+        kind, _, width, height, length = RECORD_HEADER.unpack_from(record)
+        return kind, width, height, record[RECORD_HEADER.size:RECORD_HEADER.size + length]
+
+    def _apply_record(self, frame: Optional[np.ndarray], kind: int, width: int, height: int, payload: bytes) -> np.ndarray:
+        """Applique un enregistrement à l'image reconstruite (complétée)"""
+        tile = self.tile_size
+
+        if kind == KEYFRAME:
+            image = cv2.imdecode(np.frombuffer(payload, np.uint8), cv2.IMREAD_COLOR)
+            return _pad_to_tiles(image, tile)
+
+        data = zlib.decompress(payload)
+        (count,) = struct.unpack_from('<I', data)
+        indices = np.frombuffer(data, dtype='<u2', count=count, offset=4)
+        tiles = np.frombuffer(data, dtype=np.uint8, offset=4 + 2 * count).reshape(count, tile, tile, 3)
+
+        view = _tile_view(frame, tile)
+        view[np.unravel_index(indices, view.shape[:2])] = tiles
+        return frame
+
+    def _replay(self, directory: str, entries: np.ndarray, frame: Optional[np.ndarray] = None,
+                width: int = 0, height: int = 0) -> Tuple[np.ndarray, int, int]:
+        """Applique une suite d'enregistrements (image complétée, largeur, hauteur)"""
+        handles: Dict[int, object] = {}
+        try:
+            for entry in entries:
+                if entry['kind'] == REPEAT:
+                    continue
+                kind, width, height, payload = self._read_record(directory, entry, handles)
+                frame = self._apply_record(frame, kind, width, height, payload)
+        finally:
+            for handle in handles.values():
+                handle.close()
+        return frame, width, height
+
+    def get_capture_at(self, session_id, timestamp: float) -> Optional[np.ndarray]:
+        """
+        Reconstruit la capture affichée à un instant donné
+
+        Args:
+            session_id: Identifiant de la session
+            timestamp: Instant recherché (secondes epoch)
+
+        Returns:
+            Capture d'écran (numpy array BGR) ou None si aucune capture antérieure
+        """
+        session_id = _session_key(session_id)
+        index = self.load_index(session_id)
+        if index.size == 0:
+            return None
+
+        position = int(np.searchsorted(index['timestamp'], timestamp, side='right')) - 1
+        if position < 0:
+            return None
+
+        keyframes = np.flatnonzero(index['kind'][:position + 1] == KEYFRAME)
+        if keyframes.size == 0:
+            return None
+        start = int(keyframes[-1])
+
+        # Relecture séquentielle : on repart de la dernière reconstruction si possible
+        frame = None
+        width = height = 0
+        with self._writers_lock:
+            cached = self._last_frames.get(session_id)
+        if cached is not None and start <= cached[0] <= position:
+            # L'image en cache est complétée aux tuiles : ses dimensions réelles sont conservées à part
+            start, frame, width, height = cached[0] + 1, cached[1].copy(), cached[2], cached[3]
+
+        frame, width, height = self._replay(self.session_dir(session_id), index[start:position + 1], frame, width, height)
+
+        with self._writers_lock:
+            self._last_frames[session_id] = (position, frame, width, height)
+            self._last_frames.move_to_end(session_id)
+            while len(self._last_frames) > self._max_cached_frames:
+                self._last_frames.popitem(last=False)
+
+        return frame[:height, :width].copy()
+
+    def describe(self, session_id) -> Dict:
+        """
+        Résume le stockage d'une session (à enregistrer dans ExamSession.screen_captures)
+
+        Args:
+            session_id: Identifiant de la session
+
+        Returns:
+            Description du stockage (format, nombre d'enregistrements, taille)
+        """
+        directory = self.session_dir(session_id)
+        index = self.load_index(session_id)
+        total_bytes = 0
+        if os.path.isdir(directory):
+            total_bytes = sum(
+                os.path.getsize(os.path.join(directory, name))
+                for name in os.listdir(directory)
+            )
+
+        return {
+            'format': 'tile-delta-v1',
+            'path': os.path.relpath(directory, settings.UPLOAD_DIR),
+            'records': int(index.size),
+            'keyframes': int((index['kind'] == KEYFRAME).sum()) if index.size else 0,
+            'bytes': int(total_bytes),
+            'first_timestamp': float(index['timestamp'][0]) if index.size else None,
+            'last_timestamp': float(index['timestamp'][-1]) if index.size else None
+        }
+
+# Instance globale du stockage
+screen_capture_store = ScreenCaptureStore()
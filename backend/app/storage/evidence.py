@@ -0,0 +1,266 @@
+"""
+Stockage des preuves ProctoFlex AI
+Images à l'origine des alertes, adressées par leur contenu (SHA-256)
+"""
+
+import hashlib
+import logging
+import os
+import re
+import threading
+import time
+from collections import OrderedDict, deque
+from typing import Deque, Dict, Iterator, Optional, Tuple
+
+import cv2
+import numpy as np
+
+from app.core.config import settings
+from app.core.uploads import decode_base64
+
+logger = logging.getLogger(__name__)
+
+EVIDENCE_HASH = re.compile(r'^[0-9a-f]{64}$')
+
+# Signatures des formats acceptés : extension du fichier stocké
+IMAGE_SIGNATURES = (
+    (b'\xff\xd8\xff', '.jpg'),
+    (b'\x89PNG\r\n\x1a\n', '.png'),
+    (b'RIFF', '.webp'),
+)
+CONTENT_TYPES = {'.jpg': 'image/jpeg', '.png': 'image/png', '.webp': 'image/webp'}
+
+
+def perceptual_hash(image: np.ndarray) -> int:
+    """Empreinte perceptuelle 64 bits (dHash : gradients horizontaux sur 9x8)"""
+    gray = cv2.cvtColor(image, cv2.COLOR_BGR2GRAY) if image.ndim == 3 else image
+    small = cv2.resize(gray, (9, 8), interpolation=cv2.INTER_AREA)
+    bits = (small[:, 1:] > small[:, :-1]).flatten()
+    return int(np.packbits(bits).view('>u8')[0])
+
+
+def _image_extension(data: bytes) -> Optional[str]:
+    """Extension correspondant au format de l'image, None si non reconnu"""
+    for signature, extension in IMAGE_SIGNATURES:
+        if data.startswith(signature):
+            return extension
+    return None
+
+
+class EvidenceStore:
+    """
+    Stockage dédupliqué des images de preuve
+
+    Les fichiers sont nommés par le SHA-256 de leur contenu et répartis dans des
+    répertoires par préfixe (ab/cd/abcd....jpg). Une image identique n'est écrite
+    qu'une fois ; une image quasi identique (distance de Hamming des dHash sous
+    le seuil) à une preuve récente de la même session réutilise cette preuve.
+    """
+
+    def __init__(self, root_dir: Optional[str] = None):
+        """Initialisation du stockage des preuves"""
+        self.root_dir = root_dir or os.path.join(settings.UPLOAD_DIR, 'evidence')
+        self.near_dup_window = settings.EVIDENCE_NEAR_DUP_WINDOW_SECONDS
+        self.max_distance = settings.EVIDENCE_PHASH_MAX_DISTANCE
+        self.thumbnail_size = settings.EVIDENCE_THUMBNAIL_SIZE
+
+        # Preuves récentes par session : (horodatage, dHash, SHA-256)
+        self._recent: "OrderedDict[str, Deque[Tuple[float, int, str]]]" = OrderedDict()
+        self._max_sessions = 1024
+        self._lock = threading.Lock()
+
+        self._stats = {"stored": 0, "exact_duplicates": 0, "near_duplicates": 0, "bytes_written": 0}
+
+        os.makedirs(self.root_dir, exist_ok=True)
+        logger.info("Stockage des preuves initialisé")
+
+    def _shard_dir(self, digest: str) -> str:
+        """Répertoire d'une preuve (deux niveaux de préfixe)"""
+        return os.path.join(self.root_dir, digest[:2], digest[2:4])
+
+    def find(self, digest: str) -> Optional[str]:
+        """Chemin du fichier d'une preuve, None si elle n'existe pas"""
+        if not EVIDENCE_HASH.match(digest):
+            return None
+        directory = self._shard_dir(digest)
+        for extension in CONTENT_TYPES:
+            path = os.path.join(directory, digest + extension)
+            if os.path.exists(path):
+                return path
+        return None
+
+    def _recent_match(self, session_id: str, phash: int, now: float) -> Optional[str]:
+        """Preuve récente de la session proche de l'empreinte donnée"""
+        with self._lock:
+            recent = self._recent.get(session_id)
+            if recent is None:
+                return None
+            while recent and now - recent[0][0] > self.near_dup_window:
+                recent.popleft()
+            for _, known, digest in reversed(recent):
+                if bin(known ^ phash).count('1') <= self.max_distance:
+                    return digest
+        return None
+
+    def _remember(self, session_id: str, phash: int, digest: str, now: float) -> None:
+        """Ajoute une preuve à la fenêtre de quasi-doublons de la session"""
+        with self._lock:
+            recent = self._recent.get(session_id)
+            if recent is None:
+                recent = self._recent[session_id] = deque(maxlen=64)
+            self._recent.move_to_end(session_id)
+            recent.append((now, phash, digest))
+            while len(self._recent) > self._max_sessions:
+                self._recent.popitem(last=False)
+
+    def store(self, image_data, session_id=None) -> Dict:
+        """
+        Enregistre une image de preuve (exécuté hors de la boucle d'événements)
+
+        Args:
+            image_data: Image encodée (octets, base64 ou data URL)
+            session_id: Session d'examen (fenêtre de quasi-doublons)
+
+        Returns:
+            Référence de la preuve (hash, dédupliquée ou non)
+        """
+        if isinstance(image_data, str):
+            image_data = decode_base64(image_data)
+
+        extension = _image_extension(image_data)
+        if extension is None:
+            raise ValueError("Format d'image de preuve non supporté")
+
+        now = time.time()
+        session_key = str(session_id)
+        digest = hashlib.sha256(image_data).hexdigest()
+
+        # Doublon exact : aucune écriture, on rafraîchit seulement la date (rétention)
+        existing = self.find(digest)
+        if existing is not None:
+            os.utime(existing)
+            self._stats["exact_duplicates"] += 1
+            return {"hash": digest, "deduplicated": "exact"}
+
+        image = cv2.imdecode(np.frombuffer(image_data, np.uint8), cv2.IMREAD_GRAYSCALE)
+        if image is None:
+            raise ValueError("Image de preuve illisible")
+        phash = perceptual_hash(image)
+
+        if session_id is not None:
+            match = self._recent_match(session_key, phash, now)
+            match_path = self.find(match) if match else None
+            if match_path is not None:
+                os.utime(match_path)
+                self._stats["near_duplicates"] += 1
+                return {"hash": match, "deduplicated": "near"}
+
+        directory = self._shard_dir(digest)
+        os.makedirs(directory, exist_ok=True)
+        path = os.path.join(directory, digest + extension)
+        # Écriture atomique : un lecteur ne voit jamais de fichier partiel
+        temporary = f"{path}.{os.getpid()}.{threading.get_ident()}.tmp"
+        with open(temporary, 'wb') as handle:
+            handle.write(image_data)
+        os.replace(temporary, path)
+
+        if session_id is not None:
+            self._remember(session_key, phash, digest, now)
+        self._stats["stored"] += 1
+        self._stats["bytes_written"] += len(image_data)
+        return {"hash": digest, "deduplicated": None}
+
+    def thumbnail(self, digest: str) -> Optional[str]:
+        """
+        Chemin de la miniature d'une preuve, générée à la première demande
+
+        Args:
+            digest: SHA-256 de la preuve
+
+        Returns:
+            Chemin de la miniature JPEG, None si la preuve n'existe pas
+        """
+        path = self.find(digest)
+        if path is None:
+            return None
+
+        thumbnail_path = os.path.join(self._shard_dir(digest), digest + '.thumb.jpg')
+        if os.path.exists(thumbnail_path):
+            return thumbnail_path
+
+        image = cv2.imread(path, cv2.IMREAD_COLOR)
+        if image is None:
+            return None
+        height, width = image.shape[:2]
+        scale = min(1.0, self.thumbnail_size / max(height, width))
+        if scale < 1.0:
+            image = cv2.resize(image, (int(width * scale), int(height * scale)), interpolation=cv2.INTER_AREA)
+
+        ok, encoded = cv2.imencode('.jpg', image, [cv2.IMWRITE_JPEG_QUALITY, 80])
+        if not ok:
+            return None
+        temporary = f"{thumbnail_path}.{os.getpid()}.{threading.get_ident()}.tmp"
+        with open(temporary, 'wb') as handle:
+            handle.write(encoded.tobytes())
+        os.replace(temporary, thumbnail_path)
+        return thumbnail_path
+
+    def iter_unused_since(self, cutoff_timestamp: float) -> Iterator[str]:
+        """
+        Preuves ni écrites ni réutilisées depuis une date (candidates à la rétention)
+
+        Une réutilisation (doublon exact ou quasi-doublon) rafraîchit la date du
+        fichier : seules les preuves sans nouvelle alerte depuis la limite sortent.
+
+        Args:
+            cutoff_timestamp: Date limite (secondes epoch)
+
+        Returns:
+            SHA-256 des preuves concernées
+        """
+        for dirpath, _, filenames in os.walk(self.root_dir):
+            for name in filenames:
+                digest, extension = os.path.splitext(name)
+                if extension not in CONTENT_TYPES or not EVIDENCE_HASH.match(digest):
+                    continue
+                try:
+                    if os.path.getmtime(os.path.join(dirpath, name)) < cutoff_timestamp:
+                        yield digest
+                except OSError:
+                    continue
+
+    def delete(self, digest: str) -> Tuple[int, int]:
+        """
+        Supprime une preuve et sa miniature
+
+        Args:
+            digest: SHA-256 de la preuve
+
+        Returns:
+            Nombre de fichiers supprimés et octets libérés
+        """
+        files = 0
+        freed = 0
+        if not EVIDENCE_HASH.match(digest):
+            return files, freed
+
+        directory = self._shard_dir(digest)
+        for extension in list(CONTENT_TYPES) + ['.thumb.jpg']:
+            path = os.path.join(directory, digest + extension)
+            try:
+                size = os.path.getsize(path)
+                os.remove(path)
+                files += 1
+                freed += size
+            except FileNotFoundError:
+                continue
+            except OSError as e:
+                logger.warning(f"Impossible de supprimer {path}: {e}")
+        return files, freed
+
+    def stats(self) -> Dict:
+        """Statistiques du stockage"""
+        return dict(self._stats)
+
+# Instance globale du stockage
+evidence_store = EvidenceStore()
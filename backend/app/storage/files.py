@@ -0,0 +1,42 @@
+"""
+Suppression de fichiers des stockages ProctoFlex AI
+Comptage des fichiers et octets libérés (rapports de rétention)
+"""
+
+import logging
+import os
+from typing import Tuple
+
+logger = logging.getLogger(__name__)
+
+
+def remove_tree(directory: str) -> Tuple[int, int]:
+    """
+    Supprime un répertoire et son contenu
+
+    Args:
+        directory: Répertoire à supprimer (absent : rien à faire)
+
+    Returns:
+        Nombre de fichiers supprimés et octets libérés
+    """
+    files = 0
+    freed = 0
+    if not os.path.isdir(directory):
+        return files, freed
+
+    for dirpath, _, filenames in os.walk(directory, topdown=False):
+        for name in filenames:
+            path = os.path.join(dirpath, name)
+            try:
+                size = os.path.getsize(path)
+                os.remove(path)
+                files += 1
+                freed += size
+            except OSError as e:
+                logger.warning(f"Impossible de supprimer {path}: {e}")
+        try:
+            os.rmdir(dirpath)
+        except OSError as e:
+            logger.warning(f"Impossible de supprimer {dirpath}: {e}")
+    return files, freed
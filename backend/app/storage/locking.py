@@ -0,0 +1,27 @@
+"""
+Verrous de fichiers entre processus ProctoFlex AI
+Les workers forkés par serve.py écrivent dans les mêmes segments et index :
+chaque ajout est sérialisé par un verrou flock sur le fichier d'index
+"""
+
+from contextlib import contextmanager
+from typing import IO, Iterator
+
+try:
+    import fcntl
+except ImportError:
+    # Windows : pas de fork, un seul worker (serve.py) ; le verrou est inutile
+    fcntl = None
+
+
+@contextmanager
+def exclusive_lock(handle: IO) -> Iterator[None]:
+    """Verrou exclusif sur un fichier ouvert, partagé par tous les processus"""
+    if fcntl is None:
+        yield
+        return
+    fcntl.flock(handle.fileno(), fcntl.LOCK_EX)
+    try:
+        yield
+    finally:
+        fcntl.flock(handle.fileno(), fcntl.LOCK_UN)
@@ -0,0 +1,363 @@
+"""
+Enregistrement audio / vidéo des sessions ProctoFlex AI
+Segments append-only et index horodaté par flux, relecture par mmap
+"""
+
+import asyncio
+import logging
+import mmap
+import os
+import struct
+import time
+from collections import OrderedDict
+from concurrent.futures import ThreadPoolExecutor
+from typing import Dict, Iterator, List, Optional, Tuple
+
+import numpy as np
+
+from app.core.config import settings
+from app.storage.files import remove_tree
+from app.storage.locking import exclusive_lock
+
+logger = logging.getLogger(__name__)
+
+# Flux enregistrés par session
+STREAMS = ("video", "audio")
+
+# En-tête d'un enregistrement dans un segment : horodatage, taille des données
+RECORD_HEADER = struct.Struct('<dI')
+
+# Entrée d'index : horodatage, numéro de segment, position, taille des données
+INDEX_ENTRY = struct.Struct('<dIQI')
+INDEX_DTYPE = np.dtype([
+    ('timestamp', '<f8'),
+    ('segment', '<u4'),
+    ('offset', '<u8'),
+    ('length', '<u4')
+])
+
+INDEX_FILENAME = 'index.bin'
+SEGMENT_PATTERN = 'segment_{:06d}.bin'
+
+
+class _StreamWriter:
+    """État d'écriture d'un flux (segment courant, entrées d'index en attente)"""
+
+    def __init__(self, directory: str, segment: int, buffer_size: int):
+        self.directory = directory
+        self.segment = segment
+        self.buffer_size = buffer_size
+        self.segment_file = self._open_segment()
+        self.index_file = open(os.path.join(directory, INDEX_FILENAME), 'ab')
+        # Les entrées d'index ne sont écrites qu'après fsync des données qu'elles désignent
+        self.pending_index = bytearray()
+
+    def _open_segment(self):
+        return open(os.path.join(self.directory, SEGMENT_PATTERN.format(self.segment)), 'ab', buffering=self.buffer_size)
+
+    def rotate(self) -> None:
+        """Passe au segment suivant (segment courant rendu durable, index écrit au prochain sync)"""
+        self.segment_file.flush()
+        os.fsync(self.segment_file.fileno())
+        self.segment_file.close()
+        self.segment += 1
+        self.segment_file = self._open_segment()
+
+    def follow_rotation(self) -> None:
+        """Rejoint le dernier segment si un autre processus en a ouvert un nouveau"""
+        while os.path.exists(os.path.join(self.directory, SEGMENT_PATTERN.format(self.segment + 1))):
+            self.rotate()
+
+    def sync(self) -> None:
+        """Rend durables les données puis l'index qui les référence"""
+        if not self.pending_index:
+            return
+        self.segment_file.flush()
+        os.fsync(self.segment_file.fileno())
+        with exclusive_lock(self.index_file):
+            self.index_file.write(self.pending_index)
+            self.index_file.flush()
+        os.fsync(self.index_file.fileno())
+        self.pending_index.clear()
+
+    def close(self) -> None:
+        """Synchronise et ferme les fichiers"""
+        self.sync()
+        self.segment_file.close()
+        self.index_file.close()
+
+
+class RecordingStore:
+    """
+    Stockage append-only des enregistrements d'une session
+
+    Chaque flux (video, audio) reçoit des morceaux encodés (WebM, Opus...) écrits
+    dans des segments tournants. Toutes les écritures passent par un unique
+    thread d'E/S ; les fsync sont regroupés toutes les RECORDING_FSYNC_INTERVAL_MS.
+    """
+
+    def __init__(self, root_dir: Optional[str] = None):
+        """Initialisation du stockage des enregistrements"""
+        self.root_dir = root_dir or os.path.join(settings.UPLOAD_DIR, 'recordings')
+        self.segment_max_bytes = settings.RECORDING_SEGMENT_MAX_BYTES
+        self.fsync_interval = settings.RECORDING_FSYNC_INTERVAL_MS / 1000.0
+        self.buffer_size = settings.RECORDING_WRITE_BUFFER_BYTES
+        self.max_open_writers = 512
+
+        # Un seul thread : ordre des écritures garanti, pas de verrou par flux
+        self._io = ThreadPoolExecutor(max_workers=1, thread_name_prefix="recording-io")
+        self._writers: "OrderedDict[Tuple[str, str], _StreamWriter]" = OrderedDict()
+        self._task: Optional[asyncio.Task] = None
+
+        os.makedirs(self.root_dir, exist_ok=True)
+        logger.info("Stockage des enregistrements initialisé")
+
+    def stream_dir(self, session_id, stream: str) -> str:
+        """Répertoire de stockage d'un flux"""
+        return os.path.join(self.root_dir, str(session_id), stream)
+
+    # ------------------------------------------------------------------
+    # Cycle de vie
+    # ------------------------------------------------------------------
+
+    async def start(self) -> None:
+        """Démarre la synchronisation périodique (hook lifespan)"""
+        if self._task is None:
+            self._task = asyncio.create_task(self._run())
+
+    async def stop(self) -> None:
+        """Arrête la synchronisation et ferme tous les flux"""
+        if self._task is not None:
+            self._task.cancel()
+            try:
+                await self._task
+            except asyncio.CancelledError:
+                pass
+            self._task = None
+        await asyncio.get_running_loop().run_in_executor(self._io, self._close_all)
+
+    async def _run(self) -> None:
+        """Boucle de synchronisation (fsync groupés)"""
+        loop = asyncio.get_running_loop()
+        while True:
+            await asyncio.sleep(self.fsync_interval)
+            try:
+                await loop.run_in_executor(self._io, self._sync_all)
+            except Exception as e:
+                logger.error(f"Erreur lors de la synchronisation des enregistrements: {e}")
+
+    # ------------------------------------------------------------------
+    # Écriture (thread d'E/S)
+    # ------------------------------------------------------------------
+
+    def _get_writer(self, session_id: str, stream: str) -> _StreamWriter:
+        """Récupère (ou ouvre) l'écrivain d'un flux"""
+        key = (session_id, stream)
+        writer = self._writers.get(key)
+        if writer is not None:
+            self._writers.move_to_end(key)
+            return writer
+
+        directory = self.stream_dir(session_id, stream)
+        os.makedirs(directory, exist_ok=True)
+
+        # Reprise après redémarrage : on continue le dernier segment
+        segments = sorted(
+            name for name in os.listdir(directory)
+            if name.startswith('segment_') and name.endswith('.bin')
+        )
+        segment = int(segments[-1][8:14]) if segments else 0
+
+        writer = _StreamWriter(directory, segment, self.buffer_size)
+        self._writers[key] = writer
+        while len(self._writers) > self.max_open_writers:
+            _, evicted = self._writers.popitem(last=False)
+            evicted.close()
+        return writer
+
+    def _write(self, session_id: str, stream: str, data: bytes, timestamp: float) -> Dict:
+        """Ajoute un morceau à un flux"""
+        writer = self._get_writer(session_id, stream)
+
+        # Les workers de serve.py partagent les segments : segment courant, position et
+        # écriture sous verrou, le morceau est transmis au système avant sa libération
+        with exclusive_lock(writer.index_file):
+            writer.follow_rotation()
+            if writer.segment_file.seek(0, os.SEEK_END) >= self.segment_max_bytes:
+                writer.rotate()
+
+            offset = writer.segment_file.seek(0, os.SEEK_END)
+            writer.segment_file.write(RECORD_HEADER.pack(timestamp, len(data)))
+            writer.segment_file.write(data)
+            writer.segment_file.flush()
+        writer.pending_index += INDEX_ENTRY.pack(timestamp, writer.segment, offset + RECORD_HEADER.size, len(data))
+
+        return {'segment': writer.segment, 'offset': offset, 'bytes': len(data)}
+
+    def _sync_all(self) -> None:
+        """Synchronise tous les flux ouverts"""
+        for writer in self._writers.values():
+            writer.sync()
+
+    def _close(self, session_id: str) -> None:
+        """Ferme les flux d'une session"""
+        for stream in STREAMS:
+            writer = self._writers.pop((session_id, stream), None)
+            if writer is not None:
+                writer.close()
+
+    def _delete(self, session_id: str) -> Tuple[int, int]:
+        """Ferme puis supprime les flux d'une session"""
+        self._close(session_id)
+        return remove_tree(os.path.join(self.root_dir, session_id))
+
+    def _close_all(self) -> None:
+        """Ferme tous les flux"""
+        while self._writers:
+            _, writer = self._writers.popitem()
+            writer.close()
+
+    # ------------------------------------------------------------------
+    # API asynchrone
+    # ------------------------------------------------------------------
+
+    async def append(self, session_id, stream: str, data: bytes, timestamp: Optional[float] = None) -> Dict:
+        """
+        Ajoute un morceau encodé au flux d'une session
+
+        Args:
+            session_id: Identifiant de la session
+            stream: Flux (video ou audio)
+            data: Morceau encodé (tel que produit par le client)
+            timestamp: Horodatage (secondes epoch), maintenant par défaut
+
+        Returns:
+            Position de l'enregistrement (segment, position, taille)
+        """
+        if stream not in STREAMS:
+            raise ValueError(f"Flux inconnu: {stream}")
+        timestamp = time.time() if timestamp is None else float(timestamp)
+        return await asyncio.get_running_loop().run_in_executor(
+            self._io, self._write, str(session_id), stream, bytes(data), timestamp
+        )
+
+    async def flush(self) -> None:
+        """Force la synchronisation des flux ouverts"""
+        await asyncio.get_running_loop().run_in_executor(self._io, self._sync_all)
+
+    async def close_session(self, session_id) -> Dict:
+        """
+        Ferme les flux d'une session (fin d'examen)
+
+        Returns:
+            Chemins relatifs des flux enregistrés, par flux
+        """
+        session_id = str(session_id)
+        await asyncio.get_running_loop().run_in_executor(self._io, self._close, session_id)
+        return {
+            stream: os.path.relpath(self.stream_dir(session_id, stream), settings.UPLOAD_DIR)
+            for stream in STREAMS
+            if os.path.isdir(self.stream_dir(session_id, stream))
+        }
+
+    def session_ids(self) -> List[int]:
+        """Sessions dont des enregistrements sont stockés"""
+        if not os.path.isdir(self.root_dir):
+            return []
+        return sorted(int(name) for name in os.listdir(self.root_dir) if name.isdigit())
+
+    async def delete_session(self, session_id) -> Tuple[int, int]:
+        """
+        Supprime les enregistrements d'une session (rétention)
+
+        Args:
+            session_id: Identifiant de la session
+
+        Returns:
+            Nombre de fichiers supprimés et octets libérés
+        """
+        # Thread d'E/S : aucune écriture en attente ne recrée le flux après suppression
+        return await asyncio.get_running_loop().run_in_executor(self._io, self._delete, str(int(session_id)))
+
+    # ------------------------------------------------------------------
+    # Lecture (mmap, sans chargement complet)
+    # ------------------------------------------------------------------
+
+    def open_reader(self, session_id, stream: str) -> "RecordingReader":
+        """Ouvre un lecteur sur les données déjà synchronisées d'un flux"""
+        if stream not in STREAMS:
+            raise ValueError(f"Flux inconnu: {stream}")
+        return RecordingReader(self.stream_dir(session_id, stream))
+
+
+class RecordingReader:
+    """Accès aléatoire à un flux enregistré via mmap (index et segments)"""
+
+    def __init__(self, directory: str):
+        self.directory = directory
+        self._maps: Dict[int, mmap.mmap] = {}
+        self._index_map: Optional[mmap.mmap] = None
+        self.index = np.zeros(0, dtype=INDEX_DTYPE)
+
+        path = os.path.join(directory, INDEX_FILENAME)
+        if os.path.exists(path):
+            # Une entrée partiellement écrite (arrêt brutal) est ignorée
+            count = os.path.getsize(path) // INDEX_DTYPE.itemsize
+            if count:
+                with open(path, 'rb') as handle:
+                    self._index_map = mmap.mmap(handle.fileno(), count * INDEX_DTYPE.itemsize, access=mmap.ACCESS_READ)
+                self.index = np.frombuffer(self._index_map, dtype=INDEX_DTYPE, count=count)
+                # Chaque worker ajoute ses entrées à sa synchronisation : l'index peut
+                # mêler deux workers hors de l'ordre chronologique
+                if count > 1 and (np.diff(self.index['timestamp']) < 0).any():
+                    self.index = np.sort(self.index, order='timestamp', kind='stable')
+
+    def __enter__(self) -> "RecordingReader":
+        return self
+
+    def __exit__(self, *exc) -> None:
+        self.close()
+
+    def _segment(self, segment: int) -> mmap.mmap:
+        """Projette un segment en mémoire à la première lecture"""
+        mapped = self._maps.get(segment)
+        if mapped is None:
+            with open(os.path.join(self.directory, SEGMENT_PATTERN.format(segment)), 'rb') as handle:
+                mapped = mmap.mmap(handle.fileno(), 0, access=mmap.ACCESS_READ)
+            self._maps[segment] = mapped
+        return mapped
+
+    def _chunk(self, position: int) -> bytes:
+        """Données d'une entrée d'index (seules ces pages sont lues)"""
+        entry = self.index[position]
+        offset = int(entry['offset'])
+        return self._segment(int(entry['segment']))[offset:offset + int(entry['length'])]
+
+    def chunk_at(self, timestamp: float) -> Optional[Tuple[float, bytes]]:
+        """Morceau en cours à un instant donné (dernier morceau antérieur)"""
+        position = int(np.searchsorted(self.index['timestamp'], timestamp, side='right')) - 1
+        if position < 0:
+            return None
+        return float(self.index['timestamp'][position]), self._chunk(position)
+
+    def iter_range(self, start: Optional[float] = None, end: Optional[float] = None) -> Iterator[Tuple[float, bytes]]:
+        """Parcourt les morceaux dont l'horodatage est dans [start, end]"""
+        timestamps = self.index['timestamp']
+        first = 0 if start is None else int(np.searchsorted(timestamps, start, side='left'))
+        last = len(timestamps) if end is None else int(np.searchsorted(timestamps, end, side='right'))
+        for position in range(first, last):
+            yield float(timestamps[position]), self._chunk(position)
+
+    def close(self) -> None:
+        """Libère les projections mémoire"""
+        # Les vues numpy doivent disparaître avant la fermeture du mmap de l'index
+        self.index = np.zeros(0, dtype=INDEX_DTYPE)
+        for mapped in self._maps.values():
+            mapped.close()
+        self._maps.clear()
+        if self._index_map is not None:
+            self._index_map.close()
+            self._index_map = None
+
+# Instance globale du stockage
+recording_store = RecordingStore()
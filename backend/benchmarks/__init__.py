@@ -0,0 +1,9 @@
+"""
+Benchmarks ProctoFlex AI
+Mesure reproductible des services IA et des endpoints sur un corpus d'images synthétiques
+
+Utilisation (depuis le dossier backend) :
+    python -m benchmarks corpus --output bench-corpus
+    python -m benchmarks run --corpus bench-corpus --output avant.json
+    python -m benchmarks compare avant.json apres.json
+"""
@@ -0,0 +1,116 @@
+"""
+Point d'entrée des benchmarks ProctoFlex AI (python -m benchmarks)
+"""
+
+import argparse
+import sys
+
+from benchmarks.corpus import build_corpus, ensure_corpus
+from benchmarks.harness import prepare_environment
+
+
+def main(argv=None) -> int:
+    """Fonction principale"""
+    parser = argparse.ArgumentParser(prog="python -m benchmarks", description="Benchmarks des services IA ProctoFlex AI")
+    commands = parser.add_subparsers(dest="command", required=True)
+
+    corpus_parser = commands.add_parser("corpus", help="génère le corpus synthétique")
+    corpus_parser.add_argument("--output", default="bench-corpus", help="répertoire du corpus")
+    corpus_parser.add_argument("--seed", type=int, default=1234)
+
+    run_parser = commands.add_parser("run", help="exécute les benchmarks")
+    run_parser.add_argument("--corpus", default="bench-corpus", help="répertoire du corpus (généré s'il est absent)")
+    run_parser.add_argument("--seed", type=int, default=1234, help="graine si le corpus doit être généré")
+    run_parser.add_argument("--output", default="benchmark-results.json", help="fichier de résultats JSON")
+    run_parser.add_argument("--iterations", type=int, default=3, help="passages sur le corpus par cas")
+    run_parser.add_argument("--warmup", type=int, default=2, help="appels de chauffe non mesurés")
+    run_parser.add_argument("--cases", nargs="*", help="motifs des cas à exécuter (ex. 'service.*')")
+    run_parser.add_argument("--no-endpoints", action="store_true", help="ne mesure que les méthodes des services")
+    run_parser.add_argument("--workdir", help="répertoire de la base et des uploads (temporaire par défaut)")
+
+    load_parser = commands.add_parser("load", help="simule des sessions d'examen simultanées")
+    load_parser.add_argument("--sessions", default="1,2,4,8,16", help="paliers de sessions simultanées (ex. 1,2,4,8)")
+    load_parser.add_argument("--duration", type=float, default=30.0, help="durée de diffusion par palier (s)")
+    load_parser.add_argument("--fps", type=float, default=1.0, help="images vidéo analysées par seconde et par session")
+    load_parser.add_argument("--screen-interval", type=float, default=5.0, help="intervalle des captures d'écran (s, 0 : aucune)")
+    load_parser.add_argument("--audio-interval", type=float, default=1.0, help="intervalle des morceaux audio (s, 0 : aucun)")
+    load_parser.add_argument("--audio-chunk-bytes", type=int, default=16000)
+    load_parser.add_argument("--max-drop-rate", type=float, default=0.01, help="taux d'abandon marquant la saturation")
+    load_parser.add_argument("--max-error-rate", type=float, default=0.01, help="taux d'erreur marquant la saturation")
+    load_parser.add_argument("--resolution", default="640x480", help="résolution des images envoyées")
+    load_parser.add_argument("--url", help="serveur local à charger (application en processus par défaut)")
+    load_parser.add_argument("--server-cores", type=int, help="cœurs alloués au serveur (sessions par cœur)")
+    load_parser.add_argument("--keep-going", action="store_true", help="continue après le premier palier saturé")
+    load_parser.add_argument("--corpus", default="bench-corpus")
+    load_parser.add_argument("--output", default="load-results.json")
+    load_parser.add_argument("--workdir", help="répertoire de la base et des uploads (temporaire par défaut)")
+
+    compare_parser = commands.add_parser("compare", help="compare deux exécutions")
+    compare_parser.add_argument("baseline", help="résultats de référence")
+    compare_parser.add_argument("candidate", help="résultats à évaluer")
+    compare_parser.add_argument("--threshold", type=float, default=0.10, help="variation tolérée (0.10 = 10 %%)")
+    compare_parser.add_argument("--fail-on-regression", action="store_true", help="code de sortie 1 en cas de régression")
+
+    args = parser.parse_args(argv)
+
+    if args.command == "corpus":
+        manifest = build_corpus(args.output, seed=args.seed)
+        print(f"✅ {len(manifest['frames'])} images générées dans {args.output}")
+        return 0
+
+    if args.command == "run":
+        # Avant tout import de l'application (configuration lue à l'import)
+        workdir = prepare_environment(args.workdir)
+        from benchmarks.runner import run_benchmarks, write_results
+
+        corpus = ensure_corpus(args.corpus, seed=args.seed)
+        print(f"🧪 Benchmarks ProctoFlex AI : {len(corpus['frames'])} images, {args.iterations} passage(s), travail dans {workdir}")
+        results = run_benchmarks(
+            corpus,
+            iterations=args.iterations,
+            warmup=args.warmup,
+            include_endpoints=not args.no_endpoints,
+            selection=args.cases
+        )
+        write_results(results, args.output)
+        print(f"✅ Résultats écrits dans {args.output}")
+        return 0
+
+    if args.command == "load":
+        import asyncio
+
+        workdir = prepare_environment(args.workdir)
+        from benchmarks.loadgen import LoadProfile, run_load
+        from benchmarks.runner import write_results
+
+        corpus = ensure_corpus(args.corpus)
+        frames = [frame for frame in corpus['frames'] if f"{frame['width']}x{frame['height']}" == args.resolution]
+        if not frames:
+            parser.error(f"aucune image {args.resolution} dans le corpus")
+        profile = LoadProfile(
+            frame_interval=1.0 / args.fps,
+            screen_interval=args.screen_interval,
+            audio_interval=args.audio_interval,
+            audio_chunk_bytes=args.audio_chunk_bytes,
+            duration=args.duration,
+            max_drop_rate=args.max_drop_rate,
+            max_error_rate=args.max_error_rate
+        )
+        steps = sorted(int(value) for value in args.sessions.split(","))
+        print(f"🧪 Charge ProctoFlex AI : cible {args.url or 'en processus'}, travail dans {workdir}")
+        report = asyncio.run(run_load(steps, frames, profile, args.url, args.server_cores, not args.keep_going))
+        write_results(report, args.output)
+        print(f"✅ {report['sustained_sessions']} session(s) soutenue(s), "
+              f"{report['sustained_sessions_per_core']} par cœur, saturation à {report['saturation_sessions'] or '-'}")
+        print(f"✅ Rapport écrit dans {args.output}")
+        return 0
+
+    from benchmarks.compare import compare_results, format_comparison, load_results
+
+    comparison = compare_results(load_results(args.baseline), load_results(args.candidate), args.threshold)
+    print(format_comparison(comparison))
+    return 1 if args.fail_on_regression and comparison['regressions'] else 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
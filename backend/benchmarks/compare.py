@@ -0,0 +1,104 @@
+"""
+Comparaison de deux exécutions des benchmarks ProctoFlex AI
+"""
+
+import json
+from typing import Dict, List, Optional
+
+# Indicateurs comparés : (clé, chemin dans les résultats, une hausse est-elle une régression ?)
+INDICATORS = (
+    ('p50_ms', ('latency_ms', 'p50'), True),
+    ('p95_ms', ('latency_ms', 'p95'), True),
+    ('p99_ms', ('latency_ms', 'p99'), True),
+    ('throughput_per_s', ('throughput_per_s',), False),
+    ('peak_rss_mb', ('peak_rss_mb',), True),
+)
+
+
+def load_results(path: str) -> Dict:
+    """Charge un fichier de résultats"""
+    with open(path) as handle:
+        return json.load(handle)
+
+
+def _value(result: Dict, path) -> Optional[float]:
+    for key in path:
+        if not isinstance(result, dict) or key not in result:
+            return None
+        result = result[key]
+    return float(result)
+
+
+def compare_results(baseline: Dict, candidate: Dict, threshold: float = 0.10) -> Dict:
+    """
+    Compare deux exécutions cas par cas
+
+    Args:
+        baseline: Résultats de référence
+        candidate: Résultats à évaluer
+        threshold: Variation relative au-delà de laquelle un écart défavorable est une régression
+
+    Returns:
+        Variations par cas et par indicateur, régressions et avertissements
+    """
+    warnings: List[str] = []
+    if baseline['meta']['corpus']['fingerprint'] != candidate['meta']['corpus']['fingerprint']:
+        warnings.append("Corpus différents : les résultats ne sont pas directement comparables")
+    if baseline['meta'].get('cpu_count') != candidate['meta'].get('cpu_count'):
+        warnings.append("Nombre de CPU différent entre les deux exécutions")
+
+    cases: Dict[str, Dict] = {}
+    regressions: List[str] = []
+    for name in sorted(set(baseline['results']) | set(candidate['results'])):
+        before = baseline['results'].get(name)
+        after = candidate['results'].get(name)
+        if before is None or after is None:
+            cases[name] = {'status': 'absent de la référence' if before is None else 'absent du candidat'}
+            continue
+
+        indicators = {}
+        for key, path, higher_is_worse in INDICATORS:
+            old, new = _value(before, path), _value(after, path)
+            if old is None or new is None:
+                continue
+            change = (new - old) / old if old else 0.0
+            regressed = (change > threshold) if higher_is_worse else (change < -threshold)
+            # Le pic mémoire n'est comparable que mesuré par cas dans les deux exécutions
+            if key == 'peak_rss_mb' and not (before.get('peak_rss_scope') == after.get('peak_rss_scope') == 'case'):
+                regressed = False
+            indicators[key] = {'before': old, 'after': new, 'change': round(change, 4), 'regression': regressed}
+            if regressed:
+                regressions.append(f"{name}: {key} {old:g} -> {new:g} ({change:+.1%})")
+
+        if after.get('errors', 0) > before.get('errors', 0):
+            regressions.append(f"{name}: erreurs {before.get('errors', 0)} -> {after.get('errors', 0)}")
+        cases[name] = {'status': 'comparé', 'indicators': indicators}
+
+    return {'threshold': threshold, 'warnings': warnings, 'regressions': regressions, 'cases': cases}
+
+
+def format_comparison(comparison: Dict) -> str:
+    """Tableau texte d'une comparaison"""
+    lines = [f"{'cas':<52} {'p50 ms':>20} {'p95 ms':>20} {'débit/s':>20}"]
+    for name, case in comparison['cases'].items():
+        if case['status'] != 'comparé':
+            lines.append(f"{name:<52} {case['status']}")
+            continue
+        cells = []
+        for key in ('p50_ms', 'p95_ms', 'throughput_per_s'):
+            indicator = case['indicators'].get(key)
+            if indicator is None:
+                cells.append(f"{'-':>20}")
+                continue
+            mark = ' ⚠️' if indicator['regression'] else ''
+            cells.append(f"{indicator['after']:>9.2f} ({indicator['change']:+.1%}){mark}".rjust(20))
+        lines.append(f"{name:<52} {' '.join(cells)}")
+
+    for warning in comparison['warnings']:
+        lines.append(f"⚠️  {warning}")
+    if comparison['regressions']:
+        lines.append(f"❌ {len(comparison['regressions'])} régression(s) au-delà de {comparison['threshold']:.0%}:")
+        lines.extend(f"   - {regression}" for regression in comparison['regressions'])
+    else:
+        lines.append(f"✅ Aucune régression au-delà de {comparison['threshold']:.0%}")
+    return "\n".join(lines)
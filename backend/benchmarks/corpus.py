@@ -0,0 +1,201 @@
+"""
+Corpus d'images des benchmarks ProctoFlex AI
+Images synthétiques déterministes (résolutions, nombre de visages, éclairage)
+ou images réelles chargées depuis un répertoire
+"""
+
+import base64
+import hashlib
+import itertools
+import json
+import os
+from typing import Dict, List, Optional
+
+import cv2
+import numpy as np
+
+MANIFEST_FILENAME = 'manifest.json'
+CORPUS_VERSION = 1
+
+# Dimensions couvertes (largeur, hauteur) : webcam basse définition, VGA, 720p
+RESOLUTIONS = ((320, 240), (640, 480), (1280, 720))
+FACE_COUNTS = (0, 1, 2)
+# Éclairage : facteur de luminosité et gamma appliqués à la scène
+LIGHTING = {
+    'dark': (0.35, 1.4),
+    'normal': (1.0, 1.0),
+    'bright': (1.5, 0.7),
+}
+IMAGE_EXTENSIONS = ('.jpg', '.jpeg', '.png')
+
+
+def _draw_face(canvas: np.ndarray, center, size: int, rng: np.random.Generator) -> List[int]:
+    """Dessine un visage schématique ; renvoie sa boîte englobante [x, y, w, h]"""
+    cx, cy = center
+    width, height = size, int(size * 1.25)
+    skin = tuple(int(v) for v in rng.integers((120, 150, 180), (170, 190, 230)))
+
+    cv2.ellipse(canvas, (cx, cy), (width // 2, height // 2), 0, 0, 360, skin, -1)
+    eye_y = cy - height // 8
+    for side in (-1, 1):
+        eye_x = cx + side * width // 5
+        cv2.ellipse(canvas, (eye_x, eye_y), (width // 10, width // 18), 0, 0, 360, (240, 240, 240), -1)
+        cv2.circle(canvas, (eye_x, eye_y), max(2, width // 24), (40, 30, 20), -1)
+        cv2.line(canvas, (eye_x - width // 8, eye_y - width // 7), (eye_x + width // 8, eye_y - width // 7), (50, 40, 30), max(1, width // 40))
+    cv2.line(canvas, (cx, eye_y + width // 12), (cx - width // 20, cy + height // 10), (90, 100, 140), max(1, width // 50))
+    cv2.ellipse(canvas, (cx, cy + height // 4), (width // 6, width // 16), 0, 0, 180, (60, 60, 150), -1)
+    return [cx - width // 2, cy - height // 2, width, height]
+
+
+def generate_frame(width: int, height: int, faces: int, lighting: str, seed: int) -> Dict:
+    """
+    Génère une image synthétique déterministe
+
+    Args:
+        width: Largeur en pixels
+        height: Hauteur en pixels
+        faces: Nombre de visages dessinés
+        lighting: Conditions d'éclairage (clé de LIGHTING)
+        seed: Graine du générateur aléatoire
+
+    Returns:
+        Image (BGR) et boîtes englobantes des visages
+    """
+    rng = np.random.default_rng(seed)
+
+    # Fond : dégradé vertical (mur) et bureau
+    top = rng.integers(90, 200, 3)
+    bottom = rng.integers(40, 140, 3)
+    ramp = np.linspace(0.0, 1.0, height, dtype=np.float32)[:, None, None]
+    canvas = (top * (1 - ramp) + bottom * ramp).astype(np.uint8).repeat(width, axis=1)
+    desk_y = int(height * 0.8)
+    canvas[desk_y:] = rng.integers(60, 120, 3).astype(np.uint8)
+
+    # Objets du bureau (contours pour la détection d'objets)
+    for _ in range(int(rng.integers(1, 4))):
+        w = int(rng.integers(width // 12, width // 5))
+        h = int(rng.integers(height // 20, height // 8))
+        x = int(rng.integers(0, width - w))
+        color = tuple(int(v) for v in rng.integers(0, 255, 3))
+        cv2.rectangle(canvas, (x, desk_y - h), (x + w, desk_y), color, -1)
+
+    boxes = []
+    face_size = int(min(width, height) * (0.35 if faces <= 1 else 0.25))
+    for index in range(faces):
+        cx = width // 2 if faces == 1 else int(width * (index + 1) / (faces + 1))
+        cy = int(height * 0.42)
+        boxes.append(_draw_face(canvas, (cx, cy), face_size, rng))
+
+    # Éclairage puis bruit de capteur
+    gain, gamma = LIGHTING[lighting]
+    image = canvas.astype(np.float32) / 255.0
+    image = np.clip((image ** gamma) * gain, 0.0, 1.0) * 255.0
+    image += rng.normal(0.0, 4.0, image.shape).astype(np.float32)
+    return {'image': np.clip(image, 0, 255).astype(np.uint8), 'faces': boxes}
+
+
+def build_corpus(output_dir: str, seed: int = 1234, quality: int = 90) -> Dict:
+    """
+    Génère le corpus synthétique complet dans un répertoire
+
+    Une image par combinaison résolution / visages / éclairage, encodée en JPEG ;
+    le manifeste conserve les paramètres et l'empreinte SHA-256 de chaque image.
+
+    Returns:
+        Manifeste du corpus
+    """
+    os.makedirs(output_dir, exist_ok=True)
+    frames = []
+    combinations = itertools.product(RESOLUTIONS, FACE_COUNTS, LIGHTING)
+    for index, ((width, height), faces, lighting) in enumerate(combinations):
+        generated = generate_frame(width, height, faces, lighting, seed + index)
+        ok, encoded = cv2.imencode('.jpg', generated['image'], [cv2.IMWRITE_JPEG_QUALITY, quality])
+        if not ok:
+            raise RuntimeError("Encodage JPEG impossible")
+        data = encoded.tobytes()
+
+        name = f"{width}x{height}_{faces}faces_{lighting}.jpg"
+        with open(os.path.join(output_dir, name), 'wb') as handle:
+            handle.write(data)
+        frames.append({
+            'file': name,
+            'width': width,
+            'height': height,
+            'faces': faces,
+            'lighting': lighting,
+            'face_boxes': generated['faces'],
+            'sha256': hashlib.sha256(data).hexdigest()
+        })
+
+    manifest = {'version': CORPUS_VERSION, 'seed': seed, 'quality': quality, 'frames': frames}
+    with open(os.path.join(output_dir, MANIFEST_FILENAME), 'w') as handle:
+        json.dump(manifest, handle, indent=2)
+    return manifest
+
+
+def _describe_image(directory: str, name: str) -> Optional[Dict]:
+    """Entrée de manifeste pour une image réelle (sans annotation de visages)"""
+    image = cv2.imread(os.path.join(directory, name), cv2.IMREAD_COLOR)
+    if image is None:
+        return None
+    with open(os.path.join(directory, name), 'rb') as handle:
+        digest = hashlib.sha256(handle.read()).hexdigest()
+    return {
+        'file': name,
+        'width': image.shape[1],
+        'height': image.shape[0],
+        'faces': None,
+        'lighting': None,
+        'face_boxes': [],
+        'sha256': digest
+    }
+
+
+def load_corpus(directory: str, verify: bool = True) -> Dict:
+    """
+    Charge un corpus depuis un répertoire
+
+    Avec un manifeste, les empreintes sont vérifiées (un corpus modifié fausserait
+    la comparaison de deux exécutions). Sans manifeste, toutes les images JPEG / PNG
+    du répertoire sont utilisées, triées par nom.
+
+    Args:
+        directory: Répertoire du corpus
+        verify: Vérifie les empreintes SHA-256 du manifeste
+
+    Returns:
+        Manifeste, complété des images encodées (octets et base64) et décodées (RGB)
+    """
+    manifest_path = os.path.join(directory, MANIFEST_FILENAME)
+    if os.path.exists(manifest_path):
+        with open(manifest_path) as handle:
+            manifest = json.load(handle)
+    else:
+        names = sorted(name for name in os.listdir(directory) if name.lower().endswith(IMAGE_EXTENSIONS))
+        frames = [entry for entry in (_describe_image(directory, name) for name in names) if entry]
+        manifest = {'version': CORPUS_VERSION, 'seed': None, 'quality': None, 'frames': frames}
+
+    if not manifest['frames']:
+        raise ValueError(f"Aucune image dans le corpus {directory}")
+
+    for frame in manifest['frames']:
+        with open(os.path.join(directory, frame['file']), 'rb') as handle:
+            data = handle.read()
+        if verify and hashlib.sha256(data).hexdigest() != frame['sha256']:
+            raise ValueError(f"Image modifiée depuis la génération du corpus: {frame['file']}")
+        frame['bytes'] = data
+        frame['base64'] = 'data:image/jpeg;base64,' + base64.b64encode(data).decode('ascii')
+        frame['rgb'] = cv2.cvtColor(cv2.imdecode(np.frombuffer(data, np.uint8), cv2.IMREAD_COLOR), cv2.COLOR_BGR2RGB)
+
+    manifest['directory'] = os.path.abspath(directory)
+    manifest['fingerprint'] = hashlib.sha256(
+        ''.join(frame['sha256'] for frame in manifest['frames']).encode('ascii')
+    ).hexdigest()
+    return manifest
+
+
+def ensure_corpus(directory: str, seed: int = 1234) -> Dict:
+    """Charge le corpus, en le générant d'abord si le répertoire est vide ou absent"""
+    if not os.path.isdir(directory) or not os.listdir(directory):
+        build_corpus(directory, seed=seed)
+    return load_corpus(directory)
@@ -0,0 +1,87 @@
+"""
+Application en processus pour les benchmarks ProctoFlex AI
+Base SQLite et répertoire d'uploads temporaires, client ASGI authentifié
+"""
+
+import os
+import resource
+import tempfile
+from typing import Dict, Optional
+
+# Base de l'API (settings.API_V1_STR)
+API = "/api/v1"
+
+
+def prepare_environment(workdir: Optional[str] = None) -> str:
+    """
+    Isole l'application dans un répertoire de travail temporaire
+
+    Doit être appelé avant tout import de `app` ou `main` : la configuration est
+    lue à l'import. Les variables déjà définies par l'appelant sont conservées.
+
+    Returns:
+        Répertoire de travail
+    """
+    workdir = workdir or tempfile.mkdtemp(prefix="proctoflex-bench-")
+    os.makedirs(workdir, exist_ok=True)
+    os.environ.setdefault("DATABASE_URL", f"sqlite:///{os.path.join(workdir, 'bench.db')}")
+    os.environ.setdefault("UPLOAD_DIR", os.path.join(workdir, "uploads"))
+    # Tâches de fond sans intérêt pour les mesures
+    os.environ.setdefault("RETENTION_ENABLED", "false")
+    os.environ.setdefault("DB_AUTO_MIGRATE", "false")
+    return workdir
+
+
+def create_schema() -> None:
+    """Crée les tables dans la base de benchmark (sans passer par Alembic)"""
+    from app.core.database import Base, engine
+    Base.metadata.create_all(bind=engine)
+
+
+def register_user(client, username: str, password: str = "bench-password", role: str = "student") -> Dict:
+    """
+    Crée un compte et renvoie les en-têtes d'authentification
+
+    Returns:
+        En-têtes HTTP (Authorization: Bearer ...)
+    """
+    response = client.post(f"{API}/auth/register", json={
+        "email": f"{username}@example.com",
+        "username": username,
+        "full_name": username,
+        "password": password,
+        "role": role
+    })
+    if response.status_code != 200:
+        response = client.post(f"{API}/auth/login", data={"username": username, "password": password})
+    response.raise_for_status()
+    return {"Authorization": f"Bearer {response.json()['access_token']}"}
+
+
+def peak_rss_reset() -> bool:
+    """
+    Réinitialise le pic de mémoire résidente du processus (Linux, /proc/self/clear_refs)
+
+    Returns:
+        True si la réinitialisation est prise en charge
+    """
+    try:
+        with open("/proc/self/clear_refs", "w") as handle:
+            handle.write("5")
+        return True
+    except OSError:
+        return False
+
+
+def peak_rss_bytes() -> int:
+    """Pic de mémoire résidente du processus (VmHWM, ou ru_maxrss à défaut)"""
+    try:
+        with open("/proc/self/status") as handle:
+            for line in handle:
+                if line.startswith("VmHWM:"):
+                    return int(line.split()[1]) * 1024
+    except OSError:
+        pass
+    # ru_maxrss : kilo-octets sous Linux, octets sous macOS
+    maxrss = resource.getrusage(resource.RUSAGE_SELF).ru_maxrss
+    return maxrss if os.uname().sysname == "Darwin" else maxrss * 1024
@@ -0,0 +1,326 @@
+"""
+Générateur de charge ProctoFlex AI
+Simule N sessions d'examen simultanées, dans le processus (ASGI) ou contre un serveur local
+"""
+
+import asyncio
+import os
+import resource
+import time
+from datetime import datetime, timezone
+from typing import Dict, List, Optional, Set
+
+import numpy as np
+
+from benchmarks.harness import API, create_schema
+from benchmarks.runner import summarize
+
+
+class LoadProfile:
+    """Comportement d'un étudiant simulé (cadences d'envoi et tailles)"""
+
+    def __init__(
+        self,
+        frame_interval: float = 1.0,
+        screen_interval: float = 5.0,
+        audio_interval: float = 1.0,
+        audio_chunk_bytes: int = 16000,
+        duration: float = 30.0,
+        max_drop_rate: float = 0.01,
+        max_error_rate: float = 0.01
+    ):
+        self.frame_interval = frame_interval
+        self.screen_interval = screen_interval
+        self.audio_interval = audio_interval
+        self.audio_chunk_bytes = audio_chunk_bytes
+        # Durée de la phase de diffusion, par palier
+        self.duration = duration
+        # Seuils de saturation d'un palier
+        self.max_drop_rate = max_drop_rate
+        self.max_error_rate = max_error_rate
+
+    def to_dict(self) -> Dict:
+        return dict(self.__dict__)
+
+
+class _StepRecorder:
+    """Latences par endpoint, images envoyées et abandonnées pendant un palier"""
+
+    def __init__(self):
+        self.latencies: Dict[str, List[float]] = {}
+        self.errors: Dict[str, int] = {}
+        self.scheduled: Dict[str, int] = {}
+        self.dropped: Dict[str, int] = {}
+
+    async def request(self, client, endpoint: str, method: str, url: str, **kwargs):
+        """Exécute une requête et enregistre sa latence sous le nom de l'endpoint"""
+        started = time.perf_counter()
+        try:
+            response = await client.request(method, url, **kwargs)
+            ok = response.status_code < 400
+        except Exception:
+            response, ok = None, False
+        self.latencies.setdefault(endpoint, []).append(time.perf_counter() - started)
+        if not ok:
+            self.errors[endpoint] = self.errors.get(endpoint, 0) + 1
+        return response if ok else None
+
+
+async def _authenticate(client, recorder: _StepRecorder, username: str, accounts: Set[str],
+                        password: str = "load-password") -> Optional[Dict]:
+    """Connexion d'un étudiant (compte créé au premier palier qui l'utilise)"""
+    if username in accounts:
+        response = await recorder.request(client, "POST /auth/login", "POST", f"{API}/auth/login",
+                                          data={"username": username, "password": password})
+    else:
+        response = await recorder.request(client, "POST /auth/register", "POST", f"{API}/auth/register", json={
+            "email": f"{username}@example.com",
+            "username": username,
+            "full_name": username,
+            "password": password,
+            "role": "student"
+        })
+    if response is None:
+        return None
+    accounts.add(username)
+    return {"Authorization": f"Bearer {response.json()['access_token']}"}
+
+
+async def _stream(interval: float, deadline: float, name: str, recorder: _StepRecorder, send) -> None:
+    """
+    Envoie à cadence fixe jusqu'à l'échéance
+
+    Comme un client réel, une image dont l'instant d'envoi est passé pendant que
+    la requête précédente est encore en cours est abandonnée, pas mise en file.
+    """
+    next_tick = time.monotonic()
+    while next_tick < deadline:
+        recorder.scheduled[name] = recorder.scheduled.get(name, 0) + 1
+        await send()
+
+        now = time.monotonic()
+        missed = int((now - next_tick) // interval)
+        if missed > 0:
+            # Instants d'envoi manqués pendant la requête (hors de la fenêtre : non comptés)
+            missed = min(missed, max(0, int((deadline - next_tick) // interval)))
+            recorder.scheduled[name] += missed
+            recorder.dropped[name] = recorder.dropped.get(name, 0) + missed
+        next_tick += (missed + 1) * interval
+        await asyncio.sleep(max(0.0, next_tick - time.monotonic()))
+
+
+class _StepControl:
+    """Synchronisation d'un palier : les étudiants diffusent ensemble, après leur installation"""
+
+    def __init__(self, sessions: int, accounts: Set[str]):
+        self.sessions = sessions
+        self.accounts = accounts
+        self.ready = 0
+        self.all_ready = asyncio.Event()
+        self.go = asyncio.Event()
+        self.deadline = 0.0
+
+    def mark_ready(self) -> None:
+        self.ready += 1
+        if self.ready >= self.sessions:
+            self.all_ready.set()
+
+
+async def _student(client, index: int, frames: List[Dict], profile: LoadProfile,
+                   setup: _StepRecorder, recorder: _StepRecorder, control: _StepControl) -> None:
+    """Parcours d'un étudiant : connexion, vérification d'identité, session, diffusion"""
+    session_id = None
+    try:
+        headers = await _authenticate(client, setup, f"load-student-{index}", control.accounts)
+        if headers is not None:
+            frame = frames[index % len(frames)]
+            await setup.request(client, "POST /surveillance/verify-identity", "POST", f"{API}/surveillance/verify-identity",
+                                headers=headers, json={"reference_image": frame['base64'], "current_image": frame['base64']})
+            response = await setup.request(client, "POST /surveillance/start-session", "POST", f"{API}/surveillance/start-session",
+                                           headers=headers, json={"exam_id": 1, "identity_verified": True})
+            if response is not None:
+                session_id = response.json()['session_id']
+    finally:
+        control.mark_ready()
+    if session_id is None:
+        return
+
+    # Tous les étudiants diffusent ensemble : la mesure ne couvre que la phase stable
+    await control.go.wait()
+    audio_chunk = np.random.default_rng(index).integers(0, 256, profile.audio_chunk_bytes, dtype=np.uint8).tobytes()
+    sequence = [0]
+
+    def analysis(payload: Dict) -> Dict:
+        return {"session_id": str(session_id), "timestamp": datetime.now(timezone.utc).isoformat(), **payload}
+
+    async def send_frame():
+        sequence[0] += 1
+        image = frames[(index + sequence[0]) % len(frames)]['base64']
+        await recorder.request(client, "POST /ai/surveillance-analysis (video)", "POST", f"{API}/ai/surveillance-analysis",
+                               headers=headers, json=analysis({"video_frame": image}))
+
+    async def send_screen():
+        await recorder.request(client, "POST /ai/surveillance-analysis (screen)", "POST", f"{API}/ai/surveillance-analysis",
+                               headers=headers, json=analysis({"screen_capture": frame['base64']}))
+
+    async def send_audio():
+        await recorder.request(client, "POST /surveillance/session/{id}/recording/audio", "POST",
+                               f"{API}/surveillance/session/{session_id}/recording/audio",
+                               headers={**headers, "Content-Type": "application/octet-stream"}, content=audio_chunk)
+
+    streams = [_stream(profile.frame_interval, control.deadline, "video", recorder, send_frame)]
+    if profile.screen_interval > 0:
+        streams.append(_stream(profile.screen_interval, control.deadline, "screen", recorder, send_screen))
+    if profile.audio_interval > 0:
+        streams.append(_stream(profile.audio_interval, control.deadline, "audio", recorder, send_audio))
+    await asyncio.gather(*streams)
+
+    await setup.request(client, "POST /surveillance/session/{id}/end", "POST",
+                        f"{API}/surveillance/session/{session_id}/end", headers=headers)
+
+
+async def run_step(client, sessions: int, frames: List[Dict], profile: LoadProfile, accounts: Set[str]) -> Dict:
+    """
+    Exécute un palier de charge (N sessions simultanées)
+
+    Returns:
+        Rapport du palier : latences par endpoint, taux d'abandon, CPU consommé
+    """
+    setup = _StepRecorder()
+    recorder = _StepRecorder()
+    control = _StepControl(sessions, accounts)
+
+    # Connexion et démarrage des sessions, mesurés à part de la phase de diffusion
+    tasks = [
+        asyncio.create_task(_student(client, index, frames, profile, setup, recorder, control))
+        for index in range(sessions)
+    ]
+    await control.all_ready.wait()
+
+    cpu_before = resource.getrusage(resource.RUSAGE_SELF)
+    started = time.monotonic()
+    control.deadline = started + profile.duration
+    control.go.set()
+    await asyncio.gather(*tasks)
+    wall = time.monotonic() - started
+    cpu_after = resource.getrusage(resource.RUSAGE_SELF)
+
+    cpu_seconds = (cpu_after.ru_utime - cpu_before.ru_utime) + (cpu_after.ru_stime - cpu_before.ru_stime)
+    scheduled = sum(recorder.scheduled.values())
+    dropped = sum(recorder.dropped.values())
+    calls = sum(len(values) for values in recorder.latencies.values())
+    errors = sum(recorder.errors.values())
+    failed_sessions = sessions - len(setup.latencies.get("POST /surveillance/start-session", [])) + \
+        setup.errors.get("POST /surveillance/start-session", 0)
+
+    return {
+        'sessions': sessions,
+        'failed_sessions': failed_sessions,
+        'wall_seconds': round(wall, 2),
+        'process_cpu_seconds': round(cpu_seconds, 2),
+        'process_cpu_utilization': round(cpu_seconds / wall, 3) if wall else 0.0,
+        'scheduled': dict(recorder.scheduled),
+        'dropped': dict(recorder.dropped),
+        'drop_rate': round(dropped / scheduled, 4) if scheduled else 0.0,
+        'error_rate': round(errors / calls, 4) if calls else 0.0,
+        'video_frames_per_s': round((recorder.scheduled.get('video', 0) - recorder.dropped.get('video', 0)) / profile.duration, 3),
+        'endpoints': {
+            endpoint: summarize(values, wall, recorder.errors.get(endpoint, 0))
+            for endpoint, values in sorted(recorder.latencies.items())
+        },
+        'setup': {
+            endpoint: summarize(values, sum(values), setup.errors.get(endpoint, 0))
+            for endpoint, values in sorted(setup.latencies.items())
+        }
+    }
+
+
+def _saturated(step: Dict, profile: LoadProfile) -> bool:
+    """Un palier est saturé dès que les abandons ou les erreurs dépassent leur seuil"""
+    return (
+        step['failed_sessions'] > 0
+        or step['drop_rate'] > profile.max_drop_rate
+        or step['error_rate'] > profile.max_error_rate
+    )
+
+
+async def run_load(
+    steps: List[int],
+    frames: List[Dict],
+    profile: LoadProfile,
+    base_url: Optional[str] = None,
+    server_cores: Optional[int] = None,
+    stop_at_saturation: bool = True,
+    log=print
+) -> Dict:
+    """
+    Exécute une montée en charge par paliers
+
+    Args:
+        steps: Nombres de sessions simultanées, par palier croissant
+        frames: Images du corpus (voir benchmarks.corpus)
+        profile: Cadences et seuils
+        base_url: Serveur local à charger ; application en processus si absent
+        server_cores: Cœurs alloués au serveur (1 en processus : une seule boucle d'événements)
+        stop_at_saturation: Arrête la montée au premier palier saturé
+        log: Fonction d'affichage de la progression
+
+    Returns:
+        Rapport : paliers, point de saturation et sessions soutenues par cœur
+    """
+    import httpx
+
+    limits = httpx.Limits(max_connections=None, max_keepalive_connections=None)
+    timeout = httpx.Timeout(60.0)
+
+    if base_url is None:
+        import main
+
+        create_schema()
+        transport = httpx.ASGITransport(app=main.app)
+        client_context = httpx.AsyncClient(transport=transport, base_url="http://loadgen", timeout=timeout, limits=limits)
+        lifespan = main.app.router.lifespan_context(main.app)
+        cores = server_cores or 1
+    else:
+        client_context = httpx.AsyncClient(base_url=base_url.rstrip("/"), timeout=timeout, limits=limits)
+        lifespan = None
+        cores = server_cores or os.cpu_count() or 1
+
+    reports = []
+    saturation = None
+    accounts: Set[str] = set()
+    if lifespan is not None:
+        await lifespan.__aenter__()
+    try:
+        async with client_context as client:
+            for sessions in steps:
+                log(f"📈 {sessions} session(s) pendant {profile.duration:g} s...")
+                step = await run_step(client, sessions, frames, profile, accounts)
+                step['saturated'] = _saturated(step, profile)
+                reports.append(step)
+                video = step['endpoints'].get("POST /ai/surveillance-analysis (video)", {}).get('latency_ms', {})
+                log(f"    abandon {step['drop_rate']:.1%}, erreurs {step['error_rate']:.1%}, "
+                    f"vidéo p95 {video.get('p95', '-')} ms, CPU {step['process_cpu_utilization']:.2f}")
+                if step['saturated']:
+                    saturation = sessions
+                    if stop_at_saturation:
+                        break
+    finally:
+        if lifespan is not None:
+            await lifespan.__aexit__(None, None, None)
+
+    sustained = max((step['sessions'] for step in reports if not step['saturated']), default=0)
+    return {
+        'meta': {
+            'started_at': datetime.now(timezone.utc).isoformat(),
+            'target': base_url or 'in-process',
+            'server_cores': cores,
+            'client_cpu_count': os.cpu_count(),
+            'profile': profile.to_dict(),
+            'steps': steps
+        },
+        'sustained_sessions': sustained,
+        'sustained_sessions_per_core': round(sustained / cores, 2),
+        'saturation_sessions': saturation,
+        'steps': reports
+    }
@@ -0,0 +1,260 @@
+"""
+Exécution des benchmarks ProctoFlex AI
+Méthodes des services IA et endpoints complets, mesurés en processus
+"""
+
+import fnmatch
+import gc
+import json
+import os
+import platform
+import subprocess
+import sys
+import time
+from datetime import datetime, timezone
+from typing import Callable, Dict, List, Optional
+
+import numpy as np
+
+from benchmarks.harness import API, create_schema, peak_rss_bytes, peak_rss_reset, register_user
+
+RESULT_FORMAT_VERSION = 1
+
+
+def summarize(latencies: List[float], wall_seconds: float, errors: int = 0) -> Dict:
+    """
+    Statistiques d'une série de mesures
+
+    Args:
+        latencies: Durées des appels (secondes)
+        wall_seconds: Durée totale de la série
+        errors: Nombre d'appels en échec
+
+    Returns:
+        Débit, percentiles de latence (ms) et nombre d'appels
+    """
+    if not latencies:
+        return {'calls': 0, 'errors': errors, 'throughput_per_s': 0.0, 'latency_ms': {}}
+    samples = np.asarray(latencies) * 1000.0
+    p50, p95, p99 = np.percentile(samples, [50, 95, 99])
+    return {
+        'calls': len(latencies),
+        'errors': errors,
+        'throughput_per_s': round(len(latencies) / wall_seconds, 3) if wall_seconds > 0 else 0.0,
+        'latency_ms': {
+            'mean': round(float(samples.mean()), 3),
+            'p50': round(float(p50), 3),
+            'p95': round(float(p95), 3),
+            'p99': round(float(p99), 3),
+            'max': round(float(samples.max()), 3)
+        }
+    }
+
+
+class BenchmarkCase:
+    """Cas de benchmark : une fonction appelée une fois par image du corpus"""
+
+    def __init__(self, name: str, call: Callable[[Dict], object], frames: Optional[Callable[[Dict], bool]] = None):
+        self.name = name
+        self.call = call
+        # Filtre des images concernées (par exemple : images contenant un visage)
+        self.frames = frames or (lambda frame: True)
+
+    def run(self, corpus: Dict, iterations: int, warmup: int) -> Dict:
+        """Exécute le cas sur le corpus et renvoie ses statistiques"""
+        frames = [frame for frame in corpus['frames'] if self.frames(frame)]
+        if not frames:
+            return {'skipped': "aucune image adaptée dans le corpus"}
+
+        for frame in frames[:warmup]:
+            self.call(frame)
+
+        gc.collect()
+        rss_reset = peak_rss_reset()
+
+        latencies = []
+        by_resolution: Dict[str, List[float]] = {}
+        errors = 0
+        started = time.perf_counter()
+        for _ in range(iterations):
+            for frame in frames:
+                call_started = time.perf_counter()
+                try:
+                    ok = self.call(frame) is not False
+                except Exception:
+                    ok = False
+                elapsed = time.perf_counter() - call_started
+                if not ok:
+                    errors += 1
+                latencies.append(elapsed)
+                by_resolution.setdefault(f"{frame['width']}x{frame['height']}", []).append(elapsed)
+        wall = time.perf_counter() - started
+
+        result = summarize(latencies, wall, errors)
+        result['peak_rss_mb'] = round(peak_rss_bytes() / (1024 * 1024), 1)
+        result['peak_rss_scope'] = 'case' if rss_reset else 'process'
+        result['p50_ms_by_resolution'] = {
+            resolution: round(float(np.percentile(values, 50)) * 1000.0, 3)
+            for resolution, values in sorted(by_resolution.items())
+        }
+        return result
+
+
+def _reference_frame(corpus: Dict) -> Dict:
+    """Image de référence pour la vérification d'identité (un visage, éclairage normal)"""
+    for frame in corpus['frames']:
+        if frame.get('faces') == 1 and frame.get('lighting') == 'normal':
+            return frame
+    return corpus['frames'][0]
+
+
+def _face_box(frame: Dict) -> List[int]:
+    """Boîte du premier visage annoté, ou zone centrale de l'image"""
+    if frame.get('face_boxes'):
+        return frame['face_boxes'][0]
+    width, height = frame['width'], frame['height']
+    return [width // 4, height // 4, width // 2, height // 2]
+
+
+def service_cases(corpus: Dict) -> List[BenchmarkCase]:
+    """Cas mesurant directement les méthodes des services IA"""
+    from app.ai.face_detection import face_detection_service
+    from app.ai.object_detection import object_detection_service
+    from app.ai.screen_analysis import screen_analysis_service
+
+    reference = _reference_frame(corpus)
+    with_face = lambda frame: frame.get('faces') != 0
+
+    return [
+        BenchmarkCase('service.face_detection.decode_base64_image',
+                      lambda frame: face_detection_service.decode_base64_image(frame['base64'])),
+        BenchmarkCase('service.face_detection.detect_faces',
+                      lambda frame: face_detection_service.detect_faces(frame['rgb'])),
+        BenchmarkCase('service.face_detection.verify_identity',
+                      lambda frame: face_detection_service.verify_identity(frame['base64'], reference['base64'])),
+        BenchmarkCase('service.face_detection.track_gaze',
+                      lambda frame: face_detection_service.track_gaze(frame['base64'], _face_box(frame)),
+                      frames=with_face),
+        BenchmarkCase('service.face_detection.analyze_face_quality',
+                      lambda frame: face_detection_service.analyze_face_quality(frame['base64'])),
+        BenchmarkCase('service.object_detection.detect_suspicious_objects',
+                      lambda frame: object_detection_service.detect_suspicious_objects(frame['base64'])),
+        BenchmarkCase('service.screen_analysis.analyze_capture',
+                      lambda frame: screen_analysis_service.analyze_capture('benchmark', frame['base64'])),
+    ]
+
+
+def endpoint_cases(corpus: Dict, client, headers: Dict, session_id: int) -> List[BenchmarkCase]:
+    """Cas mesurant les endpoints complets (validation, authentification, sérialisation)"""
+    reference = _reference_frame(corpus)
+
+    def post(path: str, payload_for: Callable[[Dict], Dict]) -> Callable[[Dict], bool]:
+        return lambda frame: client.post(f"{API}{path}", json=payload_for(frame), headers=headers).status_code == 200
+
+    return [
+        BenchmarkCase('endpoint.ai.verify-identity', post('/ai/verify-identity', lambda frame: {
+            'current_image': frame['base64'], 'reference_image': reference['base64']
+        })),
+        BenchmarkCase('endpoint.ai.analyze-face', post('/ai/analyze-face', lambda frame: {'image': frame['base64']})),
+        BenchmarkCase('endpoint.ai.detect-objects', post('/ai/detect-objects', lambda frame: {'image': frame['base64']})),
+        BenchmarkCase('endpoint.ai.surveillance-analysis', post('/ai/surveillance-analysis', lambda frame: {
+            'session_id': str(session_id),
+            'video_frame': frame['base64'],
+            'screen_capture': frame['base64'],
+            'timestamp': datetime.now(timezone.utc).isoformat()
+        })),
+        BenchmarkCase('endpoint.surveillance.verify-identity', post('/surveillance/verify-identity', lambda frame: {
+            'current_image': frame['base64'], 'reference_image': reference['base64'], 'session_id': session_id
+        })),
+    ]
+
+
+def _git_revision() -> Optional[str]:
+    """Révision git du dépôt (None hors d'un dépôt)"""
+    try:
+        return subprocess.run(
+            ['git', 'rev-parse', '--short', 'HEAD'],
+            capture_output=True, text=True, timeout=5,
+            cwd=os.path.dirname(os.path.abspath(__file__))
+        ).stdout.strip() or None
+    except (OSError, subprocess.SubprocessError):
+        return None
+
+
+def run_benchmarks(
+    corpus: Dict,
+    iterations: int = 3,
+    warmup: int = 2,
+    include_endpoints: bool = True,
+    selection: Optional[List[str]] = None,
+    log: Callable[[str], None] = print
+) -> Dict:
+    """
+    Exécute les benchmarks sur un corpus chargé
+
+    Args:
+        corpus: Corpus (voir benchmarks.corpus.load_corpus)
+        iterations: Nombre de passages sur le corpus par cas
+        warmup: Appels de chauffe, non mesurés
+        include_endpoints: Mesure aussi les endpoints via l'application ASGI
+        selection: Motifs (fnmatch) des cas à exécuter, tous par défaut
+        log: Fonction d'affichage de la progression
+
+    Returns:
+        Résultats au format JSON (métadonnées et statistiques par cas)
+    """
+    from app.core.metrics import METRICS_ENABLED
+
+    results: Dict[str, Dict] = {}
+
+    def execute(cases: List[BenchmarkCase]) -> None:
+        for case in cases:
+            if selection and not any(fnmatch.fnmatch(case.name, pattern) for pattern in selection):
+                continue
+            log(f"⏱️  {case.name}")
+            results[case.name] = case.run(corpus, iterations, warmup)
+            summary = results[case.name]
+            if 'latency_ms' in summary:
+                log(f"    p50 {summary['latency_ms']['p50']} ms, p95 {summary['latency_ms']['p95']} ms, "
+                    f"{summary['throughput_per_s']}/s, {summary['errors']} erreur(s)")
+
+    execute(service_cases(corpus))
+
+    if include_endpoints:
+        from fastapi.testclient import TestClient
+        import main
+
+        create_schema()
+        with TestClient(main.app) as client:
+            headers = register_user(client, "bench-student")
+            response = client.post(f"{API}/surveillance/start-session", json={"exam_id": 1, "identity_verified": True}, headers=headers)
+            response.raise_for_status()
+            execute(endpoint_cases(corpus, client, headers, response.json()['session_id']))
+
+    return {
+        'format': RESULT_FORMAT_VERSION,
+        'meta': {
+            'started_at': datetime.now(timezone.utc).isoformat(),
+            'git_revision': _git_revision(),
+            'python': sys.version.split()[0],
+            'platform': platform.platform(),
+            'machine': platform.machine(),
+            'cpu_count': os.cpu_count(),
+            'metrics_enabled': METRICS_ENABLED,
+            'corpus': {
+                'directory': corpus.get('directory'),
+                'fingerprint': corpus.get('fingerprint'),
+                'seed': corpus.get('seed'),
+                'frames': len(corpus['frames'])
+            },
+            'iterations': iterations,
+            'warmup': warmup
+        },
+        'results': results
+    }
+
+
+def write_results(results: Dict, path: str) -> None:
+    """Écrit les résultats au format JSON"""
+    with open(path, 'w') as handle:
+        json.dump(results, handle, indent=2, ensure_ascii=False)
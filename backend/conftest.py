@@ -0,0 +1,66 @@
+"""
+Configuration commune des tests ProctoFlex AI
+
+Base SQLite et répertoire des médias temporaires, définis avant le premier import
+de l'application (les moteurs et stockages globaux sont créés à l'import).
+"""
+
+import itertools
+import os
+import tempfile
+
+import pytest
+
+_WORKDIR = tempfile.mkdtemp(prefix="proctoflex-tests-")
+
+os.environ.setdefault("DATABASE_URL", f"sqlite:///{_WORKDIR}/tests.db")
+os.environ.setdefault("UPLOAD_DIR", os.path.join(_WORKDIR, "uploads"))
+# Pas de préchauffage des modèles au démarrage de l'application de test
+os.environ.setdefault("AI_WARMUP_ENABLED", "false")
+
+_usernames = itertools.count(1)
+
+
+@pytest.fixture(scope="session")
+def client():
+    """Client HTTP de l'application (cycle de vie complet, schéma créé)"""
+    from fastapi.testclient import TestClient
+
+    import main
+    from app.core.database import Base, engine
+
+    Base.metadata.create_all(bind=engine)
+    with TestClient(main.app) as test_client:
+        yield test_client
+
+
+@pytest.fixture
+def register(client):
+    """Crée un utilisateur et renvoie (identifiant, en-têtes d'authentification)"""
+    def _register(role: str = "student"):
+        username = f"user{next(_usernames)}"
+        response = client.post("/api/v1/auth/register", json={
+            "email": f"{username}@example.com",
+            "username": username,
+            "full_name": username.title(),
+            "password": "motdepasse",
+            "role": role,
+        })
+        assert response.status_code == 200, response.text
+        token = response.json()
+        return token["user_id"], {"Authorization": f"Bearer {token['access_token']}"}
+    return _register
+
+
+@pytest.fixture
+def start_session(client):
+    """Démarre une session d'examen pour un étudiant et renvoie son identifiant"""
+    def _start(headers) -> int:
+        response = client.post(
+            "/api/v1/surveillance/start-session",
+            json={"exam_id": 1, "identity_verified": True},
+            headers=headers
+        )
+        assert response.status_code == 200, response.text
+        return response.json()["session_id"]
+    return _start
@@ -3,24 +3,62 @@ ProctoFlex AI - Backend API
 Serveur FastAPI pour la surveillance d'examens en ligne
 """
 
-from fastapi import FastAPI, HTTPException, Depends
+from fastapi import FastAPI, HTTPException, Depends, Response
+from fastapi.responses import JSONResponse
 from fastapi.middleware.cors import CORSMiddleware
 from fastapi.security import HTTPBearer
 from contextlib import asynccontextmanager
+import asyncio
 import uvicorn
 from typing import List
 
+from app.core.cache import cache_bus
 from app.core.config import settings
-from app.core.database import engine, Base
+from app.core.database import async_engine, get_pool_status, upgrade_database
+from app.core.hashing import shutdown_process_pool
+from app.core.metrics import METRICS_ENABLED, HttpMetricsMiddleware, render_latest
+from app.core.uploads import RequestSizeLimitMiddleware
+from app.ai.warmup import warm_up
 from app.api.v1.api import api_router
 from app.core.security import get_current_user
+from app.services.alert_sink import alert_sink
+from app.services.readiness import readiness_service
+from app.services.retention import retention_service
+from app.storage.recordings import recording_store
 
-# Création des tables au démarrage
+# Initialisation et arrêt des services
 @asynccontextmanager
 async def lifespan(app: FastAPI):
-    # Créer les tables au démarrage
-    Base.metadata.create_all(bind=engine)
+    # Le schéma est géré par Alembic (`alembic upgrade head` avant le démarrage des workers)
+    if settings.DB_AUTO_MIGRATE:
+        await asyncio.to_thread(upgrade_database)
+    # Invalidation des caches partagée entre workers (Redis, optionnel)
+    await cache_bus.start()
+    # Démarrer le tampon d'écriture des alertes
+    await alert_sink.start()
+    # Rétention RGPD (alertes et médias plus anciens que RETENTION_DAYS)
+    await retention_service.start()
+    # Synchronisation groupée des enregistrements audio / vidéo
+    await recording_store.start()
+    # Préchauffage des modèles : aucune requête n'est servie avant la fin (premier appel lent)
+    if settings.AI_WARMUP_ENABLED:
+        readiness_service.record_warmup(await asyncio.to_thread(
+            warm_up,
+            settings.AI_WARMUP_ANALYZERS,
+            settings.AI_WARMUP_RESOLUTIONS,
+            settings.AI_WARMUP_ITERATIONS
+        ))
+    # Sondes des analyseurs IA (état servi par /ready et /api/v1/ai/health)
+    await readiness_service.start()
     yield
+    await readiness_service.stop()
+    await recording_store.stop()
+    await retention_service.stop()
+    # Vider le tampon avant l'arrêt
+    await alert_sink.stop()
+    await cache_bus.stop()
+    shutdown_process_pool()
+    await async_engine.dispose()
 
 # Configuration de l'application FastAPI
 app = FastAPI(
@@ -41,6 +79,12 @@ app.add_middleware(
     allow_headers=["*"],
 )
 
+# Limite de taille des corps de requête, appliquée pendant la réception
+app.add_middleware(RequestSizeLimitMiddleware)
+
+# Durée des requêtes par route (ajouté en dernier : englobe les autres middlewares)
+app.add_middleware(HttpMetricsMiddleware)
+
 # Inclusion des routes API
 app.include_router(api_router, prefix="/api/v1")
 
@@ -51,9 +95,34 @@ async def health_check():
     return {
         "status": "healthy",
         "service": "ProctoFlex AI Backend",
-        "version": "1.0.0"
+        "version": "1.0.0",
+        "database_pool": get_pool_status()
     }
 
+# Disponibilité du worker pour les répartiteurs de charge
+@app.get("/ready")
+async def readiness_check():
+    """Worker prêt (200) ou froid / saturé (503), d'après les dernières sondes IA"""
+    report = readiness_service.report()
+    content = {
+        "status": report["status"],
+        "ready": report["ready"],
+        "in_flight": report["in_flight"],
+        "event_loop_lag_ms": report["event_loop_lag_ms"],
+        "analyzers": {name: analyzer["status"] for name, analyzer in report["analyzers"].items()},
+        "timestamp": report["timestamp"]
+    }
+    return JSONResponse(content=content, status_code=200 if report["ready"] else 503)
+
+# Exposition Prometheus
+@app.get("/metrics", include_in_schema=False)
+async def metrics():
+    """Métriques au format texte Prometheus"""
+    if not METRICS_ENABLED:
+        raise HTTPException(status_code=404, detail="Métriques désactivées")
+    content, content_type = render_latest()
+    return Response(content=content, media_type=content_type)
+
 # Route racine
 @app.get("/")
 async def root():
@@ -0,0 +1,337 @@
+#!/usr/bin/env python3
+"""
+Lanceur multi-workers ProctoFlex AI (préchargement puis fork)
+
+Le processus maître importe l'application et charge une seule fois les modèles IA
+en lecture seule (dlib, cascades, YOLO), puis crée les workers par fork : leurs
+pages mémoire sont partagées en copie sur écriture au lieu d'être dupliquées dans
+chaque worker. Les états incompatibles avec fork (graphes MediaPipe, connexions à
+la base) sont recréés dans chaque worker au premier usage.
+
+    python serve.py --workers 4 --host 0.0.0.0 --port 8000
+    python serve.py --memory-report <pid du maître>   # pages partagées / propres
+
+Le maître affiche aussi le rapport mémoire à la réception de SIGUSR1.
+
+Les métriques Prometheus des workers sont agrégées par /metrics via
+PROMETHEUS_MULTIPROC_DIR (répertoire temporaire si la variable n'est pas définie) :
+compteurs et histogrammes sont sommés, les jauges restent par worker (label pid).
+"""
+
+import argparse
+import gc
+import json
+import logging
+import os
+import signal
+import socket
+import sys
+import tempfile
+import time
+from typing import Dict, List, Optional
+
+logger = logging.getLogger("proctoflex.serve")
+
+# Champs de /proc/<pid>/smaps_rollup retenus (kB)
+SMAPS_FIELDS = ("Rss", "Pss", "Shared_Clean", "Shared_Dirty", "Private_Clean", "Private_Dirty", "Swap")
+
+
+# ----------------------------------------------------------------------
+# Rapport mémoire
+# ----------------------------------------------------------------------
+
+def read_smaps(pid: int) -> Dict[str, int]:
+    """Compteurs mémoire d'un processus en kB (smaps_rollup, ou somme de smaps)"""
+    totals = dict.fromkeys(SMAPS_FIELDS, 0)
+    for name in ("smaps_rollup", "smaps"):
+        try:
+            with open(f"/proc/{pid}/{name}") as smaps:
+                for line in smaps:
+                    field, _, value = line.partition(":")
+                    if field in totals:
+                        totals[field] += int(value.split()[0])
+            return totals
+        except FileNotFoundError:
+            continue
+    raise RuntimeError(f"/proc/{pid}/smaps indisponible (Linux uniquement)")
+
+
+def child_pids(pid: int) -> List[int]:
+    """PID des processus enfants directs"""
+    children = []
+    try:
+        for task in os.listdir(f"/proc/{pid}/task"):
+            with open(f"/proc/{pid}/task/{task}/children") as handle:
+                children.extend(int(child) for child in handle.read().split())
+    except FileNotFoundError:
+        pass
+    return sorted(set(children))
+
+
+def memory_report(master_pid: int, worker_pids: Optional[List[int]] = None) -> Dict:
+    """
+    Pages uniques et partagées du maître et de chaque worker
+
+    USS (pages propres au processus) est la mémoire libérée si le worker s'arrête ;
+    PSS répartit les pages partagées entre les processus qui les utilisent : la somme
+    des PSS est l'empreinte réelle, à comparer à la somme des RSS (sans partage).
+    """
+    if worker_pids is None:
+        worker_pids = child_pids(master_pid)
+    processes = []
+    for role, pid in [("maître", master_pid)] + [("worker", pid) for pid in worker_pids]:
+        try:
+            smaps = read_smaps(pid)
+        except (RuntimeError, ProcessLookupError, PermissionError):
+            continue
+        processes.append({
+            "pid": pid,
+            "role": role,
+            "rss_mb": round(smaps["Rss"] / 1024, 1),
+            "pss_mb": round(smaps["Pss"] / 1024, 1),
+            "unique_mb": round((smaps["Private_Clean"] + smaps["Private_Dirty"]) / 1024, 1),
+            "shared_mb": round((smaps["Shared_Clean"] + smaps["Shared_Dirty"]) / 1024, 1),
+            "swap_mb": round(smaps["Swap"] / 1024, 1)
+        })
+
+    workers = [process for process in processes if process["role"] == "worker"]
+    return {
+        "master_pid": master_pid,
+        "workers": len(workers),
+        "processes": processes,
+        "total_rss_mb": round(sum(process["rss_mb"] for process in processes), 1),
+        "total_pss_mb": round(sum(process["pss_mb"] for process in processes), 1),
+        # Coût marginal d'un worker supplémentaire (pages propres moyennes)
+        "mean_worker_unique_mb": round(sum(process["unique_mb"] for process in workers) / len(workers), 1) if workers else None
+    }
+
+
+def format_memory_report(report: Dict) -> str:
+    """Rapport mémoire lisible"""
+    lines = [f"{'PID':>8}  {'rôle':<7}{'RSS':>9}{'PSS':>9}{'unique':>9}{'partagé':>9}  (Mo)"]
+    for process in report["processes"]:
+        lines.append(
+            f"{process['pid']:>8}  {process['role']:<7}{process['rss_mb']:>9}{process['pss_mb']:>9}"
+            f"{process['unique_mb']:>9}{process['shared_mb']:>9}"
+        )
+    lines.append(
+        f"Total : RSS {report['total_rss_mb']} Mo, PSS {report['total_pss_mb']} Mo ; "
+        f"coût moyen d'un worker : {report['mean_worker_unique_mb']} Mo uniques"
+    )
+    return "\n".join(lines)
+
+
+# ----------------------------------------------------------------------
+# Métriques multi-processus
+# ----------------------------------------------------------------------
+
+def prepare_metrics_dir() -> str:
+    """
+    Répertoire des métriques partagées entre workers (PROMETHEUS_MULTIPROC_DIR)
+
+    À appeler avant l'import de l'application : prometheus_client choisit son mode
+    de stockage à la création des métriques. Un répertoire fourni est vidé des
+    fichiers d'une exécution précédente, sinon un répertoire temporaire est créé.
+
+    Returns:
+        Chemin du répertoire
+    """
+    path = os.environ.get("PROMETHEUS_MULTIPROC_DIR")
+    if not path:
+        path = tempfile.mkdtemp(prefix="proctoflex-metrics-")
+        os.environ["PROMETHEUS_MULTIPROC_DIR"] = path
+        return path
+    os.makedirs(path, exist_ok=True)
+    for name in os.listdir(path):
+        if name.endswith(".db"):
+            os.remove(os.path.join(path, name))
+    return path
+
+
+def mark_process_dead(pid: int) -> None:
+    """Retire les jauges d'un processus arrêté de l'agrégation des métriques"""
+    if not os.environ.get("PROMETHEUS_MULTIPROC_DIR"):
+        return
+    try:
+        from prometheus_client import multiprocess
+    except ImportError:
+        return
+    multiprocess.mark_process_dead(pid)
+
+
+# ----------------------------------------------------------------------
+# Maître et workers
+# ----------------------------------------------------------------------
+
+def preload_application(preload_models: bool):
+    """Importe l'application et charge les modèles dans le maître"""
+    import main
+    from app.ai.providers import preload_services
+
+    if preload_models:
+        durations = preload_services()
+        for name, seconds in durations.items():
+            print(f"📦 {name} préchargé en {seconds:.2f} s")
+    # Objets présents avant le fork exclus du ramasse-miettes : le GC ne réécrit pas
+    # leurs en-têtes dans les workers (pages conservées partagées)
+    gc.collect()
+    gc.freeze()
+    return main.app
+
+
+def bind_socket(host: str, port: int) -> socket.socket:
+    """Socket d'écoute créée par le maître et héritée par tous les workers"""
+    family = socket.AF_INET6 if ":" in host else socket.AF_INET
+    sock = socket.socket(family, socket.SOCK_STREAM)
+    sock.setsockopt(socket.SOL_SOCKET, socket.SO_REUSEADDR, 1)
+    sock.bind((host, port))
+    sock.listen(2048)
+    sock.set_inheritable(True)
+    return sock
+
+
+def run_worker(app, sock: socket.socket, args) -> None:
+    """Processus worker : serveur uvicorn sur la socket partagée"""
+    import uvicorn
+    from app.core.database import async_engine, engine
+
+    for signum in (signal.SIGINT, signal.SIGTERM, signal.SIGUSR1):
+        signal.signal(signum, signal.SIG_DFL)
+
+    # Connexions éventuellement ouvertes par le maître : abandonnées sans être fermées
+    engine.dispose(close=False)
+    async_engine.sync_engine.dispose(close=False)
+
+    config = uvicorn.Config(
+        app,
+        log_level=args.log_level,
+        proxy_headers=args.proxy_headers,
+        forwarded_allow_ips=args.forwarded_allow_ips,
+        timeout_keep_alive=args.timeout_keep_alive
+    )
+    uvicorn.Server(config).run(sockets=[sock])
+
+
+class Master:
+    """Supervision des workers : fork, relance en cas d'arrêt, arrêt propre"""
+
+    def __init__(self, app, sock: socket.socket, args):
+        self.app = app
+        self.sock = sock
+        self.args = args
+        self.workers: Dict[int, float] = {}
+        self.stopping = False
+
+    def spawn(self) -> None:
+        pid = os.fork()
+        if pid == 0:
+            code = 0
+            try:
+                run_worker(self.app, self.sock, self.args)
+            except BaseException:
+                logger.exception("Arrêt du worker sur erreur")
+                code = 1
+            finally:
+                # Sortie immédiate : le code du maître (boucle de supervision) ne s'exécute pas dans l'enfant
+                sys.stdout.flush()
+                sys.stderr.flush()
+                os._exit(code)
+        self.workers[pid] = time.monotonic()
+        print(f"👷 Worker {pid} démarré")
+
+    def _on_stop(self, signum, frame) -> None:
+        self.stopping = True
+        for pid in list(self.workers):
+            try:
+                os.kill(pid, signal.SIGTERM)
+            except ProcessLookupError:
+                pass
+
+    def _on_report(self, signum, frame) -> None:
+        print(format_memory_report(memory_report(os.getpid(), list(self.workers))), flush=True)
+
+    def run(self) -> int:
+        signal.signal(signal.SIGTERM, self._on_stop)
+        signal.signal(signal.SIGINT, self._on_stop)
+        if hasattr(signal, "SIGUSR1"):
+            signal.signal(signal.SIGUSR1, self._on_report)
+
+        # Le maître ne sert aucune requête : ses jauges (valeurs de l'import) ne sont pas exportées
+        mark_process_dead(os.getpid())
+        for _ in range(self.args.workers):
+            self.spawn()
+
+        deadline = None
+        while self.workers:
+            if self.stopping and deadline is None:
+                deadline = time.monotonic() + self.args.graceful_timeout
+            if deadline is not None and time.monotonic() > deadline:
+                for pid in list(self.workers):
+                    try:
+                        os.kill(pid, signal.SIGKILL)
+                    except ProcessLookupError:
+                        pass
+                deadline = float("inf")
+
+            pid, status = os.waitpid(-1, os.WNOHANG)
+            if pid == 0:
+                time.sleep(0.2)
+                continue
+            self.reap(pid, status)
+
+        print("🛑 Serveur arrêté")
+        return 0
+
+    def reap(self, pid: int, status: int) -> None:
+        """Worker terminé : ses jauges sont retirées, il est relancé hors arrêt du serveur"""
+        started = self.workers.pop(pid, None)
+        mark_process_dead(pid)
+        if started is None or self.stopping:
+            return
+        print(f"⚠️  Worker {pid} arrêté (code {os.waitstatus_to_exitcode(status)}), relance")
+        # Un worker qui s'arrête dès le démarrage n'est pas relancé en boucle
+        if time.monotonic() - started < 1.0:
+            time.sleep(1.0)
+        self.spawn()
+
+
+def main(argv=None) -> int:
+    """Fonction principale"""
+    parser = argparse.ArgumentParser(description="Lanceur multi-workers ProctoFlex AI (préchargement puis fork)")
+    parser.add_argument("--host", default=os.getenv("HOST", "0.0.0.0"))
+    parser.add_argument("--port", type=int, default=int(os.getenv("PORT", "8000")))
+    parser.add_argument("--workers", type=int, default=int(os.getenv("WEB_CONCURRENCY", "1")))
+    parser.add_argument("--no-preload", action="store_true", help="modèles chargés dans chaque worker")
+    parser.add_argument("--graceful-timeout", type=float, default=30.0, help="délai d'arrêt des workers (s)")
+    parser.add_argument("--timeout-keep-alive", type=int, default=5)
+    parser.add_argument("--log-level", default="info")
+    parser.add_argument("--proxy-headers", action="store_true")
+    parser.add_argument("--forwarded-allow-ips", default="127.0.0.1")
+    parser.add_argument("--memory-report", type=int, metavar="PID", help="rapport mémoire d'un maître en cours d'exécution")
+    parser.add_argument("--json", action="store_true", help="rapport mémoire au format JSON")
+    args = parser.parse_args(argv)
+
+    logging.basicConfig(level=args.log_level.upper(), format="%(asctime)s %(levelname)s %(name)s: %(message)s")
+
+    if args.memory_report:
+        report = memory_report(args.memory_report)
+        print(json.dumps(report, indent=2) if args.json else format_memory_report(report))
+        return 0
+
+    if not hasattr(os, "fork"):
+        # Windows : pas de fork, un seul processus uvicorn
+        import uvicorn
+        print("⚠️  fork indisponible sur cette plateforme : démarrage d'un worker unique")
+        uvicorn.run("main:app", host=args.host, port=args.port, log_level=args.log_level)
+        return 0
+
+    print(f"🚀 ProctoFlex AI : {args.workers} worker(s) sur {args.host}:{args.port} (maître {os.getpid()})")
+    # Avant le préchargement : les métriques sont créées à l'import de l'application
+    prepare_metrics_dir()
+    app = preload_application(not args.no_preload)
+    sock = bind_socket(args.host, args.port)
+    return Master(app, sock, args).run()
+
+
+if __name__ == "__main__":
+    sys.exit(main())
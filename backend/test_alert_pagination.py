@@ -0,0 +1,113 @@
+#!/usr/bin/env python3
+"""
+Alertes d'une session : curseur (timestamp, id), filtres et export NDJSON
+
+    python -m pytest test_alert_pagination.py
+"""
+
+import json
+from datetime import datetime, timedelta, timezone
+
+import pytest
+
+from app.crud.alert import decode_cursor, encode_cursor
+
+START = datetime(2026, 10, 19, 9, 0, 0)
+
+
+def test_cursor_round_trip():
+    moment = datetime(2026, 10, 19, 9, 30, 15, 123456, tzinfo=timezone.utc)
+    cursor = encode_cursor(moment, 42)
+    # Opaque et utilisable tel quel dans une URL
+    assert "=" not in cursor and "/" not in cursor and "+" not in cursor
+    assert decode_cursor(cursor) == (moment, 42)
+    assert decode_cursor(encode_cursor(START, 7)) == (START, 7)
+
+
+@pytest.mark.parametrize("cursor", ["", "pas-un-curseur", encode_cursor(START, 1)[:-3] + "!!!", "MjAyNnwx"])
+def test_invalid_cursor_raises_value_error(cursor):
+    with pytest.raises(ValueError):
+        decode_cursor(cursor)
+
+
+@pytest.fixture
+def session_alerts(client, register, start_session):
+    """Session avec 7 alertes ; les deux premières partagent le même timestamp"""
+    from app.core.database import SecurityAlert, SessionLocal
+
+    _, headers = register()
+    session_id = start_session(headers)
+    specs = [
+        (0, "gaze", "low"), (0, "face_detection", "high"), (1, "gaze", "medium"),
+        (2, "screen", "high"), (3, "gaze", "high"), (4, "audio", "low"), (5, "screen", "critical"),
+    ]
+    with SessionLocal() as db:
+        alerts = [
+            SecurityAlert(session_id=session_id, alert_type=alert_type, severity=severity,
+                          description=f"alerte {index}", timestamp=START + timedelta(minutes=minutes))
+            for index, (minutes, alert_type, severity) in enumerate(specs)
+        ]
+        db.add_all(alerts)
+        db.commit()
+        ids = [alert.id for alert in alerts]
+    return session_id, headers, ids, specs
+
+
+def fetch_all(client, session_id, headers, **params):
+    pages, cursor = [], None
+    while True:
+        query = dict(params, **({"cursor": cursor} if cursor else {}))
+        response = client.get(f"/api/v1/surveillance/session/{session_id}/alerts", params=query, headers=headers)
+        assert response.status_code == 200, response.text
+        page = response.json()
+        pages.append([item["id"] for item in page["items"]])
+        cursor = page["next_cursor"]
+        if cursor is None:
+            return pages
+
+
+def test_pages_follow_timestamp_then_id(client, session_alerts):
+    session_id, headers, ids, _ = session_alerts
+    pages = fetch_all(client, session_id, headers, limit=2)
+
+    # Ordre (timestamp, id), sans doublon ni trou, même à timestamp égal
+    assert pages == [ids[0:2], ids[2:4], ids[4:6], ids[6:7]]
+    # Dernière page pleine : pas de curseur suivant superflu
+    assert fetch_all(client, session_id, headers, limit=7) == [ids]
+
+
+def test_filters_combine_with_cursor(client, session_alerts):
+    session_id, headers, ids, specs = session_alerts
+    high = [alert_id for alert_id, (_, _, severity) in zip(ids, specs) if severity in ("high", "critical")]
+    assert sum(fetch_all(client, session_id, headers, limit=2, severity=["high", "critical"]), []) == high
+
+    gaze = [alert_id for alert_id, (_, alert_type, _) in zip(ids, specs) if alert_type == "gaze"]
+    assert sum(fetch_all(client, session_id, headers, limit=1, alert_type="gaze"), []) == gaze
+
+    both = fetch_all(client, session_id, headers, severity="high", alert_type="gaze")
+    assert both == [[ids[4]]]
+
+
+def test_invalid_cursor_and_foreign_session(client, register, session_alerts):
+    session_id, headers, _, _ = session_alerts
+    url = f"/api/v1/surveillance/session/{session_id}/alerts"
+    assert client.get(url, params={"cursor": "pas-un-curseur"}, headers=headers).status_code == 400
+
+    _, other = register()
+    assert client.get(url, headers=other).status_code == 403
+    assert client.get(f"{url}/stream", headers=other).status_code == 403
+
+
+def test_ndjson_stream_exports_filtered_alerts(client, session_alerts):
+    session_id, headers, ids, _ = session_alerts
+    url = f"/api/v1/surveillance/session/{session_id}/alerts/stream"
+
+    response = client.get(url, headers=headers)
+    assert response.status_code == 200
+    assert response.headers["content-type"].startswith("application/x-ndjson")
+    lines = [json.loads(line) for line in response.text.splitlines()]
+    assert [line["id"] for line in lines] == ids
+    assert lines[0]["type"] == "gaze" and lines[0]["description"] == "alerte 0"
+
+    screen = client.get(url, params={"alert_type": "screen"}, headers=headers)
+    assert [json.loads(line)["id"] for line in screen.text.splitlines()] == [ids[3], ids[6]]
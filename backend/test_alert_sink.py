@@ -0,0 +1,147 @@
+#!/usr/bin/env python3
+"""
+Tampon d'écriture des alertes : vidage par lots, reprise après échec et abandon
+
+    python -m pytest test_alert_sink.py
+"""
+
+import asyncio
+
+import pytest
+
+from app.core.database import Base, SecurityAlert, SessionLocal, engine
+from app.services.alert_sink import AlertSink
+
+SESSION_ID = 9101
+
+
+@pytest.fixture
+def sink():
+    sink = AlertSink()
+    sink.batch_size = 3
+    sink.max_pending = 100
+    sink.flush_interval = 60.0
+    sink.method = "insert"
+    sink.durable = False
+    return sink
+
+
+@pytest.fixture
+def database():
+    Base.metadata.create_all(bind=engine)
+    yield
+    db = SessionLocal()
+    try:
+        db.query(SecurityAlert).filter(SecurityAlert.session_id == SESSION_ID).delete(synchronize_session=False)
+        db.commit()
+    finally:
+        db.close()
+
+
+def count_alerts() -> int:
+    db = SessionLocal()
+    try:
+        return db.query(SecurityAlert).filter(SecurityAlert.session_id == SESSION_ID).count()
+    finally:
+        db.close()
+
+
+class FailingWrites:
+    """Remplace l'écriture d'un lot : échoue `failures` fois puis mémorise les lignes"""
+
+    def __init__(self, failures: int):
+        self.failures = failures
+        self.rows = []
+
+    def __call__(self, rows):
+        if self.failures:
+            self.failures -= 1
+            raise RuntimeError("base indisponible")
+        self.rows.extend(rows)
+
+
+@pytest.mark.asyncio
+async def test_direct_write_when_not_running(sink, database):
+    await sink.submit("gaze", session_id=SESSION_ID)
+    assert count_alerts() == 1
+    assert sink.stats()["pending"] == 0
+
+
+@pytest.mark.asyncio
+async def test_flush_writes_pending_in_batches(sink, database):
+    await sink.start()
+    try:
+        for i in range(7):
+            await sink.submit("screen", description=f"alerte {i}", session_id=SESSION_ID)
+        await sink.flush()
+
+        assert count_alerts() == 7
+        stats = sink.stats()
+        assert stats["written"] == 7 and stats["batches"] == 3 and stats["pending"] == 0
+    finally:
+        await sink.stop()
+
+
+@pytest.mark.asyncio
+async def test_stop_flushes_remaining_alerts(sink, database):
+    await sink.start()
+    await sink.submit("audio", session_id=SESSION_ID)
+    await sink.stop()
+    assert count_alerts() == 1
+
+
+@pytest.mark.asyncio
+async def test_failed_batch_is_retried(sink, monkeypatch):
+    writes = FailingWrites(failures=1)
+    monkeypatch.setattr(sink, "_write_batch", writes)
+    await sink.start()
+    try:
+        await sink.submit("screen", description="a", session_id=SESSION_ID)
+        await sink.submit("screen", description="b", session_id=SESSION_ID)
+        await sink.flush()
+        assert writes.rows == []
+        assert sink.stats()["failed"] == 2 and sink.stats()["pending"] == 2
+
+        await sink.flush()
+        assert [row["description"] for row in writes.rows] == ["a", "b"]
+        assert sink.stats()["pending"] == 0
+    finally:
+        await sink.stop()
+
+
+@pytest.mark.asyncio
+async def test_durable_submit_gets_write_error(sink, monkeypatch):
+    writes = FailingWrites(failures=1)
+    monkeypatch.setattr(sink, "_write_batch", writes)
+    await sink.start()
+    try:
+        durable = asyncio.create_task(sink.submit("face_detection", session_id=SESSION_ID, durable=True))
+        await asyncio.sleep(0)
+        await sink.flush()
+        with pytest.raises(RuntimeError):
+            await durable
+        # Une alerte durable n'est pas reprise : l'appelant a reçu l'erreur
+        assert sink.stats()["pending"] == 0
+    finally:
+        await sink.stop()
+
+
+@pytest.mark.asyncio
+async def test_retry_that_does_not_fit_is_dropped(sink, monkeypatch):
+    writes = FailingWrites(failures=1)
+    monkeypatch.setattr(sink, "_write_batch", writes)
+    await sink.start()
+    try:
+        for i in range(5):
+            await sink.submit("screen", description=str(i), session_id=SESSION_ID)
+
+        # Tampon réduit : la reprise du lot en échec ne tient pas en entier
+        sink.max_pending = 3
+        await sink.flush()
+        stats = sink.stats()
+        assert stats["dropped"] == 2 and stats["pending"] == 3
+
+        await sink.flush()
+        assert [row["description"] for row in writes.rows] == ["0", "3", "4"]
+    finally:
+        await sink.stop()
@@ -0,0 +1,101 @@
+#!/usr/bin/env python3
+"""
+Caches d'authentification : revendications des tokens et utilisateurs, invalidation à la modification
+
+    python -m pytest test_auth_cache.py
+"""
+
+import hashlib
+import time
+from datetime import timedelta
+
+import pytest
+from sqlalchemy.ext.asyncio import async_sessionmaker, create_async_engine
+from sqlalchemy.pool import NullPool
+
+from app.core import security
+from app.core.config import settings
+from app.core.database import get_async_database_url
+from app.crud import user as crud
+
+
+@pytest.fixture
+def verifications(monkeypatch):
+    """Décodages JWT effectifs (absents quand le cache répond)"""
+    calls = []
+    verify = security.verify_token
+
+    def counting_verify(token):
+        calls.append(token)
+        return verify(token)
+    monkeypatch.setattr(security, "verify_token", counting_verify)
+    return calls
+
+
+def test_claims_are_verified_once(verifications):
+    token = security.create_access_token({"sub": "alice"})
+    first = security.verify_token_cached(token)
+    assert security.verify_token_cached(token) == first
+    assert first["sub"] == "alice"
+    assert verifications == [token]
+
+
+def test_invalid_token_is_not_cached(verifications):
+    assert security.verify_token_cached("pas.un.jwt") is None
+    assert security.verify_token_cached("pas.un.jwt") is None
+    assert len(verifications) == 2
+
+
+def test_expired_claims_are_verified_again(verifications):
+    token = security.create_access_token({"sub": "bob"}, expires_delta=timedelta(minutes=5))
+    payload = security.verify_token_cached(token)
+
+    # Entrée encore en cache mais `exp` dépassé (horloge murale) : le token est revérifié
+    key = hashlib.sha256(token.encode()).digest()
+    security.token_claims_cache.set(key, dict(payload, exp=time.time() - 1))
+    assert security.verify_token_cached(token) == payload
+    assert len(verifications) == 2
+
+
+@pytest.fixture
+def session_factory(client):
+    engine = create_async_engine(get_async_database_url(settings.DATABASE_URL), poolclass=NullPool)
+    yield async_sessionmaker(bind=engine, expire_on_commit=False)
+    engine.sync_engine.dispose()
+
+
+def me(client, headers):
+    return client.get("/api/v1/auth/me", headers=headers)
+
+
+@pytest.mark.asyncio
+async def test_principal_is_cached_then_invalidated_on_update(client, register, session_factory):
+    user_id, headers = register()
+    username = me(client, headers).json()["username"]
+    assert security.user_principal_cache.get(username) is not None
+
+    async with session_factory() as db:
+        await crud.update_user(db, user_id, {"full_name": "Nom Modifié"})
+    assert security.user_principal_cache.get(username) is None
+    assert me(client, headers).json()["full_name"] == "Nom Modifié"
+
+
+@pytest.mark.asyncio
+async def test_renamed_user_loses_old_token(client, register, session_factory):
+    user_id, headers = register()
+    username = me(client, headers).json()["username"]
+
+    async with session_factory() as db:
+        await crud.update_user(db, user_id, {"username": f"{username}-renomme"})
+    # Le token désigne l'ancien nom : plus aucun utilisateur ne lui correspond
+    assert me(client, headers).status_code == 401
+
+
+@pytest.mark.asyncio
+async def test_deleted_user_is_rejected(client, register, session_factory):
+    user_id, headers = register()
+    assert me(client, headers).status_code == 200
+
+    async with session_factory() as db:
+        assert await crud.delete_user(db, user_id) is True
+    assert me(client, headers).status_code == 401
@@ -0,0 +1,91 @@
+#!/usr/bin/env python3
+"""
+Comparaison des benchmarks : seuils de régression par indicateur et code de sortie
+
+    python -m pytest test_benchmark_compare.py
+"""
+
+import copy
+import json
+
+import pytest
+
+from benchmarks.__main__ import main
+from benchmarks.compare import compare_results, format_comparison
+
+
+def case(p50=10.0, p95=20.0, p99=30.0, throughput=100.0, rss=200.0, scope="case", errors=0):
+    return {
+        'latency_ms': {'p50': p50, 'p95': p95, 'p99': p99},
+        'throughput_per_s': throughput,
+        'peak_rss_mb': rss,
+        'peak_rss_scope': scope,
+        'errors': errors,
+    }
+
+
+def results(**cases):
+    return {'meta': {'corpus': {'fingerprint': 'abc'}, 'cpu_count': 4}, 'results': cases}
+
+
+BASELINE = results(**{'service.face': case()})
+
+
+def regressed(candidate, threshold=0.10):
+    comparison = compare_results(BASELINE, results(**{'service.face': candidate}), threshold)
+    return {key for key, indicator in comparison['cases']['service.face']['indicators'].items()
+            if indicator['regression']}
+
+
+def test_identical_runs_have_no_regression():
+    comparison = compare_results(BASELINE, copy.deepcopy(BASELINE))
+    assert comparison['regressions'] == [] and comparison['warnings'] == []
+    assert "Aucune régression au-delà de 10%" in format_comparison(comparison)
+
+
+@pytest.mark.parametrize("p95, expected", [(21.9, set()), (22.2, {'p95_ms'}), (15.0, set())])
+def test_latency_regresses_above_threshold(p95, expected):
+    assert regressed(case(p95=p95)) == expected
+
+
+@pytest.mark.parametrize("throughput, expected", [(91.0, set()), (89.0, {'throughput_per_s'}), (150.0, set())])
+def test_throughput_regresses_when_it_drops(throughput, expected):
+    assert regressed(case(throughput=throughput)) == expected
+
+
+def test_threshold_is_configurable():
+    assert regressed(case(p50=10.6), threshold=0.05) == {'p50_ms'}
+    assert regressed(case(p50=10.6), threshold=0.10) == set()
+
+
+def test_peak_rss_is_compared_only_per_case():
+    assert regressed(case(rss=300.0)) == {'peak_rss_mb'}
+    # Pic mesuré pour tout le processus : non attribuable au cas
+    assert regressed(case(rss=300.0, scope='process')) == set()
+
+
+def test_new_errors_are_regressions():
+    comparison = compare_results(BASELINE, results(**{'service.face': case(errors=2)}))
+    assert comparison['regressions'] == ["service.face: erreurs 0 -> 2"]
+
+
+def test_missing_cases_and_mismatched_runs():
+    candidate = results(**{'service.objects': case()})
+    candidate['meta'] = {'corpus': {'fingerprint': 'def'}, 'cpu_count': 8}
+    comparison = compare_results(BASELINE, candidate)
+
+    assert comparison['cases']['service.face'] == {'status': 'absent du candidat'}
+    assert comparison['cases']['service.objects'] == {'status': 'absent de la référence'}
+    assert len(comparison['warnings']) == 2
+    assert comparison['regressions'] == []
+
+
+def test_cli_fails_on_regression_only_when_asked(tmp_path, capsys):
+    baseline, candidate = tmp_path / "base.json", tmp_path / "candidate.json"
+    baseline.write_text(json.dumps(BASELINE))
+    candidate.write_text(json.dumps(results(**{'service.face': case(p99=60.0)})))
+
+    assert main(["compare", str(baseline), str(candidate)]) == 0
+    assert main(["compare", str(baseline), str(candidate), "--fail-on-regression"]) == 1
+    assert main(["compare", str(baseline), str(baseline), "--fail-on-regression"]) == 0
+    assert "p99_ms 30 -> 60 (+100.0%)" in capsys.readouterr().out
@@ -0,0 +1,283 @@
+#!/usr/bin/env python3
+"""
+Stockage différentiel des captures d'écran : écriture puis relecture exacte
+
+    python -m pytest test_capture_store.py
+"""
+
+import base64
+import os
+
+import cv2
+import numpy as np
+import pytest
+
+from app.storage import capture_store
+from app.storage.capture_store import DELTA, KEYFRAME, REPEAT, ScreenCaptureStore
+
+
+def make_frames(count: int, height: int = 300, width: int = 410, seed: int = 0) -> list:
+    """Captures successives : fond fixe et une petite zone modifiée à chaque capture"""
+    base = np.random.RandomState(seed).randint(0, 255, (height, width, 3), np.uint8)
+    frames = []
+    for i in range(count):
+        frame = base.copy()
+        y, x = (i * 37) % (height - 5), (i * 53) % (width - 5)
+        frame[y:y + 5, x:x + 5] = (i * 5) % 256
+        frames.append(frame)
+    return frames
+
+
+def encode(frame: np.ndarray) -> str:
+    return base64.b64encode(cv2.imencode('.png', frame)[1].tobytes()).decode()
+
+
+@pytest.fixture
+def decodes(monkeypatch):
+    """Compte les décodages de captures encodées"""
+    calls = []
+    imdecode = cv2.imdecode
+
+    def counting_imdecode(buffer, flags):
+        if flags == cv2.IMREAD_COLOR and buffer.size and buffer[0] == 0x89:
+            calls.append(flags)
+        return imdecode(buffer, flags)
+    monkeypatch.setattr(capture_store.cv2, "imdecode", counting_imdecode)
+    return calls
+
+
+@pytest.fixture
+def store(tmp_path):
+    return ScreenCaptureStore(root_dir=str(tmp_path / "captures"))
+
+
+def assert_replays(store, session_id, frames, timestamps=None):
+    """Chaque capture relue à son horodatage est identique au pixel près"""
+    timestamps = timestamps or [float(i) for i in range(len(frames))]
+    for timestamp, frame in zip(timestamps, frames):
+        capture = store.get_capture_at(session_id, timestamp)
+        assert capture is not None
+        assert capture.shape == frame.shape
+        assert np.array_equal(capture, frame), f"capture différente à t={timestamp}"
+
+
+def test_round_trip_keyframe_then_deltas(store):
+    frames = make_frames(12)
+    kinds = [store.append(1, frame, float(i))['kind'] for i, frame in enumerate(frames)]
+
+    assert kinds[0] == 'keyframe'
+    assert set(kinds[1:]) == {'delta'}
+    assert_replays(store, 1, frames)
+
+
+def test_repeated_lookup_returns_real_size(store):
+    """La reconstruction en cache (complétée aux tuiles) est recadrée à chaque retour"""
+    frame = make_frames(1, height=100, width=130)[0]
+    store.append(1, frame, 10.0)
+
+    first = store.get_capture_at(1, 10.0)
+    second = store.get_capture_at(1, 10.0)
+    assert first.shape == second.shape == (100, 130, 3)
+    assert np.array_equal(second, frame)
+
+
+def test_lookup_between_and_before_captures(store):
+    frames = make_frames(3)
+    for i, frame in enumerate(frames):
+        store.append(1, frame, 10.0 * i)
+
+    assert store.get_capture_at(1, -1.0) is None
+    assert np.array_equal(store.get_capture_at(1, 15.0), frames[1])
+    assert np.array_equal(store.get_capture_at(1, 1e12), frames[2])
+    # Relecture en arrière : le cache n'est pas réutilisé
+    assert np.array_equal(store.get_capture_at(1, 0.0), frames[0])
+
+
+def test_identical_capture_is_skipped(store):
+    frame = make_frames(1)[0]
+    store.append(1, frame, 0.0)
+
+    result = store.append(1, frame.copy(), 1.0)
+    assert result == {'kind': 'skipped', 'bytes': 0, 'changed_tiles': 0}
+    assert store.load_index(1).size == 1
+
+
+def test_identical_encoded_capture_writes_timestamp_only(store, decodes):
+    """Même capture encodée : ni décodage ni comparaison, une entrée d'index horodatée"""
+    frames = make_frames(2)
+    first = encode(frames[0])
+    store.append_encoded(1, first, 0.0)
+    decoded = len(decodes)
+
+    assert store.append_encoded(1, first, 1.0) == {'kind': 'repeat', 'bytes': 0, 'changed_tiles': 0}
+    assert store.append_encoded(1, first, 2.0)['kind'] == 'repeat'
+    assert len(decodes) == decoded
+
+    index = store.load_index(1)
+    assert index['kind'].tolist() == [KEYFRAME, REPEAT, REPEAT]
+    assert index['timestamp'].tolist() == [0.0, 1.0, 2.0]
+    assert_replays(store, 1, [frames[0]] * 3)
+
+    # Capture différente puis retour à la première : comparaison complète
+    assert store.append_encoded(1, encode(frames[1]), 3.0)['kind'] == 'delta'
+    assert store.append_encoded(1, first, 4.0)['kind'] == 'delta'
+    assert_replays(store, 1, [frames[1], frames[0]], [3.0, 4.0])
+
+
+def test_repeats_do_not_count_towards_keyframe_interval(store):
+    store.keyframe_interval = 2
+    frames = make_frames(2)
+    first = encode(frames[0])
+    for i in range(5):
+        store.append_encoded(1, first, float(i))
+    assert store.append_encoded(1, encode(frames[1]), 5.0)['kind'] == 'delta'
+
+
+def test_repeats_from_another_writer_keep_reference(tmp_path, monkeypatch):
+    """Répétitions écrites par un autre worker : l'image de référence n'est pas relue"""
+    root = str(tmp_path / "captures")
+    capture = encode(make_frames(1)[0])
+    first, second = ScreenCaptureStore(root_dir=root), ScreenCaptureStore(root_dir=root)
+
+    first.append_encoded(1, capture, 0.0)
+    assert second.append_encoded(1, capture, 1.0)['kind'] == 'skipped'
+    assert second.append_encoded(1, capture, 2.0)['kind'] == 'repeat'
+
+    def no_replay(*args, **kwargs):
+        raise AssertionError("référence relue sur disque")
+    monkeypatch.setattr(first, "_replay", no_replay)
+    assert first.append_encoded(1, capture, 3.0)['kind'] == 'repeat'
+
+
+def test_small_change_below_perceptual_threshold_is_stored(store):
+    """Un seul pixel modifié suffit à écrire un delta (comparaison exacte)"""
+    frame = make_frames(1)[0]
+    changed = frame.copy()
+    changed[0, 0, 0] ^= 1
+    store.append(1, frame, 0.0)
+
+    assert store.append(1, changed, 1.0)['changed_tiles'] == 1
+    assert np.array_equal(store.get_capture_at(1, 1.0), changed)
+
+
+def test_resolution_change_writes_keyframe(store):
+    small = make_frames(2, height=120, width=200)
+    large = make_frames(2, height=240, width=320, seed=1)
+    frames = small + large
+    kinds = [store.append(1, frame, float(i))['kind'] for i, frame in enumerate(frames)]
+
+    assert kinds == ['keyframe', 'delta', 'keyframe', 'delta']
+    assert_replays(store, 1, frames)
+
+
+def test_periodic_keyframes(store):
+    store.keyframe_interval = 4
+    frames = make_frames(20)
+    for i, frame in enumerate(frames):
+        store.append(1, frame, float(i))
+
+    index = store.load_index(1)
+    assert int((index['kind'] == KEYFRAME).sum()) == 4
+    assert_replays(store, 1, frames)
+
+
+def test_long_delta_run_rotates_segments(store):
+    """La taille du segment est vérifiée à chaque écriture, pas seulement aux images clés"""
+    store.keyframe_interval = 10 ** 6
+    frames = make_frames(40)
+    store.append(1, frames[0], 0.0)
+    keyframe_bytes = os.path.getsize(os.path.join(store.session_dir(1), 'segment_000000.bin'))
+    store.segment_max_bytes = keyframe_bytes + 50000
+    for i, frame in enumerate(frames[1:], start=1):
+        store.append(1, frame, float(i))
+
+    index = store.load_index(1)
+    segments = np.unique(index['segment'])
+    assert len(segments) > 1
+    for segment in segments:
+        entries = index[index['segment'] == segment]
+        # Chaque segment commence par une image clé et ne dépasse la limite que d'un enregistrement
+        assert entries['kind'][0] == KEYFRAME
+        assert (entries['kind'] == DELTA).any()
+        size = os.path.getsize(os.path.join(store.session_dir(1), f'segment_{int(segment):06d}.bin'))
+        assert size - int(entries['length'][-1]) < store.segment_max_bytes
+    assert_replays(store, 1, frames)
+
+
+def test_restart_continues_with_deltas(tmp_path):
+    """Après redémarrage, l'image de référence est relue sur disque"""
+    root = str(tmp_path / "captures")
+    frames = make_frames(6)
+
+    first = ScreenCaptureStore(root_dir=root)
+    for i, frame in enumerate(frames[:3]):
+        first.append(1, frame, float(i))
+    first.close_session(1)
+
+    second = ScreenCaptureStore(root_dir=root)
+    kinds = [second.append(1, frame, float(i + 3))['kind'] for i, frame in enumerate(frames[3:])]
+    assert kinds == ['delta', 'delta', 'delta']
+    assert_replays(ScreenCaptureStore(root_dir=root), 1, frames)
+
+
+@pytest.mark.skipif(not hasattr(os, "fork"), reason="fork indisponible")
+def test_two_processes_append_to_one_session(tmp_path):
+    """Deux workers alternent les captures d'une session : les deltas restent exacts"""
+    root = str(tmp_path / "captures")
+    frames = make_frames(24)
+    to_child_r, to_child_w = os.pipe()
+    to_parent_r, to_parent_w = os.pipe()
+
+    pid = os.fork()
+    if pid == 0:
+        code = 0
+        try:
+            store = ScreenCaptureStore(root_dir=root)
+            store.segment_max_bytes = 450000
+            for i in range(1, len(frames), 2):
+                os.read(to_child_r, 1)
+                store.append(1, frames[i], float(i))
+                os.write(to_parent_w, b"x")
+        except BaseException:
+            code = 1
+        finally:
+            os._exit(code)
+
+    store = ScreenCaptureStore(root_dir=root)
+    store.segment_max_bytes = 450000
+    for i in range(0, len(frames), 2):
+        if i:
+            os.read(to_parent_r, 1)
+        store.append(1, frames[i], float(i))
+        os.write(to_child_w, b"x")
+    os.read(to_parent_r, 1)
+    _, status = os.waitpid(pid, 0)
+    assert os.waitstatus_to_exitcode(status) == 0
+
+    index = ScreenCaptureStore(root_dir=root).load_index(1)
+    assert (index['kind'] == DELTA).sum() > 0
+    assert len(np.unique(index['segment'])) > 1
+    assert_replays(ScreenCaptureStore(root_dir=root), 1, frames)
+
+
+def test_session_paths_are_numeric(store):
+    with pytest.raises(ValueError):
+        store.session_dir("../../etc")
+    with pytest.raises(ValueError):
+        store.append("../x", make_frames(1)[0])
+    assert store.session_dir("12") == store.session_dir(12)
+
+
+def test_delete_session_keeps_root(store):
+    frames = make_frames(3)
+    for session_id in (1, 2):
+        for i, frame in enumerate(frames):
+            store.append(session_id, frame, float(i))
+
+    assert store.session_ids() == [1, 2]
+    files, freed = store.delete_session(1)
+    assert files == 2 and freed > 0
+    assert store.session_ids() == [2]
+    assert os.path.isdir(store.root_dir)
+    assert store.get_capture_at(1, 10.0) is None
+    assert_replays(store, 2, frames)
@@ -0,0 +1,148 @@
+#!/usr/bin/env python3
+"""
+Pool de connexions : options par pilote (statement_timeout) et métriques d'occupation
+
+    python -m pytest test_database_pool.py
+"""
+
+import itertools
+
+import pytest
+from prometheus_client import REGISTRY
+from sqlalchemy import create_engine, exc
+from sqlalchemy.ext.asyncio import create_async_engine
+
+from app.core import database
+from app.core.config import settings
+from app.core.database import InstrumentedAsyncQueuePool, InstrumentedQueuePool, get_engine_options
+
+_labels = itertools.count(1)
+
+
+def sample(name: str, label: str) -> float:
+    return REGISTRY.get_sample_value(name, {"pool": label}) or 0.0
+
+
+def test_sqlite_keeps_dialect_defaults():
+    assert get_engine_options("sqlite:///./proctoflex.db") == {}
+    assert get_engine_options("sqlite+aiosqlite:///./proctoflex.db", asynchronous=True) == {}
+
+
+def test_statement_timeout_per_driver(monkeypatch):
+    monkeypatch.setattr(settings, "DB_STATEMENT_TIMEOUT_MS", 5000)
+
+    sync = get_engine_options("postgresql://u:p@db/proctoflex")
+    assert sync["poolclass"] is InstrumentedQueuePool
+    # psycopg / psycopg2 : paramètre de démarrage libpq
+    assert sync["connect_args"] == {"options": "-c statement_timeout=5000"}
+
+    asynchronous = get_engine_options("postgresql+asyncpg://u:p@db/proctoflex", asynchronous=True)
+    assert asynchronous["poolclass"] is InstrumentedAsyncQueuePool
+    # asyncpg : server_settings (pas d'option `options`)
+    assert asynchronous["connect_args"] == {"server_settings": {"statement_timeout": "5000"}}
+
+
+def test_statement_timeout_disabled(monkeypatch):
+    monkeypatch.setattr(settings, "DB_STATEMENT_TIMEOUT_MS", 0)
+    assert "connect_args" not in get_engine_options("postgresql://u:p@db/proctoflex")
+
+
+class Refused(Exception):
+    pass
+
+
+def test_statement_timeout_reaches_psycopg2(monkeypatch):
+    """Les connect_args arrivent jusqu'au connect() du pilote"""
+    psycopg2 = pytest.importorskip("psycopg2")
+    monkeypatch.setattr(settings, "DB_STATEMENT_TIMEOUT_MS", 2500)
+    received = {}
+
+    def connect(*args, **kwargs):
+        received.update(kwargs)
+        raise Refused()
+    monkeypatch.setattr(psycopg2, "connect", connect)
+
+    url = "postgresql+psycopg2://u:p@db/proctoflex"
+    engine = create_engine(url, **get_engine_options(url))
+    with pytest.raises(Refused):
+        engine.connect()
+    assert received["options"] == "-c statement_timeout=2500"
+    engine.dispose()
+
+
+@pytest.mark.asyncio
+async def test_statement_timeout_reaches_asyncpg(monkeypatch):
+    asyncpg = pytest.importorskip("asyncpg")
+    monkeypatch.setattr(settings, "DB_STATEMENT_TIMEOUT_MS", 2500)
+    received = {}
+
+    async def connect(*args, **kwargs):
+        received.update(kwargs)
+        raise Refused()
+    monkeypatch.setattr(asyncpg, "connect", connect)
+
+    url = "postgresql+asyncpg://u:p@db/proctoflex"
+    engine = create_async_engine(url, **get_engine_options(url, asynchronous=True))
+    with pytest.raises(Refused):
+        async with engine.connect():
+            pass
+    assert received["server_settings"] == {"statement_timeout": "2500"}
+    await engine.dispose()
+
+
+@pytest.fixture
+def pool_engine(tmp_path):
+    """Engine SQLite sur un pool instrumenté : 1 connexion + 1 en débordement"""
+    label = f"test{next(_labels)}"
+    engine = create_engine(
+        f"sqlite:///{tmp_path}/pool.db",
+        poolclass=InstrumentedQueuePool,
+        pool_size=1,
+        max_overflow=1,
+        pool_timeout=0.05
+    )
+    database.register_pool_metrics(label, engine)
+    yield engine, label
+    engine.dispose()
+
+
+def test_pool_gauges_follow_checkouts(pool_engine):
+    engine, label = pool_engine
+    first = engine.connect()
+    assert sample("proctoflex_db_pool_connections_in_use", label) == 1
+    assert sample("proctoflex_db_pool_overflow", label) == 0
+
+    second = engine.connect()
+    assert sample("proctoflex_db_pool_connections_in_use", label) == 2
+    assert sample("proctoflex_db_pool_overflow", label) == 1
+    assert sample("proctoflex_db_pool_overflow_checkouts_total", label) == 1
+
+    # File vide : la connexion restituée y reste, toujours ouverte en débordement
+    second.close()
+    assert sample("proctoflex_db_pool_connections_in_use", label) == 1
+    assert sample("proctoflex_db_pool_overflow", label) == 1
+
+    # File pleine : la connexion restituée est fermée, le débordement retombe
+    first.close()
+    assert sample("proctoflex_db_pool_connections_in_use", label) == 0
+    assert sample("proctoflex_db_pool_overflow", label) == 0
+    assert sample("proctoflex_db_pool_checkout_seconds_count", "sync") >= 2
+
+
+def test_pool_timeout_is_counted(pool_engine):
+    engine, label = pool_engine
+    timeouts = sample("proctoflex_db_pool_timeouts_total", "sync")
+    held = [engine.connect(), engine.connect()]
+    with pytest.raises(exc.TimeoutError):
+        engine.connect()
+    assert sample("proctoflex_db_pool_timeouts_total", "sync") == timeouts + 1
+    for connection in held:
+        connection.close()
+
+
+def test_listeners_survive_dispose(pool_engine):
+    engine, label = pool_engine
+    engine.dispose()
+    with engine.connect():
+        assert sample("proctoflex_db_pool_connections_in_use", label) == 1
+    assert sample("proctoflex_db_pool_connections_in_use", label) == 0
@@ -0,0 +1,124 @@
+#!/usr/bin/env python3
+"""
+Stockage des preuves : adressage par contenu, dédoublonnage et rétention
+
+    python -m pytest test_evidence_store.py
+"""
+
+import base64
+import hashlib
+import os
+import time
+
+import cv2
+import numpy as np
+import pytest
+
+from app.storage.evidence import EvidenceStore
+
+
+def encode(image: np.ndarray, extension: str = '.png') -> bytes:
+    ok, encoded = cv2.imencode(extension, image)
+    assert ok
+    return encoded.tobytes()
+
+
+def make_image(seed: int = 0, height: int = 240, width: int = 320) -> np.ndarray:
+    return np.random.RandomState(seed).randint(0, 255, (height, width, 3), np.uint8)
+
+
+@pytest.fixture
+def store(tmp_path):
+    return EvidenceStore(root_dir=str(tmp_path / "evidence"))
+
+
+def test_store_is_content_addressed(store):
+    data = encode(make_image())
+    result = store.store(data, session_id=1)
+
+    digest = hashlib.sha256(data).hexdigest()
+    assert result == {"hash": digest, "deduplicated": None}
+    path = store.find(digest)
+    assert path == os.path.join(store.root_dir, digest[:2], digest[2:4], digest + '.png')
+    with open(path, 'rb') as handle:
+        assert handle.read() == data
+
+
+def test_base64_and_data_url_inputs(store):
+    data = encode(make_image(), '.jpg')
+    encoded = base64.b64encode(data).decode()
+
+    first = store.store(encoded)
+    second = store.store("data:image/jpeg;base64," + encoded)
+    assert first["hash"] == second["hash"] == hashlib.sha256(data).hexdigest()
+    assert second["deduplicated"] == "exact"
+
+
+def test_exact_duplicate_is_not_rewritten(store):
+    data = encode(make_image())
+    digest = store.store(data, session_id=1)["hash"]
+    path = store.find(digest)
+    os.utime(path, (1, 1))
+
+    assert store.store(data, session_id=2) == {"hash": digest, "deduplicated": "exact"}
+    # La réutilisation rafraîchit la date du fichier (rétention)
+    assert os.path.getmtime(path) > 1
+    assert store.stats()["stored"] == 1
+    assert store.stats()["exact_duplicates"] == 1
+
+
+def test_near_duplicate_within_session(store):
+    image = make_image()
+    slightly_changed = image.copy()
+    slightly_changed[0, 0] = 255 - slightly_changed[0, 0]
+
+    digest = store.store(encode(image), session_id=1)["hash"]
+    assert store.store(encode(slightly_changed), session_id=1) == {"hash": digest, "deduplicated": "near"}
+    # Autre session : pas de rapprochement perceptuel
+    assert store.store(encode(slightly_changed), session_id=2)["deduplicated"] is None
+    assert store.store(encode(make_image(seed=1)), session_id=1)["deduplicated"] is None
+
+
+def test_near_duplicate_window_expires(store):
+    store.near_dup_window = 0.0
+    image = make_image()
+    slightly_changed = image.copy()
+    slightly_changed[0, 0] = 255 - slightly_changed[0, 0]
+
+    store.store(encode(image), session_id=1)
+    time.sleep(0.01)
+    assert store.store(encode(slightly_changed), session_id=1)["deduplicated"] is None
+
+
+def test_rejects_unsupported_and_unreadable_data(store):
+    with pytest.raises(ValueError):
+        store.store(b"GIF89a....")
+    with pytest.raises(ValueError):
+        store.store(b'\x89PNG\r\n\x1a\n' + b'\x00' * 32)
+    assert store.find("../../etc/passwd") is None
+
+
+def test_thumbnail(store):
+    digest = store.store(encode(make_image(height=600, width=800)))["hash"]
+
+    path = store.thumbnail(digest)
+    thumbnail = cv2.imread(path)
+    assert max(thumbnail.shape[:2]) == store.thumbnail_size
+    assert store.thumbnail(digest) == path
+    assert store.thumbnail("0" * 64) is None
+
+
+def test_delete_and_unused_since(store):
+    old = store.store(encode(make_image(seed=1)))["hash"]
+    recent = store.store(encode(make_image(seed=2)))["hash"]
+    store.thumbnail(old)
+    os.utime(store.find(old), (1000, 1000))
+
+    assert list(store.iter_unused_since(2000)) == [old]
+
+    files, freed = store.delete(old)
+    assert files == 2 and freed > 0
+    assert store.find(old) is None
+    assert store.find(recent) is not None
+    assert store.delete(old) == (0, 0)
+    assert store.delete("not-a-digest") == (0, 0)
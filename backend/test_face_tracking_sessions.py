@@ -0,0 +1,78 @@
+#!/usr/bin/env python3
+"""
+Suivi du visage par session : seul l'identifiant d'une session de l'étudiant désigne un suiveur
+
+    python -m pytest test_face_tracking_sessions.py
+"""
+
+import numpy as np
+import pytest
+
+from app.api.v1 import ai
+
+IMAGE = "data:image/jpeg;base64,AAAA"
+
+
+class FakeFaceDetection:
+    """Service de détection factice : relève la session transmise au suivi du regard"""
+
+    def __init__(self):
+        self.gaze_sessions = []
+
+    def decode_base64_image(self, image):
+        return np.zeros((4, 4, 3), np.uint8)
+
+    def detect_faces(self, image):
+        return [{'bbox': [0, 0, 2, 2]}]
+
+    def analyze_face_quality(self, image):
+        return {'quality': 'good'}
+
+    def detect_multiple_faces(self, image):
+        return {'multiple_faces': False}
+
+    def track_gaze(self, image, bbox, session_id=None):
+        self.gaze_sessions.append(session_id)
+        return {'looking_at_screen': True}
+
+
+@pytest.fixture
+def faces(monkeypatch):
+    fake = FakeFaceDetection()
+    monkeypatch.setattr(ai, "face_detection_service", fake)
+    return fake
+
+
+@pytest.fixture
+def sessions(register, start_session):
+    _, alice = register()
+    _, mallory = register()
+    return alice, mallory, start_session(alice)
+
+
+def test_analyze_face_tracks_only_owned_sessions(client, faces, sessions):
+    alice, mallory, session_id = sessions
+
+    for headers, requested in ((alice, str(session_id)), (mallory, str(session_id)),
+                               (alice, "999999"), (alice, "pas-un-nombre"), (alice, None)):
+        response = client.post("/api/v1/ai/analyze-face", headers=headers,
+                               json={"image": IMAGE, "session_id": requested})
+        assert response.status_code == 200, response.text
+
+    # Identifiant numérique de la session vérifiée, jamais la chaîne du client
+    assert faces.gaze_sessions == [session_id, None, None, None, None]
+
+
+def test_surveillance_analysis_tracks_only_owned_sessions(client, faces, sessions):
+    alice, mallory, session_id = sessions
+
+    for headers in (alice, mallory):
+        response = client.post("/api/v1/ai/surveillance-analysis", headers=headers, json={
+            "session_id": str(session_id),
+            "video_frame": IMAGE,
+            "timestamp": "2026-01-01T00:00:00Z"
+        })
+        assert response.status_code == 200, response.text
+        assert response.json()["face_analysis"]["gaze_analysis"] == {'looking_at_screen': True}
+
+    assert faces.gaze_sessions == [session_id, None]
@@ -0,0 +1,125 @@
+#!/usr/bin/env python3
+"""
+Pose de la tête et regard : points FaceMesh synthétiques projetés depuis une pose connue
+
+    python -m pytest test_head_pose.py
+"""
+
+import math
+
+import cv2
+import numpy as np
+import pytest
+
+from app.ai import head_pose
+from app.ai.head_pose import MODEL_POINTS, POSE_LANDMARKS, HeadPoseEstimator
+
+WIDTH, HEIGHT = 640, 480
+CAMERA = np.array([[WIDTH, 0, WIDTH / 2.0], [0, WIDTH, HEIGHT / 2.0], [0, 0, 1]], dtype=np.float64)
+
+
+def make_landmarks(yaw=0.0, pitch=0.0, iris=(0.0, 0.0), count=head_pose.IRIS_LANDMARKS):
+    """
+    Maillage (count, 2) d'un visage tourné de `yaw` / `pitch` degrés
+
+    Les yeux sont des rectangles de 40 x 10 pixels à partir des coins externes
+    projetés ; `iris` place les deux iris de -1 à 1 dans l'œil.
+    """
+    rvec = np.array([math.radians(pitch), math.radians(yaw), 0.0])
+    tvec = np.array([0.0, 0.0, 1500.0])
+    projected, _ = cv2.projectPoints(MODEL_POINTS, rvec, tvec, CAMERA, None)
+
+    landmarks = np.zeros((count, 2))
+    landmarks[list(POSE_LANDMARKS)] = projected.reshape(-1, 2)
+    if count >= head_pose.IRIS_LANDMARKS:
+        for outer, inner, top, bottom, iris_index, side in (
+            (head_pose.LEFT_EYE_OUTER, head_pose.LEFT_EYE_INNER, head_pose.LEFT_EYE_TOP,
+             head_pose.LEFT_EYE_BOTTOM, head_pose.LEFT_IRIS, 1.0),
+            (head_pose.RIGHT_EYE_OUTER, head_pose.RIGHT_EYE_INNER, head_pose.RIGHT_EYE_TOP,
+             head_pose.RIGHT_EYE_BOTTOM, head_pose.RIGHT_IRIS, -1.0),
+        ):
+            center = landmarks[outer] + (side * 20.0, 0.0)
+            landmarks[inner] = landmarks[outer] + (side * 40.0, 0.0)
+            landmarks[top] = center - (0.0, 5.0)
+            landmarks[bottom] = center + (0.0, 5.0)
+            landmarks[iris_index] = center + (iris[0] * 20.0, iris[1] * 5.0)
+    return landmarks, rvec
+
+
+def expected_head(rvec):
+    rotation, _ = cv2.Rodrigues(rvec)
+    angles = head_pose._direction_angles(rotation @ np.array([0.0, 0.0, -1.0]))
+    angles['roll'] = math.degrees(math.atan2(rotation[1, 0], rotation[0, 0]))
+    return angles
+
+
+@pytest.mark.parametrize("yaw, pitch", [(0, 0), (15, 0), (-20, 5), (0, -10), (35, 0)])
+def test_head_angles_match_projected_pose(yaw, pitch):
+    landmarks, rvec = make_landmarks(yaw, pitch)
+    result = HeadPoseEstimator().estimate(landmarks, WIDTH, HEIGHT)
+
+    expected = expected_head(rvec)
+    assert result['head_pose']['yaw'] == pytest.approx(expected['yaw'], abs=0.5)
+    assert result['head_pose']['pitch'] == pytest.approx(expected['pitch'], abs=0.5)
+    assert result['head_pose']['roll'] == pytest.approx(expected['roll'], abs=0.5)
+
+
+def test_centered_iris_follows_head():
+    landmarks, _ = make_landmarks(10, 0)
+    result = HeadPoseEstimator().estimate(landmarks, WIDTH, HEIGHT)
+
+    assert result['gaze']['yaw'] == pytest.approx(result['head_pose']['yaw'], abs=0.1)
+    assert result['gaze']['pitch'] == pytest.approx(result['head_pose']['pitch'], abs=0.1)
+    assert len(result['iris_positions']) == 2
+
+
+def test_iris_offset_turns_gaze():
+    landmarks, _ = make_landmarks(0, 0, iris=(1.0, 0.0))
+    result = HeadPoseEstimator().estimate(landmarks, WIDTH, HEIGHT)
+
+    # Iris en butée vers la droite de l'image : regard décalé de EYE_YAW_RANGE_DEG
+    assert result['gaze']['yaw'] == pytest.approx(head_pose.EYE_YAW_RANGE_DEG, abs=1.0)
+    assert result['looking_at_screen'] is False
+
+
+@pytest.mark.parametrize("yaw, looking", [(0, True), (20, True), (-30, False)])
+def test_looking_at_screen_uses_limits(yaw, looking):
+    landmarks, _ = make_landmarks(yaw, 0)
+    result = HeadPoseEstimator(yaw_limit=25.0).estimate(landmarks, WIDTH, HEIGHT)
+
+    assert result['looking_at_screen'] is looking
+    assert result['gaze_offset'] == pytest.approx(abs(result['gaze']['yaw']) / 25.0, abs=0.01)
+
+
+def test_without_iris_gaze_is_head_direction():
+    landmarks, _ = make_landmarks(30, 0, count=468)
+    result = HeadPoseEstimator(yaw_limit=25.0).estimate(landmarks, WIDTH, HEIGHT)
+
+    assert result['gaze'] is None and result['gaze_vector'] is None
+    assert result['iris_positions'] == []
+    assert result['looking_at_screen'] is False
+
+
+def test_tracking_reuses_previous_pose(monkeypatch):
+    calls = []
+    solve = cv2.solvePnP
+
+    def recording_solve(*args, **kwargs):
+        calls.append(kwargs['useExtrinsicGuess'])
+        return solve(*args, **kwargs)
+    monkeypatch.setattr(head_pose.cv2, "solvePnP", recording_solve)
+
+    estimator = HeadPoseEstimator()
+    for yaw in (10, 12):
+        landmarks, rvec = make_landmarks(yaw, 0)
+        result = estimator.estimate(landmarks, WIDTH, HEIGHT)
+        assert result['head_pose']['yaw'] == pytest.approx(expected_head(rvec)['yaw'], abs=0.5)
+
+    # Changement de résolution : nouveau flux, sans pose initiale
+    estimator.estimate(make_landmarks(12, 0)[0], WIDTH + 1, HEIGHT)
+    assert calls == [False, True, False]
+
+    untracked = HeadPoseEstimator(tracking=False)
+    untracked.estimate(landmarks, WIDTH, HEIGHT)
+    untracked.estimate(landmarks, WIDTH, HEIGHT)
+    assert calls[3:] == [False, False]
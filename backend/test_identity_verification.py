@@ -0,0 +1,77 @@
+#!/usr/bin/env python3
+"""
+Vérification d'identité : alertes et preuves rattachées uniquement aux sessions de l'étudiant
+
+    python -m pytest test_identity_verification.py
+"""
+
+import base64
+
+import cv2
+import numpy as np
+import pytest
+
+from app.api.v1.endpoints import surveillance
+
+URL = "/api/v1/surveillance/verify-identity"
+IMAGE = base64.b64encode(cv2.imencode('.png', np.zeros((32, 32, 3), np.uint8))[1].tobytes()).decode()
+
+
+class RejectingEngine:
+    """Moteur de reconnaissance factice (MediaPipe / dlib absents des tests)"""
+
+    def verify_identity(self, reference_image, current_image):
+        return {'verified': False, 'confidence': 0.1, 'error': 'Visages différents'}
+
+
+@pytest.fixture
+def persisted(monkeypatch):
+    """Vérification toujours échouée ; alertes et preuves enregistrées en mémoire"""
+    records = {"alerts": [], "evidence": []}
+
+    monkeypatch.setattr(surveillance, "face_engine", RejectingEngine())
+
+    async def submit(**alert):
+        records["alerts"].append(alert)
+
+    def store(data, session_id):
+        records["evidence"].append(session_id)
+        return {"hash": "0" * 64}
+
+    monkeypatch.setattr(surveillance.alert_sink, "submit", submit)
+    monkeypatch.setattr(surveillance.evidence_store, "store", store)
+    monkeypatch.setattr(surveillance.settings, "EVIDENCE_STORE_ENABLED", True)
+    return records
+
+
+def verify(client, headers, session_id):
+    body = {"reference_image": IMAGE, "current_image": IMAGE}
+    if session_id is not None:
+        body["session_id"] = session_id
+    response = client.post(URL, headers=headers, json=body)
+    assert response.status_code == 200, response.text
+    assert response.json()["verified"] is False
+    return response
+
+
+def test_failure_on_own_session_is_recorded(client, register, start_session, persisted):
+    _, headers = register()
+    session_id = start_session(headers)
+    verify(client, headers, session_id)
+
+    assert persisted["evidence"] == [session_id]
+    assert [(alert["session_id"], alert["alert_type"], alert["evidence_hash"]) for alert in persisted["alerts"]] == [
+        (session_id, "face_verification_failed", "0" * 64)
+    ]
+
+
+def test_foreign_or_missing_session_is_not_recorded(client, register, start_session, persisted):
+    _, alice = register()
+    _, mallory = register()
+    session_id = start_session(alice)
+
+    verify(client, mallory, session_id)
+    verify(client, mallory, 999999)
+    verify(client, mallory, None)
+
+    assert persisted == {"alerts": [], "evidence": []}
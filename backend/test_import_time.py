@@ -0,0 +1,118 @@
+#!/usr/bin/env python3
+"""
+Budget de temps d'import de l'application
+
+Un worker uvicorn importe `main` avant de servir sa première requête : les modèles
+IA (dlib, MediaPipe, YOLO) ne doivent pas être chargés à ce moment-là mais au premier
+usage ou par les sondes de démarrage. Chaque mesure est faite dans un interpréteur
+neuf (python -X importtime), sans cache de modules.
+
+    python test_import_time.py
+    IMPORT_TIME_BUDGET_SECONDS=3 python -m pytest test_import_time.py
+"""
+
+import json
+import os
+import subprocess
+import sys
+import tempfile
+from pathlib import Path
+
+BACKEND_DIR = Path(__file__).resolve().parent
+
+# Temps d'import maximal de `main` (secondes, machine de CI)
+BUDGET_SECONDS = float(os.getenv("IMPORT_TIME_BUDGET_SECONDS", "5"))
+
+# Modules qui chargent des modèles ou des bibliothèques natives volumineuses
+HEAVY_MODULES = ("face_recognition", "dlib", "mediapipe", "torch", "ultralytics")
+
+MEASURE_SCRIPT = """
+import json, sys, time
+started = time.perf_counter()
+import main
+elapsed = time.perf_counter() - started
+from app.ai.providers import loaded_services
+print(json.dumps({
+    "seconds": elapsed,
+    "heavy": sorted(name for name in %r if name in sys.modules),
+    "loaded": loaded_services(),
+}))
+""" % (HEAVY_MODULES,)
+
+
+def measure_import() -> dict:
+    """Importe `main` dans un nouvel interpréteur et renvoie la durée et les modules lourds chargés"""
+    with tempfile.TemporaryDirectory() as workdir:
+        env = dict(os.environ)
+        env.setdefault("DATABASE_URL", f"sqlite:///{workdir}/import-time.db")
+        env.setdefault("UPLOAD_DIR", os.path.join(workdir, "uploads"))
+        result = subprocess.run(
+            [sys.executable, "-X", "importtime", "-c", MEASURE_SCRIPT],
+            cwd=BACKEND_DIR,
+            env=env,
+            capture_output=True,
+            text=True,
+            timeout=300
+        )
+    if result.returncode != 0:
+        raise RuntimeError(f"Import de main en échec:\n{result.stderr[-2000:]}")
+
+    measure = json.loads(result.stdout.strip().splitlines()[-1])
+    measure["slowest"] = _slowest_imports(result.stderr)
+    return measure
+
+
+def _slowest_imports(importtime_output: str, limit: int = 10) -> list:
+    """Modules les plus coûteux à importer sous `main` (temps cumulé, -X importtime)"""
+    modules = []
+    for line in importtime_output.splitlines():
+        if not line.startswith("import time:") or "|" not in line:
+            continue
+        _, cumulative, name = line[len("import time:"):].split("|")
+        # Indentation : profondeur dans l'arbre d'import (main lui-même exclu)
+        if not cumulative.strip().isdigit() or not name.startswith("   "):
+            continue
+        modules.append((int(cumulative) / 1e6, name.strip()))
+    return sorted(modules, reverse=True)[:limit]
+
+
+def _describe(measure: dict) -> str:
+    return "\n".join(f"  {seconds:6.2f} s  {name}" for seconds, name in measure["slowest"])
+
+
+def test_heavy_models_not_imported():
+    """Aucune bibliothèque de modèles n'est importée avec l'application"""
+    measure = measure_import()
+    assert not measure["heavy"], f"Modules lourds importés avec main: {measure['heavy']}\n{_describe(measure)}"
+
+
+def test_services_not_built_at_import():
+    """Aucun service IA paresseux n'est construit par l'import de l'application"""
+    measure = measure_import()
+    assert not measure["loaded"], f"Services IA construits à l'import de main: {measure['loaded']}"
+
+
+def test_import_time_budget():
+    """L'import de l'application reste sous le budget"""
+    measure = measure_import()
+    assert measure["seconds"] <= BUDGET_SECONDS, (
+        f"Import de main en {measure['seconds']:.2f} s (budget {BUDGET_SECONDS} s)\n{_describe(measure)}"
+    )
+
+
+def main():
+    """Fonction principale"""
+    print(f"⏱️  Temps d'import de main (budget {BUDGET_SECONDS} s)")
+    measure = measure_import()
+    print(f"{'✅' if measure['seconds'] <= BUDGET_SECONDS else '❌'} {measure['seconds']:.2f} s")
+    print(_describe(measure))
+    if measure["heavy"]:
+        print(f"❌ Modules lourds importés: {', '.join(measure['heavy'])}")
+    if measure["loaded"]:
+        print(f"❌ Services IA construits à l'import: {', '.join(measure['loaded'])}")
+    return measure["seconds"] <= BUDGET_SECONDS and not measure["heavy"] and not measure["loaded"]
+
+
+if __name__ == "__main__":
+    success = main()
+    sys.exit(0 if success else 1)
@@ -0,0 +1,116 @@
+#!/usr/bin/env python3
+"""
+Générateur de charge : cadence d'envoi, images abandonnées et détection de la saturation
+
+    python -m pytest test_loadgen.py
+"""
+
+import types
+
+import pytest
+
+from benchmarks import loadgen
+from benchmarks.loadgen import LoadProfile, _saturated, _stream, _StepRecorder, run_step
+
+FRAMES = [{'base64': 'aW1hZ2U=', 'width': 2, 'height': 2}]
+
+
+@pytest.mark.asyncio
+async def test_stream_drops_ticks_missed_during_a_slow_request(monkeypatch):
+    now = [0.0]
+
+    async def sleep(delay):
+        now[0] += delay
+    monkeypatch.setattr(loadgen, "time", types.SimpleNamespace(monotonic=lambda: now[0]))
+    monkeypatch.setattr(loadgen, "asyncio", types.SimpleNamespace(sleep=sleep))
+
+    sent = []
+
+    async def send():
+        sent.append(now[0])
+        # Troisième envoi lent : les instants 3 et 4 passent pendant la requête
+        now[0] += 2.7 if len(sent) == 3 else 0.5
+
+    recorder = _StepRecorder()
+    await _stream(1.0, 10.0, "video", recorder, send)
+
+    assert sent == [0.0, 1.0, 2.0, 5.0, 6.0, 7.0, 8.0, 9.0]
+    assert recorder.scheduled == {"video": 10}
+    assert recorder.dropped == {"video": 2}
+
+
+class FakeResponse:
+    def __init__(self, status_code, payload=None):
+        self.status_code = status_code
+        self._payload = payload or {}
+
+    def json(self):
+        return self._payload
+
+
+class FakeClient:
+    """Serveur simulé : l'enregistrement audio échoue, un étudiant ne peut démarrer sa session"""
+
+    def __init__(self):
+        self.calls = []
+
+    async def request(self, method, url, **kwargs):
+        self.calls.append((method, url))
+        if url.endswith("/auth/register"):
+            return FakeResponse(200, {"access_token": kwargs["json"]["username"]})
+        if url.endswith("/start-session"):
+            if kwargs["headers"]["Authorization"].endswith("-1"):
+                return FakeResponse(503)
+            return FakeResponse(200, {"session_id": 7})
+        if url.endswith("/recording/audio"):
+            return FakeResponse(500)
+        return FakeResponse(200)
+
+
+@pytest.mark.asyncio
+async def test_step_report_counts_failures_and_errors():
+    profile = LoadProfile(frame_interval=0.05, screen_interval=0, audio_interval=0.1, duration=0.3)
+    client = FakeClient()
+    accounts = set()
+
+    step = await run_step(client, 2, FRAMES, profile, accounts)
+
+    assert accounts == {"load-student-0", "load-student-1"}
+    assert step['sessions'] == 2 and step['failed_sessions'] == 1
+    assert set(step['endpoints']) == {
+        "POST /ai/surveillance-analysis (video)",
+        "POST /surveillance/session/{id}/recording/audio",
+    }
+    assert step['endpoints']["POST /surveillance/session/{id}/recording/audio"]['errors'] > 0
+    assert 0 < step['error_rate'] < 1
+    assert "screen" not in step['scheduled']
+    # Seule la session démarrée est terminée
+    assert [url for _, url in client.calls if url.endswith("/end")] == ["/api/v1/surveillance/session/7/end"]
+    assert _saturated(step, profile)
+
+
+@pytest.mark.asyncio
+async def test_known_accounts_log_in_instead_of_registering():
+    client = FakeClient()
+    recorder = _StepRecorder()
+
+    async def login(method, url, **kwargs):
+        client.calls.append((method, url))
+        return FakeResponse(200, {"access_token": "jeton"})
+    client.request = login
+
+    headers = await loadgen._authenticate(client, recorder, "load-student-0", {"load-student-0"})
+    assert headers == {"Authorization": "Bearer jeton"}
+    assert client.calls == [("POST", "/api/v1/auth/login")]
+
+
+@pytest.mark.parametrize("failed, drop_rate, error_rate, expected", [
+    (0, 0.0, 0.0, False),
+    (0, 0.01, 0.01, False),
+    (1, 0.0, 0.0, True),
+    (0, 0.02, 0.0, True),
+    (0, 0.0, 0.02, True),
+])
+def test_saturation_thresholds(failed, drop_rate, error_rate, expected):
+    step = {'failed_sessions': failed, 'drop_rate': drop_rate, 'error_rate': error_rate}
+    assert _saturated(step, LoadProfile(max_drop_rate=0.01, max_error_rate=0.01)) is expected
@@ -0,0 +1,108 @@
+#!/usr/bin/env python3
+"""
+Métriques : gabarits de route des requêtes HTTP et métriques inactives
+
+    python -m pytest test_metrics.py
+"""
+
+import pytest
+from prometheus_client import REGISTRY
+
+from app.core import metrics
+
+HTTP_COUNT = "proctoflex_http_request_seconds_count"
+
+
+def scope(path, route=object(), **path_params):
+    return {"type": "http", "path": path, "route": route, "path_params": path_params}
+
+
+def test_route_template_replaces_parameters():
+    assert metrics._route_template(scope("/api/v1/surveillance/session/42/status", session_id=42)) == \
+        "/api/v1/surveillance/session/{session_id}/status"
+    assert metrics._route_template(scope("/api/v1/surveillance/session/42/recording/audio",
+                                         session_id=42, stream="audio")) == \
+        "/api/v1/surveillance/session/{session_id}/recording/{stream}"
+    assert metrics._route_template(scope("/health")) == "/health"
+
+
+def test_unmatched_paths_share_one_label():
+    assert metrics._route_template(scope("/pas/une/route/123", route=None)) == "unmatched"
+
+
+def requests_count(route, status):
+    return REGISTRY.get_sample_value(HTTP_COUNT, {"method": "GET", "route": route, "status": status}) or 0.0
+
+
+def test_requests_are_recorded_by_template(client, register, start_session):
+    _, headers = register()
+    route = "/api/v1/surveillance/session/{session_id}/status"
+    before = requests_count(route, "200")
+
+    for _ in range(2):
+        session_id = start_session(headers)
+        assert client.get(f"/api/v1/surveillance/session/{session_id}/status", headers=headers).status_code == 200
+
+    assert requests_count(route, "200") == before + 2
+    assert requests_count(f"/api/v1/surveillance/session/{session_id}/status", "200") == 0.0
+
+    before = requests_count("unmatched", "404")
+    assert client.get("/introuvable/1").status_code == 404
+    assert requests_count("unmatched", "404") == before + 1
+
+
+def test_metrics_endpoint_exposes_text_format(client):
+    client.get("/health")
+    response = client.get("/metrics")
+    assert response.status_code == 200
+    assert response.headers["content-type"].startswith("text/plain")
+    assert HTTP_COUNT.encode() in response.content
+
+
+@pytest.fixture
+def disabled(monkeypatch):
+    monkeypatch.setattr(metrics, "METRICS_ENABLED", False)
+
+
+def test_disabled_factories_return_noop_metrics(disabled):
+    for metric in (
+        metrics.counter("proctoflex_test_total", "test", ["a"]),
+        metrics.gauge("proctoflex_test_gauge", "test"),
+        metrics.histogram("proctoflex_test_seconds", "test", ["a"]),
+    ):
+        assert metric is metrics._NOOP
+        child = metric.labels("x")
+        child.inc()
+        child.dec()
+        child.set(1)
+        child.observe(0.5)
+        child.set_function(lambda: 1)
+    # Rien n'est enregistré dans le registre global
+    assert REGISTRY.get_sample_value("proctoflex_test_total", {"a": "x"}) is None
+
+
+def test_disabled_timers_are_free(disabled):
+    assert metrics.timed(metrics.AI_STAGE_SECONDS, "a", "b", "c") is metrics._NOOP_TIMER
+
+    def analyse(value):
+        return value * 2
+    assert metrics.timed_function(metrics.AI_STAGE_SECONDS, "a", "b", "c")(analyse) is analyse
+
+
+@pytest.mark.asyncio
+async def test_disabled_middleware_passes_through(disabled):
+    calls = []
+
+    async def app(scope, receive, send):
+        calls.append(scope["path"])
+
+    # Une route absente de la requête ferait échouer la mesure : elle n'est pas évaluée
+    await metrics.HttpMetricsMiddleware(app)({"type": "http", "path": "/x"}, None, None)
+    assert calls == ["/x"]
+
+
+def test_disabled_endpoint_returns_404(client, monkeypatch):
+    import main
+
+    monkeypatch.setattr(main, "METRICS_ENABLED", False)
+    assert client.get("/metrics").status_code == 404
@@ -0,0 +1,78 @@
+#!/usr/bin/env python3
+"""
+Migrations Alembic : script SQL hors ligne (--sql) et base existante créée par create_all
+
+    python -m pytest test_migrations.py
+"""
+
+import io
+import os
+
+import pytest
+import sqlalchemy as sa
+from alembic import command
+from alembic.config import Config
+
+from app.core.config import settings
+
+BACKEND_DIR = os.path.dirname(os.path.abspath(__file__))
+TABLES = ("users", "exams", "exam_sessions", "security_alerts")
+
+
+def alembic_config(output=None) -> Config:
+    config = Config(os.path.join(BACKEND_DIR, "alembic.ini"), output_buffer=output)
+    config.set_main_option("script_location", os.path.join(BACKEND_DIR, "alembic"))
+    config.attributes["configure_logger"] = False
+    return config
+
+
+def offline_script(revision: str = "head") -> str:
+    output = io.StringIO()
+    command.upgrade(alembic_config(output), revision, sql=True)
+    return output.getvalue()
+
+
+def test_offline_script_creates_initial_schema():
+    script = offline_script("0001")
+    for table in TABLES:
+        assert f"CREATE TABLE {table} (" in script
+    assert "CREATE UNIQUE INDEX ix_users_email ON users (email);" in script
+
+
+def test_offline_script_reaches_head():
+    script = offline_script()
+    assert "CREATE TABLE users (" in script
+    assert "ADD COLUMN evidence_hash" in script
+
+
+@pytest.fixture
+def database_url(tmp_path, monkeypatch):
+    url = f"sqlite:///{tmp_path}/migrations.db"
+    monkeypatch.setattr(settings, "DATABASE_URL", url)
+    return url
+
+
+def test_upgrade_keeps_tables_created_by_create_all(database_url):
+    from app.core.database import Base
+
+    engine = sa.create_engine(database_url)
+    Base.metadata.create_all(bind=engine)
+    with engine.begin() as connection:
+        connection.execute(sa.text(
+            "INSERT INTO users (email, username, full_name, hashed_password) VALUES ('a@b.c', 'a', 'A', 'x')"
+        ))
+
+    command.upgrade(alembic_config(), "head")
+
+    with engine.connect() as connection:
+        assert connection.execute(sa.text("SELECT count(*) FROM users")).scalar() == 1
+        assert connection.execute(sa.text("SELECT version_num FROM alembic_version")).scalar() == "0004"
+    engine.dispose()
+
+
+def test_upgrade_creates_empty_database(database_url):
+    command.upgrade(alembic_config(), "head")
+
+    engine = sa.create_engine(database_url)
+    assert set(TABLES) <= set(sa.inspect(engine).get_table_names())
+    engine.dispose()
@@ -0,0 +1,183 @@
+#!/usr/bin/env python3
+"""
+Partitions de security_alerts : grille, noms, bornes PostgreSQL et création / suppression par la rétention
+
+    python -m pytest test_partitions.py
+"""
+
+import io
+import os
+import re
+from datetime import date, datetime, timedelta, timezone
+
+import pytest
+from alembic import command
+from alembic.config import Config
+
+from app.core import partitions
+from app.core.config import settings
+from app.core.partitions import next_partition_bound, partition_bound, partition_name, partition_start
+from app.services.retention import PARTITION_BOUND, RetentionService, _parse_bound
+
+UTC = timezone.utc
+# Mercredi
+NOW = datetime(2026, 10, 21, 12, 0, tzinfo=UTC)
+
+
+class RecordingConnection:
+    """Connexion factice : enregistre le SQL, échoue sur demande"""
+
+    def __init__(self, fail_on=None):
+        self.statements = []
+        self.fail_on = fail_on
+
+    async def execute(self, statement):
+        sql = str(statement)
+        if self.fail_on and self.fail_on in sql:
+            raise RuntimeError("partition par défaut en conflit")
+        self.statements.append(sql)
+
+
+def created_bounds(conn):
+    return [re.search(r"FROM \('([^']+)'\) TO \('([^']+)'\)", sql).groups() for sql in conn.statements]
+
+
+@pytest.mark.parametrize("day", [date(2026, 10, 19) + timedelta(days=offset) for offset in range(7)])
+def test_weekly_grid_starts_on_monday(day):
+    assert partition_start(day, 7) == date(2026, 10, 19)
+    assert next_partition_bound(day, 7) == date(2026, 10, 26)
+
+
+def test_grid_is_stable_for_any_interval():
+    assert partition_start(date(2026, 10, 21), 1) == date(2026, 10, 21)
+    assert next_partition_bound(date(2026, 10, 21), 1) == date(2026, 10, 22)
+    # Une grille de 30 jours ne dépend pas du jour de départ
+    start = partition_start(date(2026, 10, 21), 30)
+    assert all(partition_start(start + timedelta(days=offset), 30) == start for offset in range(30))
+    assert partition_start(start + timedelta(days=30), 30) == start + timedelta(days=30)
+
+
+def test_interval_is_validated(monkeypatch):
+    monkeypatch.setattr(settings, "ALERT_PARTITION_INTERVAL_DAYS", 0)
+    with pytest.raises(ValueError):
+        partitions.partition_interval_days()
+    with pytest.raises(ValueError):
+        RetentionService()
+
+
+def test_partition_name_and_bound():
+    assert partition_name(date(2026, 10, 19)) == "security_alerts_p20261019"
+    assert partition_bound(date(2026, 10, 19)) == "2026-10-19T00:00:00+00:00"
+
+
+@pytest.mark.parametrize("expression, expected", [
+    ("FOR VALUES FROM ('2026-10-19 00:00:00+00') TO ('2026-10-26 00:00:00+00')",
+     (datetime(2026, 10, 19, tzinfo=UTC), datetime(2026, 10, 26, tzinfo=UTC))),
+    # Session PostgreSQL dans un autre fuseau : même instant
+    ("FOR VALUES FROM ('2026-10-19 02:00:00+02') TO ('2026-10-20 05:30:00+05:30')",
+     (datetime(2026, 10, 19, tzinfo=UTC), datetime(2026, 10, 20, tzinfo=UTC))),
+    # Sans fuseau : UTC
+    ("FOR VALUES FROM ('2026-10-19 00:00:00') TO ('2026-10-26 00:00:00')",
+     (datetime(2026, 10, 19, tzinfo=UTC), datetime(2026, 10, 26, tzinfo=UTC))),
+])
+def test_parse_partition_bounds(expression, expected):
+    match = PARTITION_BOUND.search(expression)
+    assert (_parse_bound(match.group(1)), _parse_bound(match.group(2))) == expected
+
+
+def test_default_partition_has_no_bounds():
+    assert PARTITION_BOUND.search("DEFAULT") is None
+
+
+@pytest.fixture
+def service(monkeypatch):
+    monkeypatch.setattr(settings, "ALERT_PARTITION_INTERVAL_DAYS", 7)
+    monkeypatch.setattr(settings, "ALERT_PARTITIONS_AHEAD", 4)
+    return RetentionService()
+
+
+@pytest.mark.asyncio
+async def test_ensure_partitions_from_scratch(service):
+    conn = RecordingConnection()
+    created = await service._ensure_partitions(conn, [], NOW)
+
+    mondays = [date(2026, 10, 19) + timedelta(weeks=week) for week in range(5)]
+    assert created == [partition_name(monday) for monday in mondays]
+    assert created_bounds(conn)[0] == ("2026-10-19T00:00:00+00:00", "2026-10-26T00:00:00+00:00")
+    # Les partitions se suivent sans trou jusqu'au-delà de l'horizon
+    bounds = created_bounds(conn)
+    assert all(previous[1] == following[0] for previous, following in zip(bounds, bounds[1:]))
+    assert datetime.fromisoformat(bounds[-1][1]) >= NOW + timedelta(weeks=4)
+
+
+@pytest.mark.asyncio
+async def test_ensure_partitions_continues_after_last(service):
+    existing = [("security_alerts_p20261026", datetime(2026, 10, 26, tzinfo=UTC), datetime(2026, 11, 2, tzinfo=UTC))]
+    created = await service._ensure_partitions(RecordingConnection(), existing, NOW)
+    assert created == ["security_alerts_p20261102", "security_alerts_p20261109", "security_alerts_p20261116"]
+
+
+@pytest.mark.asyncio
+async def test_interval_change_realigns_on_grid(service):
+    """Partitions quotidiennes existantes terminées un jeudi, passage à l'hebdomadaire"""
+    existing = [("security_alerts_p20261021", datetime(2026, 10, 21, tzinfo=UTC), datetime(2026, 10, 22, tzinfo=UTC))]
+    conn = RecordingConnection()
+    await service._ensure_partitions(conn, existing, NOW)
+
+    # Partition courte jusqu'au lundi, puis la grille hebdomadaire
+    assert created_bounds(conn)[:2] == [
+        ("2026-10-22T00:00:00+00:00", "2026-10-26T00:00:00+00:00"),
+        ("2026-10-26T00:00:00+00:00", "2026-11-02T00:00:00+00:00"),
+    ]
+
+
+@pytest.mark.asyncio
+async def test_unexpected_bound_creates_nothing(service):
+    existing = [("manuelle", datetime(2026, 10, 19, tzinfo=UTC), datetime(2026, 10, 26, 6, tzinfo=UTC))]
+    conn = RecordingConnection()
+    assert await service._ensure_partitions(conn, existing, NOW) == []
+    assert conn.statements == []
+
+
+@pytest.mark.asyncio
+async def test_creation_failure_stops(service):
+    conn = RecordingConnection(fail_on="security_alerts_p20261102")
+    created = await service._ensure_partitions(conn, [], NOW)
+    assert created == ["security_alerts_p20261019", "security_alerts_p20261026"]
+
+
+@pytest.mark.asyncio
+async def test_drop_only_fully_expired_partitions(service):
+    existing = [
+        (partition_name(start), datetime(start.year, start.month, start.day, tzinfo=UTC),
+         datetime(start.year, start.month, start.day, tzinfo=UTC) + timedelta(weeks=1))
+        for start in (date(2026, 7, 6), date(2026, 7, 13), date(2026, 7, 20))
+    ]
+    conn = RecordingConnection()
+    # Limite au milieu de la troisième semaine : seules les deux premières sont entièrement expirées
+    dropped = await service._drop_expired_partitions(conn, existing, datetime(2026, 7, 22, tzinfo=UTC))
+
+    assert dropped == ["security_alerts_p20260706", "security_alerts_p20260713"]
+    assert conn.statements == [f"DROP TABLE IF EXISTS {name}" for name in dropped]
+    # Limite exactement sur une borne : la partition qui s'y termine est supprimée
+    assert await service._drop_expired_partitions(RecordingConnection(), existing, datetime(2026, 7, 13, tzinfo=UTC)) == [
+        "security_alerts_p20260706"
+    ]
+
+
+def test_migration_uses_the_retention_grid(service, monkeypatch):
+    """Script --sql PostgreSQL de la migration 0003 : mêmes noms et bornes que la rétention"""
+    monkeypatch.setattr(settings, "DATABASE_URL", "postgresql://u:p@db/proctoflex")
+    monkeypatch.setattr(settings, "ALERT_PARTITION_INTERVAL_DAYS", 1)
+    backend = os.path.dirname(os.path.abspath(__file__))
+    output = io.StringIO()
+    config = Config(os.path.join(backend, "alembic.ini"), output_buffer=output)
+    config.set_main_option("script_location", os.path.join(backend, "alembic"))
+    config.attributes["configure_logger"] = False
+    command.upgrade(config, "0002:0003", sql=True)
+
+    names = re.findall(r"CREATE TABLE (security_alerts_p\d{8}) PARTITION OF", output.getvalue())
+    today = datetime.now(UTC).date()
+    # Partition du jour puis ALERT_PARTITIONS_AHEAD partitions quotidiennes
+    assert names == [partition_name(today + timedelta(days=offset)) for offset in range(5)]
+    assert f"FROM ('{partition_bound(today)}') TO ('{partition_bound(today + timedelta(days=1))}')" in output.getvalue()
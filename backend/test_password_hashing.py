@@ -0,0 +1,73 @@
+#!/usr/bin/env python3
+"""
+Hachage des mots de passe : concurrence bornée et rejet 503 au-delà de la file d'attente
+
+    python -m pytest test_password_hashing.py
+"""
+
+import asyncio
+import threading
+
+import pytest
+from fastapi import HTTPException
+from prometheus_client import REGISTRY
+
+from app.core import security
+from app.core.config import settings
+
+
+def rejected() -> float:
+    return REGISTRY.get_sample_value("proctoflex_password_hash_rejected_total") or 0.0
+
+
+@pytest.fixture
+def one_slot(monkeypatch):
+    """Un seul hachage à la fois, un seul en attente"""
+    monkeypatch.setattr(security, "_hashing_slots", asyncio.Semaphore(1))
+    monkeypatch.setattr(settings, "PASSWORD_HASH_MAX_QUEUE", 1)
+
+
+@pytest.mark.asyncio
+async def test_overflow_is_rejected_with_503(one_slot):
+    release = threading.Event()
+    before = rejected()
+
+    def slow_hash(value):
+        release.wait(5.0)
+        return value.upper()
+
+    running = asyncio.create_task(security._run_hashing("hash", slow_hash, "a"))
+    await asyncio.sleep(0.05)
+    waiting = asyncio.create_task(security._run_hashing("hash", slow_hash, "b"))
+    await asyncio.sleep(0.05)
+    assert security._hashing_waiting == 1
+
+    with pytest.raises(HTTPException) as error:
+        await security._run_hashing("hash", slow_hash, "c")
+    assert error.value.status_code == 503
+    assert error.value.headers == {"Retry-After": "1"}
+    assert rejected() == before + 1
+
+    # Les opérations admises se terminent normalement
+    release.set()
+    assert await asyncio.gather(running, waiting) == ["A", "B"]
+    assert security._hashing_waiting == 0
+
+
+@pytest.mark.asyncio
+async def test_failed_hash_releases_its_slot(one_slot):
+    def broken(value):
+        raise ValueError(value)
+
+    with pytest.raises(ValueError):
+        await security._run_hashing("verify", broken, "x")
+    assert await security._run_hashing("verify", str.upper, "ok") == "OK"
+
+
+def test_login_returns_503_when_saturated(client, register, monkeypatch):
+    _, headers = register()
+    username = client.get("/api/v1/auth/me", headers=headers).json()["username"]
+    monkeypatch.setattr(settings, "PASSWORD_HASH_MAX_QUEUE", 0)
+    response = client.post("/api/v1/auth/login", data={"username": username, "password": "motdepasse"})
+    assert response.status_code == 503
+    assert response.headers["retry-after"] == "1"
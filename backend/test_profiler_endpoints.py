@@ -0,0 +1,61 @@
+#!/usr/bin/env python3
+"""
+Profilage à la demande : réservé aux administrateurs, désactivable, un profil à la fois
+
+    python -m pytest test_profiler_endpoints.py
+"""
+
+import pytest
+
+from app.services.profiler import profiler_service
+
+CPU = "/api/v1/admin/profiler/cpu"
+MEMORY = "/api/v1/admin/profiler/memory"
+
+
+@pytest.fixture
+def admin(register):
+    return register(role="admin")[1]
+
+
+@pytest.mark.parametrize("url", [CPU, MEMORY])
+def test_non_admins_are_refused(client, register, url):
+    assert client.post(url, params={"seconds": 0.01}).status_code in (401, 403)
+    for role in ("student", "instructor"):
+        _, headers = register(role=role)
+        response = client.post(url, params={"seconds": 0.01}, headers=headers)
+        assert response.status_code == 403, role
+    assert profiler_service._busy is False
+
+
+def test_disabled_profiler_is_hidden_from_admins_only(client, register, admin, monkeypatch):
+    monkeypatch.setattr(profiler_service, "enabled", False)
+    assert client.post(CPU, params={"seconds": 0.01}, headers=admin).status_code == 404
+    # Le refus des non-administrateurs ne révèle pas l'état du profileur
+    _, student = register()
+    assert client.post(CPU, params={"seconds": 0.01}, headers=student).status_code == 403
+
+
+def test_admin_gets_collapsed_stacks(client, admin):
+    response = client.post(CPU, params={"seconds": 0.05, "interval_ms": 5, "include_idle": True}, headers=admin)
+    assert response.status_code == 200, response.text
+    assert response.headers["content-type"].startswith("text/plain")
+    assert response.headers["x-profiler-mode"] == "thread"
+    assert int(response.headers["x-profiler-samples"]) > 0
+    assert response.headers["content-disposition"].endswith('.collapsed"')
+
+
+def test_admin_gets_memory_growth(client, admin):
+    response = client.post(MEMORY, params={"seconds": 0.01, "limit": 3}, headers=admin)
+    assert response.status_code == 200, response.text
+    report = response.json()
+    assert report["group_by"] == "lineno" and len(report["sites"]) <= 3
+
+
+def test_refusals_map_to_http_errors(client, admin, monkeypatch):
+    response = client.post(CPU, params={"seconds": profiler_service.max_seconds + 1}, headers=admin)
+    assert response.status_code == 422
+
+    monkeypatch.setattr(profiler_service, "_busy", True)
+    assert client.post(CPU, params={"seconds": 0.01}, headers=admin).status_code == 409
+    assert client.post(MEMORY, params={"seconds": 0.01}, headers=admin).status_code == 409
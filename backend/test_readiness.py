@@ -0,0 +1,133 @@
+#!/usr/bin/env python3
+"""
+Disponibilité des analyseurs IA : sondes hors de la boucle, états prêt / dégradé / indisponible
+
+    python -m pytest test_readiness.py
+"""
+
+import threading
+
+import pytest
+
+from app.services import readiness
+from app.services.readiness import ReadinessService
+
+
+class Probe:
+    """Sonde contrôlée par le test (échec à la demande, thread d'exécution relevé)"""
+
+    def __init__(self):
+        self.failing = False
+        self.threads = []
+
+    def __call__(self, image):
+        self.threads.append(threading.get_ident())
+        if self.failing:
+            raise RuntimeError("inférence impossible")
+
+
+@pytest.fixture
+def service(monkeypatch):
+    monkeypatch.setattr(readiness, "synthetic_probe_image", lambda: "image")
+    service = ReadinessService()
+    service.enabled = True
+    # Boucle de sondes considérée démarrée (les sondes sont lancées par le test)
+    service._task = object()
+    return service
+
+
+@pytest.mark.asyncio
+async def test_probes_run_outside_the_event_loop(service):
+    probe = Probe()
+    service.register("face_detection", probe=probe)
+
+    await service.probe_all()
+
+    assert probe.threads and threading.get_ident() not in probe.threads
+    assert service.report()["analyzers"]["face_detection"]["probe_latency_ms"]["last"] is not None
+
+
+@pytest.mark.asyncio
+async def test_required_failure_makes_the_worker_unavailable(service):
+    required, optional = Probe(), Probe()
+    service.register("face_detection", probe=required)
+    service.register("screen_analysis", probe=optional, required=False)
+
+    await service.probe_all()
+    assert (service.report()["status"], service.report()["ready"]) == ("healthy", True)
+
+    required.failing = True
+    await service.probe_all()
+    report = service.report()
+    assert (report["status"], report["ready"]) == ("unavailable", False)
+    assert report["analyzers"]["face_detection"]["status"] == "error"
+    assert report["analyzers"]["face_detection"]["last_error"] == "inférence impossible"
+
+    # Rétabli à la sonde suivante
+    required.failing = False
+    await service.probe_all()
+    assert service.report()["status"] == "healthy"
+
+
+@pytest.mark.asyncio
+async def test_optional_failure_only_degrades(service):
+    optional = Probe()
+    service.register("face_detection", probe=Probe())
+    service.register("screen_analysis", probe=optional, required=False)
+    optional.failing = True
+
+    await service.probe_all()
+    report = service.report()
+    assert (report["status"], report["ready"]) == ("degraded", True)
+    assert report["analyzers"]["screen_analysis"]["status"] == "error"
+
+
+@pytest.mark.asyncio
+async def test_failed_load_skips_the_probe(service):
+    probe = Probe()
+
+    def load():
+        raise ImportError("modèle absent")
+    service.register("object_detection", probe=probe, loaded=lambda: {"loaded": False}, load=load)
+
+    await service.probe_all()
+    assert probe.threads == []
+    assert service.report()["analyzers"]["object_detection"]["status"] == "error"
+    assert service.report()["ready"] is False
+
+
+@pytest.mark.asyncio
+async def test_stale_saturated_and_lagging_states(service):
+    service.register("face_detection", probe=Probe())
+    await service.probe_all()
+    analyzer = service._analyzers["face_detection"]
+
+    analyzer.in_flight = service.max_in_flight
+    assert service.report()["analyzers"]["face_detection"]["status"] == "saturated"
+    analyzer.in_flight = 0
+
+    analyzer.last_success_at -= 3 * service.interval + 1
+    assert service.report()["analyzers"]["face_detection"]["status"] == "stale"
+    assert service.report()["ready"] is False
+    analyzer.last_success_at += 3 * service.interval + 1
+
+    service._loop_lag = service.max_loop_lag * 2
+    report = service.report()
+    assert report["event_loop_saturated"] is True and report["status"] == "unavailable"
+
+
+def test_not_started_worker_is_unavailable(service):
+    service._task = None
+    assert service.report()["ready"] is False
+
+
+def test_ready_endpoint_returns_503_when_unavailable(client, service, monkeypatch):
+    import main
+
+    monkeypatch.setattr(main, "readiness_service", service)
+    assert client.get("/ready").status_code == 200
+
+    service._loop_lag = service.max_loop_lag * 2
+    response = client.get("/ready")
+    assert response.status_code == 503
+    assert response.json()["status"] == "unavailable"
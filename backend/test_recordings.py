@@ -0,0 +1,144 @@
+#!/usr/bin/env python3
+"""
+Enregistrements audio / vidéo : segments append-only, index et relecture mmap
+
+    python -m pytest test_recordings.py
+"""
+
+import asyncio
+import os
+
+import pytest
+
+from app.storage.recordings import RecordingStore
+
+
+def chunk(i: int) -> bytes:
+    return bytes([i % 256]) * (100 + i)
+
+
+@pytest.fixture
+def root(tmp_path):
+    return str(tmp_path / "recordings")
+
+
+@pytest.mark.asyncio
+async def test_round_trip_after_flush(root):
+    store = RecordingStore(root_dir=root)
+    for i in range(10):
+        await store.append(1, "video", chunk(i), float(i))
+
+    # L'index n'est écrit qu'après synchronisation des données
+    with store.open_reader(1, "video") as reader:
+        assert len(reader.index) == 0
+
+    await store.flush()
+    with store.open_reader(1, "video") as reader:
+        assert list(reader.iter_range()) == [(float(i), chunk(i)) for i in range(10)]
+        assert reader.chunk_at(4.5) == (4.0, chunk(4))
+        assert reader.chunk_at(-1.0) is None
+        assert [t for t, _ in reader.iter_range(3.0, 5.0)] == [3.0, 4.0, 5.0]
+    await store.stop()
+
+
+@pytest.mark.asyncio
+async def test_streams_are_separate(root):
+    store = RecordingStore(root_dir=root)
+    await store.append(1, "video", b"video", 1.0)
+    await store.append(1, "audio", b"audio", 1.0)
+    paths = await store.close_session(1)
+
+    assert set(paths) == {"video", "audio"}
+    with store.open_reader(1, "audio") as reader:
+        assert list(reader.iter_range()) == [(1.0, b"audio")]
+    with pytest.raises(ValueError):
+        await store.append(1, "screen", b"x")
+    await store.stop()
+
+
+@pytest.mark.asyncio
+async def test_segment_rotation(root):
+    store = RecordingStore(root_dir=root)
+    store.segment_max_bytes = 1000
+    for i in range(30):
+        await store.append(1, "video", chunk(i), float(i))
+    await store.close_session(1)
+
+    with store.open_reader(1, "video") as reader:
+        assert len(set(reader.index['segment'].tolist())) > 1
+        assert list(reader.iter_range()) == [(float(i), chunk(i)) for i in range(30)]
+    await store.stop()
+
+
+@pytest.mark.asyncio
+async def test_restart_appends_after_existing_data(root):
+    first = RecordingStore(root_dir=root)
+    for i in range(3):
+        await first.append(1, "audio", chunk(i), float(i))
+    await first.stop()
+
+    second = RecordingStore(root_dir=root)
+    for i in range(3, 6):
+        await second.append(1, "audio", chunk(i), float(i))
+    await second.stop()
+
+    with RecordingStore(root_dir=root).open_reader(1, "audio") as reader:
+        assert list(reader.iter_range()) == [(float(i), chunk(i)) for i in range(6)]
+
+
+def _append_alternately(root: str, parity: int, count: int, read_fd: int, write_fd: int) -> None:
+    """Écrit les morceaux de rang `parity` (un processus sur deux), synchronisé par tubes"""
+    async def run():
+        store = RecordingStore(root_dir=root)
+        store.segment_max_bytes = 2000
+        for i in range(parity, count, 2):
+            if i:
+                os.read(read_fd, 1)
+            await store.append(1, "video", chunk(i), float(i))
+            # Synchronisations à des instants différents dans chaque processus
+            if i % 5 == 0:
+                await store.flush()
+            os.write(write_fd, b"x")
+        await store.stop()
+    asyncio.run(run())
+
+
+@pytest.mark.skipif(not hasattr(os, "fork"), reason="fork indisponible")
+def test_two_processes_append_to_one_stream(root):
+    """Deux workers alternent les morceaux d'un flux : positions et index restent exacts"""
+    count = 40
+    to_child_r, to_child_w = os.pipe()
+    to_parent_r, to_parent_w = os.pipe()
+
+    pid = os.fork()
+    if pid == 0:
+        code = 0
+        try:
+            _append_alternately(root, 1, count, to_child_r, to_parent_w)
+        except BaseException:
+            code = 1
+        finally:
+            os._exit(code)
+
+    _append_alternately(root, 0, count, to_parent_r, to_child_w)
+    _, status = os.waitpid(pid, 0)
+    assert os.waitstatus_to_exitcode(status) == 0
+
+    with RecordingStore(root_dir=root).open_reader(1, "video") as reader:
+        assert len(set(reader.index['segment'].tolist())) > 1
+        assert list(reader.iter_range()) == [(float(i), chunk(i)) for i in range(count)]
+
+
+@pytest.mark.asyncio
+async def test_delete_session_keeps_root(root):
+    store = RecordingStore(root_dir=root)
+    for session_id in (1, 2):
+        await store.append(session_id, "video", b"data", 1.0)
+    await store.flush()
+
+    assert store.session_ids() == [1, 2]
+    files, freed = await store.delete_session(1)
+    assert files == 2 and freed > 0
+    assert store.session_ids() == [2]
+    assert os.path.isdir(store.root_dir)
+    await store.stop()
@@ -0,0 +1,134 @@
+#!/usr/bin/env python3
+"""
+Rétention des médias : seules les sessions terminées depuis RETENTION_DAYS sont purgées
+
+    python -m pytest test_retention.py
+"""
+
+import os
+from datetime import datetime, timedelta, timezone
+
+import cv2
+import numpy as np
+import pytest
+
+from app.core.database import Base, ExamSession, SecurityAlert, SessionLocal, engine
+from app.services import retention
+from app.storage.capture_store import ScreenCaptureStore
+from app.storage.evidence import EvidenceStore
+from app.storage.recordings import RecordingStore
+
+OLD_COMPLETED, OLD_ACTIVE, RECENT_COMPLETED, LEGACY_COMPLETED = 9001, 9002, 9003, 9004
+
+
+@pytest.fixture
+def stores(tmp_path, monkeypatch):
+    """Stockages isolés dans un répertoire temporaire"""
+    captures = ScreenCaptureStore(root_dir=str(tmp_path / "captures"))
+    recordings = RecordingStore(root_dir=str(tmp_path / "recordings"))
+    evidence = EvidenceStore(root_dir=str(tmp_path / "evidence"))
+    monkeypatch.setattr(retention, "screen_capture_store", captures)
+    monkeypatch.setattr(retention, "recording_store", recordings)
+    monkeypatch.setattr(retention, "evidence_store", evidence)
+    return captures, recordings, evidence
+
+
+@pytest.fixture
+def sessions():
+    """Sessions d'examen : anciennes, en cours et récentes"""
+    Base.metadata.create_all(bind=engine)
+    now = datetime.now(timezone.utc)
+    old = now - timedelta(days=retention.settings.RETENTION_DAYS + 10)
+
+    db = SessionLocal()
+    try:
+        db.add_all([
+            ExamSession(id=OLD_COMPLETED, status="completed", start_time=old, end_time=old + timedelta(hours=2)),
+            # Examen commencé il y a longtemps mais toujours en cours
+            ExamSession(id=OLD_ACTIVE, status="active", start_time=old),
+            ExamSession(id=RECENT_COMPLETED, status="completed", start_time=now - timedelta(days=2),
+                        end_time=now - timedelta(days=1)),
+            # Session terminée avant l'enregistrement de end_time
+            ExamSession(id=LEGACY_COMPLETED, status="terminated", start_time=old),
+        ])
+        db.commit()
+        yield now
+    finally:
+        db.query(SecurityAlert).filter(SecurityAlert.session_id.in_(
+            [OLD_COMPLETED, OLD_ACTIVE, RECENT_COMPLETED, LEGACY_COMPLETED]
+        )).delete(synchronize_session=False)
+        db.query(ExamSession).filter(ExamSession.id.in_(
+            [OLD_COMPLETED, OLD_ACTIVE, RECENT_COMPLETED, LEGACY_COMPLETED]
+        )).delete(synchronize_session=False)
+        db.commit()
+        db.close()
+
+
+def _age_files(directory: str, timestamp: float) -> None:
+    """Date de modification ancienne sur tous les fichiers d'un répertoire"""
+    for dirpath, _, filenames in os.walk(directory):
+        for name in filenames:
+            os.utime(os.path.join(dirpath, name), (timestamp, timestamp))
+
+
+def _evidence_image(seed: int) -> bytes:
+    image = np.random.RandomState(seed).randint(0, 255, (64, 64, 3), np.uint8)
+    return cv2.imencode('.png', image)[1].tobytes()
+
+
+@pytest.mark.asyncio
+async def test_purges_only_expired_ended_sessions(stores, sessions):
+    captures, recordings, _ = stores
+    now = sessions
+    frame = np.random.RandomState(0).randint(0, 255, (120, 160, 3), np.uint8)
+
+    for session_id in (OLD_COMPLETED, OLD_ACTIVE, RECENT_COMPLETED, LEGACY_COMPLETED):
+        captures.append(session_id, frame, 1.0)
+        await recordings.append(session_id, "video", b"video", 1.0)
+    await recordings.flush()
+    # Fichiers anciens de la session en cours : la date des fichiers ne compte pas
+    stale = (now - timedelta(days=retention.settings.RETENTION_DAYS + 10)).timestamp()
+    _age_files(captures.session_dir(OLD_ACTIVE), stale)
+    _age_files(recordings.stream_dir(OLD_ACTIVE, "video"), stale)
+
+    report = await retention.retention_service.run_once(now=now)
+
+    assert report["sessions_purged"] == 2
+    assert report["files_deleted"] > 0 and report["bytes_freed"] > 0
+    assert captures.session_ids() == [OLD_ACTIVE, RECENT_COMPLETED]
+    assert recordings.session_ids() == [OLD_ACTIVE, RECENT_COMPLETED]
+    assert os.path.isdir(captures.root_dir) and os.path.isdir(recordings.root_dir)
+
+    # Les segments de la session en cours restent lisibles
+    assert np.array_equal(captures.get_capture_at(OLD_ACTIVE, 1.0), frame)
+    with recordings.open_reader(OLD_ACTIVE, "video") as reader:
+        assert list(reader.iter_range()) == [(1.0, b"video")]
+    await recordings.stop()
+
+
+@pytest.mark.asyncio
+async def test_keeps_evidence_referenced_by_retained_alerts(stores, sessions):
+    _, recordings, evidence = stores
+    now = sessions
+    referenced = evidence.store(_evidence_image(1))["hash"]
+    orphan = evidence.store(_evidence_image(2))["hash"]
+    fresh = evidence.store(_evidence_image(3))["hash"]
+
+    stale = (now - timedelta(days=retention.settings.RETENTION_DAYS + 10)).timestamp()
+    for digest in (referenced, orphan):
+        os.utime(evidence.find(digest), (stale, stale))
+
+    db = SessionLocal()
+    try:
+        db.add(SecurityAlert(session_id=RECENT_COMPLETED, alert_type="screen", evidence_hash=referenced,
+                             timestamp=now - timedelta(days=1)))
+        db.commit()
+    finally:
+        db.close()
+
+    await retention.retention_service.run_once(now=now)
+
+    assert evidence.find(referenced) is not None
+    assert evidence.find(orphan) is None
+    assert evidence.find(fresh) is not None
+    await recordings.stop()
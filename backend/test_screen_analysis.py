@@ -0,0 +1,169 @@
+#!/usr/bin/env python3
+"""
+Analyse incrémentale des captures d'écran : tuiles modifiées, chemin rapide et LRU
+
+    python -m pytest test_screen_analysis.py
+"""
+
+import base64
+
+import cv2
+import numpy as np
+import pytest
+
+from app.ai import screen_analysis
+from app.ai.screen_analysis import ScreenAnalysisService
+
+WIDTH, HEIGHT = 640, 360
+
+
+def make_screen(value: int = 40, width: int = WIDTH, height: int = HEIGHT) -> np.ndarray:
+    """Écran uni avec une barre de titre, comme un bureau immobile"""
+    screen = np.full((height, width, 3), value, np.uint8)
+    screen[:20] = 200
+    return screen
+
+
+def encode(screen: np.ndarray) -> str:
+    return base64.b64encode(cv2.imencode('.png', screen)[1].tobytes()).decode()
+
+
+@pytest.fixture
+def service():
+    return ScreenAnalysisService()
+
+
+@pytest.fixture
+def decodes(monkeypatch):
+    """Compte les décodages d'image (absents sur le chemin rapide)"""
+    calls = []
+    decode = screen_analysis.decode_capture_grayscale
+
+    def counting_decode(image_data):
+        calls.append(image_data)
+        return decode(image_data)
+    monkeypatch.setattr(screen_analysis, "decode_capture_grayscale", counting_decode)
+    return calls
+
+
+def test_first_capture_is_baseline(service):
+    result = service.analyze_capture(1, encode(make_screen()), now=0.0)
+    assert result['baseline'] is True
+    assert result['changed'] is False and result['events'] == []
+
+
+def test_identical_capture_skips_decoding(service, decodes):
+    capture = encode(make_screen())
+    service.analyze_capture(1, capture, now=0.0)
+    result = service.analyze_capture(1, capture, now=1.0)
+
+    assert len(decodes) == 1
+    assert result['changed'] is False and result['baseline'] is False
+
+
+def test_small_change_reports_its_region(service):
+    service.analyze_capture(1, encode(make_screen()), now=0.0)
+    screen = make_screen()
+    # Une tuile de la grille 16 x 9 : 40 x 40 pixels
+    screen[120:160, 200:240] = 255
+    result = service.analyze_capture(1, encode(screen), now=1.0)
+
+    assert result['changed'] is True
+    assert result['changed_tiles'] == 1
+    assert result['changed_regions'] == [{'bbox': [200, 120, 40, 40], 'tiles': 1}]
+    assert result['events'] == []
+
+
+def test_compression_noise_is_ignored(service):
+    service.analyze_capture(1, encode(make_screen()), now=0.0)
+    noisy = make_screen().astype(np.int16) + np.random.RandomState(0).randint(-3, 4, (HEIGHT, WIDTH, 3))
+    result = service.analyze_capture(1, encode(noisy.clip(0, 255).astype(np.uint8)), now=1.0)
+    assert result['changed'] is False
+
+
+def test_window_switch_and_full_screen_change(service):
+    service.analyze_capture(1, encode(make_screen()), now=0.0)
+    half = make_screen()
+    half[:, :WIDTH * 5 // 8] = 255
+    switch = service.analyze_capture(1, encode(half), now=1.0)
+    assert [event['type'] for event in switch['events']] == ['window_switch']
+
+    full = service.analyze_capture(1, encode(make_screen(value=120)), now=2.0)
+    assert [event['type'] for event in full['events']] == ['full_screen_change']
+    assert full['change_ratio'] >= service.full_screen_ratio
+
+
+def test_rapid_changes_within_window(service):
+    service.rapid_change_count = 3
+    service.analyze_capture(1, encode(make_screen()), now=0.0)
+    types = []
+    for i in range(1, 4):
+        screen = make_screen()
+        screen[120:160, 40 * i:40 * i + 40] = 255
+        types.append([event['type'] for event in service.analyze_capture(1, encode(screen), now=float(i))['events']])
+    assert types == [[], [], ['rapid_content_change']]
+
+    # Hors de la fenêtre : le compteur repart
+    result = service.analyze_capture(1, encode(make_screen()), now=100.0)
+    assert result['recent_changes'] == 1
+
+
+def test_resolution_change_counts_every_tile(service):
+    service.analyze_capture(1, encode(make_screen()), now=0.0)
+    result = service.analyze_capture(1, encode(make_screen(width=800, height=450)), now=1.0)
+
+    total = service.grid[0] * service.grid[1]
+    assert result['baseline'] is True
+    assert result['changed_tiles'] == total
+    assert result['changed_regions'] == [{'bbox': [0, 0, 800, 450], 'tiles': total}]
+    assert [event['type'] for event in result['events']] == ['resolution_change']
+
+
+def test_sessions_are_independent(service):
+    service.analyze_capture(1, encode(make_screen()), now=0.0)
+    result = service.analyze_capture(2, encode(make_screen(value=120)), now=1.0)
+    assert result['baseline'] is True
+    # Identifiant numérique ou texte : même session
+    assert service.analyze_capture("1", encode(make_screen()), now=2.0)['baseline'] is False
+
+
+def test_lru_forgets_least_recent_session(service):
+    service.max_sessions = 2
+    for session_id in (1, 2):
+        service.analyze_capture(session_id, encode(make_screen()), now=0.0)
+    service.analyze_capture(1, encode(make_screen()), now=1.0)
+    service.analyze_capture(3, encode(make_screen()), now=2.0)
+
+    assert service.analyze_capture(1, encode(make_screen()), now=3.0)['baseline'] is False
+    assert service.analyze_capture(2, encode(make_screen()), now=4.0)['baseline'] is True
+
+
+def test_reset_session(service):
+    service.analyze_capture(1, encode(make_screen()), now=0.0)
+    service.reset_session(1)
+    assert service.analyze_capture(1, encode(make_screen()), now=1.0)['baseline'] is True
+
+
+def test_invalid_capture_reports_error(service):
+    result = service.analyze_capture(1, base64.b64encode(b"pas une image").decode(), now=0.0)
+    assert result['changed'] is False
+    assert 'error' in result
+
+
+def test_endpoint_keys_analysis_on_owned_session(client, register, start_session):
+    """Une session d'un autre étudiant (ou inventée) ne touche pas à la référence"""
+    _, alice = register()
+    _, bob = register()
+    session_id = start_session(alice)
+
+    def analyze(headers, session, screen):
+        response = client.post("/api/v1/ai/surveillance-analysis", headers=headers, json={
+            "session_id": str(session), "screen_capture": encode(screen), "timestamp": "t"
+        })
+        assert response.status_code == 200, response.text
+        return response.json()["screen_analysis"]
+
+    assert analyze(bob, session_id, make_screen(value=120)) is None
+    assert analyze(bob, "n'importe-quoi", make_screen(value=120)) is None
+    assert analyze(alice, session_id, make_screen())['baseline'] is True
+    assert analyze(alice, session_id, make_screen())['changed'] is False
@@ -0,0 +1,200 @@
+#!/usr/bin/env python3
+"""
+Lanceur multi-workers : rapport mémoire, relance des workers et métriques partagées
+
+    python -m pytest test_serve.py
+"""
+
+import argparse
+import io
+import os
+import sys
+import types
+
+import pytest
+
+import serve
+
+SMAPS_ROLLUP = """\
+00400000-7ffd0000 ---p 00000000 00:00 0                                  [rollup]
+Rss:               20480 kB
+Pss:               12288 kB
+Shared_Clean:       8192 kB
+Shared_Dirty:       1024 kB
+Private_Clean:      2048 kB
+Private_Dirty:      9216 kB
+Swap:                512 kB
+Anonymous:         10000 kB
+"""
+
+# Sans smaps_rollup (noyaux anciens) : une entrée par projection, à sommer
+SMAPS = """\
+00400000-00452000 r-xp 00000000 08:02 173521      /usr/bin/python3
+Rss:                 100 kB
+Pss:                  50 kB
+Private_Dirty:        10 kB
+7f0000000000-7f0000021000 rw-p 00000000 00:00 0
+Rss:                  60 kB
+Pss:                  60 kB
+Private_Dirty:        60 kB
+"""
+
+
+@pytest.fixture
+def proc(monkeypatch):
+    """Fichiers /proc simulés"""
+    files = {}
+
+    def fake_open(path, *args, **kwargs):
+        if path not in files:
+            raise FileNotFoundError(path)
+        return io.StringIO(files[path])
+    monkeypatch.setattr(serve, "open", fake_open, raising=False)
+    return files
+
+
+def test_read_smaps_rollup(proc):
+    proc["/proc/42/smaps_rollup"] = SMAPS_ROLLUP
+    assert serve.read_smaps(42) == {
+        "Rss": 20480, "Pss": 12288, "Shared_Clean": 8192, "Shared_Dirty": 1024,
+        "Private_Clean": 2048, "Private_Dirty": 9216, "Swap": 512
+    }
+
+
+def test_read_smaps_sums_mappings_without_rollup(proc):
+    proc["/proc/42/smaps"] = SMAPS
+    smaps = serve.read_smaps(42)
+    assert (smaps["Rss"], smaps["Pss"], smaps["Private_Dirty"], smaps["Swap"]) == (160, 110, 70, 0)
+
+
+def test_read_smaps_requires_proc(proc):
+    with pytest.raises(RuntimeError):
+        serve.read_smaps(42)
+
+
+@pytest.mark.skipif(not sys.platform.startswith("linux"), reason="/proc est propre à Linux")
+def test_read_smaps_of_this_process():
+    smaps = serve.read_smaps(os.getpid())
+    assert smaps["Rss"] > 0 and smaps["Pss"] > 0
+
+
+def test_memory_report_aggregates_processes(monkeypatch):
+    def smaps(rss, pss, private, shared):
+        return {"Rss": rss, "Pss": pss, "Shared_Clean": shared, "Shared_Dirty": 0,
+                "Private_Clean": 0, "Private_Dirty": private, "Swap": 0}
+
+    processes = {
+        1: smaps(400 * 1024, 300 * 1024, 200 * 1024, 200 * 1024),
+        2: smaps(300 * 1024, 150 * 1024, 50 * 1024, 250 * 1024),
+        3: smaps(320 * 1024, 170 * 1024, 70 * 1024, 250 * 1024),
+    }
+
+    def read_smaps(pid):
+        if pid not in processes:
+            raise ProcessLookupError(pid)
+        return processes[pid]
+    monkeypatch.setattr(serve, "read_smaps", read_smaps)
+
+    # Le worker 4 s'est arrêté pendant le relevé : ignoré
+    report = serve.memory_report(1, [2, 3, 4])
+
+    assert [(process["pid"], process["role"]) for process in report["processes"]] == [
+        (1, "maître"), (2, "worker"), (3, "worker")
+    ]
+    assert report["workers"] == 2
+    assert report["total_rss_mb"] == 1020.0
+    assert report["total_pss_mb"] == 620.0
+    assert report["mean_worker_unique_mb"] == 60.0
+    assert "coût moyen d'un worker : 60.0 Mo uniques" in serve.format_memory_report(report)
+
+
+def test_memory_report_without_workers(monkeypatch):
+    monkeypatch.setattr(serve, "read_smaps", lambda pid: dict.fromkeys(serve.SMAPS_FIELDS, 1024))
+    report = serve.memory_report(1, [])
+    assert report["workers"] == 0 and report["mean_worker_unique_mb"] is None
+
+
+class Clock:
+    def __init__(self):
+        self.now = 100.0
+        self.sleeps = []
+
+    def monotonic(self):
+        return self.now
+
+    def sleep(self, seconds):
+        self.sleeps.append(seconds)
+        self.now += seconds
+
+
+@pytest.fixture
+def master(monkeypatch):
+    clock = Clock()
+    monkeypatch.setattr(serve, "time", types.SimpleNamespace(monotonic=clock.monotonic, sleep=clock.sleep))
+    master = serve.Master(app=None, sock=None, args=argparse.Namespace(workers=1, graceful_timeout=1.0))
+    master.spawned = []
+    monkeypatch.setattr(master, "spawn", lambda: master.spawned.append(clock.now))
+    master.clock = clock
+    return master
+
+
+def test_crash_at_startup_is_respawned_after_a_delay(master):
+    master.workers[10] = master.clock.now
+    master.clock.now += 0.3
+    master.reap(10, 256)
+
+    assert master.clock.sleeps == [1.0]
+    assert master.spawned == [101.3]
+    assert 10 not in master.workers
+
+
+def test_long_running_worker_is_respawned_immediately(master):
+    master.workers[10] = master.clock.now
+    master.clock.now += 3600
+    master.reap(10, 0)
+    assert master.clock.sleeps == [] and len(master.spawned) == 1
+
+
+def test_no_respawn_while_stopping_or_for_unknown_pids(master):
+    master.reap(99, 0)
+    master.workers[10] = master.clock.now
+    master.stopping = True
+    master.reap(10, 0)
+    assert master.spawned == [] and master.workers == {}
+
+
+@pytest.fixture
+def metrics_dir(tmp_path, monkeypatch):
+    monkeypatch.setenv("PROMETHEUS_MULTIPROC_DIR", str(tmp_path))
+    return tmp_path
+
+
+def test_reaped_worker_gauges_are_removed(master, metrics_dir):
+    for name in ("gauge_liveall_10.db", "gauge_liveall_11.db", "counter_10.db", "histogram_10.db"):
+        (metrics_dir / name).write_bytes(b"")
+    master.workers[10] = master.clock.now
+
+    master.reap(10, 0)
+
+    # Les compteurs et histogrammes du worker restent dans les totaux
+    assert sorted(path.name for path in metrics_dir.iterdir()) == [
+        "counter_10.db", "gauge_liveall_11.db", "histogram_10.db"
+    ]
+
+
+def test_metrics_dir_is_cleared_at_startup(metrics_dir):
+    (metrics_dir / "counter_1.db").write_bytes(b"")
+    (metrics_dir / "notes.txt").write_text("conservé")
+    assert serve.prepare_metrics_dir() == str(metrics_dir)
+    assert [path.name for path in metrics_dir.iterdir()] == ["notes.txt"]
+
+
+def test_metrics_dir_defaults_to_a_temporary_directory(monkeypatch):
+    monkeypatch.delenv("PROMETHEUS_MULTIPROC_DIR", raising=False)
+    path = serve.prepare_metrics_dir()
+    try:
+        assert os.environ["PROMETHEUS_MULTIPROC_DIR"] == path
+        assert os.path.isdir(path) and os.listdir(path) == []
+    finally:
+        os.environ.pop("PROMETHEUS_MULTIPROC_DIR", None)
+        os.rmdir(path)
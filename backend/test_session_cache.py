@@ -0,0 +1,156 @@
+#!/usr/bin/env python3
+"""
+Caches en mémoire : expiration TTL, éviction LRU, invalidation entre workers et état des sessions
+
+    python -m pytest test_session_cache.py
+"""
+
+import json
+import types
+
+import pytest
+from sqlalchemy import update
+from sqlalchemy.ext.asyncio import AsyncSession, create_async_engine
+from sqlalchemy.pool import NullPool
+
+from app.core import cache as cache_module
+from app.core.cache import CacheInvalidationBus, TTLCache
+from app.services.session_cache import session_cache
+
+
+@pytest.fixture
+def clock(monkeypatch):
+    """Horloge monotone contrôlée par le test"""
+    now = [1000.0]
+    monkeypatch.setattr(cache_module, "time", types.SimpleNamespace(monotonic=lambda: now[0]))
+    return now
+
+
+def test_entries_expire_after_ttl(clock):
+    cache = TTLCache("test", maxsize=10, ttl=30.0)
+    cache.set("a", 1)
+    cache.set("b", 2, ttl=5.0)
+
+    clock[0] += 5.0
+    assert cache.get("a") == 1
+    assert cache.get("b", "absent") == "absent"
+
+    clock[0] += 25.0
+    assert cache.get("a") is None
+    assert cache.stats()["hits"] == 1 and cache.stats()["misses"] == 2
+    assert len(cache) == 0
+
+
+def test_lru_eviction_keeps_recent_entries(clock):
+    cache = TTLCache("test", maxsize=2, ttl=30.0)
+    cache.set("a", 1)
+    cache.set("b", 2)
+    cache.get("a")
+    cache.set("c", 3)
+
+    assert cache.get("b") is None
+    assert cache.get("a") == 1 and cache.get("c") == 3
+    assert cache.stats()["evictions"] == 1
+
+
+def test_invalidate_and_clear(clock):
+    cache = TTLCache("test", maxsize=10, ttl=30.0)
+    cache.set("a", 1)
+    cache.set("b", 2)
+    cache.invalidate("a")
+    cache.invalidate("absent")
+    assert cache.get("a") is None
+    assert cache.stats()["invalidations"] == 1
+
+    cache.clear()
+    assert cache.get("b") is None
+
+
+class FakeRedis:
+    def __init__(self):
+        self.published = []
+
+    async def publish(self, channel, message):
+        self.published.append((channel, json.loads(message)))
+
+
+@pytest.mark.asyncio
+async def test_bus_without_redis_is_local():
+    bus = CacheInvalidationBus()
+    cache = bus.register(TTLCache("sessions", maxsize=10, ttl=30.0))
+    cache.set(1, "état")
+    await bus.invalidate(cache, 1)
+    assert cache.get(1) is None
+
+
+@pytest.mark.asyncio
+async def test_bus_publishes_local_invalidations():
+    bus = CacheInvalidationBus()
+    cache = bus.register(TTLCache("sessions", maxsize=10, ttl=30.0))
+    bus._redis = FakeRedis()
+    cache.set(1, "état")
+
+    await bus.invalidate(cache, 1)
+
+    assert cache.get(1) is None
+    assert bus._redis.published == [(bus.channel, {"origin": bus.instance_id, "cache": "sessions", "key": 1})]
+
+
+def test_bus_applies_remote_invalidations():
+    sender, receiver = CacheInvalidationBus(), CacheInvalidationBus()
+    cache = receiver.register(TTLCache("sessions", maxsize=10, ttl=30.0))
+    cache.set(1, "état")
+    cache.set(2, "état")
+
+    # Message d'un autre worker : appliqué
+    receiver._apply(json.dumps({"origin": sender.instance_id, "cache": "sessions", "key": 1}))
+    # Message émis par ce worker, cache inconnu ou message illisible : ignorés
+    receiver._apply(json.dumps({"origin": receiver.instance_id, "cache": "sessions", "key": 2}))
+    receiver._apply(json.dumps({"origin": sender.instance_id, "cache": "inconnu", "key": 2}))
+    receiver._apply(b"pas du json")
+
+    assert cache.get(1) is None
+    assert cache.get(2) == "état"
+
+
+def end_in_another_worker(session_id):
+    """Fin de session écrite en base sans invalider le cache de ce worker"""
+    from app.core.database import ExamSession, SessionLocal
+
+    with SessionLocal() as db:
+        db.execute(update(ExamSession).where(ExamSession.id == session_id).values(status="completed"))
+        db.commit()
+
+
+def test_recording_sees_session_ended_elsewhere(client, register, start_session):
+    _, headers = register()
+    session_id = start_session(headers)
+    url = f"/api/v1/surveillance/session/{session_id}/recording/audio"
+
+    assert client.post(url, content=b"morceau", headers=headers).status_code == 200
+
+    # Le cache de ce worker affiche toujours la session active
+    end_in_another_worker(session_id)
+    status = client.get(f"/api/v1/surveillance/session/{session_id}/status", headers=headers)
+    assert status.json()["status"] == "active"
+
+    assert client.post(url, content=b"morceau", headers=headers).status_code == 409
+
+
+@pytest.mark.asyncio
+async def test_fresh_read_refreshes_the_cache(client, register, start_session):
+    from app.core.config import settings
+    from app.core.database import get_async_database_url
+
+    _, headers = register()
+    session_id = start_session(headers)
+    end_in_another_worker(session_id)
+
+    # Moteur propre à la boucle du test (celui de l'application vit dans celle du client)
+    engine = create_async_engine(get_async_database_url(settings.DATABASE_URL), poolclass=NullPool)
+    async with AsyncSession(engine) as db:
+        assert (await session_cache.get(db, session_id))["status"] == "active"
+        assert (await session_cache.get(db, session_id, fresh=True))["status"] == "completed"
+        assert (await session_cache.get(db, session_id))["status"] == "completed"
+        assert await session_cache.get(db, -1, fresh=True) is None
+    await engine.dispose()
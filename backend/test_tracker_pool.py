@@ -0,0 +1,193 @@
+#!/usr/bin/env python3
+"""
+Pool de suiveurs FaceMesh : éviction LRU, inactivité et fin de session
+
+    python -m pytest test_tracker_pool.py
+"""
+
+import threading
+import time
+from collections import Counter
+
+import pytest
+
+from app.ai import tracker_pool
+from app.ai.tracker_pool import TrackerPool
+
+
+class FakeMesh:
+    """FaceMesh factice : seule la fermeture est observée"""
+
+    def __init__(self):
+        self.closed = False
+
+    def close(self):
+        self.closed = True
+
+
+class RecordingCounter:
+    """Compteur de métriques en mémoire, par raison"""
+
+    def __init__(self):
+        self.counts = Counter()
+
+    def labels(self, reason):
+        counts = self.counts
+
+        class _Child:
+            def inc(self, amount=1):
+                counts[reason] += amount
+        return _Child()
+
+
+@pytest.fixture
+def evictions(monkeypatch):
+    metric = RecordingCounter()
+    monkeypatch.setattr(tracker_pool, "FACE_TRACKER_EVICTIONS", metric)
+    return metric.counts
+
+
+def make_pool(max_size=2, idle_timeout=60.0):
+    meshes = []
+
+    def factory():
+        meshes.append(FakeMesh())
+        return meshes[-1]
+    return TrackerPool(factory, max_size=max_size, idle_timeout=idle_timeout), meshes
+
+
+def use(pool, session_id):
+    with pool.acquire(session_id) as tracker:
+        return tracker
+
+
+def test_same_session_reuses_tracker(evictions):
+    pool, meshes = make_pool()
+    first = use(pool, "1")
+    assert use(pool, "1") is first
+    assert len(meshes) == 1
+    assert first.head_pose is use(pool, "1").head_pose
+
+
+def test_lru_eviction(evictions):
+    pool, meshes = make_pool(max_size=2)
+    first = use(pool, "1")
+    use(pool, "2")
+    use(pool, "1")
+    use(pool, "3")
+
+    # La session 2 est la moins récemment utilisée
+    assert [mesh.closed for mesh in meshes] == [False, True, False]
+    assert use(pool, "1") is first
+    assert pool.stats() == {'trackers': 2, 'max_size': 2, 'idle_timeout': 60.0}
+    assert evictions == {'lru': 1}
+
+
+def test_idle_eviction(evictions):
+    pool, meshes = make_pool(max_size=10, idle_timeout=0.05)
+    use(pool, "1")
+    use(pool, "2")
+    time.sleep(0.1)
+    use(pool, "3")
+
+    assert [mesh.closed for mesh in meshes] == [True, True, False]
+    assert pool.stats()['trackers'] == 1
+    assert evictions == {'idle': 2}
+
+
+def test_released_session_starts_again(evictions):
+    pool, meshes = make_pool()
+    first = use(pool, "1")
+    pool.release("1")
+    pool.release("unknown")
+
+    assert meshes[0].closed
+    assert use(pool, "1") is not first
+    assert evictions == {'session_end': 1}
+
+
+def test_close_releases_everything(evictions):
+    pool, meshes = make_pool()
+    use(pool, "1")
+    use(pool, "2")
+    pool.close()
+
+    assert all(mesh.closed for mesh in meshes)
+    assert pool.stats()['trackers'] == 0
+    assert evictions == {'shutdown': 2}
+
+
+def test_release_during_analysis_closes_after_it(evictions):
+    pool, meshes = make_pool()
+    lease = pool.acquire("1")
+    tracker = lease.__enter__()
+
+    # Fin de session pendant l'analyse : retiré du pool, fermé à la fin du bail
+    pool.release("1")
+    assert pool.stats()['trackers'] == 0 and not meshes[0].closed
+
+    lease.__exit__(None, None, None)
+    assert tracker.mesh.closed
+    assert evictions == {'session_end': 1}
+
+
+def test_lease_is_pinned_before_it_is_entered(evictions):
+    """Bail obtenu mais pas encore utilisé : ni l'éviction LRU ni la fin de session ne ferment le suiveur"""
+    pool, meshes = make_pool(max_size=1)
+    lease = pool.acquire("1")
+
+    # La session 1 est la plus ancienne mais épinglée : le pool déborde temporairement
+    use(pool, "2")
+    assert not meshes[0].closed and meshes[1].closed is False
+    assert pool.stats()['trackers'] == 2
+
+    pool.release("1")
+    with lease as tracker:
+        assert tracker.mesh is meshes[0] and not tracker.mesh.closed
+    assert meshes[0].closed
+    assert evictions == {'session_end': 1}
+
+    # Le pool revient à sa taille au prochain accès
+    use(pool, "3")
+    assert pool.stats()['trackers'] == 1 and meshes[1].closed
+    assert evictions == {'session_end': 1, 'lru': 1}
+
+
+def test_pinned_tracker_survives_idle_eviction(evictions):
+    pool, meshes = make_pool(max_size=10, idle_timeout=0.05)
+    lease = pool.acquire("1")
+    use(pool, "2")
+    time.sleep(0.1)
+    use(pool, "3")
+
+    assert [mesh.closed for mesh in meshes] == [False, True, False]
+    with lease as tracker:
+        assert tracker.mesh is meshes[0]
+    assert evictions == {'idle': 1}
+
+
+def test_concurrent_creation_keeps_one_tracker(evictions):
+    """Deux requêtes simultanées d'une session : le maillage en trop est fermé"""
+    barrier = threading.Barrier(2)
+    meshes = []
+
+    def factory():
+        mesh = FakeMesh()
+        meshes.append(mesh)
+        barrier.wait(1.0)
+        return mesh
+
+    pool = TrackerPool(factory, max_size=2, idle_timeout=60.0)
+    trackers = []
+    threads = [threading.Thread(target=lambda: trackers.append(use(pool, "1"))) for _ in range(2)]
+    for thread in threads:
+        thread.start()
+    for thread in threads:
+        thread.join(2.0)
+
+    assert trackers[0] is trackers[1]
+    assert sorted(mesh.closed for mesh in meshes) == [False, True]
+    assert trackers[0].mesh.closed is False
+    assert pool.stats()['trackers'] == 1
+    # Un doublon n'est pas une éviction
+    assert evictions == {}
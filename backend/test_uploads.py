@@ -0,0 +1,167 @@
+#!/usr/bin/env python3
+"""
+Lecture en flux des corps de requête : base64 incrémental et limites de taille
+
+    python -m pytest test_uploads.py
+"""
+
+import base64
+import json
+import os
+
+import numpy as np
+import pytest
+from fastapi import HTTPException
+from starlette.requests import Request
+
+from app.core.uploads import (
+    Base64StreamDecoder,
+    decode_base64,
+    read_body,
+    read_json_with_base64_fields,
+    spool_body,
+)
+
+PAYLOAD = os.urandom(3000)
+ENCODED = base64.b64encode(PAYLOAD)
+
+
+def make_request(chunks, content_length=None) -> Request:
+    """Requête dont le corps arrive en plusieurs messages ASGI"""
+    messages = [
+        {"type": "http.request", "body": chunk, "more_body": i < len(chunks) - 1}
+        for i, chunk in enumerate(chunks)
+    ] or [{"type": "http.request", "body": b"", "more_body": False}]
+
+    async def receive():
+        return messages.pop(0)
+
+    headers = [(b"content-type", b"application/json")]
+    if content_length is not None:
+        headers.append((b"content-length", str(content_length).encode()))
+    return Request({"type": "http", "method": "POST", "path": "/", "headers": headers}, receive)
+
+
+def split(data: bytes, size: int) -> list:
+    return [data[start:start + size] for start in range(0, len(data), size)]
+
+
+def decode_chunks(chunks) -> bytes:
+    decoder = Base64StreamDecoder()
+    decoded = b"".join(decoder.feed(chunk) for chunk in chunks)
+    decoder.finish()
+    return decoded
+
+
+@pytest.mark.parametrize("size", [1, 3, 5, 7, 1000])
+def test_decoder_across_chunk_splits(size):
+    assert decode_chunks(split(ENCODED, size)) == PAYLOAD
+
+
+@pytest.mark.parametrize("size", [1, 2, 4, 11])
+def test_decoder_with_split_data_url_prefix(size):
+    data = b"data:image/jpeg;base64," + ENCODED
+    assert decode_chunks(split(data, size)) == PAYLOAD
+
+
+def test_decoder_ignores_mime_line_breaks():
+    data = b"\r\n".join(split(ENCODED, 76))
+    assert decode_chunks(split(data, 50)) == PAYLOAD
+
+
+def test_decoder_rejects_invalid_and_truncated_input():
+    with pytest.raises(ValueError):
+        decode_chunks([b"@@@@"])
+    with pytest.raises(ValueError):
+        decode_chunks([ENCODED[:-1]])
+    with pytest.raises(ValueError):
+        decode_chunks([b"data:" + b"x" * 300])
+
+
+def test_decode_base64():
+    assert decode_base64(ENCODED.decode(), chunk_size=7) == PAYLOAD
+    assert decode_base64("data:image/png;base64," + ENCODED.decode()) == PAYLOAD
+
+
+def test_decode_base64_returns_its_buffer():
+    decoded = decode_base64(ENCODED.decode())
+    assert type(decoded) is bytearray
+    # Les consommateurs lisent le tampon sans copie
+    view = np.frombuffer(decoded, np.uint8)
+    decoded[0] ^= 0xFF
+    assert view[0] == decoded[0]
+
+
+@pytest.mark.asyncio
+@pytest.mark.parametrize("size", [1, 9, 64, 100000])
+async def test_json_with_base64_fields(size):
+    body = json.dumps({
+        "session_id": "12",
+        "image": "data:image/jpeg;base64," + ENCODED.decode(),
+        "nested": {"image": "reste tel quel"},
+        "note": "caractères \"échappés\" \\ et /",
+    }, ensure_ascii=False).encode()
+
+    document, blobs = await read_json_with_base64_fields(make_request(split(body, size)), ["image"])
+    try:
+        assert document == {
+            "session_id": "12",
+            "image": None,
+            "nested": {"image": "reste tel quel"},
+            "note": "caractères \"échappés\" \\ et /",
+        }
+        assert blobs["image"].read() == PAYLOAD
+    finally:
+        for blob in blobs.values():
+            blob.close()
+
+
+@pytest.mark.asyncio
+async def test_json_with_escaped_slashes_in_base64():
+    body = b'{"image": "' + ENCODED.replace(b"/", b"\\/") + b'"}'
+    document, blobs = await read_json_with_base64_fields(make_request(split(body, 13)), ["image"])
+    assert blobs["image"].read() == PAYLOAD
+    blobs["image"].close()
+
+
+@pytest.mark.asyncio
+async def test_json_invalid_body_is_rejected():
+    for body in (b'{"image": "' + ENCODED[:-1] + b'"}', b'{"image": "abcd"', b'[1, 2]'):
+        with pytest.raises(HTTPException) as error:
+            await read_json_with_base64_fields(make_request([body]), ["image"])
+        assert error.value.status_code == 400
+
+
+@pytest.mark.asyncio
+async def test_json_body_limit():
+    body = b'{"image": "' + ENCODED + b'"}'
+    with pytest.raises(HTTPException) as error:
+        await read_json_with_base64_fields(make_request(split(body, 100)), ["image"], max_bytes=1000)
+    assert error.value.status_code == 413
+
+
+@pytest.mark.asyncio
+async def test_read_body_limit():
+    assert await read_body(make_request([b"abc", b"def"]), max_bytes=6) == b"abcdef"
+
+    with pytest.raises(HTTPException) as error:
+        await read_body(make_request([b"abc", b"defg"]), max_bytes=6)
+    assert error.value.status_code == 413
+
+    # Content-Length annoncé trop grand : refus sans lire le corps
+    with pytest.raises(HTTPException) as error:
+        await read_body(make_request([], content_length=7), max_bytes=6)
+    assert error.value.status_code == 413
+
+
+@pytest.mark.asyncio
+async def test_spool_body():
+    spool = await spool_body(make_request(split(PAYLOAD, 100)), max_bytes=len(PAYLOAD))
+    try:
+        assert spool.read() == PAYLOAD
+    finally:
+        spool.close()
+
+    with pytest.raises(HTTPException) as error:
+        await spool_body(make_request(split(PAYLOAD, 100)), max_bytes=len(PAYLOAD) - 1)
+    assert error.value.status_code == 413
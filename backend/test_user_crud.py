@@ -0,0 +1,118 @@
+#!/usr/bin/env python3
+"""
+CRUD utilisateurs asynchrone : pilotes async, création, recherche, mise à jour et authentification
+
+    python -m pytest test_user_crud.py
+"""
+
+import itertools
+
+import pytest
+from sqlalchemy.ext.asyncio import async_sessionmaker, create_async_engine
+from sqlalchemy.pool import NullPool
+
+from app.core import security
+from app.core.config import settings
+from app.core.database import get_async_database_url
+from app.crud import user as crud
+from app.models.auth import UserCreate
+
+_names = itertools.count(1)
+
+
+@pytest.mark.parametrize("url, expected", [
+    ("postgresql://u:p@db/proctoflex", "postgresql+asyncpg://u:p@db/proctoflex"),
+    ("postgresql+psycopg2://u:p@db/proctoflex", "postgresql+asyncpg://u:p@db/proctoflex"),
+    ("sqlite:///./proctoflex.db", "sqlite+aiosqlite:///./proctoflex.db"),
+    ("postgresql+asyncpg://u:p@db/proctoflex", "postgresql+asyncpg://u:p@db/proctoflex"),
+    ("mysql://u:p@db/proctoflex", "mysql://u:p@db/proctoflex"),
+])
+def test_async_database_url(url, expected):
+    assert get_async_database_url(url) == expected
+
+
+@pytest.fixture
+def session_factory(client):
+    """Sessions async sur la base de test, un moteur par boucle d'événements du test"""
+    engine = create_async_engine(get_async_database_url(settings.DATABASE_URL), poolclass=NullPool)
+    yield async_sessionmaker(bind=engine, expire_on_commit=False)
+    engine.sync_engine.dispose()
+
+
+def new_user(role: str = "student") -> UserCreate:
+    name = f"crud{next(_names)}"
+    return UserCreate(
+        email=f"{name}@example.com", username=name, full_name=name.title(),
+        password="motdepasse", role=role
+    )
+
+
+@pytest.mark.asyncio
+async def test_create_and_lookup(session_factory):
+    data = new_user()
+    async with session_factory() as db:
+        created = await crud.create_user(db, data)
+        assert created.id is not None
+        assert created.hashed_password != data.password
+        assert security.verify_password(data.password, created.hashed_password)
+
+    async with session_factory() as db:
+        assert (await crud.get_user_by_email(db, data.email)).id == created.id
+        assert (await crud.get_user_by_username(db, data.username)).id == created.id
+        assert (await crud.get_user_by_id(db, created.id)).email == data.email
+        assert await crud.get_user_by_email(db, "absent@example.com") is None
+        assert await crud.get_user_by_id(db, -1) is None
+
+
+@pytest.mark.asyncio
+async def test_update_and_delete(session_factory):
+    async with session_factory() as db:
+        created = await crud.create_user(db, new_user())
+        updated = await crud.update_user(db, created.id, {"full_name": "Nouveau Nom", "unknown": 1})
+        assert updated.full_name == "Nouveau Nom"
+        assert await crud.update_user(db, -1, {"full_name": "x"}) is None
+
+        assert await crud.delete_user(db, created.id) is True
+        assert await crud.delete_user(db, created.id) is False
+        assert await crud.get_user_by_id(db, created.id) is None
+
+
+@pytest.mark.asyncio
+async def test_list_and_filter_by_role(session_factory):
+    async with session_factory() as db:
+        role = f"role{next(_names)}"
+        ids = {(await crud.create_user(db, new_user(role))).id for _ in range(3)}
+
+        assert {user.id for user in await crud.get_users_by_role(db, role)} == ids
+        page = await crud.get_users(db, skip=0, limit=2)
+        assert len(page) == 2
+        following = await crud.get_users(db, skip=2, limit=2)
+        assert not {user.id for user in page} & {user.id for user in following}
+
+
+@pytest.mark.asyncio
+async def test_authenticate_by_email_or_username(session_factory):
+    data = new_user()
+    async with session_factory() as db:
+        created = await crud.create_user(db, data)
+
+        for identifier in (data.email, data.username):
+            user = await security.authenticate_user_by_email_or_username(db, identifier, data.password)
+            assert user is not None and user.id == created.id
+        assert await security.authenticate_user_by_email_or_username(db, data.username, "mauvais") is None
+        assert await security.authenticate_user_by_email_or_username(db, "inconnu", data.password) is None
+        assert (await security.authenticate_user(db, data.username, data.password)).id == created.id
+        assert (await security.authenticate_user_by_email(db, data.email, data.password)).id == created.id
+
+
+def test_login_and_me_endpoints(client, register):
+    user_id, headers = register()
+    me = client.get("/api/v1/auth/me", headers=headers)
+    assert me.status_code == 200, me.text
+    username = me.json()["username"]
+    assert me.json()["id"] == user_id
+
+    login = client.post("/api/v1/auth/login", data={"username": username, "password": "motdepasse"})
+    assert login.status_code == 200, login.text
+    refused = client.post("/api/v1/auth/login", data={"username": username, "password": "mauvais"})
+    assert refused.status_code == 401
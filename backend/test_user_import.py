@@ -0,0 +1,152 @@
+#!/usr/bin/env python3
+"""
+Import en masse des utilisateurs : lecture en flux, lots validés un à un, rapport par ligne
+
+    python -m pytest test_user_import.py
+"""
+
+import itertools
+import json
+
+import pytest
+
+from app.api.v1.endpoints import users as users_endpoint
+from app.core.config import settings
+from app.crud import user as crud_user
+
+_batches = itertools.count(1)
+URL = "/api/v1/users/import"
+
+
+@pytest.fixture(autouse=True)
+def fast_hashing(monkeypatch):
+    """Hachage factice : le pool de processus bcrypt n'est pas l'objet de ces tests"""
+    async def hash_passwords(passwords, processes):
+        return [f"hash-{password}" for password in passwords]
+    monkeypatch.setattr(crud_user, "hash_passwords", hash_passwords)
+
+
+@pytest.fixture
+def admin(register):
+    return register(role="admin")[1]
+
+
+@pytest.fixture
+def prefix():
+    """Préfixe unique : les utilisateurs importés ne se croisent pas entre tests"""
+    return f"imp{next(_batches)}"
+
+
+@pytest.fixture
+def batches(monkeypatch):
+    """Tailles des lots transmis à bulk_create_users"""
+    sizes = []
+    bulk_create_users = users_endpoint.bulk_create_users
+
+    async def recording(db, rows, batch_size=None):
+        sizes.append(len(rows))
+        return await bulk_create_users(db, rows, batch_size)
+    monkeypatch.setattr(users_endpoint, "bulk_create_users", recording)
+    return sizes
+
+
+def csv_file(prefix, rows):
+    lines = ["email,username,full_name,password,role"]
+    lines += [",".join(row) for row in rows]
+    return ("\n".join(lines) + "\n").encode()
+
+
+def person(prefix, index, role="student"):
+    return (f"{prefix}-{index}@example.com", f"{prefix}-{index}", f"Etudiant {index}", "motdepasse", role)
+
+
+def upload(client, headers, content, filename="promo.csv", content_type="text/csv", **params):
+    return client.post(URL, headers=headers, params=params, files={"file": (filename, content, content_type)})
+
+
+def test_csv_report_lines_and_duplicates(client, admin, prefix):
+    existing = person(prefix, 0)
+    assert upload(client, admin, csv_file(prefix, [existing])).json()["created"] == 1
+
+    rows = [
+        person(prefix, 1),
+        (f"{prefix}-2@example.com", "", "Sans Pseudo", "motdepasse", "student"),  # username manquant
+        person(prefix, 3, role="pirate"),
+        existing,                                                                  # déjà en base
+        (f"{prefix}-1@example.com", f"{prefix}-autre", "Doublon", "motdepasse", "student"),  # doublon du fichier
+        person(prefix, 4, role="instructor"),
+    ]
+    report = upload(client, admin, csv_file(prefix, rows)).json()
+
+    assert report["total"] == 6
+    assert report["created"] == 2
+    # Ligne 1 : en-tête ; la première donnée est en ligne 2
+    assert [(error["line"], error["error"].split(":")[0]) for error in report["errors"]] == [
+        (3, "username"),
+        (4, "Rôle inconnu"),
+        (5, "Email déjà utilisé"),
+        (6, "Email déjà utilisé"),
+    ]
+    assert report["failed"] == 4
+
+
+def test_each_batch_is_committed_before_the_next(client, admin, prefix, batches, monkeypatch):
+    monkeypatch.setattr(settings, "USER_IMPORT_BATCH_SIZE", 2)
+    rows = [person(prefix, index) for index in range(5)]
+    # Doublon dans le troisième lot d'un utilisateur du premier : vu en base
+    rows.append((f"{prefix}-5@example.com", f"{prefix}-0", "Doublon", "motdepasse", "student"))
+    report = upload(client, admin, csv_file(prefix, rows)).json()
+
+    assert batches == [2, 2, 2]
+    assert report["created"] == 5
+    assert report["errors"] == [{"line": 7, "email": f"{prefix}-5@example.com",
+                                 "error": "Nom d'utilisateur déjà utilisé"}]
+
+
+def test_raw_ndjson_body(client, admin, prefix, batches):
+    lines = [
+        json.dumps({"email": f"{prefix}-1@example.com", "username": f"{prefix}-1",
+                    "full_name": "Un", "password": "motdepasse"}),
+        "",
+        "{pas du json",
+        json.dumps({"email": f"{prefix}-2@example.com", "username": f"{prefix}-2",
+                    "full_name": "Deux", "password": "motdepasse", "role": "instructor"}),
+    ]
+    response = client.post(URL, headers={**admin, "Content-Type": "application/x-ndjson"},
+                            content="\n".join(lines).encode())
+    report = response.json()
+
+    assert response.status_code == 200, response.text
+    assert (report["total"], report["created"]) == (3, 2)
+    assert report["errors"] == [{"line": 3, "email": None, "error": "Ligne JSON invalide"}]
+    assert batches == [2]
+
+
+def test_multipart_ndjson_detected_from_extension(client, admin, prefix):
+    line = json.dumps({"email": f"{prefix}@example.com", "username": prefix, "full_name": "N", "password": "x"})
+    report = upload(client, admin, line.encode(), filename="promo.jsonl", content_type="application/octet-stream")
+    assert report.json()["created"] == 1
+
+
+def test_file_errors_reject_before_any_insert(client, admin, prefix, batches, monkeypatch):
+    monkeypatch.setattr(settings, "USER_IMPORT_BATCH_SIZE", 1)
+    valid = csv_file(prefix, [person(prefix, 1)])
+
+    # Octet invalide après une ligne valide : rien n'est créé
+    response = upload(client, admin, valid + b"\xff\xfe,x,y,z\n")
+    assert response.status_code == 400
+
+    monkeypatch.setattr(settings, "USER_IMPORT_MAX_ROWS", 2)
+    response = upload(client, admin, csv_file(prefix, [person(prefix, index) for index in range(3)]))
+    assert response.status_code == 413
+    assert batches == []
+
+
+def test_utf8_bom_is_accepted(client, admin, prefix):
+    report = upload(client, admin, "﻿".encode() + csv_file(prefix, [person(prefix, "é")])).json()
+    assert report["created"] == 1 and report["errors"] == []
+
+
+def test_students_cannot_import(client, register, prefix):
+    _, student = register()
+    assert upload(client, student, csv_file(prefix, [person(prefix, 1)])).status_code == 403
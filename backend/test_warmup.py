@@ -0,0 +1,76 @@
+#!/usr/bin/env python3
+"""
+Préchauffage des modèles : un analyseur en échec n'interrompt pas les autres
+
+    python -m pytest test_warmup.py
+"""
+
+import pytest
+from prometheus_client import REGISTRY
+
+from app.ai import warmup
+from app.services.readiness import ReadinessService
+
+
+@pytest.fixture
+def warmers(monkeypatch):
+    """Analyseurs factices : appels relevés par nom et par résolution"""
+    calls = []
+
+    def recording(name, fail_at=None):
+        def warmer(frame, image):
+            resolution = f"{frame.shape[1]}x{frame.shape[0]}"
+            calls.append((name, resolution))
+            assert image.startswith("data:image/jpeg;base64,")
+            if resolution == fail_at:
+                raise ModuleNotFoundError("No module named 'mediapipe'")
+        return warmer
+
+    monkeypatch.setitem(warmup.WARMERS, "face_detection", recording("face_detection"))
+    monkeypatch.setitem(warmup.WARMERS, "face_recognition", recording("face_recognition", fail_at="160x120"))
+    monkeypatch.setitem(warmup.WARMERS, "object_detection", recording("object_detection"))
+    return calls
+
+
+def test_failing_analyzer_is_isolated(warmers):
+    result = warmup.warm_up(
+        ["face_recognition", "inconnu", "face_detection", "object_detection"],
+        ["64x48", "160x120"],
+        iterations=2
+    )
+
+    analyzers = result["analyzers"]
+    assert list(analyzers) == ["face_recognition", "face_detection", "object_detection"]
+
+    failed = analyzers["face_recognition"]
+    assert failed["error"] == "No module named 'mediapipe'"
+    # Résolutions traitées avant l'échec conservées
+    assert list(failed["resolutions"]) == ["64x48"]
+
+    for name in ("face_detection", "object_detection"):
+        assert analyzers[name]["error"] is None
+        assert list(analyzers[name]["resolutions"]) == ["64x48", "160x120"]
+        assert warmers.count((name, "160x120")) == 2
+
+    assert REGISTRY.get_sample_value("proctoflex_ai_warmup_seconds", {"analyzer": "face_recognition"}) == \
+        failed["seconds"]
+
+
+def test_at_least_one_call_per_resolution(warmers):
+    result = warmup.warm_up(["object_detection"], ["32x24"], iterations=0)
+    assert warmers == [("object_detection", "32x24")]
+    timings = result["analyzers"]["object_detection"]["resolutions"]["32x24"]
+    assert timings["first_ms"] == timings["last_ms"]
+
+
+def test_parse_resolution():
+    assert warmup.parse_resolution("640X480") == (640, 480)
+    with pytest.raises(ValueError):
+        warmup.parse_resolution("640")
+
+
+def test_warmup_result_is_reported(warmers):
+    service = ReadinessService()
+    service.record_warmup(warmup.warm_up(["face_recognition"], ["160x120"]))
+    report = service.report()
+    assert report["warmup"]["analyzers"]["face_recognition"]["error"] is not None